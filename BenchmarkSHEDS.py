@@ -0,0 +1,363 @@
+"""
+Benchmark SHEDS times the lake and river parsers on synthetic data and keeps a history.
+
+Each scenario is a standard query, bounds, area, continent, river thresholds, run with
+each reading mode (line by line, memory mapped, sidecar index). The input is written by
+SyntheticSHEDS.py the first time and reused after, so runs with the same sizes time the
+same file. Each scenario runs once to warm the page cache and build any index, then
+Repeats times. The best time is kept with the throughput in input lines/s and MB/s.
+
+The lake scenarios, except BoundsOutline, are also run header only. The lake headers are
+read and extracted once, then tested with LakeMatchesAllTesters (mode HeaderTesters) and
+with the compiled LakePredicate (mode HeaderPredicate). This times the tests alone, their
+throughput is in lake headers/s and header MB/s.
+
+Every run is added to a JSON history file along with the date, commit, machine and data
+sizes. The run is compared with the last one in the history on the same machine with the
+same data and any scenario slower by more than Tolerance is reported as a regression. For
+example
+
+import BenchmarkSHEDS
+
+Run = BenchmarkSHEDS.RunBenchmarks('SyntheticData', LakeCount=200000)
+BenchmarkSHEDS.AddToHistory('BenchmarkHistory.json', Run)
+
+or from the command line
+
+python3 BenchmarkSHEDS.py BenchmarkHistory.json -L 200000 -R 500000 -N 3
+
+Author: Joseph Wellhouse
+"""
+
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import ParseSHEDSLake
+import ParseSHEDSriv
+import SyntheticSHEDS
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+# Scenario name, parser and options. Rivers always need both thresholds.
+LAKE_SCENARIOS = {'SimpleBounds':{'SimpleBounds':[-100.0, -60.0, 45.0, 60.0]},
+                    'SimpleBoundsAreaMin':{'SimpleBounds':[-100.0, -60.0, 45.0, 60.0], 'AreaMin':5.0},
+                    'AreaMin':{'AreaMin':1.0},
+                    'ContinentNorth':{'ContinentName':'north'},
+                    'BoundsOutline':{'SimpleBounds':[5.0, 40.0, 55.0, 71.0], 'BoundsOutline':True}}
+
+RIVER_SCENARIOS = {'ThresholdLow':{'ThresholdLow':1000, 'ThresholdHigh':SyntheticSHEDS.MAX_UPSTREAM_CELLS},
+                    'ThresholdHighLow':{'ThresholdLow':1000, 'ThresholdHigh':100000},
+                    'BoundsThreshold':{'SimpleBounds':[130.0, 150.0, -40.0, -20.0], 'ThresholdLow':500,
+                                        'ThresholdHigh':SyntheticSHEDS.MAX_UPSTREAM_CELLS}}
+
+# Reading mode name and options for each parser, None where a parser does not have it
+MODES = {'Lines':({}, {}),
+            'MemoryMap':({'MemoryMap':True}, {'MemoryMap':True}),
+            'UseIndex':({'UseIndex':True}, None)}
+
+# Header only modes of the lake scenarios, the name and the test run on each lake header
+PREDICATE_MODES = {'HeaderTesters':lambda Parser, Atributes: Parser.LakeMatchesAllTesters(),
+                    'HeaderPredicate':lambda Parser, Atributes: Parser.LakePredicate(Atributes)}
+
+DEFAULT_TOLERANCE = 0.1
+
+
+def CountFileLines(FileName):
+    Count = 0
+    with open(FileName, 'rb') as InFile:
+        for Block in iter(lambda: InFile.read(1024 * 1024), b''):
+            Count += Block.count(b'\n')
+    return Count
+
+
+def GitCommit():
+    """
+    Returns the commit of the working tree of this file, None if it is not in git.
+    """
+    try:
+        Result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True)
+    except OSError:
+        return None
+    if Result.returncode != 0:
+        return None
+    return Result.stdout.strip()
+
+
+def MakeData(WorkDirectory, DataSizes, RunLoud=False):
+    """
+    Writes the synthetic lakes and rivers files of DataSizes in WorkDirectory unless they
+    are already there. Returns a dictionary of lakes and rivers, each (file name, lines, bytes).
+    """
+    os.makedirs(WorkDirectory, exist_ok=True)
+    LakesFile = os.path.join(WorkDirectory, 'SyntheticLakes_{LakeCount}_{IslandsPerLake}_{VerticesPerRing}_{Seed}.gmt'.format(**DataSizes))
+    RiversFile = os.path.join(WorkDirectory, 'SyntheticRivers_{SegmentCount}_{VerticesPerSegment}_{Seed}.gmt'.format(**DataSizes))
+
+    if not os.path.exists(LakesFile):
+        if RunLoud:
+            print("Writing {}".format(LakesFile))
+        SyntheticSHEDS.WriteLakes(LakesFile + '.partial', LakeCount=DataSizes['LakeCount'], IslandsPerLake=DataSizes['IslandsPerLake'],
+                                    VerticesPerRing=DataSizes['VerticesPerRing'], Seed=DataSizes['Seed'])
+        os.replace(LakesFile + '.partial', LakesFile)
+    if not os.path.exists(RiversFile):
+        if RunLoud:
+            print("Writing {}".format(RiversFile))
+        SyntheticSHEDS.WriteRivers(RiversFile + '.partial', SegmentCount=DataSizes['SegmentCount'],
+                                    VerticesPerSegment=DataSizes['VerticesPerSegment'], Seed=DataSizes['Seed'])
+        os.replace(RiversFile + '.partial', RiversFile)
+
+    return {'lakes':(LakesFile, CountFileLines(LakesFile), os.path.getsize(LakesFile)),
+            'rivers':(RiversFile, CountFileLines(RiversFile), os.path.getsize(RiversFile))}
+
+
+def TimeParser(Kind, InputFile, OutputFile, Options):
+    """
+    Parses InputFile into OutputFile once. Returns (seconds, features copied).
+    """
+    Start = time.perf_counter()
+    if Kind == 'lakes':
+        Parser = ParseSHEDSLake.LakesParser(InputFile, OutputFile, RunSilent=True, Overwrite=True, **Options)
+        Parser.ParseLAKES()
+        Copied = Parser.FileStats['CountLakesCopied']
+    else:
+        Parser = ParseSHEDSriv.SHEDSrivParser(InputFile, OutputFile, RunSilent=True, Overwrite=True, **Options)
+        Parser.ParseRIV()
+        Copied = Parser.FileStats['OutputSegmentCount']
+    return time.perf_counter() - Start, Copied
+
+
+def ReadLakeHeaders(FileName):
+    """
+    Returns the list of lake header lines, # @D, of FileName.
+    """
+    with open(FileName, 'r') as InFile:
+        return [line for line in InFile if line.startswith('# @D')]
+
+
+def TimePredicate(InputFile, OutputFile, Options, Headers, ModeName):
+    """
+    Tests each of the lake Headers with the PREDICATE_MODES test ModeName of a lakes parser
+    with Options. The headers are extracted before timing. Returns (seconds, lakes matched).
+    """
+    Parser = ParseSHEDSLake.LakesParser(InputFile, OutputFile, RunSilent=True, Overwrite=True, **Options)
+    AtributesLists = []
+    for line in Headers:
+        Parser.ExtractLakeHeader(line)
+        AtributesLists.append(Parser.LakeAtributesList)
+    Test = PREDICATE_MODES[ModeName]
+
+    Matched = 0
+    Start = time.perf_counter()
+    for Atributes in AtributesLists:
+        Parser.LakeAtributesList = Atributes
+        if Test(Parser, Atributes):
+            Matched += 1
+    return time.perf_counter() - Start, Matched
+
+
+def RunBenchmarks(WorkDirectory, LakeCount=200000, IslandsPerLake=0.2, VerticesPerRing=30,
+                    SegmentCount=500000, VerticesPerSegment=8, Seed=1, Repeats=3,
+                    Scenarios=None, Modes=None, RunLoud=False):
+    """
+    Times each scenario in each mode on synthetic data in WorkDirectory.
+
+    Scenarios and Modes are lists of names from LAKE_SCENARIOS, RIVER_SCENARIOS, MODES and
+    PREDICATE_MODES, None for all of them. Returns the run, a dictionary for AddToHistory.
+    Its Results are keyed on '<Scenario> <Mode>' and hold the best and median seconds of
+    Repeats runs, the lines/s and MB/s of the best and the number of features copied.
+    """
+    DataSizes = {'LakeCount':LakeCount, 'IslandsPerLake':IslandsPerLake, 'VerticesPerRing':VerticesPerRing,
+                    'SegmentCount':SegmentCount, 'VerticesPerSegment':VerticesPerSegment, 'Seed':Seed}
+    Data = MakeData(WorkDirectory, DataSizes, RunLoud=RunLoud)
+    OutputFile = os.path.join(WorkDirectory, 'BenchmarkOutput.gmt')
+
+    Results = {}
+
+    def AddResult(Key, Kind, Times, Copied, Lines, Bytes):
+        Best = min(Times)
+        Results[Key] = {'Parser':Kind,
+                        'BestSeconds':round(Best, 4),
+                        'MedianSeconds':round(statistics.median(Times), 4),
+                        'LinesPerSecond':round(Lines / Best),
+                        'MBPerSecond':round(Bytes / 1e6 / Best, 2),
+                        'Copied':Copied}
+        if RunLoud:
+            print("{:<36} {:>9.3f} s {:>12.0f} lines/s {:>8.1f} MB/s {:>8} copied".format(
+                    Key, Best, Lines / Best, Bytes / 1e6 / Best, Copied))
+
+    for Kind, KindScenarios in (('lakes', LAKE_SCENARIOS), ('rivers', RIVER_SCENARIOS)):
+        InputFile, InputLines, InputBytes = Data[Kind]
+        for ScenarioName, ScenarioOptions in KindScenarios.items():
+            if (Scenarios is not None) and (ScenarioName not in Scenarios):
+                continue
+            for ModeName, ModeOptions in MODES.items():
+                ModeOptions = ModeOptions[0] if Kind == 'lakes' else ModeOptions[1]
+                if (ModeOptions is None) or ((Modes is not None) and (ModeName not in Modes)):
+                    continue
+                Options = dict(ScenarioOptions, **ModeOptions)
+
+                # Warm up, this also builds the lake index
+                TimeParser(Kind, InputFile, OutputFile, Options)
+                Times = []
+                for Repeat in range(Repeats):
+                    Seconds, Copied = TimeParser(Kind, InputFile, OutputFile, Options)
+                    Times.append(Seconds)
+                AddResult('{} {}'.format(ScenarioName, ModeName), Kind, Times, Copied, InputLines, InputBytes)
+
+    # Header only, LakeMatchesAllTesters against the compiled LakePredicate
+    RunPredicateModes = [ModeName for ModeName in PREDICATE_MODES if (Modes is None) or (ModeName in Modes)]
+    if RunPredicateModes:
+        InputFile = Data['lakes'][0]
+        Headers = ReadLakeHeaders(InputFile)
+        HeaderBytes = sum(len(line) for line in Headers)
+        for ScenarioName, ScenarioOptions in LAKE_SCENARIOS.items():
+            if (Scenarios is not None) and (ScenarioName not in Scenarios):
+                continue
+            # The outline test is not on the header, the predicate leaves bounds to it
+            if ScenarioName == 'BoundsOutline':
+                continue
+            for ModeName in RunPredicateModes:
+                Times = []
+                for Repeat in range(Repeats):
+                    Seconds, Copied = TimePredicate(InputFile, OutputFile, ScenarioOptions, Headers, ModeName)
+                    Times.append(Seconds)
+                AddResult('{} {}'.format(ScenarioName, ModeName), 'lakes', Times, Copied, len(Headers), HeaderBytes)
+
+    if os.path.exists(OutputFile):
+        os.remove(OutputFile)
+
+    return {'Date':datetime.datetime.now().isoformat(timespec='seconds'),
+            'Version':__version__,
+            'Commit':GitCommit(),
+            'Machine':platform.node(),
+            'Platform':platform.platform(),
+            'Python':platform.python_version(),
+            'DataSizes':DataSizes,
+            'InputLines':{Kind:Data[Kind][1] for Kind in Data},
+            'InputBytes':{Kind:Data[Kind][2] for Kind in Data},
+            'Repeats':Repeats,
+            'Results':Results}
+
+
+def LoadHistory(HistoryFile):
+    """
+    Returns the list of runs in HistoryFile, empty if it does not exist.
+    """
+    if not os.path.exists(HistoryFile):
+        return []
+    with open(HistoryFile, 'r') as InFile:
+        return json.load(InFile)['Runs']
+
+
+def AddToHistory(HistoryFile, Run):
+    """
+    Adds Run to the end of HistoryFile. The file is replaced whole so it is never left
+    half written.
+    """
+    Runs = LoadHistory(HistoryFile)
+    Runs.append(Run)
+    with open(HistoryFile + '.partial', 'w') as OutFile:
+        json.dump({'Runs':Runs}, OutFile, indent=1)
+    os.replace(HistoryFile + '.partial', HistoryFile)
+
+
+def PreviousRun(Runs, Run):
+    """
+    Returns the last of Runs on the same machine with the same data sizes as Run, or None.
+    """
+    for Previous in reversed(Runs):
+        if (Previous['Machine'] == Run['Machine']) and (Previous['DataSizes'] == Run['DataSizes']):
+            return Previous
+    return None
+
+
+def CompareRuns(Previous, Run, Tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns a list of (result key, previous best seconds, best seconds, ratio, regressed)
+    for the results in both runs. A result regressed if it is more than Tolerance slower.
+    """
+    Comparison = []
+    for Key, Result in Run['Results'].items():
+        if Key not in Previous['Results']:
+            continue
+        PreviousSeconds = Previous['Results'][Key]['BestSeconds']
+        Ratio = Result['BestSeconds'] / PreviousSeconds if PreviousSeconds > 0 else 1.0
+        Comparison.append((Key, PreviousSeconds, Result['BestSeconds'], Ratio, Ratio > 1.0 + Tolerance))
+    return Comparison
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Time Parse SHEDS Lake and Parse SHEDS riv on synthetic data and keep a JSON history')
+
+    parser.add_argument("HistoryFile", action="store", nargs=1,
+                        help="JSON file of past runs. Created if it does not exist, this run is added to it.")
+    parser.add_argument('--version', action='version',
+                        version="%(prog)s {}".format(__version__))
+    parser.add_argument("-s", "--silent", action="store_true",
+                        help="Only print regressions.")
+
+    parser.add_argument("-WD", "-wd", "--WorkDirectory", action="store", nargs=1, default=['SyntheticData'],
+                        help="Directory for the synthetic input files. Kept between runs. Default SyntheticData.")
+    parser.add_argument("-L", "-l", "--LakeCount", action="store", nargs=1, type=int, default=[200000],
+                        help="Lakes in the synthetic lakes file. Default 200000.")
+    parser.add_argument("-I", "-i", "--IslandsPerLake", action="store", nargs=1, type=float, default=[0.2],
+                        help="Mean number of islands per lake. Default 0.2.")
+    parser.add_argument("-V", "--VerticesPerRing", action="store", nargs=1, type=int, default=[30],
+                        help="Mean number of vertices per lake outline. Default 30.")
+    parser.add_argument("-R", "-r", "--SegmentCount", action="store", nargs=1, type=int, default=[500000],
+                        help="Segments in the synthetic river network file. Default 500000.")
+    parser.add_argument("-VS", "-vs", "--VerticesPerSegment", action="store", nargs=1, type=int, default=[8],
+                        help="Mean number of vertices per river segment. Default 8.")
+    parser.add_argument("-S", "--Seed", action="store", nargs=1, type=int, default=[1],
+                        help="Random seed of the synthetic data. Default 1.")
+    parser.add_argument("-N", "-n", "--Repeats", action="store", nargs=1, type=int, default=[3],
+                        help="Timed runs of each scenario, the best is kept. Default 3.")
+
+    parser.add_argument("-SC", "-sc", "--Scenarios", action="store", nargs='+',
+                        choices=list(LAKE_SCENARIOS) + list(RIVER_SCENARIOS),
+                        help="Only run these scenarios. Default all.")
+    parser.add_argument("-M", "-m", "--Modes", action="store", nargs='+', choices=list(MODES) + list(PREDICATE_MODES),
+                        help="Only run these reading modes or header only modes. Default all.")
+    parser.add_argument("-T", "-t", "--Tolerance", action="store", nargs=1, type=float, default=[DEFAULT_TOLERANCE],
+                        help="A scenario more than this fraction slower than the last comparable run is a regression. Default {}.".format(DEFAULT_TOLERANCE))
+    parser.add_argument("-FR", "-fr", "--FailOnRegression", action="store_true",
+                        help="Exit with code 1 if any scenario regressed.")
+    args = parser.parse_args()
+
+    RUN_LOUD = not args.silent
+    HistoryFile = args.HistoryFile[0]
+
+    Run = RunBenchmarks(args.WorkDirectory[0], LakeCount=args.LakeCount[0], IslandsPerLake=args.IslandsPerLake[0],
+                        VerticesPerRing=args.VerticesPerRing[0], SegmentCount=args.SegmentCount[0],
+                        VerticesPerSegment=args.VerticesPerSegment[0], Seed=args.Seed[0], Repeats=args.Repeats[0],
+                        Scenarios=args.Scenarios, Modes=args.Modes, RunLoud=RUN_LOUD)
+
+    Previous = PreviousRun(LoadHistory(HistoryFile), Run)
+    AddToHistory(HistoryFile, Run)
+
+    Regressed = False
+    if Previous is None:
+        if RUN_LOUD:
+            print("\nNo earlier run on this machine with the same data to compare with.")
+    else:
+        if RUN_LOUD:
+            print("\nCompared with the run of {} (commit {})".format(Previous['Date'], Previous['Commit']))
+        for Key, PreviousSeconds, Seconds, Ratio, IsRegression in CompareRuns(Previous, Run, args.Tolerance[0]):
+            Regressed = Regressed or IsRegression
+            if RUN_LOUD or IsRegression:
+                print("{:<36} {:>9.3f} s -> {:>9.3f} s  x{:.2f}{}".format(Key, PreviousSeconds, Seconds, Ratio,
+                        '  REGRESSION' if IsRegression else ''))
+
+    if Regressed and args.FailOnRegression:
+        sys.exit(1)
+    sys.exit(0)
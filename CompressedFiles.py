@@ -0,0 +1,263 @@
+"""
+Compressed Files opens gzip, bzip2, xz and zstd compressed files as though they were not.
+
+HydroSHEDS GMT conversions are large and compress well. Inputs are recognised by their
+magic bytes, or by their extension (.gz, .bz2, .xz, .zst) if the magic bytes are not
+known, and decompressed as they are read. Outputs are compressed when their name has one
+of those extensions. Files without are opened with the builtin open.
+
+gzip, bzip2 and xz use the standard library. zstd uses the zstandard package if it is
+installed and otherwise runs the zstd command line program through a pipe.
+
+With Background=True the input is decompressed in a separate thread, a few blocks ahead
+of the reader, so decompressing overlaps with parsing. zlib, bz2 and lzma release the GIL
+while they work. The zstd program is a separate process already.
+
+Used by ParseSHEDSLake.LakesParser and ParseSHEDSriv.SHEDSrivParser. For example
+
+import CompressedFiles
+
+with CompressedFiles.Open('HydroLAKES_polys_v10.gmt.xz', 'r', Background=True) as InFile:
+    for line in InFile:
+        ...
+
+Author: Joseph Wellhouse
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import subprocess
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+COMPRESSION_EXTENSIONS = {'.gz':'gzip', '.bz2':'bz2', '.xz':'xz', '.zst':'zstd'}
+
+# Leading bytes of each compressed format
+MAGIC_BYTES = [(b'\x1f\x8b', 'gzip'),
+                (b'BZh', 'bz2'),
+                (b'\xfd7zXZ\x00', 'xz'),
+                (b'\x28\xb5\x2f\xfd', 'zstd')]
+
+# Size of the blocks decompressed ahead of the reader with Background
+BACKGROUND_BLOCK_BYTES = 4 * 1024 * 1024
+BACKGROUND_BLOCKS_AHEAD = 4
+
+
+def CompressionFromExtension(FileName):
+    """
+    Returns the compression named by the extension of FileName, gzip, bz2, xz or zstd,
+    or None.
+    """
+    for Extension, Compression in COMPRESSION_EXTENSIONS.items():
+        if FileName.lower().endswith(Extension):
+            return Compression
+    return None
+
+
+def StripCompressionExtension(FileName):
+    """
+    Returns FileName without a compression extension, so lakes.gmt.gz is lakes.gmt.
+    """
+    for Extension in COMPRESSION_EXTENSIONS:
+        if FileName.lower().endswith(Extension):
+            return FileName[:-len(Extension)]
+    return FileName
+
+
+def DetectCompression(FileName):
+    """
+    Returns the compression of the existing file FileName from its magic bytes, or from
+    its extension if they are not known. None if it is not compressed.
+    """
+    with open(FileName, 'rb') as TheFile:
+        Leading = TheFile.read(8)
+    for Magic, Compression in MAGIC_BYTES:
+        if Leading.startswith(Magic):
+            return Compression
+    return CompressionFromExtension(FileName)
+
+
+class PipeFile(io.RawIOBase):
+    """
+    Binary file reading the stdout of, or writing the stdin of, a command. Closing it
+    waits for the command and raises OSError if it failed. For the zstd program.
+    """
+
+    def __init__(self, Command, Writing, OutputFileName=None):
+        super().__init__()
+        self.Command = Command
+        self.Writing = Writing
+        self.AtEOF = False
+        if Writing:
+            self.OutputFile = open(OutputFileName, 'wb')
+            self.Process = subprocess.Popen(Command, stdin=subprocess.PIPE, stdout=self.OutputFile)
+            self.Pipe = self.Process.stdin
+        else:
+            self.OutputFile = None
+            self.Process = subprocess.Popen(Command, stdout=subprocess.PIPE)
+            self.Pipe = self.Process.stdout
+
+    def readable(self):
+        return not self.Writing
+
+    def writable(self):
+        return self.Writing
+
+    def readinto(self, Buffer):
+        Count = self.Pipe.readinto(Buffer)
+        if not Count:
+            self.AtEOF = True
+        return Count
+
+    def write(self, Data):
+        self.Pipe.write(Data)
+        return len(Data)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        if not self.Writing and not self.AtEOF:
+            # Closed before EOF, nothing more is wanted
+            self.Pipe.close()
+            self.Process.kill()
+            self.Process.wait()
+            return
+        self.Pipe.close()
+        ExitStatus = self.Process.wait()
+        if self.OutputFile is not None:
+            self.OutputFile.close()
+        if ExitStatus != 0:
+            raise OSError('{} exited with status {}'.format(' '.join(self.Command), ExitStatus))
+
+
+class BackgroundReader(io.RawIOBase):
+    """
+    Binary file reading Source, a binary file, in a separate thread. Up to
+    BACKGROUND_BLOCKS_AHEAD blocks are read ahead. Exceptions in the thread are raised
+    in the reader.
+    """
+
+    def __init__(self, Source):
+        super().__init__()
+        self.Source = Source
+        self.Blocks = queue.Queue(maxsize=BACKGROUND_BLOCKS_AHEAD)
+        self.Stopping = threading.Event()
+        self.Block = b''
+        self.BlockOffset = 0
+        self.AtEOF = False
+        self.Thread = threading.Thread(target=self.ReadAhead, daemon=True)
+        self.Thread.start()
+
+    def ReadAhead(self):
+        try:
+            while not self.Stopping.is_set():
+                Block = self.Source.read(BACKGROUND_BLOCK_BYTES)
+                self.Put(Block)
+                if not Block:
+                    return
+        except BaseException as err:
+            self.Put(err)
+
+    def Put(self, Item):
+        # The reader may stop taking blocks, so keep checking for close
+        while not self.Stopping.is_set():
+            try:
+                self.Blocks.put(Item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, Buffer):
+        if self.BlockOffset >= len(self.Block):
+            if self.AtEOF:
+                return 0
+            Block = self.Blocks.get()
+            if isinstance(Block, BaseException):
+                self.AtEOF = True
+                raise Block
+            if not Block:
+                self.AtEOF = True
+                return 0
+            self.Block = Block
+            self.BlockOffset = 0
+        Count = min(len(Buffer), len(self.Block) - self.BlockOffset)
+        Buffer[:Count] = self.Block[self.BlockOffset:self.BlockOffset + Count]
+        self.BlockOffset += Count
+        return Count
+
+    def fileno(self):
+        # The file read ahead, so its offset can be followed
+        return self.Source.fileno()
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self.Stopping.set()
+        self.Thread.join()
+        self.Source.close()
+
+
+def OpenBinary(FileName, Compression, Writing):
+    """
+    Returns FileName opened as a binary file with Compression, as Open.
+    """
+    Mode = 'wb' if Writing else 'rb'
+    if Compression is None:
+        return open(FileName, Mode)
+    if Compression == 'gzip':
+        # Level 6 as the gzip program, the module's default 9 is much slower for little gain
+        return gzip.open(FileName, Mode, compresslevel=6) if Writing else gzip.open(FileName, Mode)
+    if Compression == 'bz2':
+        return bz2.open(FileName, Mode)
+    if Compression == 'xz':
+        return lzma.open(FileName, Mode)
+    if Compression == 'zstd':
+        if zstandard is not None:
+            return zstandard.open(FileName, Mode)
+        try:
+            if Writing:
+                return io.BufferedWriter(PipeFile(['zstd', '-q', '-c'], True, FileName))
+            return io.BufferedReader(PipeFile(['zstd', '-q', '-d', '-c', '--', FileName], False))
+        except FileNotFoundError as err:
+            raise OSError('zstd compressed files need the zstandard package or the zstd program: {}'.format(err))
+    raise ValueError('Unknown compression {}'.format(Compression))
+
+
+def Open(FileName, Mode='r', Background=False):
+    """
+    Opens FileName as the builtin open would with Mode, one of r, rb, rt, w, wb and wt.
+    Read files are decompressed as detected by DetectCompression, written files are
+    compressed as named by CompressionFromExtension. With Background compressed files
+    are read in a separate thread, see BackgroundReader.
+    """
+    Writing = 'w' in Mode
+    if Writing:
+        Compression = CompressionFromExtension(FileName)
+    else:
+        Compression = DetectCompression(FileName)
+    if Compression is None:
+        return open(FileName, Mode)
+
+    TheFile = OpenBinary(FileName, Compression, Writing)
+    if Background and not Writing:
+        TheFile = io.BufferedReader(BackgroundReader(TheFile), buffer_size=BACKGROUND_BLOCK_BYTES)
+    if 'b' not in Mode:
+        # Decoded the same way as a file opened with open(<file>, 'r')
+        TheFile = io.TextIOWrapper(TheFile)
+    return TheFile
@@ -0,0 +1,185 @@
+"""
+Conversion Cache keeps the GMT text files ogr2ogr makes from HydroSHEDS shapefiles so
+repeat runs on the same shapefile skip the conversion.
+
+Entries are keyed on a hash of the size and modification time of the .shp, .shx, .dbf
+and .prj files, so a changed shapefile gets a new entry and an unchanged one, wherever
+it is, finds the old one. Each entry is <Key>.gmt in the cache directory, plus any
+sidecars named <Key>.gmt.* (for example the lake index <Key>.gmt.lakeidx).
+
+A conversion is written into a private temporary directory inside the cache directory
+and moved into place with os.replace, so concurrent runs never see or clobber a partial
+file. Two runs converting the same shapefile at once both succeed and the last move wins.
+
+After a conversion the least recently used entries are deleted until the cache is below
+its size limit. Using an entry sets its access time, its modification time is left alone
+so the lake index does not go stale.
+
+The cache directory is CacheDirectory if given, otherwise $PARSESHEDS_CACHE_DIR, otherwise
+~/.cache/ParseSHEDS. For example
+
+import ConversionCache
+
+Cache = ConversionCache.ConversionCache(MaxBytes=10e9)
+GMTFileName = Cache.Convert('HydroLAKES_polys_v10.shp', RunOgr2ogr)
+
+where RunOgr2ogr(OutputFileName) writes the GMT file.
+
+Author: Joseph Wellhouse
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+class ConversionCache:
+    """
+    Size limited, least recently used cache of converted shapefiles.
+
+    Optional inputs:    CacheDirectory=None,
+                        MaxBytes=None,
+                        RunLoud=False
+
+    MaxBytes None is DEFAULT_MAX_BYTES.
+    """
+
+    # The files of a shapefile that go into the key
+    SHAPEFILE_EXTENSIONS = ['shp', 'shx', 'dbf', 'prj']
+    # Changing this makes every old entry miss, for changes to how files are converted
+    KEY_VERSION = 1
+
+    DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+    TEMP_PREFIX = 'Converting_'
+
+    def __init__(self, CacheDirectory=None, MaxBytes=None, RunLoud=False):
+        if CacheDirectory is None:
+            CacheDirectory = os.environ.get('PARSESHEDS_CACHE_DIR',
+                                            os.path.join(os.path.expanduser('~'), '.cache', 'ParseSHEDS'))
+        if MaxBytes is None:
+            MaxBytes = self.DEFAULT_MAX_BYTES
+        self.CacheDirectory = CacheDirectory
+        self.MaxBytes = MaxBytes
+        self.RunLoud = RunLoud
+
+    @classmethod
+    def ShapefileParts(cls, ShapeFile):
+        """
+        Returns the existing files of the shapefile ShapeFile (.shp, .shx, .dbf, .prj),
+        in either case of extension.
+        """
+        Parts = []
+        for Extension in cls.SHAPEFILE_EXTENSIONS:
+            for Name in (ShapeFile[:-3] + Extension.lower(), ShapeFile[:-3] + Extension.upper()):
+                if os.path.exists(Name):
+                    Parts.append(Name)
+                    break
+        return Parts
+
+    def Key(self, ShapeFile):
+        """
+        Returns the cache key of ShapeFile, a hex hash of the extension, size and mtime
+        in ns of each of its files.
+        """
+        Hash = hashlib.sha256('ConversionCache {}\n'.format(self.KEY_VERSION).encode())
+        for Part in self.ShapefileParts(ShapeFile):
+            PartStat = os.stat(Part)
+            Hash.update('{} {} {}\n'.format(Part[-3:].lower(), PartStat.st_size, PartStat.st_mtime_ns).encode())
+        return Hash.hexdigest()[:32]
+
+    def EntryFileName(self, Key):
+        return os.path.join(self.CacheDirectory, Key + '.gmt')
+
+    def Lookup(self, Key):
+        """
+        Returns the file name of the entry for Key or None if there is none.
+        Marks the entry as used.
+        """
+        EntryFileName = self.EntryFileName(Key)
+        try:
+            EntryStat = os.stat(EntryFileName)
+            os.utime(EntryFileName, ns=(time.time_ns(), EntryStat.st_mtime_ns))
+        except FileNotFoundError:
+            return None
+        return EntryFileName
+
+    def Convert(self, ShapeFile, ConvertFunction):
+        """
+        Returns the name of the GMT file for ShapeFile, from the cache or made by calling
+        ConvertFunction(OutputFileName) then added to the cache. Exceptions from
+        ConvertFunction are passed on and nothing is added.
+        """
+        Key = self.Key(ShapeFile)
+        EntryFileName = self.Lookup(Key)
+        if EntryFileName is not None:
+            if self.RunLoud:
+                print("Using cached conversion {}".format(EntryFileName))
+            return EntryFileName
+
+        os.makedirs(self.CacheDirectory, exist_ok=True)
+        EntryFileName = self.EntryFileName(Key)
+        TempDirectory = tempfile.mkdtemp(prefix=self.TEMP_PREFIX, dir=self.CacheDirectory)
+        try:
+            TempFileName = os.path.join(TempDirectory, Key + '.gmt')
+            if self.RunLoud:
+                print("Converting into {}".format(TempFileName))
+            ConvertFunction(TempFileName)
+            os.replace(TempFileName, EntryFileName)
+        finally:
+            shutil.rmtree(TempDirectory, ignore_errors=True)
+
+        self.Evict(Keep=Key)
+        return EntryFileName
+
+    def Entries(self):
+        """
+        Returns a list of [last used time, total bytes, file names] for each entry.
+        """
+        Entries = {}
+        try:
+            Names = os.listdir(self.CacheDirectory)
+        except FileNotFoundError:
+            return []
+        for Name in Names:
+            if Name.startswith(self.TEMP_PREFIX) or ('.gmt' not in Name):
+                continue
+            Key = Name[:Name.index('.gmt')]
+            FileName = os.path.join(self.CacheDirectory, Name)
+            try:
+                FileStat = os.stat(FileName)
+            except FileNotFoundError:
+                # Evicted by another run
+                continue
+            Entry = Entries.setdefault(Key, [0, 0, []])
+            if Name == Key + '.gmt':
+                Entry[0] = FileStat.st_atime
+            Entry[1] += FileStat.st_size
+            Entry[2].append(FileName)
+        return list(Entries.values())
+
+    def Evict(self, Keep=None):
+        """
+        Deletes the least recently used entries until the cache is within MaxBytes.
+        The entry for Keep is never deleted.
+        """
+        Entries = sorted(self.Entries(), key=lambda Entry: Entry[0])
+        TotalBytes = sum(Entry[1] for Entry in Entries)
+        KeepFileName = None if Keep is None else self.EntryFileName(Keep)
+        for LastUsed, EntryBytes, FileNames in Entries:
+            if TotalBytes <= self.MaxBytes:
+                break
+            if KeepFileName in FileNames:
+                continue
+            if self.RunLoud:
+                print("Evicting {} from the conversion cache".format(FileNames))
+            for FileName in FileNames:
+                try:
+                    os.remove(FileName)
+                except FileNotFoundError:
+                    pass
+            TotalBytes -= EntryBytes
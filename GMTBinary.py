@@ -0,0 +1,148 @@
+"""
+GMT Binary writes GMT text output as a native binary table for gmt plot -bi.
+
+gmt plot reads native binary columns much faster than ASCII and the files are smaller.
+Coordinates are written as lon, lat pairs of float32 or float64 in the byte order of this
+machine. A segment break is a record with every column NaN, which is how GMT marks
+segment headers in native binary tables. Read the output with
+
+gmt plot lakes.bin -bi2d ...      (float64)
+gmt plot lakes.bin -bi2f ...      (float32)
+
+Binary records have no room for text, so the header lines go to a sidecar file,
+<OutputFile>.hdr. It has the file header (the # lines before the first >) and then the
+> line and # comment lines of each segment, in order. Segment i of the binary file is the
+i-th > line of the sidecar. Polygons and their holes are separate segments in the binary
+file, the # @P and # @H lines of the sidecar tell them apart.
+
+BinaryWriter takes the GMT text the parsers would write, as bytes or str, in pieces of any
+size. So any output of ParseSHEDSLake.LakesParser or ParseSHEDSriv.SHEDSrivParser can be
+written in binary by opening OutFile with it. For example
+
+import GMTBinary
+
+with GMTBinary.BinaryWriter('lakes.bin', 'float32') as OutFile:
+    OutFile.write(b'>\\n# @D1|...\\n# @P\\n-131.5 61.7\\n-131.6 61.8\\n')
+
+Author: Joseph Wellhouse
+"""
+
+import re
+from array import array
+
+import CompressedFiles
+import GMTGeometry
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+# Output precision name and array typecode
+PRECISIONS = {'float32':'f', 'float64':'d'}
+
+SIDECAR_EXTENSION = '.hdr'
+
+# Text is converted in blocks of about this size, many small writes are gathered
+BLOCK_BYTES = 1024 * 1024
+
+# Segment header and comment lines, with their newline
+HEADER_LINE_PATTERN = re.compile(rb'^[>#][^\n]*\n?', re.MULTILINE)
+
+
+def SidecarFileName(OutputFile):
+    """
+    Returns the name of the header sidecar of the binary file OutputFile.
+    """
+    return OutputFile + SIDECAR_EXTENSION
+
+
+class BinaryWriter:
+    """
+    File like writer turning GMT text into a native binary table and a header sidecar.
+
+    Required inputs: OutputFile
+    Optional inputs:    Precision='float64'
+                            float32 or float64
+
+    write() takes bytes or str. Text is gathered into blocks of BLOCK_BYTES and only whole
+    lines are converted, the rest waits for the next block or close(). Use as a context
+    manager or call close().
+    Raises ValueError for a coordinate line that is not lon lat.
+    """
+
+    def __init__(self, OutputFile, Precision='float64'):
+        if Precision not in PRECISIONS:
+            raise ValueError('Precision should be one of {}, received {}'.format(list(PRECISIONS), Precision))
+        self.TypeCode = PRECISIONS[Precision]
+        # A record of NaN in both columns starts each segment
+        self.SegmentBreak = array(self.TypeCode, [float('nan'), float('nan')]).tobytes()
+        self.Pending = []
+        self.PendingBytes = 0
+        self.CountSegments = 0
+        self.CountVertices = 0
+        # Compressed if the name says so, as other outputs
+        self.OutFile = CompressedFiles.Open(OutputFile, 'wb')
+        self.SidecarFile = open(SidecarFileName(OutputFile), 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+    def write(self, Data):
+        if isinstance(Data, str):
+            Data = Data.encode()
+        else:
+            Data = bytes(Data)
+        self.Pending.append(Data)
+        self.PendingBytes += len(Data)
+        if self.PendingBytes >= BLOCK_BYTES:
+            Text = b''.join(self.Pending)
+            LastNewline = Text.rfind(b'\n')
+            self.Pending = [Text[LastNewline + 1:]]
+            self.PendingBytes = len(self.Pending[0])
+            self.WriteText(Text[:LastNewline + 1])
+        return len(Data)
+
+    def WriteText(self, Text):
+        """
+        Converts Text, whole lines of GMT text. Header lines go to the sidecar with a
+        segment break for each > line and the coordinate lines between them are parsed
+        in one block each.
+        """
+        BlockStart = 0
+        for Match in HEADER_LINE_PATTERN.finditer(Text):
+            if Match.start() > BlockStart:
+                self.WriteCoordinates(Text[BlockStart:Match.start()])
+            Line = Match.group()
+            if Line[:1] == b'>':
+                self.OutFile.write(self.SegmentBreak)
+                self.CountSegments += 1
+            self.SidecarFile.write(Line if Line.endswith(b'\n') else Line + b'\n')
+            BlockStart = Match.end()
+        if BlockStart < len(Text):
+            self.WriteCoordinates(Text[BlockStart:])
+
+    def WriteCoordinates(self, Block):
+        Coordinates = GMTGeometry.ParseCoordinates(Block)
+        if not len(Coordinates):
+            return
+        if self.TypeCode != 'd':
+            Coordinates = array(self.TypeCode, Coordinates)
+        self.OutFile.write(Coordinates.tobytes())
+        self.CountVertices += len(Coordinates) // 2
+
+    def close(self):
+        if self.OutFile is None:
+            return
+        try:
+            if self.PendingBytes:
+                self.WriteText(b''.join(self.Pending))
+                self.Pending = []
+                self.PendingBytes = 0
+        finally:
+            self.OutFile.close()
+            self.SidecarFile.close()
+            self.OutFile = None
@@ -0,0 +1,539 @@
+"""
+GMT Geometry holds the coordinates of GMT polygons and lines as flat float64 buffers.
+
+A ring or line of N vertices is one array('d') of 2N values, lon, lat, lon, lat, ...
+parsed from its GMT text block in one call rather than a line and a tuple at a time.
+That is 16 bytes a vertex where a list of (lon, lat) float tuples costs about 100.
+array('d') supports the buffer protocol so the same memory can be shared without
+copying, as a memoryview with CoordinateView or as an N x 2 NumPy array with AsNumPy.
+
+Used by LakeRecords.Ring. For example
+
+import GMTGeometry
+
+Coordinates = GMTGeometry.ParseCoordinates(b'-131.5 61.7\\n-131.6 61.8\\n')
+View = GMTGeometry.CoordinateView(Coordinates)     # memoryview, no copy
+LonLat = GMTGeometry.AsNumPy(Coordinates)          # NumPy N x 2 array, no copy
+OutFile.write(GMTGeometry.FormatCoordinates(Coordinates))
+
+SimplifyCoordinates and ClipToBox work on these buffers. NumPy is only needed for
+AsNumPy and FromNumPy, which raise InitInputError without it. The other functions use it
+when it is installed and fall back to pure Python.
+
+Author: Joseph Wellhouse
+"""
+
+from array import array
+import operator
+
+# NumPy is optional, see above
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+class InitInputError(Exception):
+    """
+    Exception raised when the coordinates asked for can not be made, as NumPy arrays 
+    without NumPy.
+    Attributes:
+        message -- explanation of the error
+        var -- the variable which caused the error
+        InputRec -- the improper input
+    
+    raise InitInputError('var', InputRec, 'message {}'.format())
+    """
+    def __init__(self, var, InputRec, message):
+        self.var = var
+        self.message = message
+        self.InputRec = InputRec
+        super(InitInputError, self).__init__(message)
+
+
+def ParseCoordinates(Text):
+    """
+    Parses GMT coordinate lines, "lon lat" one vertex per line, into an array('d') of
+    lon, lat, lon, lat, ... Text is bytes or str. Comment lines (# @P) are ignored.
+    """
+    if isinstance(Text, str):
+        Text = Text.encode()
+    if b'#' in Text:
+        Text = b'\n'.join(line for line in Text.split(b'\n') if not line.startswith(b'#'))
+    Coordinates = array('d', map(float, Text.split()))
+    if len(Coordinates) % 2:
+        raise ValueError('Odd number of values in coordinate block, {}'.format(len(Coordinates)))
+    return Coordinates
+
+
+def CoordinateView(Coordinates):
+    """
+    Returns a read only memoryview of the float64 values of Coordinates without copying.
+    """
+    return memoryview(Coordinates).toreadonly()
+
+
+def AsNumPy(Coordinates):
+    """
+    Returns Coordinates as an N x 2 NumPy float64 array of lon, lat sharing its memory.
+    Changing the NumPy array changes Coordinates.
+    """
+    if np is None:
+        raise InitInputError('Coordinates', type(Coordinates).__name__, 'ERROR - AsNumPy needs NumPy, which is not installed')
+    return np.frombuffer(Coordinates, dtype=np.float64).reshape(-1, 2)
+
+
+def FromNumPy(LonLat):
+    """
+    Returns an array('d') of lon, lat, lon, lat, ... from an N x 2 NumPy array.
+    """
+    if np is None:
+        raise InitInputError('LonLat', type(LonLat).__name__, 'ERROR - FromNumPy needs NumPy, which is not installed')
+    return array('d', np.ascontiguousarray(LonLat, dtype=np.float64).tobytes())
+
+
+def FormatCoordinates(Coordinates):
+    """
+    Returns the GMT text of Coordinates as bytes, one "lon lat" line per vertex.
+    Values are written with repr so parsed values are written back unchanged.
+    """
+    Values = iter(Coordinates)
+    return ''.join(['{!r} {!r}\n'.format(Lon, Lat) for Lon, Lat in zip(Values, Values)]).encode()
+
+
+def VertexCount(Coordinates):
+    """
+    Returns the number of vertices in Coordinates.
+    """
+    return len(Coordinates) // 2
+
+
+# Winding
+
+def SignedArea(Coordinates):
+    """
+    Returns the shoelace area of a ring in square degrees, positive when its vertices run
+    counterclockwise and negative when clockwise. The ring need not be closed. Uses NumPy
+    when it is installed.
+    """
+    if len(Coordinates) < 6:
+        return 0.0
+    if np is not None:
+        LonLat = AsNumPy(Coordinates)
+        Lons = LonLat[:, 0]
+        Lats = LonLat[:, 1]
+        Twice = float(np.dot(Lons[:-1], Lats[1:]) - np.dot(Lons[1:], Lats[:-1]))
+    else:
+        Lons = Coordinates[0::2]
+        Lats = Coordinates[1::2]
+        Twice = sum(map(operator.mul, Lons[:-1], Lats[1:])) - sum(map(operator.mul, Lons[1:], Lats[:-1]))
+    # The closing edge, 0 for a closed ring
+    Twice += Coordinates[-2] * Coordinates[1] - Coordinates[0] * Coordinates[-1]
+    return Twice / 2.0
+
+
+def RingIsClockwise(Coordinates):
+    """
+    Returns True if the vertices of a ring run clockwise. In a shapefile outer rings are
+    clockwise and holes counterclockwise.
+    """
+    return SignedArea(Coordinates) < 0.0
+
+
+# Simplification
+
+# Metres in a degree of latitude, used to turn map scale into degrees
+METRES_PER_DEGREE = 111320.0
+METRES_PER_INCH = 0.0254
+
+# Closed rings keep at least this many vertices, a triangle plus the closing vertex
+MIN_RING_VERTICES = 4
+
+
+def ToleranceFromScale(Scale, DPI):
+    """
+    Returns the simplification tolerance in degrees for a map at 1:Scale printed at DPI.
+    This is the ground size of one output pixel so removed detail is below a pixel.
+    """
+    return Scale * METRES_PER_INCH / DPI / METRES_PER_DEGREE
+
+
+def SimplifyCoordinates(Coordinates, Tolerance):
+    """
+    Douglas-Peucker simplification of a ring or line. Vertices closer than Tolerance 
+    (degrees) to the simplified outline are dropped. Returns a new array('d'), or 
+    Coordinates itself if nothing was dropped.
+    
+    A closed ring (first vertex equal to the last) is split at the vertex farthest from
+    the first so both halves have a real base line, and it keeps at least 
+    MIN_RING_VERTICES vertices so it stays a polygon. Uses NumPy when it is installed,
+    with the distances of each span computed as one array operation.
+    """
+    VertexCount = len(Coordinates) // 2
+    if VertexCount <= MIN_RING_VERTICES:
+        return Coordinates
+    
+    if np is not None:
+        Keep = _SimplifyKeepNumPy(AsNumPy(Coordinates), Tolerance)
+    else:
+        Keep = _SimplifyKeepPython(Coordinates, Tolerance)
+    
+    if len(Keep) == VertexCount:
+        return Coordinates
+    Simplified = array('d')
+    for i in Keep:
+        Simplified.append(Coordinates[2 * i])
+        Simplified.append(Coordinates[2 * i + 1])
+    return Simplified
+
+
+def _SimplifyKeepNumPy(LonLat, Tolerance):
+    """
+    Returns the sorted indices of the vertices SimplifyCoordinates keeps. NumPy version.
+    """
+    Last = len(LonLat) - 1
+    Keep = np.zeros(len(LonLat), dtype=bool)
+    Keep[0] = Keep[Last] = True
+    
+    Closed = (LonLat[0] == LonLat[Last]).all()
+    if Closed:
+        Split = int(np.argmax(((LonLat - LonLat[0]) ** 2).sum(axis=1)))
+        Keep[Split] = True
+        Spans = [(0, Split), (Split, Last)]
+    else:
+        Spans = [(0, Last)]
+    
+    while Spans:
+        First, End = Spans.pop()
+        if End - First < 2:
+            continue
+        Distances = _SpanDistancesNumPy(LonLat, First, End)
+        i = int(np.argmax(Distances))
+        if Distances[i] > Tolerance:
+            Middle = First + 1 + i
+            Keep[Middle] = True
+            Spans.append((First, Middle))
+            Spans.append((Middle, End))
+    
+    if Closed and (Keep.sum() < MIN_RING_VERTICES):
+        # Too thin to survive, keep the vertex farthest from the split line as well
+        for First, End in ((0, Split), (Split, Last)):
+            if End - First >= 2:
+                Keep[First + 1 + int(np.argmax(_SpanDistancesNumPy(LonLat, First, End)))] = True
+
+    return np.flatnonzero(Keep).tolist()
+
+
+def _SpanDistancesNumPy(LonLat, First, End):
+    """
+    Distances of vertices First+1 to End-1 from the line through vertices First and End.
+    """
+    Start = LonLat[First]
+    Direction = LonLat[End] - Start
+    Offsets = LonLat[First + 1:End] - Start
+    Length = np.hypot(Direction[0], Direction[1])
+    if Length == 0.0:
+        return np.hypot(Offsets[:, 0], Offsets[:, 1])
+    return np.abs(Direction[0] * Offsets[:, 1] - Direction[1] * Offsets[:, 0]) / Length
+
+
+def _SimplifyKeepPython(Coordinates, Tolerance):
+    """
+    Returns the sorted indices of the vertices SimplifyCoordinates keeps. Without NumPy.
+    """
+    Lons = Coordinates[0::2]
+    Lats = Coordinates[1::2]
+    Last = len(Lons) - 1
+    Keep = [False] * len(Lons)
+    Keep[0] = Keep[Last] = True
+    
+    Closed = (Lons[0] == Lons[Last]) and (Lats[0] == Lats[Last])
+    if Closed:
+        Split = max(range(len(Lons)), key=lambda i: (Lons[i] - Lons[0]) ** 2 + (Lats[i] - Lats[0]) ** 2)
+        Keep[Split] = True
+        Spans = [(0, Split), (Split, Last)]
+    else:
+        Spans = [(0, Last)]
+    
+    while Spans:
+        First, End = Spans.pop()
+        if End - First < 2:
+            continue
+        Distance, Middle = _FarthestInSpanPython(Lons, Lats, First, End)
+        if Distance > Tolerance:
+            Keep[Middle] = True
+            Spans.append((First, Middle))
+            Spans.append((Middle, End))
+    
+    if Closed and (sum(Keep) < MIN_RING_VERTICES):
+        # Too thin to survive, keep the vertex farthest from the split line as well
+        for First, End in ((0, Split), (Split, Last)):
+            if End - First >= 2:
+                Keep[_FarthestInSpanPython(Lons, Lats, First, End)[1]] = True
+    
+    return [i for i, Kept in enumerate(Keep) if Kept]
+
+
+def _FarthestInSpanPython(Lons, Lats, First, End):
+    """
+    Returns (Distance, index) of the vertex between First and End farthest from their line.
+    """
+    StartLon = Lons[First]
+    StartLat = Lats[First]
+    DirectionLon = Lons[End] - StartLon
+    DirectionLat = Lats[End] - StartLat
+    Length = (DirectionLon ** 2 + DirectionLat ** 2) ** 0.5
+    
+    Farthest = -1.0
+    FarthestIndex = First + 1
+    for i in range(First + 1, End):
+        OffsetLon = Lons[i] - StartLon
+        OffsetLat = Lats[i] - StartLat
+        if Length == 0.0:
+            Distance = (OffsetLon ** 2 + OffsetLat ** 2) ** 0.5
+        else:
+            Distance = abs(DirectionLon * OffsetLat - DirectionLat * OffsetLon) / Length
+        if Distance > Farthest:
+            Farthest = Distance
+            FarthestIndex = i
+    return Farthest, FarthestIndex
+
+
+# Bounding boxes and clipping
+
+def CoordinateBounds(Coordinates):
+    """
+    Returns the bounding box of Coordinates as (W, E, S, N). None if there are no vertices.
+    """
+    if len(Coordinates) < 2:
+        return None
+    Lons = Coordinates[0::2]
+    Lats = Coordinates[1::2]
+    return (min(Lons), max(Lons), min(Lats), max(Lats))
+
+
+def BoxesOverlap(Box, Bounds):
+    """
+    Returns True if Box (W, E, S, N) and Bounds [W E S N BoundsIncDateline] touch or overlap.
+    Bounds may cross the dateline as in ParseSHEDSLake.LakesParser.SimpleBounds. Box may not.
+    """
+    if (Box[2] > Bounds[3]) or (Box[3] < Bounds[2]):
+        return False
+    if not Bounds[4]:
+        return (Box[0] <= Bounds[1]) and (Box[1] >= Bounds[0])
+    # split across International Dateline
+    return (Box[1] >= Bounds[0]) or (Box[0] <= Bounds[1])
+
+
+def ClipBoxForRing(Box, Bounds):
+    """
+    Returns the W E S N box a ring with bounding box Box is clipped to. For Bounds crossing
+    the dateline this is the part of Bounds in the same hemisphere as the ring. Rings never
+    cross the dateline, so the ring's midpoint picks the hemisphere.
+    """
+    if not Bounds[4]:
+        return (Bounds[0], Bounds[1], Bounds[2], Bounds[3])
+    if (Box[0] + Box[1]) / 2.0 >= 0.0:
+        return (Bounds[0], 180.0, Bounds[2], Bounds[3])
+    return (-180.0, Bounds[1], Bounds[2], Bounds[3])
+
+
+# Box edges for ClipToBox: axis (0 lon, 1 lat), index into the W E S N box, keep values above the edge
+CLIP_EDGES = ((0, 0, True), (0, 1, False), (1, 2, True), (1, 3, False))
+
+
+def ClipToBox(Coordinates, ClipBox):
+    """
+    Clips a closed ring to ClipBox (W, E, S, N) with Sutherland-Hodgman, one box edge at a
+    time. Returns a closed ring as an array('d'), empty if the ring is entirely outside.
+    Uses NumPy when it is installed, with each edge clipped as array operations.
+    """
+    Box = CoordinateBounds(Coordinates)
+    if Box is None:
+        return array('d')
+    if (Box[0] >= ClipBox[0]) and (Box[1] <= ClipBox[1]) and (Box[2] >= ClipBox[2]) and (Box[3] <= ClipBox[3]):
+        # Entirely inside
+        return Coordinates
+    if (Box[0] > ClipBox[1]) or (Box[1] < ClipBox[0]) or (Box[2] > ClipBox[3]) or (Box[3] < ClipBox[2]):
+        # Entirely outside
+        return array('d')
+    
+    if np is not None:
+        Clipped = _ClipToBoxNumPy(AsNumPy(Coordinates), ClipBox)
+    else:
+        Clipped = _ClipToBoxPython(Coordinates, ClipBox)
+    # A ring needs a triangle plus the closing vertex
+    if len(Clipped) < 2 * MIN_RING_VERTICES:
+        return array('d')
+    return Clipped
+
+
+def _ClipToBoxNumPy(LonLat, ClipBox):
+    """
+    ClipToBox with NumPy. LonLat is N x 2 and closed.
+    """
+    # Work on the open ring, the closing vertex is added back at the end
+    Points = LonLat[:-1] if (LonLat[0] == LonLat[-1]).all() else LonLat
+    for Axis, BoxIndex, KeepAbove in CLIP_EDGES:
+        if len(Points) == 0:
+            break
+        Edge = ClipBox[BoxIndex]
+        if KeepAbove:
+            Inside = Points[:, Axis] >= Edge
+        else:
+            Inside = Points[:, Axis] <= Edge
+        if Inside.all():
+            continue
+        
+        # Each vertex i emits itself if inside and then the crossing of edge i to i+1 if any
+        NextPoints = np.roll(Points, -1, axis=0)
+        Crossing = Inside != np.roll(Inside, -1)
+        Crossings = np.empty_like(Points)
+        Delta = NextPoints[Crossing] - Points[Crossing]
+        Fraction = (Edge - Points[Crossing, Axis]) / Delta[:, Axis]
+        Crossings[Crossing] = Points[Crossing] + Fraction[:, np.newaxis] * Delta
+        Crossings[Crossing, Axis] = Edge
+        
+        Emitted = np.stack((Points, Crossings), axis=1)
+        Points = Emitted[np.stack((Inside, Crossing), axis=1)]
+    
+    if len(Points) == 0:
+        return array('d')
+    return FromNumPy(np.vstack((Points, Points[:1])))
+
+
+def _ClipToBoxPython(Coordinates, ClipBox):
+    """
+    ClipToBox without NumPy.
+    """
+    Points = list(zip(Coordinates[0::2], Coordinates[1::2]))
+    if Points[0] == Points[-1]:
+        Points.pop()
+    for Axis, BoxIndex, KeepAbove in CLIP_EDGES:
+        if not Points:
+            break
+        Edge = ClipBox[BoxIndex]
+        Clipped = []
+        for i, Point in enumerate(Points):
+            NextPoint = Points[(i + 1) % len(Points)]
+            if KeepAbove:
+                Inside = Point[Axis] >= Edge
+                NextInside = NextPoint[Axis] >= Edge
+            else:
+                Inside = Point[Axis] <= Edge
+                NextInside = NextPoint[Axis] <= Edge
+            if Inside:
+                Clipped.append(Point)
+            if Inside != NextInside:
+                Fraction = (Edge - Point[Axis]) / (NextPoint[Axis] - Point[Axis])
+                Crossing = [Point[0] + Fraction * (NextPoint[0] - Point[0]), 
+                            Point[1] + Fraction * (NextPoint[1] - Point[1])]
+                Crossing[Axis] = Edge
+                Clipped.append(tuple(Crossing))
+        Points = Clipped
+    
+    if not Points:
+        return array('d')
+    Points.append(Points[0])
+    Clipped = array('d')
+    for Lon, Lat in Points:
+        Clipped.append(Lon)
+        Clipped.append(Lat)
+    return Clipped
+
+
+# Point in polygon
+
+# Points x edges tested at once by PointsInRing, limits the temporary arrays to tens of MB
+POINT_EDGE_BLOCK = 1 << 20
+
+
+def PointsInRing(LonLat, Ring):
+    """
+    Ray casting point in polygon test. LonLat is an M x 2 NumPy array of points and Ring 
+    an N x 2 closed ring (see AsNumPy). Returns a boolean array, True for points inside.
+    A horizontal ray is cast east from each point and the edges it crosses are counted,
+    every edge against a block of points as one array operation. Needs NumPy.
+    """
+    Inside = np.zeros(len(LonLat), dtype=bool)
+    if (len(Ring) < MIN_RING_VERTICES) or (len(LonLat) == 0):
+        return Inside
+    
+    Lon1 = Ring[:-1, 0]
+    Lat1 = Ring[:-1, 1]
+    Lon2 = Ring[1:, 0]
+    Lat2 = Ring[1:, 1]
+    # Edges that are horizontal never straddle a ray, avoid dividing by 0 for them
+    LatSpan = np.where(Lat2 == Lat1, 1.0, Lat2 - Lat1)
+    Slope = (Lon2 - Lon1) / LatSpan
+    
+    BlockPoints = max(1, POINT_EDGE_BLOCK // len(Lon1))
+    for Start in range(0, len(LonLat), BlockPoints):
+        PointLon = LonLat[Start:Start + BlockPoints, 0:1]
+        PointLat = LonLat[Start:Start + BlockPoints, 1:2]
+        Straddles = (Lat1 > PointLat) != (Lat2 > PointLat)
+        CrossingLon = Lon1 + (PointLat - Lat1) * Slope
+        Crossings = np.count_nonzero(Straddles & (PointLon < CrossingLon), axis=1)
+        Inside[Start:Start + BlockPoints] = (Crossings % 2) == 1
+    return Inside
+
+
+class PointGrid:
+    """
+    Buckets M points into cells of CellDegrees so the points in a W E S N box are found
+    without testing all of them. Points are sorted by cell, row by row, and the points of
+    cell c are Order[CellStart[c]:CellStart[c+1]] as in LakeIndex.BuildGrid. Needs NumPy.
+
+    Required inputs: LonLat
+        M x 2 NumPy array of lon, lat
+
+    Optional inputs:    CellDegrees=1.0
+    """
+
+    def __init__(self, LonLat, CellDegrees=1.0):
+        self.LonLat = LonLat
+        self.CellDegrees = CellDegrees
+        self.Columns = int(round(360.0 / CellDegrees))
+        self.Rows = int(round(180.0 / CellDegrees))
+        
+        Rows = np.clip(((LonLat[:, 1] + 90.0) // CellDegrees).astype(np.int64), 0, self.Rows - 1)
+        Columns = np.clip(((LonLat[:, 0] + 180.0) // CellDegrees).astype(np.int64), 0, self.Columns - 1)
+        Cells = Rows * self.Columns + Columns
+        self.Order = np.argsort(Cells, kind='stable')
+        self.CellStart = np.zeros(self.Rows * self.Columns + 1, dtype=np.int64)
+        np.cumsum(np.bincount(Cells, minlength=self.Rows * self.Columns), out=self.CellStart[1:])
+
+    def Row(self, Lat):
+        """
+        Returns the grid row of a latitude, clamped to the edge rows.
+        """
+        return min(max(int((Lat + 90.0) // self.CellDegrees), 0), self.Rows - 1)
+
+    def Column(self, Lon):
+        """
+        Returns the grid column of a longitude, clamped to the edge columns.
+        """
+        return min(max(int((Lon + 180.0) // self.CellDegrees), 0), self.Columns - 1)
+
+    def PointsInBox(self, Box):
+        """
+        Returns the indices of the points within Box (W, E, S, N), sorted.
+        """
+        if (Box is None) or (Box[0] > Box[1]) or (Box[2] > Box[3]):
+            return np.zeros(0, dtype=np.int64)
+        ColumnStart = self.Column(Box[0])
+        ColumnEnd = self.Column(Box[1])
+        # Cells in one row are consecutive so each row is one slice
+        Found = [self.Order[self.CellStart[Row * self.Columns + ColumnStart]:self.CellStart[Row * self.Columns + ColumnEnd + 1]]
+                    for Row in range(self.Row(Box[2]), self.Row(Box[3]) + 1)]
+        Candidates = np.concatenate(Found)
+        if len(Candidates) == 0:
+            return Candidates
+        Lon = self.LonLat[Candidates, 0]
+        Lat = self.LonLat[Candidates, 1]
+        Candidates = Candidates[(Lon >= Box[0]) & (Lon <= Box[1]) & (Lat >= Box[2]) & (Lat <= Box[3])]
+        Candidates.sort()
+        return Candidates
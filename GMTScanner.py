@@ -0,0 +1,140 @@
+"""
+GMT Scanner finds the segments of a GMT text file by working on bytes rather than lines.
+
+Reading a GMT file with "for line in InFile" decodes every coordinate line to a str and
+creates an object for each vertex, even for segments that are about to be skipped. The
+scanner works on the raw bytes of a memory mapped file instead. Segment boundaries are
+found with find(b'\\n>'), which runs in C, and only the comment line after each >
+(# @D, # @H, # @A etc) is handed back for decoding. A skipped segment costs one find.
+A copied segment can be written out as one slice of the map.
+
+Used by ParseSHEDSLake.LakesParser and ParseSHEDSriv.SHEDSrivParser with MemoryMap=True.
+For example
+
+import GMTScanner
+
+with GMTScanner.MemoryMappedFile(InFile) as Data:
+    Scanner = GMTScanner.SegmentScanner(Data)
+    OutFile.write(Data[:Scanner.FileHeaderEnd()])
+    for SegmentStart, CommentStart, CommentEnd, SegmentEnd in Scanner.Segments():
+        Comment = Data[CommentStart:CommentEnd].decode()
+
+Author: Joseph Wellhouse
+"""
+
+import mmap
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+class MemoryMappedFile:
+    """
+    Context manager giving a read only mmap of FileName.
+    An empty file gives b'' since an empty file cannot be mapped.
+    """
+    def __init__(self, FileName):
+        self.FileName = FileName
+        self.InFile = None
+        self.Data = None
+
+    def __enter__(self):
+        self.InFile = open(self.FileName, 'rb')
+        try:
+            self.Data = mmap.mmap(self.InFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self.Data = b''
+        return self.Data
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if isinstance(self.Data, mmap.mmap):
+            self.Data.close()
+        self.InFile.close()
+        return False
+
+
+class SegmentScanner:
+    """
+    Finds the segments of GMT text held in Data (an mmap or bytes).
+
+    Required inputs: Data
+
+    Optional inputs:    Start=0,
+                        End=None
+        Only bytes Start to End are scanned. Start should be 0 or the start of a > line.
+
+    A segment runs from its > line to the next > line. The line after the > is the
+    segment comment line. For HydroSHEDS files converted by ogr2ogr this is # @D for a
+    lake or river segment and # @H for an island.
+
+    Position is the start of the next segment Segments() will give, for following the
+    scan from another thread.
+    """
+
+    COUNT_BLOCK_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, Data, Start=0, End=None):
+        self.Data = Data
+        self.Start = Start
+        if End is None:
+            End = len(Data)
+        self.End = End
+        self.Position = Start
+
+    def FileHeaderEnd(self):
+        """
+        Returns the offset of the first > line. Anything before it is the file header.
+        """
+        if self.Data[self.Start:self.Start + 1] == b'>':
+            return self.Start
+        i = self.Data.find(b'\n>', self.Start, self.End)
+        if i == -1:
+            return self.End
+        return i + 1
+
+    def LineEnd(self, Offset):
+        """
+        Returns the offset just past the line starting at Offset, including the newline.
+        """
+        i = self.Data.find(b'\n', Offset, self.End)
+        if i == -1:
+            return self.End
+        return i + 1
+
+    def CountLines(self):
+        """
+        Returns the number of lines from Start to End, counting a last line without a newline.
+        """
+        # mmap has no count() so count a block at a time
+        CountLines = 0
+        for BlockStart in range(self.Start, self.End, self.COUNT_BLOCK_BYTES):
+            CountLines += self.Data[BlockStart:min(BlockStart + self.COUNT_BLOCK_BYTES, self.End)].count(b'\n')
+        if (self.End > self.Start) and (self.Data[self.End - 1:self.End] != b'\n'):
+            CountLines += 1
+        return CountLines
+
+    def Segments(self):
+        """
+        Generator of (SegmentStart, CommentStart, CommentEnd, SegmentEnd) byte offsets.
+        SegmentStart is the > line, CommentStart to CommentEnd is the comment line after
+        it including its newline and the coordinates run from CommentEnd to SegmentEnd.
+        """
+        Data = self.Data
+        End = self.End
+        SegmentStart = self.FileHeaderEnd()
+
+        while SegmentStart < End:
+            CommentStart = self.LineEnd(SegmentStart)
+            CommentEnd = self.LineEnd(CommentStart)
+
+            # The newline ending the comment line may itself be followed by the next >
+            NextSegment = Data.find(b'\n>', CommentEnd - 1, End)
+            if (NextSegment == -1) or (CommentEnd >= End):
+                SegmentEnd = End
+            else:
+                SegmentEnd = NextSegment + 1
+
+            yield SegmentStart, CommentStart, CommentEnd, SegmentEnd
+            SegmentStart = SegmentEnd
+            self.Position = SegmentStart
@@ -0,0 +1,305 @@
+"""
+Instrumentation records where a parser spends its time and what it reads, writes and rejects.
+
+With Instrument set, ParseSHEDSLake.LakesParser and ParseSHEDSriv.SHEDSrivParser time
+these phases of a run
+
+    Conversion      converting a shapefile with ogr2ogr, or finding it in the cache
+    HeaderDecoding  decoding the # @D line of each lake or segment
+    Filtering       testing each lake or segment against the options
+    Writing         writing the output, including compressing or converting to binary
+    Scanning        the rest of parsing, reading the input and finding segments
+
+and count BytesRead (GMT text scanned), BytesWritten, HeadersDecoded and, for each test,
+the lakes or segments it Rejected. A lake failing several tests is counted against the
+first in the order they are run. Total is the wall time of the run.
+
+Nothing is added to the parsing loops. The parser replaces its own header decoding and
+test methods, for that object only, with timed wrappers from Timed, TimedTest and
+TimedPredicate, and wraps its output file in a CountingWriter. A parser without
+Instrument runs the same code as before. With Instrument each wrapped call costs two
+clock reads.
+
+With Processes > 1 the phases are summed over the worker processes so they may add up
+to more than Total.
+
+The report goes in FileStats['Instrumentation'] and, with InstrumentationFile, is written
+as JSON or, if the name ends in .prom, as a Prometheus textfile for the node exporter
+textfile collector. For example
+
+import ParseSHEDSLake
+
+TheParser = ParseSHEDSLake.LakesParser(InFile, OutFile, AreaMin=10.0, Instrument=True)
+TheParser.ParseLAKES()
+print(TheParser.FileStats['Instrumentation']['Seconds'])
+
+Author: Joseph Wellhouse
+"""
+
+import json
+import os
+import time
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+# Phases in the order they are reported. Parsing is timed and Scanning is what is left
+# of it after the phases within it.
+PHASES = ['Total', 'Conversion', 'Parsing', 'Scanning', 'HeaderDecoding', 'Filtering', 'Writing']
+PARSING_PHASES = ['HeaderDecoding', 'Filtering', 'Writing']
+COUNTERS = ['BytesRead', 'BytesWritten', 'HeadersDecoded']
+
+PROMETHEUS_PREFIX = 'parsesheds_'
+# Counter, Prometheus metric name and help
+PROMETHEUS_COUNTERS = [('BytesRead', 'bytes_read', 'Bytes of GMT text read in the last run.'),
+                        ('BytesWritten', 'bytes_written', 'Bytes written to the output in the last run.'),
+                        ('HeadersDecoded', 'headers_decoded', 'Lake or segment headers decoded in the last run.')]
+
+
+class Instruments:
+    """
+    Phase times and counts of one run of a parser.
+
+    Required inputs: Parser
+        lakes or rivers, a label for the report
+
+    Seconds, Counters and Rejected are dictionaries. Phases are timed with Phase() or
+    the wrappers and counts added with Count(). Instruments from worker processes are
+    added together with Merge().
+    """
+
+    def __init__(self, Parser):
+        self.Parser = Parser
+        self.Seconds = {Phase:0.0 for Phase in PHASES if Phase != 'Scanning'}
+        self.Counters = {Counter:0 for Counter in COUNTERS}
+        self.Rejected = {}
+        self.StartTime = time.perf_counter()
+
+    def Stop(self):
+        """
+        Sets Total to the time since this was made.
+        """
+        self.Seconds['Total'] = time.perf_counter() - self.StartTime
+
+    def Phase(self, Phase):
+        """
+        Context manager adding the time spent in it to Phase.
+        """
+        return PhaseTimer(self.Seconds, Phase)
+
+    def Count(self, Counter, Count):
+        self.Counters[Counter] += Count
+
+    def Timed(self, Phase, Function, Counter=None):
+        """
+        Returns Function wrapped to add the time of each call to Phase, and one to Counter
+        if given.
+        """
+        Seconds = self.Seconds
+        Counters = self.Counters
+        Clock = time.perf_counter
+
+        def TimedFunction(*args):
+            Start = Clock()
+            try:
+                return Function(*args)
+            finally:
+                Seconds[Phase] += Clock() - Start
+                if Counter is not None:
+                    Counters[Counter] += 1
+        return TimedFunction
+
+    def TimedTest(self, Function, TestName):
+        """
+        Returns the test Function wrapped to add its time to Filtering and count the calls
+        returning False as rejected by TestName.
+        """
+        Seconds = self.Seconds
+        Rejected = self.Rejected
+        Clock = time.perf_counter
+
+        def TimedTestFunction(*args):
+            Start = Clock()
+            Result = Function(*args)
+            Seconds['Filtering'] += Clock() - Start
+            if not Result:
+                Rejected[TestName] = Rejected.get(TestName, 0) + 1
+            return Result
+        return TimedTestFunction
+
+    def TimedPredicate(self, Predicate, Testers):
+        """
+        Returns the lake predicate Predicate wrapped as TimedTest. Testers is a list of
+        (test name, function of the atributes list), the tests Predicate is made of. When
+        Predicate fails the lake is counted against the first tester that fails. Finding it
+        is not timed.
+        """
+        Seconds = self.Seconds
+        Rejected = self.Rejected
+        Clock = time.perf_counter
+
+        def TimedPredicateFunction(Atributes):
+            Start = Clock()
+            Result = Predicate(Atributes)
+            Seconds['Filtering'] += Clock() - Start
+            if not Result:
+                for TestName, Tester in Testers:
+                    if not Tester(Atributes):
+                        Rejected[TestName] = Rejected.get(TestName, 0) + 1
+                        break
+            return Result
+        return TimedPredicateFunction
+
+    def CountingWriter(self, OutFile):
+        return CountingWriter(OutFile, self)
+
+    def CountingReader(self, InFile):
+        """
+        Returns a generator of the lines of InFile adding their length to BytesRead.
+        """
+        Counters = self.Counters
+        Count = 0
+        try:
+            for line in InFile:
+                Count += len(line)
+                yield line
+        finally:
+            Counters['BytesRead'] += Count
+
+    def Merge(self, Other):
+        """
+        Adds the times and counts of Other, Instruments of another part of the same run.
+        Total is left alone.
+        """
+        for Phase, Seconds in Other.Seconds.items():
+            if Phase != 'Total':
+                self.Seconds[Phase] = self.Seconds.get(Phase, 0.0) + Seconds
+        for Counter, Count in Other.Counters.items():
+            self.Counters[Counter] = self.Counters.get(Counter, 0) + Count
+        for TestName, Count in Other.Rejected.items():
+            self.Rejected[TestName] = self.Rejected.get(TestName, 0) + Count
+
+    def Report(self):
+        """
+        Returns a dictionary of Parser, Seconds, Counters and Rejected. Seconds has every
+        phase of PHASES, Scanning being Parsing less the phases within it.
+        """
+        Seconds = dict(self.Seconds)
+        Seconds['Scanning'] = max(0.0, Seconds['Parsing'] - sum(Seconds[Phase] for Phase in PARSING_PHASES))
+        return {'Parser':self.Parser,
+                'Seconds':{Phase:round(Seconds[Phase], 6) for Phase in PHASES},
+                'Counters':dict(self.Counters),
+                'Rejected':dict(self.Rejected)}
+
+    def WriteFile(self, FileName, InputFile):
+        """
+        Writes the report to FileName, as a Prometheus textfile if its name ends in .prom
+        and as JSON otherwise. InputFile labels the report. The file is replaced whole so a
+        collector never reads it half written.
+        """
+        Report = self.Report()
+        if FileName.endswith('.prom'):
+            Text = PrometheusText(Report, InputFile)
+        else:
+            Report['InputFile'] = InputFile
+            Text = json.dumps(Report, indent=1) + '\n'
+        with open(FileName + '.partial', 'w') as OutFile:
+            OutFile.write(Text)
+        os.replace(FileName + '.partial', FileName)
+
+
+class PhaseTimer:
+    """
+    Context manager adding its time to Seconds[Phase].
+    """
+
+    def __init__(self, Seconds, Phase):
+        self.Seconds = Seconds
+        self.Phase = Phase
+
+    def __enter__(self):
+        self.Start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.Seconds[self.Phase] += time.perf_counter() - self.Start
+        return False
+
+
+class CountingWriter:
+    """
+    Output file wrapper adding the time of each write to Writing and its length to
+    BytesWritten. Closing it closes OutFile.
+    """
+
+    def __init__(self, OutFile, TheInstruments):
+        self.OutFile = OutFile
+        self.Seconds = TheInstruments.Seconds
+        self.Counters = TheInstruments.Counters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+    def write(self, Data):
+        Start = time.perf_counter()
+        Count = self.OutFile.write(Data)
+        self.Seconds['Writing'] += time.perf_counter() - Start
+        self.Counters['BytesWritten'] += len(Data)
+        return Count
+
+    def close(self):
+        Start = time.perf_counter()
+        try:
+            self.OutFile.close()
+        finally:
+            # Compressed and binary outputs finish writing on close
+            self.Seconds['Writing'] += time.perf_counter() - Start
+
+
+def PrometheusLabels(Labels):
+    """
+    Returns Labels, a list of (name, value), as {name="value",...} with the values escaped.
+    """
+    return '{' + ','.join('{}="{}"'.format(Name, str(Value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                            for Name, Value in Labels) + '}'
+
+
+def PrometheusText(Report, InputFile):
+    """
+    Returns Report in the Prometheus text exposition format. Every metric is a gauge of
+    the last run labelled with the parser and the input file name.
+    """
+    Labels = [('parser', Report['Parser']), ('input', os.path.basename(InputFile))]
+    Lines = ['# HELP {}phase_seconds Seconds spent in each phase of the last run.'.format(PROMETHEUS_PREFIX),
+                '# TYPE {}phase_seconds gauge'.format(PROMETHEUS_PREFIX)]
+    for Phase, Seconds in Report['Seconds'].items():
+        Lines.append('{}phase_seconds{} {}'.format(PROMETHEUS_PREFIX, PrometheusLabels(Labels + [('phase', Phase)]), Seconds))
+    for Counter, Metric, Help in PROMETHEUS_COUNTERS:
+        Lines.append('# HELP {}{} {}'.format(PROMETHEUS_PREFIX, Metric, Help))
+        Lines.append('# TYPE {}{} gauge'.format(PROMETHEUS_PREFIX, Metric))
+        Lines.append('{}{}{} {}'.format(PROMETHEUS_PREFIX, Metric, PrometheusLabels(Labels), Report['Counters'][Counter]))
+    Lines.append('# HELP {}rejected Lakes or segments rejected by each test in the last run.'.format(PROMETHEUS_PREFIX))
+    Lines.append('# TYPE {}rejected gauge'.format(PROMETHEUS_PREFIX))
+    for TestName, Count in Report['Rejected'].items():
+        Lines.append('{}rejected{} {}'.format(PROMETHEUS_PREFIX, PrometheusLabels(Labels + [('test', TestName)]), Count))
+    return '\n'.join(Lines) + '\n'
+
+
+def FormatReport(Report):
+    """
+    Returns Report as lines of text for the terminal.
+    """
+    Total = Report['Seconds']['Total']
+    Lines = ['Phase            Seconds      %']
+    for Phase, Seconds in Report['Seconds'].items():
+        Lines.append('{:<14} {:>9.3f} {:>6.1f}'.format(Phase, Seconds, 100.0 * Seconds / Total if Total > 0 else 0.0))
+    for Counter, Count in Report['Counters'].items():
+        Lines.append('{} {}'.format(Counter, Count))
+    for TestName, Count in Report['Rejected'].items():
+        Lines.append('Rejected by {} {}'.format(TestName, Count))
+    return '\n'.join(Lines)
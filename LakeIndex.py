@@ -0,0 +1,475 @@
+"""
+Lake Index is a sidecar index for HydroLAKES files in GMT text format.
+
+Reading a global HydroLAKES GMT file takes tens of seconds because every line is read
+and every lake header is tokenized. The index is built once with a single pass over the
+file and saved next to it as <InputFile>.lakeidx. It holds, for each lake, the byte
+offset and length of the lake perimeter (the > line, # @D header, # @P line and
+coordinates) and of the islands that follow it. All of the HydroLAKES header attributes
+are kept as typed columns (array('q') for integers, array('d') for doubles and lists
+for strings).
+
+Queries filter on the columns and then seek straight to the byte ranges of the lakes
+that match. Nothing else in the GMT file is read.
+
+The pour points (Pour_long, Pour_lat) are also bucketed in a grid of GRID_CELL_DEGREES
+cells. LakesInBounds() returns only the lakes in the grid cells a W E S N box touches, so
+a regional query reads a few cells rather than every lake. Boxes crossing the dateline
+are handled the same way as LakesParser.BoundsDatelineCheck describes them.
+
+The bounding box of each lake perimeter is saved too so bounds can be tested against the
+whole lake outline rather than the pour point without reading any coordinates. The boxes
+are bucketed in a second grid by their south west corner, so LakesWithBoxInBounds() finds
+the lakes whose outline may touch a box from a few cells too.
+
+The size and modification time of the GMT file are saved in the index. If either has
+changed, Load() reports the index as stale and it must be rebuilt.
+
+Object: Normally used by ParseSHEDSLake.LakesParser with UseIndex=True. For example
+
+import LakeIndex
+
+TheIndex = LakeIndex.LakeIndex(InFile, LakesParser.HEADER_ORDER, LakesParser.HEADER_TYPES)
+if not TheIndex.Load():
+    TheIndex.Build()
+
+Author: Joseph Wellhouse
+"""
+
+import os
+import pickle
+from array import array
+
+import GMTGeometry
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+class LakeIndexError(Exception):
+    """
+    Exception raised for errors while building or reading a lake index.
+    Attributes:
+        IndexFile -- the sidecar file
+        message -- explanation of the error
+    """
+    def __init__(self, IndexFile, message):
+        self.IndexFile = IndexFile
+        self.message = message
+        super(LakeIndexError, self).__init__(message)
+
+
+class LakeIndex:
+    """
+    Byte offset and attribute index for a HydroLAKES GMT text file.
+
+    Required inputs: SourceFile, HeaderOrder, HeaderTypes
+        HeaderOrder and HeaderTypes are LakesParser.HEADER_ORDER and LakesParser.HEADER_TYPES
+
+    Optional inputs:    RunLoud=False,
+                        RunSilent=False
+
+    After Build() or a successful Load() these are available
+        LakeCount -- number of lakes
+        HeaderLength -- bytes of file header before the first lake
+        CountLines -- lines in the source file
+        LakeOffset, LakeLength -- byte range of each lake perimeter
+        IslandsLength, IslandCount -- bytes and count of the islands after each lake
+        Columns -- dictionary of header name: typed column of values
+        BoxWest, BoxEast, BoxSouth, BoxNorth -- bounding box of each lake perimeter
+        GridCellStart, GridLakes -- pour point grid, see BuildGrid()
+        BoxGridCellStart, BoxGridLakes, LargeBoxLakes -- perimeter box grid, see BuildBoxGrid()
+    """
+
+    INDEX_EXTENSION = '.lakeidx'
+    # Increment when the layout of the saved dictionary changes. Old indices are then rebuilt.
+    INDEX_VERSION = 4
+
+    # Pour point grid. 1 degree cells give 64800 cells, about 15 lakes per cell for HydroLAKES.
+    GRID_CELL_DEGREES = 1.0
+    GRID_COLUMNS = int(360 / GRID_CELL_DEGREES)
+    GRID_ROWS = int(180 / GRID_CELL_DEGREES)
+
+    def __init__(self, SourceFile, HeaderOrder, HeaderTypes, RunLoud=False, RunSilent=False):
+        self.SourceFile = SourceFile
+        self.IndexFile = SourceFile + self.INDEX_EXTENSION
+        self.HeaderOrder = list(HeaderOrder)
+        self.HeaderTypes = list(HeaderTypes)
+        self.RunLoud = RunLoud
+        self.RunSilent = RunSilent
+
+        self.LakeCount = 0
+        self.HeaderLength = 0
+        self.CountLines = 0
+        self.LakeOffset = array('q')
+        self.LakeLength = array('q')
+        self.IslandsLength = array('q')
+        self.IslandCount = array('l')
+        self.Columns = {}
+        self.GridCellStart = array('q')
+        self.GridLakes = array('q')
+        self.BoxGridCellStart = array('q')
+        self.BoxGridLakes = array('q')
+        self.LargeBoxLakes = array('q')
+
+    def SourceSignature(self):
+        """
+        Returns (size, mtime in ns) of the source file. Used to spot a stale index.
+        """
+        SourceStat = os.stat(self.SourceFile)
+        return SourceStat.st_size, SourceStat.st_mtime_ns
+
+    def NewColumns(self):
+        """
+        Returns a dictionary of empty typed columns, one per header element.
+        """
+        Columns = {}
+        for Name, Type in zip(self.HeaderOrder, self.HeaderTypes):
+            if 'int' in Type:
+                Columns[Name] = array('q')
+            elif 'doub' in Type:
+                Columns[Name] = array('d')
+            else:
+                Columns[Name] = []
+        return Columns
+
+    def AppendHeader(self, Columns, line):
+        """
+        Splits a # @D lake header line (bytes) and appends each element to its column.
+        Values are converted the same way as LakesParser.ExtractLakeHeader.
+        """
+        LineElements = line[4:].decode('utf-8').split(sep='|')
+        if len(LineElements) != len(self.HeaderOrder):
+            raise LakeIndexError(self.IndexFile, 'ERROR - lake header has {} elements, expected {}: {}'.format(len(LineElements), len(self.HeaderOrder), line))
+
+        for Name, Type, Element in zip(self.HeaderOrder, self.HeaderTypes, LineElements):
+            if 'int' in Type:
+                Columns[Name].append(int(Element))
+            elif 'doub' in Type:
+                Columns[Name].append(float(Element))
+            else:
+                Columns[Name].append(Element.strip('"\' \n'))
+
+    def Build(self):
+        """
+        Scans the source file once and saves the index to IndexFile.
+        """
+        if not self.RunSilent:
+            print("Building lake index {}".format(self.IndexFile))
+
+        SourceSize, SourceMtimeNs = self.SourceSignature()
+
+        LakeOffset = array('q')
+        LakeLength = array('q')
+        IslandsLength = array('q')
+        IslandCount = array('l')
+        Columns = self.NewColumns()
+        PerimeterBoxes = [array('d'), array('d'), array('d'), array('d')]
+
+        HeaderLength = None
+        CountLines = 0
+        Offset = 0
+        SegmentOffset = 0
+        SegmentHeaderFound = False
+
+        # Byte offsets of the lake currently being scanned
+        ThisLakeOffset = None
+        ThisIslandsOffset = None
+        CountIslandsThisLake = 0
+        # Coordinate lines of the perimeter being scanned, None outside a perimeter
+        PerimeterLines = None
+
+        with open(self.SourceFile, 'rb') as InFile:
+            for line in InFile:
+                CountLines += 1
+
+                if SegmentHeaderFound:
+                    SegmentHeaderFound = False
+                    if line.startswith(b'# @D'):
+                        PerimeterLines = []
+                        # Close the previous lake at the start of this one
+                        if ThisLakeOffset is not None:
+                            self.AppendLake(LakeOffset, LakeLength, IslandsLength, IslandCount,
+                                            ThisLakeOffset, ThisIslandsOffset, SegmentOffset, CountIslandsThisLake)
+                        else:
+                            HeaderLength = SegmentOffset
+
+                        ThisLakeOffset = SegmentOffset
+                        ThisIslandsOffset = None
+                        CountIslandsThisLake = 0
+                        self.AppendHeader(Columns, line)
+
+                    elif line.startswith(b'# @H'):
+                        if ThisLakeOffset is not None:
+                            if ThisIslandsOffset is None:
+                                ThisIslandsOffset = SegmentOffset
+                            CountIslandsThisLake += 1
+
+                elif line[:1] == b'>':
+                    SegmentHeaderFound = True
+                    SegmentOffset = Offset
+                    if PerimeterLines is not None:
+                        self.AppendPerimeterBox(PerimeterBoxes, PerimeterLines)
+                        PerimeterLines = None
+
+                elif (PerimeterLines is not None) and (line[:1] != b'#'):
+                    PerimeterLines.append(line)
+
+                Offset += len(line)
+
+        # The last lake ends at EOF
+        if PerimeterLines is not None:
+            self.AppendPerimeterBox(PerimeterBoxes, PerimeterLines)
+        if ThisLakeOffset is not None:
+            self.AppendLake(LakeOffset, LakeLength, IslandsLength, IslandCount,
+                            ThisLakeOffset, ThisIslandsOffset, Offset, CountIslandsThisLake)
+        else:
+            HeaderLength = Offset
+
+        self.LakeCount = len(LakeOffset)
+        self.HeaderLength = HeaderLength
+        self.CountLines = CountLines
+        self.LakeOffset = LakeOffset
+        self.LakeLength = LakeLength
+        self.IslandsLength = IslandsLength
+        self.IslandCount = IslandCount
+        self.Columns = Columns
+        self.BoxWest, self.BoxEast, self.BoxSouth, self.BoxNorth = PerimeterBoxes
+        self.BuildGrid()
+        self.BuildBoxGrid()
+
+        IndexDict = {'IndexVersion':self.INDEX_VERSION,
+                    'SourceSize':SourceSize,
+                    'SourceMtimeNs':SourceMtimeNs,
+                    'HeaderOrder':self.HeaderOrder,
+                    'LakeCount':self.LakeCount,
+                    'HeaderLength':HeaderLength,
+                    'CountLines':CountLines,
+                    'LakeOffset':LakeOffset,
+                    'LakeLength':LakeLength,
+                    'IslandsLength':IslandsLength,
+                    'IslandCount':IslandCount,
+                    'Columns':Columns,
+                    'BoxWest':self.BoxWest,
+                    'BoxEast':self.BoxEast,
+                    'BoxSouth':self.BoxSouth,
+                    'BoxNorth':self.BoxNorth,
+                    'GridCellDegrees':self.GRID_CELL_DEGREES,
+                    'GridCellStart':self.GridCellStart,
+                    'GridLakes':self.GridLakes,
+                    'BoxGridCellStart':self.BoxGridCellStart,
+                    'BoxGridLakes':self.BoxGridLakes,
+                    'LargeBoxLakes':self.LargeBoxLakes}
+
+        # Write to a temporary name and move into place so a reader never sees half an index
+        TempFile = self.IndexFile + '.tmp{}'.format(os.getpid())
+        try:
+            with open(TempFile, 'wb') as IndexOut:
+                pickle.dump(IndexDict, IndexOut, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(TempFile, self.IndexFile)
+        except OSError as err:
+            if os.path.exists(TempFile):
+                os.remove(TempFile)
+            raise LakeIndexError(self.IndexFile, 'ERROR - unable to write lake index {}: {}'.format(self.IndexFile, err))
+
+        if self.RunLoud:
+            print("Lake index has {} lakes from {} lines".format(self.LakeCount, CountLines))
+
+    @staticmethod
+    def AppendLake(LakeOffset, LakeLength, IslandsLength, IslandCount, ThisLakeOffset, ThisIslandsOffset, EndOffset, CountIslandsThisLake):
+        """
+        Appends the byte ranges of one finished lake.
+        """
+        LakeOffset.append(ThisLakeOffset)
+        if ThisIslandsOffset is None:
+            LakeLength.append(EndOffset - ThisLakeOffset)
+            IslandsLength.append(0)
+        else:
+            LakeLength.append(ThisIslandsOffset - ThisLakeOffset)
+            IslandsLength.append(EndOffset - ThisIslandsOffset)
+        IslandCount.append(CountIslandsThisLake)
+
+    @staticmethod
+    def AppendPerimeterBox(PerimeterBoxes, PerimeterLines):
+        """
+        Appends the W E S N bounding box of one perimeter, given as its coordinate lines, to
+        PerimeterBoxes. A perimeter without coordinates gets an empty box, W E S N of 
+        inf -inf inf -inf, which overlaps nothing.
+        """
+        Box = GMTGeometry.CoordinateBounds(GMTGeometry.ParseCoordinates(b''.join(PerimeterLines)))
+        if Box is None:
+            Box = (float('inf'), float('-inf'), float('inf'), float('-inf'))
+        for Column, Value in zip(PerimeterBoxes, Box):
+            Column.append(Value)
+
+    def Load(self):
+        """
+        Loads IndexFile. Returns True if it is loaded and current.
+        Returns False if it is missing, from another version or stale because the
+        source file size or mtime changed.
+        """
+        if not os.path.exists(self.IndexFile):
+            if self.RunLoud:
+                print("No lake index found {}".format(self.IndexFile))
+            return False
+
+        try:
+            with open(self.IndexFile, 'rb') as IndexIn:
+                IndexDict = pickle.load(IndexIn)
+        except (OSError, EOFError, pickle.UnpicklingError) as err:
+            if not self.RunSilent:
+                print("Warning unable to read lake index {}. It will be rebuilt.".format(self.IndexFile))
+                print(err)
+            return False
+
+        SourceSize, SourceMtimeNs = self.SourceSignature()
+        if ((IndexDict.get('IndexVersion') != self.INDEX_VERSION) or (IndexDict.get('HeaderOrder') != self.HeaderOrder)
+                or (IndexDict.get('GridCellDegrees') != self.GRID_CELL_DEGREES)):
+            if not self.RunSilent:
+                print("Lake index {} is from a different version. It will be rebuilt.".format(self.IndexFile))
+            return False
+        if (IndexDict['SourceSize'] != SourceSize) or (IndexDict['SourceMtimeNs'] != SourceMtimeNs):
+            if not self.RunSilent:
+                print("Lake index {} is stale, {} has changed. It will be rebuilt.".format(self.IndexFile, self.SourceFile))
+            return False
+
+        self.LakeCount = IndexDict['LakeCount']
+        self.HeaderLength = IndexDict['HeaderLength']
+        self.CountLines = IndexDict['CountLines']
+        self.LakeOffset = IndexDict['LakeOffset']
+        self.LakeLength = IndexDict['LakeLength']
+        self.IslandsLength = IndexDict['IslandsLength']
+        self.IslandCount = IndexDict['IslandCount']
+        self.Columns = IndexDict['Columns']
+        self.BoxWest = IndexDict['BoxWest']
+        self.BoxEast = IndexDict['BoxEast']
+        self.BoxSouth = IndexDict['BoxSouth']
+        self.BoxNorth = IndexDict['BoxNorth']
+        self.GridCellStart = IndexDict['GridCellStart']
+        self.GridLakes = IndexDict['GridLakes']
+        self.BoxGridCellStart = IndexDict['BoxGridCellStart']
+        self.BoxGridLakes = IndexDict['BoxGridLakes']
+        self.LargeBoxLakes = IndexDict['LargeBoxLakes']
+
+        if self.RunLoud:
+            print("Loaded lake index {} with {} lakes".format(self.IndexFile, self.LakeCount))
+        return True
+
+    # Pour point grid
+    def GridRow(self, Lat):
+        """
+        Returns the grid row of a latitude. Out of range values are clamped to the edge rows.
+        """
+        Row = int((Lat + 90.0) // self.GRID_CELL_DEGREES)
+        return min(max(Row, 0), self.GRID_ROWS - 1)
+
+    def GridColumn(self, Lon):
+        """
+        Returns the grid column of a longitude. Out of range values are clamped to the edge columns.
+        """
+        Column = int((Lon + 180.0) // self.GRID_CELL_DEGREES)
+        return min(max(Column, 0), self.GRID_COLUMNS - 1)
+
+    def BuildGrid(self):
+        """
+        Buckets every lake by the grid cell of its pour point.
+        Cells are numbered row by row, Row * GRID_COLUMNS + Column. GridLakes holds the lake
+        numbers sorted by cell and, within a cell, in file order. The lakes of cell c are
+        GridLakes[GridCellStart[c]:GridCellStart[c+1]].
+        """
+        LakeCell = [self.GridRow(Lat) * self.GRID_COLUMNS + self.GridColumn(Lon)
+                    for Lon, Lat in zip(self.Columns['Pour_long'], self.Columns['Pour_lat'])]
+        self.GridCellStart, self.GridLakes = self.BucketLakes(LakeCell)
+
+    def BuildBoxGrid(self):
+        """
+        Buckets every lake by the grid cell of the south west corner of its perimeter box, 
+        as BuildGrid does pour points. A box wider or taller than a cell is listed in 
+        LargeBoxLakes instead. A perimeter without coordinates is in neither.
+        """
+        LakeCell = []
+        LargeBoxLakes = array('q')
+        for Lake, (West, East, South, North) in enumerate(zip(self.BoxWest, self.BoxEast, self.BoxSouth, self.BoxNorth)):
+            if West > East:
+                LakeCell.append(None)
+            elif (East - West > self.GRID_CELL_DEGREES) or (North - South > self.GRID_CELL_DEGREES):
+                LakeCell.append(None)
+                LargeBoxLakes.append(Lake)
+            else:
+                LakeCell.append(self.GridRow(South) * self.GRID_COLUMNS + self.GridColumn(West))
+        self.BoxGridCellStart, self.BoxGridLakes = self.BucketLakes(LakeCell)
+        self.LargeBoxLakes = LargeBoxLakes
+
+    def BucketLakes(self, LakeCell):
+        """
+        Returns (GridCellStart, GridLakes) of a grid from LakeCell, the cell of each lake 
+        or None to leave it out. See BuildGrid.
+        """
+        CellCount = self.GRID_ROWS * self.GRID_COLUMNS
+
+        # Count the lakes in each cell, then a running sum gives the start of each cell
+        GridCellStart = array('q', bytes(8 * (CellCount + 1)))
+        for Cell in LakeCell:
+            if Cell is not None:
+                GridCellStart[Cell + 1] += 1
+        for Cell in range(CellCount):
+            GridCellStart[Cell + 1] += GridCellStart[Cell]
+
+        NextSlot = GridCellStart[:-1]
+        GridLakes = array('q', bytes(8 * GridCellStart[-1]))
+        for Lake, Cell in enumerate(LakeCell):
+            if Cell is not None:
+                GridLakes[NextSlot[Cell]] = Lake
+                NextSlot[Cell] += 1
+
+        return GridCellStart, GridLakes
+
+    def LakesInBounds(self, Bounds):
+        """
+        Returns a sorted list of the lakes whose pour point is in a grid cell touched by Bounds.
+        Bounds is [W E S N BoundsIncDateline] as in LakesParser.SimpleBounds. 
+        These are candidates only. Lakes in the edge cells may still be outside Bounds and 
+        must be checked with LakesParser.LakeMatchesBounds().
+        """
+        return self.GridLakesInBounds(self.GridCellStart, self.GridLakes, Bounds)
+
+    def LakesWithBoxInBounds(self, Bounds):
+        """
+        Returns a sorted list of the lakes whose perimeter box may overlap Bounds, given as 
+        in LakesInBounds. A box no bigger than a cell that overlaps Bounds has its south west 
+        corner in Bounds widened by a cell to the west and south, so only the box grid cells 
+        of that are read, with LargeBoxLakes. These are candidates only and must be checked 
+        with LakesParser.BoxMatchesBounds().
+        """
+        Widened = [Bounds[0] - self.GRID_CELL_DEGREES, Bounds[1], Bounds[2] - self.GRID_CELL_DEGREES, Bounds[3], Bounds[4]]
+        Candidates = self.GridLakesInBounds(self.BoxGridCellStart, self.BoxGridLakes, Widened)
+        Candidates.extend(self.LargeBoxLakes)
+        Candidates.sort()
+        return Candidates
+
+    def GridLakesInBounds(self, GridCellStart, GridLakes, Bounds):
+        """
+        Returns a sorted list of the lakes of a grid, see BuildGrid, in the cells touched by Bounds.
+        """
+        RowStart = self.GridRow(Bounds[2])
+        RowEnd = self.GridRow(Bounds[3])
+        if not Bounds[4]:
+            ColumnRanges = [(self.GridColumn(Bounds[0]), self.GridColumn(Bounds[1]))]
+        elif self.GridColumn(Bounds[0]) <= self.GridColumn(Bounds[1]):
+            # Crosses the dateline and wraps back into the western cell, so every column
+            ColumnRanges = [(0, self.GRID_COLUMNS - 1)]
+        else:
+            # split across International Dateline
+            ColumnRanges = [(self.GridColumn(Bounds[0]), self.GRID_COLUMNS - 1),
+                            (0, self.GridColumn(Bounds[1]))]
+
+        Candidates = []
+        for Row in range(RowStart, RowEnd + 1):
+            RowFirstCell = Row * self.GRID_COLUMNS
+            # Cells in one row are consecutive so each column range is one slice
+            for ColumnStart, ColumnEnd in ColumnRanges:
+                Candidates.extend(GridLakes[GridCellStart[RowFirstCell + ColumnStart]:GridCellStart[RowFirstCell + ColumnEnd + 1]])
+
+        # Back in file order
+        Candidates.sort()
+        return Candidates
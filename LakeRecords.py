@@ -0,0 +1,133 @@
+"""
+Lake Records are the compact records yielded by ParseSHEDSLake.LakesParser.IterLakes().
+
+Each Lake holds the typed HydroLAKES header fields as attributes (Hylak_id, Lake_name,
+Lake_area, Pour_long etc) in __slots__ so a record has no per instance dictionary.
+The perimeter and islands are Rings. A Ring keeps the raw GMT text of its coordinate
+block and only parses it, in one go, into an array('d') when Coordinates is first used.
+Lakes that are only filtered or counted by their header never have their vertices parsed.
+See GMTGeometry.py for the coordinate buffers.
+
+For example
+
+import ParseSHEDSLake
+
+TheParser = ParseSHEDSLake.LakesParser(InFile, None, ContinentName='north')
+for Lake in TheParser.IterLakes():
+    print(Lake.Hylak_id, Lake.Lake_name, len(Lake.Perimeter), len(Lake.Islands))
+    Coordinates = Lake.Perimeter.Coordinates  # array('d') of lon, lat, lon, lat, ...
+
+Author: Joseph Wellhouse
+"""
+
+import GMTGeometry
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+class Ring:
+    """
+    One closed polygon ring, a lake perimeter or an island, read lazily.
+
+    Required inputs: Text
+        The bytes of the ring's coordinate lines as in the GMT file, one "lon lat" per line.
+        Comment lines (# @P) are ignored.
+
+    Coordinates is an array('d') of alternating longitude and latitude, parsed on first use
+    with GMTGeometry.ParseCoordinates. View and AsNumPy() share its memory without copying.
+    len(Ring) is the number of vertices and iterating gives (lon, lat) tuples.
+    """
+    __slots__ = ('Text', '_Coordinates')
+
+    def __init__(self, Text):
+        self.Text = Text
+        self._Coordinates = None
+
+    @property
+    def Coordinates(self):
+        if self._Coordinates is None:
+            self._Coordinates = self.ParseText(self.Text)
+            # The text is no longer needed
+            self.Text = None
+        return self._Coordinates
+
+    @staticmethod
+    def ParseText(Text):
+        """
+        Parses GMT coordinate lines into an array('d') of lon, lat, lon, lat, ...
+        """
+        return GMTGeometry.ParseCoordinates(Text)
+
+    @property
+    def View(self):
+        """
+        Read only memoryview of Coordinates. No copy is made.
+        """
+        return GMTGeometry.CoordinateView(self.Coordinates)
+
+    def AsNumPy(self):
+        """
+        Coordinates as an N x 2 NumPy array of lon, lat sharing their memory.
+        """
+        return GMTGeometry.AsNumPy(self.Coordinates)
+
+    def __len__(self):
+        return len(self.Coordinates) // 2
+
+    def __iter__(self):
+        Coordinates = self.Coordinates
+        return zip(Coordinates[0::2], Coordinates[1::2])
+
+    def __repr__(self):
+        if self._Coordinates is None:
+            return '<Ring not parsed, {} bytes>'.format(len(self.Text))
+        return '<Ring {} vertices>'.format(len(self))
+
+
+class Lake:
+    """
+    One HydroLAKES lake. The header fields are attributes named as in FIELDS, typed as
+    in the @T line of the GMT file. Perimeter is a Ring and Islands a list of Rings, empty
+    when the parser skips islands.
+
+    FIELDS follows ParseSHEDSLake.LakesParser.HEADER_ORDER.
+    """
+    FIELDS = ('Hylak_id',
+                'Lake_name',
+                'Country',
+                'Continent',
+                'Poly_src',
+                'Lake_type',
+                'Grand_id',
+                'Lake_area',
+                'Shore_len',
+                'Shore_dev',
+                'Vol_total',
+                'Vol_res',
+                'Vol_src',
+                'Depth_avg',
+                'Dis_avg',
+                'Res_time',
+                'Elevation',
+                'Slope_100',
+                'Wshd_area',
+                'Pour_long',
+                'Pour_lat')
+
+    __slots__ = FIELDS + ('Perimeter', 'Islands')
+
+    def __init__(self, Values, Perimeter, Islands):
+        for Field, Value in zip(self.FIELDS, Values):
+            setattr(self, Field, Value)
+        self.Perimeter = Perimeter
+        self.Islands = Islands
+
+    def AsDict(self):
+        """
+        Returns the header fields as a dictionary.
+        """
+        return {Field:getattr(self, Field) for Field in self.FIELDS}
+
+    def __repr__(self):
+        return '<Lake {} {!r} {} islands>'.format(self.Hylak_id, self.Lake_name, len(self.Islands))
@@ -0,0 +1,262 @@
+"""
+Mask Grid selects points that fall on the non zero cells of a raster mask.
+
+Rectangular bounds can not follow a watershed or a country. A mask grid can, and finding
+the cell of a point is two subtractions and two divisions whatever the shape of the
+region, so a mask costs the same per lake or segment as a bounding box.
+
+Masks are read from
+
+    .asc    ESRI ASCII grid. A header of ncols, nrows, xllcorner or xllcenter,
+            yllcorner or yllcenter, cellsize and optionally NODATA_value, then nrows
+            rows of ncols values from north to south. NODATA cells are off.
+    .npz    NumPy archive of Mask, a 2D array with row 0 at the north, and Extent,
+            W E S N of the outer edges of the grid. Needs NumPy.
+    other   xyz text, lon lat value per line at the cell centres of a regular grid as
+            written by gmt grd2xyz. Cells without a line are off. Lines starting with #
+            or > are skipped.
+
+A cell is on if its value is non zero and not NaN. Cells cover their western and
+northern edges, a point on the eastern or southern edge of the grid is in the edge cell.
+Points west of the grid are tried 360 degrees east, so a grid of 0 to 360 works with
+longitudes of -180 to 180.
+
+PointMatches tests one point. PointsMatch tests NumPy arrays of points at once and needs
+NumPy. The loaders use NumPy when it is installed and pure Python otherwise. For example
+
+import MaskGrid
+
+Mask = MaskGrid.MaskGrid('watershed.asc')
+Mask.PointMatches(-123.1, 49.3)
+
+Author: Joseph Wellhouse
+"""
+
+# NumPy is optional, see above
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+# ESRI ASCII grid header keys, lower case, and whether they are required
+ESRI_HEADER_KEYS = {'ncols':True, 'nrows':True, 'xllcorner':False, 'xllcenter':False,
+                    'yllcorner':False, 'yllcenter':False, 'cellsize':True, 'nodata_value':False}
+
+
+class MaskGridError(Exception):
+    """
+    Raised when a mask grid file can not be read.
+    """
+    pass
+
+
+class MaskGrid:
+    """
+    Raster mask of on and off cells over a W E S N extent.
+
+    Required inputs: MaskFile
+
+    West, East, South and North are the outer edges of the grid. Cells is bytes, one per
+    cell row by row from the north, 1 for on and 0 for off.
+    Raises MaskGridError if MaskFile can not be read.
+    """
+
+    def __init__(self, MaskFile):
+        self.MaskFile = MaskFile
+        try:
+            if MaskFile.lower().endswith('.asc'):
+                self.ReadESRIASCII(MaskFile)
+            elif MaskFile.lower().endswith('.npz'):
+                self.ReadNumPy(MaskFile)
+            else:
+                self.ReadXYZ(MaskFile)
+        except OSError as err:
+            raise MaskGridError('Unable to read mask grid {}: {}'.format(MaskFile, err))
+        except (ValueError, IndexError, KeyError) as err:
+            raise MaskGridError('Mask grid {} is not valid: {}'.format(MaskFile, err))
+
+        if (self.Columns < 1) or (self.Rows < 1) or (len(self.Cells) != self.Rows * self.Columns):
+            raise MaskGridError('Mask grid {} should have {} x {} cells, found {}'.format(MaskFile, self.Rows, self.Columns, len(self.Cells)))
+        if not ((self.West < self.East) and (-90.0 <= self.South < self.North <= 90.0) and (self.East - self.West <= 360.0)):
+            raise MaskGridError('Mask grid {} extent W E S N {} {} {} {} is not valid'.format(MaskFile, self.West, self.East, self.South, self.North))
+
+        self.CellWidth = (self.East - self.West) / self.Columns
+        self.CellHeight = (self.North - self.South) / self.Rows
+        self.CountOn = self.Cells.count(1)
+        self.CellArray = None
+        if np is not None:
+            self.CellArray = np.frombuffer(self.Cells, dtype=np.uint8).astype(bool)
+
+    def SetGrid(self, West, East, South, North, Rows, Columns, Cells):
+        self.West = float(West)
+        self.East = float(East)
+        self.South = float(South)
+        self.North = float(North)
+        self.Rows = Rows
+        self.Columns = Columns
+        self.Cells = bytes(Cells)
+
+    @staticmethod
+    def CellsFromValues(Values, NoData=None):
+        """
+        Returns bytes of 1 for each of Values, a list of str or a NumPy array, that is non
+        zero, not NaN and not NoData, else 0.
+        """
+        if np is not None:
+            Values = np.asarray(Values, dtype=np.float64)
+            On = (Values != 0) & ~np.isnan(Values)
+            if NoData is not None:
+                On &= Values != NoData
+            return On.astype(np.uint8).tobytes()
+
+        Cells = bytearray(len(Values))
+        for i, Value in enumerate(Values):
+            Value = float(Value)
+            if (Value != 0) and (Value == Value) and (Value != NoData):
+                Cells[i] = 1
+        return Cells
+
+    def ReadESRIASCII(self, MaskFile):
+        with open(MaskFile, 'r') as InFile:
+            Header = {}
+            Values = []
+            for line in InFile:
+                Fields = line.split()
+                if not Fields:
+                    continue
+                if (not Values) and (Fields[0].lower() in ESRI_HEADER_KEYS):
+                    Header[Fields[0].lower()] = float(Fields[1])
+                else:
+                    Values.extend(Fields)
+
+        for Key, Required in ESRI_HEADER_KEYS.items():
+            if Required and (Key not in Header):
+                raise ValueError('no {} in the header'.format(Key))
+        Columns = int(Header['ncols'])
+        Rows = int(Header['nrows'])
+        CellSize = Header['cellsize']
+        if 'xllcorner' in Header:
+            West = Header['xllcorner']
+        else:
+            West = Header['xllcenter'] - CellSize / 2.0
+        if 'yllcorner' in Header:
+            South = Header['yllcorner']
+        else:
+            South = Header['yllcenter'] - CellSize / 2.0
+        if len(Values) != Rows * Columns:
+            raise ValueError('{} values for {} rows of {} columns'.format(len(Values), Rows, Columns))
+
+        self.SetGrid(West, West + Columns * CellSize, South, South + Rows * CellSize, Rows, Columns,
+                        self.CellsFromValues(Values, Header.get('nodata_value')))
+
+    def ReadNumPy(self, MaskFile):
+        if np is None:
+            raise ValueError('.npz mask grids need NumPy, which is not installed')
+        with np.load(MaskFile) as Archive:
+            Mask = np.asarray(Archive['Mask'])
+            Extent = [float(Value) for Value in Archive['Extent']]
+        if Mask.ndim != 2:
+            raise ValueError('Mask should be a 2D array, received {} dimensions'.format(Mask.ndim))
+        if len(Extent) != 4:
+            raise ValueError('Extent should be W E S N, received {}'.format(Extent))
+        self.SetGrid(Extent[0], Extent[1], Extent[2], Extent[3], Mask.shape[0], Mask.shape[1],
+                        self.CellsFromValues(Mask.ravel()))
+
+    def ReadXYZ(self, MaskFile):
+        Lons = []
+        Lats = []
+        Values = []
+        with open(MaskFile, 'r') as InFile:
+            for line in InFile:
+                Fields = line.replace(',', ' ').split()
+                if (not Fields) or (Fields[0][0] in '#>'):
+                    continue
+                Lons.append(float(Fields[0]))
+                Lats.append(float(Fields[1]))
+                Values.append(Fields[2])
+        if not Values:
+            raise ValueError('no lon lat value lines')
+
+        # Cell centres, the spacing is the smallest step between them
+        CentreLons = sorted(set(Lons))
+        CentreLats = sorted(set(Lats))
+        CellWidth = self.GridSpacing(CentreLons)
+        CellHeight = self.GridSpacing(CentreLats)
+        if CellWidth is None:
+            CellWidth = CellHeight
+        if CellHeight is None:
+            CellHeight = CellWidth
+        if CellWidth is None:
+            raise ValueError('one point is not a grid')
+        Columns = int(round((CentreLons[-1] - CentreLons[0]) / CellWidth)) + 1
+        Rows = int(round((CentreLats[-1] - CentreLats[0]) / CellHeight)) + 1
+        West = CentreLons[0] - CellWidth / 2.0
+        North = CentreLats[-1] + CellHeight / 2.0
+
+        On = self.CellsFromValues(Values)
+        Cells = bytearray(Rows * Columns)
+        for Lon, Lat, CellOn in zip(Lons, Lats, On):
+            if CellOn:
+                Row = int(round((CentreLats[-1] - Lat) / CellHeight))
+                Column = int(round((Lon - CentreLons[0]) / CellWidth))
+                Cells[Row * Columns + Column] = 1
+
+        self.SetGrid(West, West + Columns * CellWidth, North - Rows * CellHeight, North, Rows, Columns, Cells)
+
+    @staticmethod
+    def GridSpacing(Centres):
+        """
+        Returns the smallest step between the sorted values Centres, None for one value.
+        """
+        Steps = [b - a for a, b in zip(Centres, Centres[1:])]
+        if not Steps:
+            return None
+        return min(Steps)
+
+    def Bounds(self):
+        """
+        Returns the extent as [W E S N BoundsIncDateline] with longitudes from -180 to 180,
+        as LakesParser.SimpleBounds, for narrowing a search to the grid.
+        """
+        if self.East - self.West >= 360.0:
+            return [-180.0, 180.0, self.South, self.North, False]
+        West = (self.West + 180.0) % 360.0 - 180.0
+        East = West + (self.East - self.West)
+        if East > 180.0:
+            return [West, East - 360.0, self.South, self.North, True]
+        return [West, East, self.South, self.North, False]
+
+    def PointMatches(self, Lon, Lat):
+        """
+        Returns True if Lon, Lat is on a cell that is on.
+        """
+        if Lon < self.West:
+            Lon += 360.0
+        if not ((self.West <= Lon <= self.East) and (self.South <= Lat <= self.North)):
+            return False
+        Column = int((Lon - self.West) / self.CellWidth)
+        if Column >= self.Columns:
+            Column = self.Columns - 1
+        Row = int((self.North - Lat) / self.CellHeight)
+        if Row >= self.Rows:
+            Row = self.Rows - 1
+        return self.Cells[Row * self.Columns + Column] == 1
+
+    def PointsMatch(self, Lon, Lat):
+        """
+        Boolean NumPy mask of the points Lon, Lat (arrays) that are on cells that are on.
+        The same test as PointMatches. Needs NumPy.
+        """
+        Lon = np.asarray(Lon, dtype=np.float64)
+        Lat = np.asarray(Lat, dtype=np.float64)
+        Lon = np.where(Lon < self.West, Lon + 360.0, Lon)
+        Inside = (Lon >= self.West) & (Lon <= self.East) & (Lat >= self.South) & (Lat <= self.North)
+        Columns = np.minimum(((Lon[Inside] - self.West) / self.CellWidth).astype(np.int64), self.Columns - 1)
+        Rows = np.minimum(((self.North - Lat[Inside]) / self.CellHeight).astype(np.int64), self.Rows - 1)
+        Matches = np.zeros(len(Lon), dtype=bool)
+        Matches[Inside] = self.CellArray[Rows * self.Columns + Columns]
+        return Matches
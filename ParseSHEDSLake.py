@@ -37,7 +37,12 @@ import ParseSHEDSLake
 TheParser = ParseSHEDSLake.LakesParser(InFile,OutFile, *optional options)
 TheParser.ParseLakes()
 
-See ParseSHEDSLake.LakesParser.__doc__ for details.
+Or iterate over the matching lakes without writing a file
+
+for Lake in TheParser.IterLakes():
+    print(Lake.Hylak_id, Lake.Lake_name, len(Lake.Perimeter))
+
+See ParseSHEDSLake.LakesParser.__doc__ and LakeRecords.py for details.
 
 Author: Joseph Wellhouse
 Last Update: 2020-07-16
@@ -48,6 +53,36 @@ import os
 import traceback
 import sys
 import subprocess
+import bisect
+import io
+import shutil
+import tempfile
+import concurrent.futures
+import functools
+import contextlib
+import json
+import shlex
+import collections.abc
+
+import LakeIndex
+import GMTScanner
+import LakeRecords
+import GMTGeometry
+import ConversionCache
+import ShapefileReader
+import CompressedFiles
+import GMTBinary
+import StreamingStats
+import Instrumentation
+import ProgressReporter
+import MaskGrid
+import RegionPolygon
+
+# NumPy is only needed for Vectorized
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Meta data in HydroLAKES 
 # # @NHylak_id|Lake_name|Country|Continent|Poly_src|Lake_type|Grand_id|Lake_area|Shore_len|Shore_dev|Vol_total|Vol_res|
@@ -87,8 +122,6 @@ import subprocess
 #  Add function LakeMatches*
 #  Update class doc string
 
-# TODO impliment save stats  ReportFullStats
-
 __version__ = "0.0.3"
 __author__ = "Joseph Wellhouse"
 
@@ -143,6 +176,275 @@ class ProcessingError(Exception):
         self.CauseException = CauseException
         super(ProcessingError, self).__init__(message)
 
+class BoundsListMatcher:
+    """
+    Answers whether a point is within, or a box overlaps, any of a list of bounds in 
+    logarithmic time.
+    
+    Required inputs: BoundsList - list of [W E S N BoundsIncDateline] as made by LakesParser.ReadBoundsFile
+    
+    The southern and northern limits of all the bounds cut the globe into latitude bands.
+    Within each band, the longitude ranges of the bounds covering it are merged into 
+    sorted, non overlapping intervals. A point is found with a bisect on the band edges 
+    and a bisect on the intervals of its band. A box is found with a bisect for each band 
+    its latitudes span. PointsMatch and BoxesMatch do the same for NumPy arrays of points 
+    or boxes, see BuildArrays. Bounds crossing the dateline are split into 
+    W to 180 and -180 to E. Limits are inclusive, as in LakeMatchesBoundsSimple.
+    """
+    def __init__(self, BoundsList):
+        # Longitude intervals of every bounds, split at the dateline
+        Boxes = []
+        for Bounds in BoundsList:
+            if not Bounds[4]:
+                Boxes.append((Bounds[2], Bounds[3], Bounds[0], Bounds[1]))
+            else:
+                Boxes.append((Bounds[2], Bounds[3], Bounds[0], 180.0))
+                Boxes.append((Bounds[2], Bounds[3], -180.0, Bounds[1]))
+        
+        self.BandEdges = sorted(set([Box[0] for Box in Boxes] + [Box[1] for Box in Boxes]))
+        
+        # Sweep up the bands keeping the boxes that cover the current band
+        Boxes.sort()
+        NextBox = 0
+        ActiveBoxes = []
+        self.BandStarts = []
+        self.BandEnds = []
+        for Band in range(len(self.BandEdges) - 1):
+            BandSouth = self.BandEdges[Band]
+            while (NextBox < len(Boxes)) and (Boxes[NextBox][0] <= BandSouth):
+                ActiveBoxes.append(Boxes[NextBox])
+                NextBox += 1
+            ActiveBoxes = [Box for Box in ActiveBoxes if Box[1] > BandSouth]
+            
+            Starts, Ends = self.MergeIntervals(sorted((Box[2], Box[3]) for Box in ActiveBoxes))
+            self.BandStarts.append(Starts)
+            self.BandEnds.append(Ends)
+        
+        # NumPy forms, built when first used
+        self.IntervalKeys = None
+    
+    @staticmethod
+    def MergeIntervals(Intervals):
+        """
+        Merges sorted (start, end) intervals. Returns separate lists of starts and ends.
+        """
+        Starts = []
+        Ends = []
+        for Start, End in Intervals:
+            if Ends and (Start <= Ends[-1]):
+                if End > Ends[-1]:
+                    Ends[-1] = End
+            else:
+                Starts.append(Start)
+                Ends.append(End)
+        return Starts, Ends
+    
+    def PointInBand(self, Band, Lon):
+        i = bisect.bisect_right(self.BandStarts[Band], Lon) - 1
+        return (i >= 0) and (Lon <= self.BandEnds[Band][i])
+    
+    def PointMatches(self, Lon, Lat):
+        """
+        Returns True if Lon, Lat is within any of the bounds.
+        """
+        Band = bisect.bisect_right(self.BandEdges, Lat) - 1
+        if (Band < 0) or (Lat > self.BandEdges[-1]):
+            return False
+        
+        # On the northern limit of the top band
+        if Band == len(self.BandStarts):
+            return self.PointInBand(Band - 1, Lon)
+        
+        if self.PointInBand(Band, Lon):
+            return True
+        # On a band edge the point is also within the northern limit of the band below
+        if (Lat == self.BandEdges[Band]) and (Band > 0):
+            return self.PointInBand(Band - 1, Lon)
+        return False
+    
+    def BuildArrays(self):
+        """
+        Builds NumPy forms of BandEdges, BandStarts and BandEnds. The intervals of all the 
+        bands are in one array in band order. Each interval start is replaced by its rank 
+        among all the starts so that IntervalKeys, band times RankCount plus rank, are 
+        exact integers sorted by band then start. One searchsorted then finds the last 
+        interval of a band starting at or before a longitude.
+        """
+        self.EdgesArray = np.array(self.BandEdges, dtype=np.float64)
+        AllStarts = np.array([Start for Starts in self.BandStarts for Start in Starts], dtype=np.float64)
+        self.IntervalEnds = np.array([End for Ends in self.BandEnds for End in Ends], dtype=np.float64)
+        self.IntervalBands = np.repeat(np.arange(len(self.BandStarts), dtype=np.int64), 
+                                        [len(Starts) for Starts in self.BandStarts])
+        self.UniqueStarts = np.unique(AllStarts)
+        self.RankCount = len(self.UniqueStarts) + 1
+        self.IntervalKeys = self.IntervalBands * self.RankCount + np.searchsorted(self.UniqueStarts, AllStarts, side='right')
+    
+    def BandsMatch(self, Band, West, East):
+        """
+        Boolean NumPy mask of the longitude ranges West to East (arrays, equal for points) 
+        that meet an interval of their band, Band (an array of band numbers). 
+        The same test as PointInBand.
+        """
+        Keys = Band * self.RankCount + np.searchsorted(self.UniqueStarts, East, side='right')
+        i = np.searchsorted(self.IntervalKeys, Keys, side='right') - 1
+        Found = i >= 0
+        i = np.maximum(i, 0)
+        return Found & (self.IntervalBands[i] == Band) & (self.IntervalEnds[i] >= West)
+    
+    def PointsMatch(self, Lon, Lat):
+        """
+        Boolean NumPy mask of the points Lon, Lat (arrays) within any of the bounds.
+        The same test as PointMatches. Needs NumPy.
+        """
+        Lon = np.asarray(Lon, dtype=np.float64)
+        Lat = np.asarray(Lat, dtype=np.float64)
+        if not self.BandStarts:
+            return np.zeros(len(Lon), dtype=bool)
+        if self.IntervalKeys is None:
+            self.BuildArrays()
+        
+        Band = np.searchsorted(self.EdgesArray, Lat, side='right') - 1
+        Inside = (Band >= 0) & (Lat <= self.EdgesArray[-1])
+        # On the northern limit of the top band
+        Band = np.clip(Band, 0, len(self.BandStarts) - 1)
+        Matches = Inside & self.BandsMatch(Band, Lon, Lon)
+        # On a band edge the point is also within the northern limit of the band below
+        OnEdge = Inside & ~Matches & (Band > 0) & (Lat == self.EdgesArray[Band])
+        Matches[OnEdge] = self.BandsMatch(Band[OnEdge] - 1, Lon[OnEdge], Lon[OnEdge])
+        return Matches
+    
+    def BoxesMatch(self, West, East, South, North):
+        """
+        Boolean NumPy mask of the boxes West East South North (arrays, not crossing the 
+        dateline) that touch or overlap any of the bounds. The same test as BoxMatches. 
+        Each pass tests the next band of the boxes not yet matched, so the work follows 
+        the number of bands each box spans. Needs NumPy.
+        """
+        West = np.asarray(West, dtype=np.float64)
+        East = np.asarray(East, dtype=np.float64)
+        if not self.BandStarts:
+            return np.zeros(len(West), dtype=bool)
+        if self.IntervalKeys is None:
+            self.BuildArrays()
+        
+        FirstBand = np.maximum(np.searchsorted(self.EdgesArray, South, side='left') - 1, 0)
+        LastBand = np.minimum(np.searchsorted(self.EdgesArray, North, side='right') - 1, len(self.BandStarts) - 1)
+        Matches = np.zeros(len(West), dtype=bool)
+        Active = np.nonzero(FirstBand <= LastBand)[0]
+        Band = FirstBand[Active]
+        while len(Active):
+            Matched = self.BandsMatch(Band, West[Active], East[Active])
+            Matches[Active[Matched]] = True
+            Remaining = ~Matched & (Band < LastBand[Active])
+            Active = Active[Remaining]
+            Band = Band[Remaining] + 1
+        return Matches
+    
+    def MergedBounds(self):
+        """
+        Returns the bounds as [W E S N False], one per merged interval of each band. 
+        These cover the same area as BoundsList, usually with far fewer boxes.
+        """
+        MergedList = []
+        for Band in range(len(self.BandStarts)):
+            for Start, End in zip(self.BandStarts[Band], self.BandEnds[Band]):
+                MergedList.append([Start, End, self.BandEdges[Band], self.BandEdges[Band + 1], False])
+        return MergedList
+    
+    def BoxMatches(self, Box):
+        """
+        Returns True if Box, W E S N not crossing the dateline, touches or overlaps any of 
+        the bounds. The same test as GMTGeometry.BoxesOverlap against each bounds.
+        """
+        if not self.BandStarts:
+            return False
+        # Bands whose closed latitude range meets Box[2] to Box[3]
+        FirstBand = max(bisect.bisect_left(self.BandEdges, Box[2]) - 1, 0)
+        LastBand = min(bisect.bisect_right(self.BandEdges, Box[3]) - 1, len(self.BandStarts) - 1)
+        for Band in range(FirstBand, LastBand + 1):
+            # The interval starting last at or before the east of the box reaches furthest east
+            i = bisect.bisect_right(self.BandStarts[Band], Box[1]) - 1
+            if (i >= 0) and (self.BandEnds[Band][i] >= Box[0]):
+                return True
+        return False
+
+
+class NameListMatcher:
+    """
+    Matches a name against a list of names, ignoring case.
+    
+    Required inputs: Names - list of names, exempli gratia from LakesParser.ReadNameFile
+    
+    Optional inputs: Substring=False
+    
+    By default a name matches if it is exactly one of Names (after casefold) which is
+    one set lookup. With Substring a name matches if any of Names occurs within it, as
+    LakeName does for a single name. Names are built into an Aho-Corasick automaton so 
+    each match is one pass over the characters of the name however many Names there are.
+    """
+    def __init__(self, Names, Substring=False):
+        self.Substring = Substring
+        self.NameSet = set(Name.casefold() for Name in Names)
+        if Substring:
+            # An empty pattern would match every name
+            self.BuildAutomaton([Name for Name in self.NameSet if Name])
+    
+    def BuildAutomaton(self, Patterns):
+        """
+        Builds the Aho-Corasick trie (Goto), failure links (Fail) and a flag per state 
+        (Terminal) that is True if any pattern ends there or at a state on its failure chain.
+        """
+        Goto = [{}]
+        Terminal = [False]
+        for Pattern in Patterns:
+            State = 0
+            for Character in Pattern:
+                NextState = Goto[State].get(Character)
+                if NextState is None:
+                    NextState = len(Goto)
+                    Goto[State][Character] = NextState
+                    Goto.append({})
+                    Terminal.append(False)
+                State = NextState
+            Terminal[State] = True
+        
+        # Breadth first so the failure link of a shorter prefix is always ready
+        Fail = [0] * len(Goto)
+        Queue = list(Goto[0].values())
+        for State in Queue:
+            for Character, NextState in Goto[State].items():
+                FailState = Fail[State]
+                while FailState and (Character not in Goto[FailState]):
+                    FailState = Fail[FailState]
+                Fail[NextState] = Goto[FailState].get(Character, 0)
+                Terminal[NextState] = Terminal[NextState] or Terminal[Fail[NextState]]
+                Queue.append(NextState)
+        
+        self.Goto = Goto
+        self.Fail = Fail
+        self.Terminal = Terminal
+    
+    def Matches(self, Name):
+        """
+        Returns True if Name matches the list.
+        """
+        Name = Name.casefold()
+        if not self.Substring:
+            return Name in self.NameSet
+        
+        Goto = self.Goto
+        Fail = self.Fail
+        Terminal = self.Terminal
+        State = 0
+        for Character in Name:
+            while State and (Character not in Goto[State]):
+                State = Fail[State]
+            State = Goto[State].get(Character, 0)
+            if Terminal[State]:
+                return True
+        return False
+
+
 class LakesParser:
     """
     Class wrapper for parsing HydroLAKES polygon data for GMT. 
@@ -169,16 +471,164 @@ class LakesParser:
                         SkipIslands=False,
                         RunLoud=False, 
                         RunSilent=False, 
+                        OutputForHistogram=False,
                         ReportFullStats=False,
-                        Overwrite=False
+                        Overwrite=False,
+                        UseIndex=False,
+                        BuildIndex=False,
+                        Processes=None,
+                        MemoryMap=False,
+                        Vectorized=False,
+                        NameFileSubstring=False,
+                        Simplify=None,
+                        SimplifyScaleDPI=None,
+                        BoundsOutline=False,
+                        ClipToBounds=False,
+                        PointsFile=None,
+                        JobFile=None,
+                        CacheDirectory=None,
+                        CacheSizeMB=None,
+                        NativeShapefile=False,
+                        StreamConversion=False,
+                        DecompressInBackground=False,
+                        BinaryOutput=None,
+                        Instrument=False,
+                        InstrumentationFile=None,
+                        Progress=False,
+                        ProgressCallback=None,
+                        MaskGridFile=None,
+                        RegionPolygonFile=None
                         
     Run <LakesParser object name>.ParseLAKES() after instantiating.
     
+    UseIndex reads lakes through a sidecar index, <GMT input>.lakeidx, and builds it 
+    if it is missing or stale. BuildIndex always rebuilds it first. See LakeIndex.py.
+    
+    Processes > 1 splits the input at lake boundaries and parses the parts in that many
+    worker processes. The output is the same as a serial run.
+    
+    MemoryMap scans the input as bytes with GMTScanner.py rather than line by line.
+    Only lake and island headers are decoded and skipped lakes are passed over without 
+    reading their lines. Lines of copied lakes are copied verbatim.
+    
+    Vectorized uses the index (as UseIndex) and NumPy. The header elements of interest 
+    are loaded into a structured array and all tests are run as one boolean mask.
+    
+    LakeNameFile and CountryNameFile have one name per line. Lakes match if their name 
+    or country is one of the names, ignoring case. With NameFileSubstring they match if 
+    any of the names is part of their name or country.
+    
+    IterLakes() is a generator of LakeRecords.Lake records for the lakes that pass the 
+    tests, an alternative to ParseLAKES() that writes nothing. OutputFile may be None 
+    when only IterLakes() is used.
+    
+    Simplify is a tolerance in degrees. Copied perimeters and islands are simplified 
+    with Douglas-Peucker (see GMTGeometry.SimplifyCoordinates), dropping vertices closer 
+    than the tolerance to the simplified outline. SimplifyScaleDPI, [Scale, DPI], sets the 
+    tolerance to one pixel of a 1:Scale map at DPI instead. Rings keep at least a triangle. 
+    FileStats gains CountVerticesBeforeSimplify and CountVerticesAfterSimplify. Simplifying 
+    implies MemoryMap unless the index is used.
+    
+    BoundsOutline tests SimpleBounds or BoundsFile against the bounding box of each lake 
+    perimeter rather than the pour point. Lakes partly inside the bounds are kept. The 
+    index saves the boxes so -UI and -VEC read no coordinates to test them.
+    ClipToBounds implies BoundsOutline and clips the copied perimeters and islands to 
+    SimpleBounds (see GMTGeometry.ClipToBox). Rings entirely outside are dropped and 
+    counted in FileStats as CountRingsClippedAway. A lake whose perimeter is clipped away 
+    is dropped with its islands and not counted as copied. Both imply MemoryMap unless 
+    the index is used.
+    
+    MaskGridFile is a raster mask, an ESRI ASCII grid (.asc), a NumPy archive (.npz) of 
+    Mask and Extent or xyz text. Lakes are copied if their pour point falls on a non zero 
+    cell. Finding the cell costs the same whatever the shape of the region, see MaskGrid.py. 
+    May be used with the bounds, a lake must pass both. With UseIndex only lakes within the 
+    extent of the grid are read.
+    
+    RegionPolygonFile is a GMT polygon, such as a province outline, and lakes are copied if 
+    their pour point is inside it. Rings inside others are holes. The edges are bucketed 
+    into a grid once so each test looks at a few edges however many vertices the outline 
+    has, see RegionPolygon.py. May be used with the bounds and MaskGridFile, a lake must 
+    pass all of them. With UseIndex only lakes within the extent of the polygon are read.
+    
+    PointsFile switches ParseLAKES() to a point lookup. PointsFile has one lon lat point 
+    per line. Each point is written to OutputFile as lon lat Hylak_id, with the Hylak_id of 
+    the lake it is in or 0 if it is in none. Points on an island are in no lake, with 
+    SkipIslands too as it only leaves islands out of written outlines. Only lakes 
+    passing the tests are used. The points are bucketed in a grid so each lake is tested 
+    only against the points in its bounding box, with a vectorized ray casting test (see 
+    GMTGeometry.PointsInRing). With UseIndex the boxes come from the index and only lakes 
+    with points in their box are read. Needs NumPy.
+    
+    ReportFullStats adds FieldStats to FileStats, a dictionary of the count, sum, min, 
+    max, mean, variance and quantiles of every numeric header element over the copied 
+    lakes. OutputForHistogram writes the same with a log binned histogram of each element 
+    to <OutputFile>.stats.json. Both are kept in one pass in bounded memory, see 
+    StreamingStats.py.
+    
+    JobFile runs many selections in one scan of the input. It is a JSON list of jobs, each 
+    a dictionary of the options above with its own OutputFile, for example
+        [{"OutputFile": "Sheet01.gmt", "SimpleBounds": [-10, 40, 30, 60], "AreaMin": 5},
+         {"OutputFile": "Sheet02.gmt", "ContinentName": "north", "ClipToBounds": true, ...}]
+    The options of this parser are the first job. Jobs take SkipIslands, Overwrite, 
+    NameFileSubstring and BinaryOutput from it unless they set them and may not set 
+    InputFile, JobFile, UseIndex, BuildIndex, Processes, MemoryMap, Vectorized, PointsFile, 
+    RunLoud, RunSilent, CacheDirectory, CacheSizeMB, NativeShapefile, StreamConversion, 
+    DecompressInBackground, Instrument, InstrumentationFile, Progress or ProgressCallback. 
+    Each lake header is decoded once and written to the output of every job it matches. 
+    After ParseLAKES() <LakesParser object name>.Jobs is the list of job LakesParsers, 
+    each with FileStats.
+    
+    Shapefile inputs are converted with ogr2ogr once and kept in a cache, see 
+    ConversionCache.py. Repeat runs on an unchanged shapefile skip the conversion. 
+    CacheDirectory defaults to $PARSESHEDS_CACHE_DIR or ~/.cache/ParseSHEDS. The least 
+    recently used conversions are deleted when the cache is over CacheSizeMB.
+    
+    NativeShapefile reads a shapefile input directly with ShapefileReader.py instead of 
+    converting it. Lakes are tested on their .dbf attributes and only the lakes copied 
+    have their .shp geometry read, with BoundsOutline testing the box stored with each 
+    shape. Parts are outer rings or islands by their winding, as in the shapefile spec: 
+    clockwise parts are outer rings and counter clockwise parts are islands of the outer 
+    ring before them. The first outer ring is written as the # @D perimeter and later 
+    outer rings as # @P segments of the same lake. Islands before any outer ring, or of 
+    an outer ring clipped away, are dropped. Coordinates are written at full precision so the output matches a converted 
+    run in content but not digit for digit. Not used with UseIndex, Vectorized, Processes, 
+    PointsFile, JobFile or IterLakes().
+    
+    StreamConversion runs ogr2ogr on a shapefile input writing to a pipe (/vsistdout/) 
+    rather than to a file and parses the GMT text as it arrives, so converting and parsing 
+    overlap and nothing is written to disk but OutputFile. The pipe is read in blocks of 
+    whole lakes, each parsed as with MemoryMap. Skips the conversion cache. Not used with 
+    UseIndex, Vectorized, Processes, PointsFile, JobFile, NativeShapefile or IterLakes().
+    
+    GMT inputs compressed with gzip, bzip2, xz or zstd, found by their magic bytes or 
+    extension (.gz, .bz2, .xz, .zst), are decompressed as they are read, in blocks of whole 
+    lakes parsed as with MemoryMap. DecompressInBackground decompresses in a separate thread 
+    so it overlaps with parsing. OutputFile is compressed when it has one of those 
+    extensions. See CompressedFiles.py. Compressed inputs are not used with UseIndex, 
+    Vectorized, Processes, PointsFile, JobFile or IterLakes().
+    
+    BinaryOutput, float32 or float64, writes OutputFile as a GMT native binary table of 
+    lon lat columns for gmt plot -bi2f or -bi2d, with a NaN record at each segment break. 
+    The lake headers and the other segment and comment lines go to the sidecar 
+    <OutputFile>.hdr. See GMTBinary.py. Not used with PointsFile.
+    
+    Instrument times the phases of ParseLAKES(), conversion, scanning, header decoding, 
+    filtering and writing, and counts the bytes read and written and the lakes each test 
+    rejected. The report is FileStats['Instrumentation']. InstrumentationFile implies 
+    Instrument and writes the report to a JSON file, or a Prometheus textfile if its name 
+    ends in .prom. Parsers without Instrument run no instrumentation code at all. See 
+    Instrumentation.py. Jobs of a JobFile are not instrumented on their own.
+    
+    Progress prints the percentage of the input read, MB/s, lakes per second and the time 
+    left to stderr a few times a second, or every few seconds when stderr is not a 
+    terminal. ProgressCallback implies Progress and is called with a dictionary of those 
+    instead, from a background thread. The input is followed from that thread so parsing 
+    is not slowed. See ProgressReporter.py.
+    
     Access <LakesParser object name>.FileStats for a dictionary of statistics 
     after running ParseLAKES().
     """
     # TODO update doc string above
-    # TODO Implement OutputForHistogram (Input is name atribute of interest - lake area etc)
     
     HYDROLAKES_NOTICE = "\n\nThe HydroLAKES license requires atribution. \nSee tecnincal documentation at https://www.hydrosheds.org/page/hydrolakes \n\n"
     
@@ -199,7 +649,39 @@ class LakesParser:
                         'RunSilent':[bool,None], 
                         'OutputForHistogram':[bool,None], 
                         'ReportFullStats':[bool,None],
-                        'Overwrite':[bool,None]}
+                        'Overwrite':[bool,None],
+                        'UseIndex':[bool,None],
+                        'BuildIndex':[bool,None],
+                        'Processes':[int,None],
+                        'MemoryMap':[bool,None],
+                        'Vectorized':[bool,None],
+                        'NameFileSubstring':[bool,None],
+                        'Simplify':[float,None],
+                        'SimplifyScaleDPI':[list,None],
+                        'BoundsOutline':[bool,None],
+                        'ClipToBounds':[bool,None],
+                        'PointsFile':[str,None],
+                        'JobFile':[str,None],
+                        'CacheDirectory':[str,None],
+                        'CacheSizeMB':[float,None],
+                        'NativeShapefile':[bool,None],
+                        'StreamConversion':[bool,None],
+                        'DecompressInBackground':[bool,None],
+                        'BinaryOutput':[str,None],
+                        'Instrument':[bool,None],
+                        'InstrumentationFile':[str,None],
+                        'Progress':[bool,None],
+                        'ProgressCallback':[collections.abc.Callable,None],
+                        'MaskGridFile':[str,'Pour_long'],
+                        'RegionPolygonFile':[str,'Pour_long']}
+    
+    # Inputs a job of a JobFile may not set. They apply to the scan, which all jobs share.
+    JOB_EXCLUDED_INPUTS = ['InputFile', 'JobFile', 'UseIndex', 'BuildIndex', 'Processes', 'MemoryMap', 
+                            'Vectorized', 'PointsFile', 'RunLoud', 'RunSilent', 'CacheDirectory', 'CacheSizeMB', 
+                            'NativeShapefile', 'StreamConversion', 'DecompressInBackground', 'Instrument', 
+                            'InstrumentationFile', 'Progress', 'ProgressCallback']
+    # Inputs a job takes from this parser unless it sets them
+    JOB_INHERITED_INPUTS = ['SkipIslands', 'Overwrite', 'NameFileSubstring', 'BinaryOutput']
     
     # TODO verify on reading file that this matches
     HEADER_ORDER = ['Hylak_id',
@@ -246,6 +728,16 @@ class LakesParser:
                     'double',
                     'double']
     
+    # ReportFullStats values. FileStats key, HEADER_ORDER index, min or max, over copied lakes only
+    FULL_STATS_FIELDS = [('SmallestAreaLake', HEADER_ORDER.index('Lake_area'), 'min', False),
+                        ('LargestAreaLake', HEADER_ORDER.index('Lake_area'), 'max', False),
+                        ('SmallestAreaLakeCopied', HEADER_ORDER.index('Lake_area'), 'min', True),
+                        ('LargestAreaLakeCopied', HEADER_ORDER.index('Lake_area'), 'max', True),
+                        ('DeepestLakeCopied', HEADER_ORDER.index('Depth_avg'), 'max', True),
+                        ('HighestLakeCopied', HEADER_ORDER.index('Elevation'), 'max', True),
+                        ('LargestWatershedToLakeCopied', HEADER_ORDER.index('Wshd_area'), 'max', True),
+                        ('LargestVolumeLakeCopied', HEADER_ORDER.index('Vol_total'), 'max', True)]
+    
     # These are keys: inputs to init and values: functions to call to test them
     NUMERIC_TESTER_DICT = {'AreaMin':'LakeMatchesAreaMin',
                         'AreaMax':'LakeMatchesAreaMax'}
@@ -257,6 +749,26 @@ class LakesParser:
                         'ContinentName':'LakeMatchesContinent'}
     
     SUPPORTED_INPUT_EXTENSIONS = ["shp", "gmt"]
+    
+    # Size of the byte range each worker parses with Processes > 1
+    CHUNK_BYTES = 64 * 1024 * 1024
+    # Size of the reads from the ogr2ogr pipe with StreamConversion
+    STREAM_BLOCK_BYTES = 16 * 1024 * 1024
+    
+    # How FileStats from chunks are merged. Anything not listed is a count and is added.
+    FILE_STATS_MIN_KEYS = ['SmallestAreaLake', 'SmallestAreaLakeCopied']
+    FILE_STATS_MAX_KEYS = ['MostIslandsInLake', 'LargestAreaLake', 'LargestAreaLakeCopied', 
+                            'DeepestLakeCopied', 'HighestLakeCopied', 'LargestWatershedToLakeCopied', 
+                            'LargestVolumeLakeCopied']
+    # FileStats values merged with their own Merge()
+    FILE_STATS_MERGE_KEYS = ['FieldStats', 'Instrumentation']
+    
+    # Methods InstrumentParsing replaces with timed wrappers on an Instrument parser
+    INSTRUMENTED_METHODS = ['ExtractLakeHeader', 'BoxMatchesBounds']
+    
+    # Numeric header elements kept in FieldStats with ReportFullStats or OutputForHistogram
+    FIELD_STATS_INDICES = [i for i, Type in enumerate(HEADER_TYPES) if Type in ('integer', 'double')]
+    FIELD_STATS_FIELDS = [Name for Name, Type in zip(HEADER_ORDER, HEADER_TYPES) if Type in ('integer', 'double')]
                         
     def __init__(self, InputFile,
                     OutputFile,
@@ -274,7 +786,31 @@ class LakesParser:
                     RunSilent=False, 
                     OutputForHistogram=False, 
                     ReportFullStats=False,
-                    Overwrite=False):
+                    Overwrite=False,
+                    UseIndex=False,
+                    BuildIndex=False,
+                    Processes=None,
+                    MemoryMap=False,
+                    Vectorized=False,
+                    NameFileSubstring=False,
+                    Simplify=None,
+                    SimplifyScaleDPI=None,
+                    BoundsOutline=False,
+                    ClipToBounds=False,
+                    PointsFile=None,
+                    JobFile=None,
+                    CacheDirectory=None,
+                    CacheSizeMB=None,
+                    NativeShapefile=False,
+                    StreamConversion=False,
+                    DecompressInBackground=False,
+                    BinaryOutput=None,
+                    Instrument=False,
+                    InstrumentationFile=None,
+                    Progress=False,
+                    ProgressCallback=None,
+                    MaskGridFile=None,
+                    RegionPolygonFile=None):
                     
         
         # Check input types
@@ -299,8 +835,12 @@ class LakesParser:
             #raise InitInputError('var', InputRec, ''.format())
             raise InitInputError('InputFile', InputFile, 'ERROR - No input file found - {}'.format(InputFile))
     
-        if (os.path.exists(OutputFile)) and (Overwrite is not True):
+        # OutputFile may be None when lakes are only read with IterLakes
+        if (OutputFile is not None) and (os.path.exists(OutputFile)) and (Overwrite is not True):
             raise InitInputError('OutputFile', OutputFile, 'Output file {}  - exists \nUse -o to overwrite '.format(OutputFile))
+        # The statistics written next to it, see FinishFieldStats
+        if (OutputFile is not None) and (OutputForHistogram is True) and (os.path.exists(OutputFile + '.stats.json')) and (Overwrite is not True):
+            raise InitInputError('OutputForHistogram', OutputFile + '.stats.json', 'Output file {}  - exists \nUse -o to overwrite '.format(OutputFile + '.stats.json'))
         
         if SkipIslands is True:
             if RunLoud:
@@ -308,6 +848,117 @@ class LakesParser:
         else:
             SkipIslands = False
         
+        # Building the index implies using it. So does Vectorized.
+        if Vectorized is True:
+            if np is None:
+                raise InitInputError('Vectorized', Vectorized, 'ERROR - Vectorized needs NumPy, which is not installed')
+            UseIndex = True
+        if BuildIndex is True:
+            UseIndex = True
+        if (UseIndex is True) and RunLoud:
+            print("Using lake index")
+        
+        if Processes is not None:
+            if Processes < 1:
+                raise InitInputError('Processes', Processes, 'ERROR - Processes should be 1 or more, received {}'.format(Processes))
+            if RunLoud:
+                print("Parsing with {} processes".format(Processes))
+        
+        # Simplification tolerance in degrees
+        SimplifyTolerance = None
+        if (Simplify is not None) and (SimplifyScaleDPI is not None):
+            raise InitInputError('Simplify SimplifyScaleDPI', [Simplify, SimplifyScaleDPI], 'ERROR - Use Simplify or SimplifyScaleDPI, not both')
+        if Simplify is not None:
+            if Simplify < 0.0:
+                raise InitInputError('Simplify', Simplify, 'ERROR - Simplify tolerance should be 0 or more, received {}'.format(Simplify))
+            SimplifyTolerance = Simplify
+        if SimplifyScaleDPI is not None:
+            if (len(SimplifyScaleDPI) != 2) or (min(SimplifyScaleDPI) <= 0):
+                raise InitInputError('SimplifyScaleDPI', SimplifyScaleDPI, 'ERROR - SimplifyScaleDPI should be [Scale, DPI], both above 0, received {}'.format(SimplifyScaleDPI))
+            SimplifyTolerance = GMTGeometry.ToleranceFromScale(SimplifyScaleDPI[0], SimplifyScaleDPI[1])
+        
+        if PointsFile is not None:
+            if not os.path.exists(PointsFile):
+                raise InitInputError('PointsFile', PointsFile, 'ERROR - No points file found - {}'.format(PointsFile))
+            if np is None:
+                raise InitInputError('PointsFile', PointsFile, 'ERROR - PointsFile needs NumPy, which is not installed')
+        
+        if (CacheSizeMB is not None) and (CacheSizeMB < 0.0):
+            raise InitInputError('CacheSizeMB', CacheSizeMB, 'ERROR - CacheSizeMB should be 0 or more, received {}'.format(CacheSizeMB))
+        
+        if NativeShapefile is True:
+            if InputFile[-3:] not in ('shp', 'SHP'):
+                raise InitInputError('NativeShapefile', InputFile, 'ERROR - NativeShapefile needs a .shp InputFile, received {}'.format(InputFile))
+            if (UseIndex is True) or (PointsFile is not None) or (JobFile is not None) or ((Processes is not None) and (Processes > 1)):
+                raise InitInputError('NativeShapefile', NativeShapefile, 'ERROR - NativeShapefile can not be used with UseIndex, Vectorized, Processes, PointsFile or JobFile')
+            if RunLoud:
+                print("Reading the shapefile directly")
+        
+        if StreamConversion is True:
+            if InputFile[-3:] not in ('shp', 'SHP'):
+                raise InitInputError('StreamConversion', InputFile, 'ERROR - StreamConversion needs a .shp InputFile, received {}'.format(InputFile))
+            if (UseIndex is True) or (PointsFile is not None) or (JobFile is not None) or (NativeShapefile is True) or ((Processes is not None) and (Processes > 1)):
+                raise InitInputError('StreamConversion', StreamConversion, 'ERROR - StreamConversion can not be used with UseIndex, Vectorized, Processes, PointsFile, JobFile or NativeShapefile')
+            if RunLoud:
+                print("Parsing ogr2ogr output as it is converted")
+        
+        if BinaryOutput is not None:
+            if BinaryOutput not in GMTBinary.PRECISIONS:
+                raise InitInputError('BinaryOutput', BinaryOutput, 'ERROR - BinaryOutput should be one of {}, received {}'.format(list(GMTBinary.PRECISIONS), BinaryOutput))
+            if PointsFile is not None:
+                raise InitInputError('BinaryOutput', BinaryOutput, 'ERROR - BinaryOutput can not be used with PointsFile')
+            if RunLoud:
+                print("Writing {} binary output, headers to {}".format(BinaryOutput, GMTBinary.SidecarFileName(str(OutputFile))))
+        
+        if InstrumentationFile is not None:
+            Instrument = True
+        # Made by InstrumentParsing when ParseLAKES runs
+        self.Instruments = None
+        
+        if ProgressCallback is not None:
+            Progress = True
+        # Made by StartProgress when ParseLAKES runs
+        self.Reporter = None
+        
+        # Compressed GMT inputs are read as a stream so nothing that seeks or maps the input works
+        self.InputCompression = CompressedFiles.DetectCompression(InputFile)
+        if self.InputCompression is not None:
+            if CompressedFiles.StripCompressionExtension(InputFile)[-3:] in ('shp', 'SHP'):
+                raise InitInputError('InputFile', InputFile, 'ERROR - Compressed shapefiles are not supported, decompress {} first'.format(InputFile))
+            # Vectorized has set UseIndex
+            for Input, Value, IsSet in (('Vectorized', Vectorized, Vectorized is True), ('UseIndex', UseIndex, UseIndex is True), 
+                                        ('Processes', Processes, (Processes is not None) and (Processes > 1)),
+                                        ('PointsFile', PointsFile, PointsFile is not None), ('JobFile', JobFile, JobFile is not None)):
+                if IsSet:
+                    raise InitInputError(Input, Value, 'ERROR - {} can not be used with compressed input {}. Compressed input is read as a stream and can not be indexed, split or memory mapped. Decompress it first'.format(Input, InputFile))
+            if RunLoud:
+                print("Input is {} compressed".format(self.InputCompression))
+        
+        if JobFile is not None:
+            if not os.path.exists(JobFile):
+                raise InitInputError('JobFile', JobFile, 'ERROR - No job file found - {}'.format(JobFile))
+            if (UseIndex is True) or (PointsFile is not None) or ((Processes is not None) and (Processes > 1)):
+                raise InitInputError('JobFile', JobFile, 'ERROR - JobFile can not be used with UseIndex, Vectorized, Processes or PointsFile')
+        
+        # Lake outline bounds and clipping
+        if ClipToBounds is True:
+            if SimpleBounds is None:
+                raise InitInputError('ClipToBounds', ClipToBounds, 'ERROR - ClipToBounds needs SimpleBounds (-B)')
+            BoundsOutline = True
+        if BoundsOutline is True:
+            if (SimpleBounds is None) and (BoundsFile is None):
+                raise InitInputError('BoundsOutline', BoundsOutline, 'ERROR - BoundsOutline needs SimpleBounds or BoundsFile')
+            if RunLoud:
+                print("Testing bounds against lake outlines")
+        
+        if (SimplifyTolerance is not None) or (BoundsOutline is True):
+            # Coordinate blocks are read as bytes so the line path is not used
+            if UseIndex is not True:
+                MemoryMap = True
+            if RunLoud:
+                print("Simplifying with tolerance {} degrees".format(SimplifyTolerance))
+        self.SimplifyTolerance = SimplifyTolerance
+        
         # Lake area min and max
         if (AreaMax is not None) and (RunLoud):
             print("Lake AreaMax set to ", AreaMax)
@@ -343,16 +994,43 @@ class LakesParser:
             else:
                 raise InitInputError('BoundsFile', BoundsFile, 'ERROR - No bounds file found - {}'.format(BoundsFile))
             
-            # Temp 
-            self.BoundsList = []
-            # TODO Move bounds file to list of lists
+            # Each line of the file is validated with BoundsDatelineCheck
+            self.BoundsList = self.ReadBoundsFile(BoundsFile, Verbose=RunLoud)
+            self.BoundsMatcher = BoundsListMatcher(self.BoundsList)
+            if RunLoud:
+                print("Read {} bounds from {}".format(len(self.BoundsList), BoundsFile))
             
             BoundsTesterToRun = 'LakeMatchesBoundsList'
             TestBounds = True
+        else:
+            self.BoundsList = []
         
         self.TestBounds = TestBounds
         
-        # TODO Validate bounds File using BoundsDatelineCheck
+        if MaskGridFile is not None:
+            if not os.path.exists(MaskGridFile):
+                raise InitInputError('MaskGridFile', MaskGridFile, 'ERROR - No mask grid file found - {}'.format(MaskGridFile))
+            try:
+                self.MaskGrid = MaskGrid.MaskGrid(MaskGridFile)
+            except MaskGrid.MaskGridError as err:
+                raise InitInputError('MaskGridFile', MaskGridFile, 'ERROR - {}'.format(err))
+            if RunLoud:
+                print("Read a {} x {} mask grid with {} cells on from {}".format(self.MaskGrid.Rows, self.MaskGrid.Columns, self.MaskGrid.CountOn, MaskGridFile))
+        else:
+            self.MaskGrid = None
+        
+        if RegionPolygonFile is not None:
+            if not os.path.exists(RegionPolygonFile):
+                raise InitInputError('RegionPolygonFile', RegionPolygonFile, 'ERROR - No region polygon file found - {}'.format(RegionPolygonFile))
+            try:
+                self.RegionPolygon = RegionPolygon.RegionPolygon(RegionPolygonFile)
+            except RegionPolygon.RegionPolygonError as err:
+                raise InitInputError('RegionPolygonFile', RegionPolygonFile, 'ERROR - {}'.format(err))
+            if RunLoud:
+                print("Read a region polygon of {} rings and {} vertices on a {} x {} grid from {}".format(self.RegionPolygon.RingCount, 
+                        self.RegionPolygon.VertexCount, self.RegionPolygon.Rows, self.RegionPolygon.Columns, RegionPolygonFile))
+        else:
+            self.RegionPolygon = None
         
         # TODO make certain all the ints are ints floats are floats and strings are strings
         #  Use allowed inputs const. Turn it into a dictionary with names as keys and types as values
@@ -390,8 +1068,8 @@ class LakesParser:
         StringTestersToRun = []
         # Save the inputs to self.<input>
         for Input in self.ALLOWED_INPUTS:
-            # For strings, convert to lowercase
-            if isinstance(eval(Input), str):
+            # For search strings, convert to lowercase. File names are left alone.
+            if isinstance(eval(Input), str) and (Input in self.STRING_TESTER_DICT) and ('File' not in Input):
                 exec('self.{} = {}.lower()'.format(Input,Input))
             else: # Not a string
                 exec('self.{} = {}'.format(Input,Input))
@@ -408,6 +1086,16 @@ class LakesParser:
         self.NumericTestersToRun = NumericTestersToRun
         self.StringTestersToRun = StringTestersToRun
         
+        # Name lists are loaded once here so each lake costs one lookup
+        if LakeNameFile is not None:
+            self.LakeNameMatcher = NameListMatcher(self.ReadNameFile('LakeNameFile', LakeNameFile), Substring=NameFileSubstring)
+            if RunLoud:
+                print("Read {} lake names from {}".format(len(self.LakeNameMatcher.NameSet), LakeNameFile))
+        if CountryNameFile is not None:
+            self.CountryNameMatcher = NameListMatcher(self.ReadNameFile('CountryNameFile', CountryNameFile), Substring=NameFileSubstring)
+            if RunLoud:
+                print("Read {} country names from {}".format(len(self.CountryNameMatcher.NameSet), CountryNameFile))
+        
         
         if RunLoud:
             print('Running these tests:')
@@ -435,8 +1123,11 @@ class LakesParser:
         #  in the contracted line list
         # Pour_long_SearchIndex is for Pour_long. Pour_lat will be at Pour_long_SearchIndex+1
         
+        # FieldStats need every numeric header element of the copied lakes
+        self.CollectFieldStats = ReportFullStats or OutputForHistogram
+        
         WorkingListOfNeededIndices = []
-        if not ReportFullStats:
+        if not self.CollectFieldStats:
             for InputName, NeededInfo in self.ALLOWED_INPUTS.items():
                 # If we received parameters and will thus need the header info to check against it
                 if eval(InputName) is not None and NeededInfo[1] is not None:
@@ -446,38 +1137,61 @@ class LakesParser:
                     # Special case - lat lon
                     if NeededInfo[1] in 'Pour_long':
                         WorkingListOfNeededIndices.append(i+1)
-        else: #ReportFullStats
+        else: #ReportFullStats or OutputForHistogram
             WorkingListOfNeededIndices = range(len(self.HEADER_ORDER))
 
-        if WorkingListOfNeededIndices:
-            self.HeaderElementsOfInterest = sorted(set(WorkingListOfNeededIndices))
-        else:
-            self.HeaderElementsOfInterest = []
+        # Sets the header subsets and _SearchIndex variables and compiles the tests
+        self.SetHeaderElementsOfInterest(WorkingListOfNeededIndices)
+        
+        # Each job of the job file is a LakesParser of its own sharing one scan
+        if JobFile is not None:
+            self.Jobs = [self] + self.ReadJobFile(JobFile)
+            # One header extraction serves every job so all use the union of their elements
+            AllElementsOfInterest = set()
+            for Job in self.Jobs:
+                AllElementsOfInterest.update(Job.HeaderElementsOfInterest)
+            for Job in self.Jobs:
+                Job.SetHeaderElementsOfInterest(AllElementsOfInterest)
+            if RunLoud:
+                print("Read {} jobs from {}".format(len(self.Jobs) - 1, JobFile))
         
         if RunLoud:
+            print("Lake predicate:")
+            print(self.LakePredicateSource)
+    
+    def SetHeaderElementsOfInterest(self, HeaderElementsOfInterest):
+        """
+        Sets the HEADER_ORDER indices of the header elements extracted from each lake header, 
+        the header subsets and the _SearchIndex variables into them, then rebuilds the 
+        lake predicate. Jobs of a JobFile are set to the union of their elements.
+        """
+        self.HeaderElementsOfInterest = sorted(set(HeaderElementsOfInterest))
+        
+        if self.RunLoud:
             print("These are the header elements of interest")
             print(self.HeaderElementsOfInterest)
-    
         
         self.HeaderListSubset = [self.HEADER_ORDER[i] for i in self.HeaderElementsOfInterest]
         self.HeaderTypeListSubset = [self.HEADER_TYPES[i] for i in self.HeaderElementsOfInterest]
         self.ElementsOfInterestCount = len(self.HeaderElementsOfInterest) 
         self.RangeElementsOfInterestCount = range(self.ElementsOfInterestCount) 
-        if RunLoud:
+        if self.RunLoud:
             print("These are the header list subsets and type subsets")
             print(self.HeaderListSubset)
             print(self.HeaderTypeListSubset)
         
         # Now build the _SearchIndex variables talked about above
         for InputName, NeededInfo in self.ALLOWED_INPUTS.items():
-            if eval(InputName) is not None and NeededInfo[1] is not None:
+            if getattr(self, InputName) is not None and NeededInfo[1] is not None:
                 
                 j = self.HeaderListSubset.index(NeededInfo[1])
                 
-                exec('self.{}_SearchIndex = {}'.format(NeededInfo[1],j))
-                if RunLoud:
+                setattr(self, '{}_SearchIndex'.format(NeededInfo[1]), j)
+                if self.RunLoud:
                     print('self.{}_SearchIndex = {}'.format(NeededInfo[1],j))
-                    print(eval('self.{}_SearchIndex '.format(NeededInfo[1])))
+        
+        # All tests compiled into one function, see BuildLakePredicate
+        self.BuildLakePredicate()
         
         
     # Functions to check the lake header against parameters
@@ -560,9 +1274,10 @@ class LakesParser:
                 
         #return True
     
-    # TODO Impliment
     def LakeMatchesBoundsList(self):
-        return True
+        # Pour_long_SearchIndex is for Pour_long. Pour_lat will be at Pour_long_SearchIndex+1
+        return self.BoundsMatcher.PointMatches(self.LakeAtributesList[self.Pour_long_SearchIndex], 
+                                                self.LakeAtributesList[self.Pour_long_SearchIndex+1])
     
     def LakeMatchesBounds(self):
         #self.BoundsTesterToRun
@@ -577,6 +1292,16 @@ class LakesParser:
             
         return True
     
+    def LakeMatchesMaskGrid(self):
+        # Pour_long_SearchIndex is for Pour_long. Pour_lat will be at Pour_long_SearchIndex+1
+        return self.MaskGrid.PointMatches(self.LakeAtributesList[self.Pour_long_SearchIndex], 
+                                            self.LakeAtributesList[self.Pour_long_SearchIndex+1])
+    
+    def LakeMatchesRegionPolygon(self):
+        # Pour_long_SearchIndex is for Pour_long. Pour_lat will be at Pour_long_SearchIndex+1
+        return self.RegionPolygon.PointMatches(self.LakeAtributesList[self.Pour_long_SearchIndex], 
+                                                self.LakeAtributesList[self.Pour_long_SearchIndex+1])
+    
     def LakeMatchesAreaMin(self):
         if self.LakeAtributesList[self.Lake_area_SearchIndex] >= self.AreaMin:
             return True
@@ -596,9 +1321,8 @@ class LakesParser:
         # Else
         return False
     
-    # TODO Impliment
     def LakeMatchesNameFile(self):
-        return True
+        return self.LakeNameMatcher.Matches(self.LakeAtributesList[self.Lake_name_SearchIndex])
         
     def LakeMatchesCountry(self):
         if self.CountryName in self.LakeAtributesList[self.Country_SearchIndex].lower():
@@ -606,9 +1330,8 @@ class LakesParser:
         # Else
         return False
     
-    # TODO Impliment
     def LakeMatchesCountryFile(self):
-        return True
+        return self.CountryNameMatcher.Matches(self.LakeAtributesList[self.Country_SearchIndex])
     
     def LakeMatchesContinent(self):
         if self.ContinentName in self.LakeAtributesList[self.Continent_SearchIndex].lower():
@@ -637,7 +1360,141 @@ class LakesParser:
                 # Must match all so we break out as soon as it fails
                 return False
         return True
+
+    def LakeMatchesAll(self):
+        """
+        Runs every test on self.LakeAtributesList. Returns True if the lake should be copied.
+        Uses the predicate built by BuildLakePredicate.
+        """
+        return self.LakePredicate(self.LakeAtributesList)
     
+    def LakeMatchesAllTesters(self):
+        """
+        LakeMatchesAll by running each LakeMatches* tester in turn. Same result as 
+        self.LakePredicate but slower. Kept as the reference for it.
+        """
+        # Run the tests Must match All
+        if self.TestBounds:
+            if not self.LakeMatchesBounds():
+                return False
+        if self.MaskGridFile is not None:
+            if not self.LakeMatchesMaskGrid():
+                return False
+        if self.RegionPolygonFile is not None:
+            if not self.LakeMatchesRegionPolygon():
+                return False
+        if self.RunNumericTesters:
+            if not self.LakeMatchesAllNumbers():
+                return False
+        if self.RunStringTesters:
+            if not self.LakeMatchesAllText():
+                return False
+        return True
+
+    def __getstate__(self):
+        """
+        The compiled predicate and testers cannot be pickled. Worker processes get the 
+        parser without them and rebuild them in __setstate__.
+        """
+        State = self.__dict__.copy()
+        State.pop('LakePredicate', None)
+        State.pop('LakeTesters', None)
+        # Timed wrappers of InstrumentParsing, workers make their own
+        for Name in self.INSTRUMENTED_METHODS:
+            State.pop(Name, None)
+        # Progress is followed in the parent process
+        State['Reporter'] = None
+        State['ProgressCallback'] = None
+        return State
+    
+    def __setstate__(self, State):
+        self.__dict__.update(State)
+        self.BuildLakePredicate()
+    
+    def BuildLakePredicate(self):
+        """
+        Builds self.LakePredicate, one function of the lake atributes list that returns 
+        True if the lake passes every active test. The source is written for the options 
+        that are set with the _SearchIndex values and limits bound as constants, then 
+        compiled once. Tests are ordered cheapest first: bounds and area comparisons, 
+        the mask grid cell and region polygon, then substring tests, then name list 
+        lookups. Per lake this is one call rather than a getattr and method call per 
+        tester.
+        
+        With Instrument each condition is also compiled on its own into self.LakeTesters, 
+        a list of (input name, function), to find which test rejected a lake.
+        """
+        # (Input name, condition source)
+        Conditions = []
+        # Values the compiled source refers to by name
+        Namespace = {}
+        
+        # With BoundsOutline the bounds are tested against the perimeter box, see BoxMatchesBounds
+        if self.TestBounds and not self.BoundsOutline:
+            Lon = 'Atributes[{}]'.format(self.Pour_long_SearchIndex)
+            Lat = 'Atributes[{}]'.format(self.Pour_long_SearchIndex + 1)
+            if self.SimpleBounds:
+                Namespace.update({'Wlimit':self.SimpleBounds[0], 'Elimit':self.SimpleBounds[1], 
+                                'Slimit':self.SimpleBounds[2], 'Nlimit':self.SimpleBounds[3]})
+                Conditions.append(('SimpleBounds', '(Slimit <= {} <= Nlimit)'.format(Lat)))
+                if not self.SimpleBounds[4]:
+                    Conditions.append(('SimpleBounds', '(Wlimit <= {0} <= Elimit)'.format(Lon)))
+                else:
+                    # split across International Dateline
+                    Conditions.append(('SimpleBounds', '((Wlimit <= {0} <= 180.0) or (-180.0 <= {0} <= Elimit))'.format(Lon)))
+            else:
+                Namespace['BoundsMatches'] = self.BoundsMatcher.PointMatches
+                Conditions.append(('BoundsFile', 'BoundsMatches({}, {})'.format(Lon, Lat)))
+        
+        if self.AreaMin is not None:
+            Namespace['AreaMin'] = self.AreaMin
+            Conditions.append(('AreaMin', '(Atributes[{}] >= AreaMin)'.format(self.Lake_area_SearchIndex)))
+        if self.AreaMax is not None:
+            Namespace['AreaMax'] = self.AreaMax
+            Conditions.append(('AreaMax', '(Atributes[{}] <= AreaMax)'.format(self.Lake_area_SearchIndex)))
+        
+        # One cell lookup however the masked region is shaped
+        if self.MaskGridFile is not None:
+            Namespace['MaskMatches'] = self.MaskGrid.PointMatches
+            Conditions.append(('MaskGridFile', 'MaskMatches(Atributes[{}], Atributes[{}])'.format(self.Pour_long_SearchIndex, self.Pour_long_SearchIndex + 1)))
+        
+        if self.RegionPolygonFile is not None:
+            Namespace['RegionMatches'] = self.RegionPolygon.PointMatches
+            Conditions.append(('RegionPolygonFile', 'RegionMatches(Atributes[{}], Atributes[{}])'.format(self.Pour_long_SearchIndex, self.Pour_long_SearchIndex + 1)))
+        
+        # Continent first, there are few continents so the test is short
+        if self.ContinentName is not None:
+            Namespace['ContinentName'] = self.ContinentName
+            Conditions.append(('ContinentName', '(ContinentName in Atributes[{}].lower())'.format(self.Continent_SearchIndex)))
+        if self.CountryName is not None:
+            Namespace['CountryName'] = self.CountryName
+            Conditions.append(('CountryName', '(CountryName in Atributes[{}].lower())'.format(self.Country_SearchIndex)))
+        if self.LakeName is not None:
+            Namespace['LakeName'] = self.LakeName
+            Conditions.append(('LakeName', '(LakeName in Atributes[{}].lower())'.format(self.Lake_name_SearchIndex)))
+        
+        if self.CountryNameFile is not None:
+            Namespace['CountryNameMatches'] = self.CountryNameMatcher.Matches
+            Conditions.append(('CountryNameFile', 'CountryNameMatches(Atributes[{}])'.format(self.Country_SearchIndex)))
+        if self.LakeNameFile is not None:
+            Namespace['LakeNameMatches'] = self.LakeNameMatcher.Matches
+            Conditions.append(('LakeNameFile', 'LakeNameMatches(Atributes[{}])'.format(self.Lake_name_SearchIndex)))
+        
+        if Conditions:
+            Source = 'def LakePredicate(Atributes):\n    return ' + ' and '.join(Condition for Name, Condition in Conditions) + '\n'
+        else:
+            Source = 'def LakePredicate(Atributes):\n    return True\n'
+        
+        exec(compile(Source, '<LakePredicate>', 'exec'), Namespace)
+        self.LakePredicate = Namespace['LakePredicate']
+        self.LakePredicateSource = Source
+        
+        self.LakeTesters = []
+        if self.Instrument:
+            for Name, Condition in Conditions:
+                exec(compile('def LakeTester(Atributes):\n    return {}\n'.format(Condition), '<LakeTester>', 'exec'), Namespace)
+                self.LakeTesters.append((Name, Namespace['LakeTester']))
+
     def ReturnTrue(self, *args):
         return True
     
@@ -659,7 +1516,8 @@ class LakesParser:
         Check to see if input file is type GMT and convert if it is not
         """
         # If .shp input, convert using ogr2ogr from GDAL. Exit with error if ogr2ogr is not accessable.
-        InputExtension = self.InputFile[-3:]
+        # lakes.gmt.gz is a gmt file
+        InputExtension = CompressedFiles.StripCompressionExtension(self.InputFile)[-3:]
         if self.RunLoud:
             print("InputFile extension is", InputExtension)
 
@@ -672,76 +1530,32 @@ class LakesParser:
             self.CheckExtension('shp')
             self.CheckExtension('shx')
             self.CheckExtension('dbf')
+            
+            if self.NativeShapefile:
+                # Read by ParseLakeShapefile, nothing to convert
+                self.InFileGMTtxt = None
+                return
+            
             self.CheckExtension('prj')
             
-            IntermediateFileName = self.InputFile[:-4] + '_TempConv.gmt'
-            self.InFileGMTtxt = IntermediateFileName
-            if self.RunLoud:
-                print("Will create temporary intermediate file\n  {}".format(IntermediateFileName))
-    
-    
-            # Call ogr2ogr GDAL
-            if self.RunLoud:
-                CommandString = 'ogr2ogr -f "GMT" ' + IntermediateFileName + ' ' + self.InputFile + ' --debug ON'
-            elif not self.RunSilent:
-                CommandString = 'ogr2ogr -f "GMT" ' + IntermediateFileName + ' ' + self.InputFile 
+            if self.StreamConversion:
+                # Converted while it is parsed by ParseLAKESStreamed
+                self.InFileGMTtxt = None
+                return
+            
+            # Converted once into the cache, later runs reuse the conversion
+            if self.CacheSizeMB is not None:
+                CacheMaxBytes = int(self.CacheSizeMB * 1024 ** 2)
             else:
-                CommandString = 'ogr2ogr -f "GMT" ' + IntermediateFileName + ' ' + self.InputFile + ' --debug OFF >/dev/null 2>&1'
-    
+                CacheMaxBytes = None
+            Cache = ConversionCache.ConversionCache(self.CacheDirectory, CacheMaxBytes, RunLoud=self.RunLoud)
             try:
-                if self.RunLoud:
-                    print("Running: ", CommandString, "\n")
-                    
-                #ExitStatus = os.system(CommandString)
-                #ProcessInfo = subprocess.run(CommandString, check=True) # Run opens a new shell. Does not work if we get gdal from GMT
-                #ExitStatus = subprocess.call(CommandString, shell=True)
-                ProcessInfo = subprocess.run(CommandString, check=True, shell=True, text=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-                ExitStatus = ProcessInfo.returncode
-                if self.RunLoud:
-                    print('ProcessInfo.stdout')
-                    print(ProcessInfo.stdout)
-                    print('ProcessInfo.stderr')
-                    print(ProcessInfo.stderr)
-                    print('ProcessInfo')
-                    print(ProcessInfo)
-
-            except subprocess.CalledProcessError as err:
-                print(" Error unable to run ",CommandString)
-                print("CalledProcessError")
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                if RunLoud:
-                    print(err.output)
-                    print(err.stdout)
-                    print(err.stderr)
-                    print(err)
-                # Special case - cannot find ogr2ogr
-                if "ogr2ogr: command not found" in err.stderr:
-                    print("\n*\n*\n*\n ogr2ogr was not found\n  It may not be installed. \n  If you use GMT to access it,\n  start GMT and run ParseSHEDSLake from the same shell.\n*\n\n\n")
-                    raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR ogr2ogr: command not found - try running it alone from the command line to see if you can reach it.")
-                
-                if self.RunLoud:
-                    traceback.print_tb(exc_traceback)
-                raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR running {} received CalledProcessError".format(CommandString))
-            except FileNotFoundError as err:
-                print(" Error unable to run ",CommandString)
-                print("FileNotFoundError")
-                print(err)
+                self.InFileGMTtxt = Cache.Convert(self.InputFile, self.RunOgr2ogr)
+            except OSError as err:
                 exc_type, exc_value, exc_traceback = sys.exc_info()
-                if self.RunLoud:
-                    traceback.print_tb(exc_traceback)
-                raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR running {} received FileNotFoundError".format(CommandString))
-
-            
-
-
+                raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR using conversion cache {}: {}".format(Cache.CacheDirectory, err))
             if self.RunLoud:
-                print("ogr2ogr exit status: ",ExitStatus)
-                print("\n")
-            if ExitStatus != 0:
-                print("ogr2ogr appears to have failed.\nIt may be that you need to open GMT to access GDAL ogr2ogr. \nExiting")
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                raise ProcessingError(exc_traceback.tb_lineno, '', "ERROR non zero exit {} running {}".format(ExitStatus,CommandString))
-    
+                print("Reading converted file\n  {}".format(self.InFileGMTtxt))
         
         #elif (InputExtension == "gmt") or (InputExtension == "GMT"):
         elif InputExtension in ('gmt', 'GMT'):
@@ -755,43 +1569,330 @@ class LakesParser:
             raise InitInputError('InputFile', self.InputFile, 'InputFile extension not supported {}. Supported types {}'.format(InputExtension, self.SUPPORTED_INPUT_EXTENSIONS))
         
         
+    def RunOgr2ogr(self, IntermediateFileName):
+        """
+        Converts the shapefile InputFile to the GMT file IntermediateFileName with ogr2ogr 
+        from GDAL. Raises ProcessingError if ogr2ogr cannot be run or fails.
+        """
+        if self.RunLoud:
+            print("Will create intermediate file\n  {}".format(IntermediateFileName))
+        
+        # Call ogr2ogr GDAL
+        if self.RunLoud:
+            CommandString = 'ogr2ogr -f "GMT" ' + shlex.quote(IntermediateFileName) + ' ' + shlex.quote(self.InputFile) + ' --debug ON'
+        elif not self.RunSilent:
+            CommandString = 'ogr2ogr -f "GMT" ' + shlex.quote(IntermediateFileName) + ' ' + shlex.quote(self.InputFile) 
+        else:
+            CommandString = 'ogr2ogr -f "GMT" ' + shlex.quote(IntermediateFileName) + ' ' + shlex.quote(self.InputFile) + ' --debug OFF >/dev/null 2>&1'
+
+        try:
+            if self.RunLoud:
+                print("Running: ", CommandString, "\n")
+                
+            #ExitStatus = os.system(CommandString)
+            #ProcessInfo = subprocess.run(CommandString, check=True) # Run opens a new shell. Does not work if we get gdal from GMT
+            #ExitStatus = subprocess.call(CommandString, shell=True)
+            ProcessInfo = subprocess.run(CommandString, check=True, shell=True, text=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+            ExitStatus = ProcessInfo.returncode
+            if self.RunLoud:
+                print('ProcessInfo.stdout')
+                print(ProcessInfo.stdout)
+                print('ProcessInfo.stderr')
+                print(ProcessInfo.stderr)
+                print('ProcessInfo')
+                print(ProcessInfo)
+
+        except subprocess.CalledProcessError as err:
+            print(" Error unable to run ",CommandString)
+            print("CalledProcessError")
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            if self.RunLoud:
+                print(err.output)
+                print(err.stdout)
+                print(err.stderr)
+                print(err)
+            # Special case - cannot find ogr2ogr
+            if "ogr2ogr: command not found" in err.stderr:
+                print("\n*\n*\n*\n ogr2ogr was not found\n  It may not be installed. \n  If you use GMT to access it,\n  start GMT and run ParseSHEDSLake from the same shell.\n*\n\n\n")
+                raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR ogr2ogr: command not found - try running it alone from the command line to see if you can reach it.")
+            
+            if self.RunLoud:
+                traceback.print_tb(exc_traceback)
+            raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR running {} received CalledProcessError".format(CommandString))
+        except FileNotFoundError as err:
+            print(" Error unable to run ",CommandString)
+            print("FileNotFoundError")
+            print(err)
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            if self.RunLoud:
+                traceback.print_tb(exc_traceback)
+            raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR running {} received FileNotFoundError".format(CommandString))
+
+        
+
+
+        if self.RunLoud:
+            print("ogr2ogr exit status: ",ExitStatus)
+            print("\n")
+        if ExitStatus != 0:
+            print("ogr2ogr appears to have failed.\nIt may be that you need to open GMT to access GDAL ogr2ogr. \nExiting")
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            raise ProcessingError(exc_traceback.tb_lineno, '', "ERROR non zero exit {} running {}".format(ExitStatus,CommandString))
+
+    def ParseLAKESStreamed(self):
+        """
+        ParseLAKES for StreamConversion. Runs ogr2ogr writing GMT text to its stdout and 
+        parses the pipe with ParseLakeStream while ogr2ogr is still converting. 
+        Raises ProcessingError if ogr2ogr cannot be run or fails, as RunOgr2ogr does.
+        """
+        CommandString = 'ogr2ogr -f "GMT" /vsistdout/ ' + shlex.quote(self.InputFile)
+        if self.RunLoud:
+            CommandString += ' --debug ON'
+            print("Running: ", CommandString, "\n")
+        
+        # stderr goes to a file so ogr2ogr can not stall on a full stderr pipe
+        with tempfile.TemporaryFile() as ErrFile:
+            try:
+                Process = subprocess.Popen(CommandString, shell=True, stdout=subprocess.PIPE, stderr=ErrFile)
+            except OSError as err:
+                print(" Error unable to run ",CommandString)
+                print(err)
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                if self.RunLoud:
+                    traceback.print_tb(exc_traceback)
+                raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR running {} received {}".format(CommandString, type(err).__name__))
+            
+            try:
+                with Process.stdout, self.OpenOutputFile('wb') as OutFile:
+                    self.FileStats = self.ParseLakeStream(Process.stdout, OutFile)
+            except BaseException:
+                # ogr2ogr would block on the pipe no one is reading
+                Process.kill()
+                Process.wait()
+                raise
+            ExitStatus = Process.wait()
+            
+            ErrFile.seek(0)
+            StdErr = ErrFile.read().decode(errors='replace')
+        
+        if self.RunLoud:
+            print("ogr2ogr stderr")
+            print(StdErr)
+            print("ogr2ogr exit status: ",ExitStatus)
+            print("\n")
+        if ExitStatus != 0:
+            print(" Error unable to run ",CommandString)
+            # Special case - cannot find ogr2ogr. The shell exits 127.
+            if (ExitStatus == 127) or ("ogr2ogr: command not found" in StdErr):
+                print("\n*\n*\n*\n ogr2ogr was not found\n  It may not be installed. \n  If you use GMT to access it,\n  start GMT and run ParseSHEDSLake from the same shell.\n*\n\n\n")
+                raise ProcessingError(None, StdErr, "ERROR ogr2ogr: command not found - try running it alone from the command line to see if you can reach it.")
+            print("ogr2ogr appears to have failed.\nIt may be that you need to open GMT to access GDAL ogr2ogr. \nExiting")
+            raise ProcessingError(None, StdErr, "ERROR non zero exit {} running {}".format(ExitStatus, CommandString))
+    
+    def ParseLakeStream(self, Stream, OutFile):
+        """
+        Parses Stream, a binary file that can not be memory mapped such as a pipe or a 
+        compressed file, in blocks of whole lakes (see ReadLakeBlocks) with ParseLakeBytes.
+        Writes to OutFile, opened 'wb', and returns the merged FileStats of the blocks.
+        """
+        if self.Reporter is not None:
+            self.Reporter.WatchFile(Stream)
+        StatsList = []
+        for Block in self.ReadLakeBlocks(Stream, self.STREAM_BLOCK_BYTES):
+            StatsList.append(self.ParseLakeBytes(Block, 0, len(Block), OutFile))
+        if not StatsList:
+            # Empty input
+            StatsList.append(self.ParseLakeBytes(b'', 0, 0, OutFile))
+        return self.MergeFileStats(StatsList)
+    
+    @staticmethod
+    def ReadLakeBlocks(Stream, BlockBytes):
+        """
+        Generator of bytes blocks of GMT text read from Stream, an unseekable binary file 
+        such as a pipe. Each block is about BlockBytes or more and ends just before a lake, 
+        a > line followed by a # @D line, so no lake is split between blocks. The first 
+        block has the file header. The last block is whatever is left at EOF.
+        """
+        Pending = b''
+        while True:
+            Read = Stream.read(BlockBytes)
+            if not Read:
+                break
+            Pending += Read
+            
+            # Start of the > line before the last # @D line, unless the lake is all there is
+            HeaderPosition = Pending.rfind(b'\n# @D')
+            if HeaderPosition == -1:
+                continue
+            LakeStart = Pending.rfind(b'\n', 0, HeaderPosition) + 1
+            if (LakeStart == 0) or (Pending[LakeStart:LakeStart + 1] != b'>'):
+                continue
+            yield Pending[:LakeStart]
+            Pending = Pending[LakeStart:]
+        
+        if Pending:
+            yield Pending
+    
+    def OpenOutputFile(self, Mode):
+        """
+        Opens OutputFile with Mode for the GMT text of the lakes. A GMTBinary.BinaryWriter 
+        with BinaryOutput, otherwise compressed as its extension says, see CompressedFiles.py.
+        Raises InitInputError if the BinaryOutput header sidecar exists, unless Overwrite. 
+        OutputFile itself is checked in __init__.
+        """
+        if self.BinaryOutput is not None:
+            SidecarFileName = GMTBinary.SidecarFileName(self.OutputFile)
+            if os.path.exists(SidecarFileName) and not self.Overwrite:
+                raise InitInputError('BinaryOutput', SidecarFileName, 'Output file {}  - exists \nUse -o to overwrite '.format(SidecarFileName))
+            OutFile = GMTBinary.BinaryWriter(self.OutputFile, self.BinaryOutput)
+        else:
+            OutFile = CompressedFiles.Open(self.OutputFile, Mode)
+        if self.Instruments is not None:
+            return self.Instruments.CountingWriter(OutFile)
+        return OutFile
+    
+    def TimedPhase(self, Phase):
+        """
+        Context manager timing Phase with Instrument. Does nothing without Instrument or 
+        for Phase None.
+        """
+        if (self.Instruments is None) or (Phase is None):
+            return contextlib.nullcontext()
+        return self.Instruments.Phase(Phase)
+    
+    def InstrumentParsing(self):
+        """
+        Starts self.Instruments, see Instrumentation.py, and replaces ExtractLakeHeader, 
+        LakePredicate and BoxMatchesBounds of this object with timed wrappers. The class 
+        is untouched so other parsers are not slowed.
+        """
+        self.Instruments = Instrumentation.Instruments('lakes')
+        # A fresh predicate and testers, not the wrappers of an earlier run
+        self.BuildLakePredicate()
+        self.ExtractLakeHeader = self.Instruments.Timed('HeaderDecoding', functools.partial(LakesParser.ExtractLakeHeader, self), 
+                                                        Counter='HeadersDecoded')
+        self.LakePredicate = self.Instruments.TimedPredicate(self.LakePredicate, self.LakeTesters)
+        self.BoxMatchesBounds = self.Instruments.TimedTest(functools.partial(LakesParser.BoxMatchesBounds, self), 'BoundsOutline')
+    
+    def FinishInstrumentation(self):
+        """
+        Adds the Instrument report to FileStats and writes InstrumentationFile.
+        """
+        self.Instruments.Stop()
+        self.FileStats['Instrumentation'] = self.Instruments.Report()
+        if self.InstrumentationFile is not None:
+            self.Instruments.WriteFile(self.InstrumentationFile, self.InputFile)
+    
+    def StartProgress(self):
+        """
+        Starts self.Reporter, see ProgressReporter.py, counting lakes as ExtractLakeHeader 
+        decodes them. The count goes around any Instrument wrapper of this run.
+        """
+        self.Reporter = ProgressReporter.ProgressReporter('lakes', Callback=self.ProgressCallback)
+        if self.Instruments is None:
+            self.ExtractLakeHeader = self.Reporter.Counted(functools.partial(LakesParser.ExtractLakeHeader, self))
+        else:
+            self.ExtractLakeHeader = self.Reporter.Counted(self.ExtractLakeHeader)
+        self.Reporter.Start()
+    
     # Main Loop Function
     def ParseLAKES(self):
     
-        self.CheckAndConvertInFile()
-    
-        # Open the files
-        # Copy the top header
-        # loop over each line
-            # find headers
-            # check for matches and copy
-        # Close the file
+        if self.OutputFile is None:
+            raise InitInputError('OutputFile', self.OutputFile, 'ERROR - No output file given. Use IterLakes() to read lakes without one.')
         
-        # Move down the input file line by Line
-        InFile = open(self.InFileGMTtxt, 'r')
-        OutFile = open(self.OutputFile, 'w')
+        if self.Instrument:
+            self.InstrumentParsing()
         
-        CountLines = 0
-        CountLakes = 0
-        CountTotalIslands = 0
-        CountIslandsThisLake = 0
-        MostIslandsInLake = 0
-        CountLakesCopied = 0
-        CountTotalIslandsCopied = 0
+        if self.Progress:
+            self.StartProgress()
         
-        if self.ReportFullStats:
-            SmallestAreaLake = 24709000
-            LargestAreaLake = 0
-            SmallestAreaLakeCopied = 24709000
-            LargestAreaLakeCopied = 0
-            DeepestLakeCopied = 0
-            HighestLakeCopied = 0
-            LargestWatershedToLakeCopied = 0
-            LargestVolumeLakeCopied = 0
-            
+        try:
+            with self.TimedPhase('Conversion'):
+                self.CheckAndConvertInFile()
         
-        HeaderFound = False
-        LakeHeaderFound = False
+            if self.PointsFile is not None:
+                with self.TimedPhase('Parsing'):
+                    self.LocatePoints()
+        
+            elif self.JobFile is not None:
+                with self.TimedPhase('Parsing'):
+                    self.ParseLAKESBatch()
+        
+            # Open the files
+            # Copy the top header
+            # loop over each line
+                # find headers
+                # check for matches and copy
+            # Close the file
+
+            else:
+                ParseInParallel = (not self.UseIndex) and (self.Processes is not None) and (self.Processes > 1)
+                # Workers time their own parsing, see ParseLakeChunk
+                with self.TimedPhase(None if ParseInParallel else 'Parsing'):
+                    if self.UseIndex:
+                        self.ParseLAKESIndexed()
+
+                    elif ParseInParallel:
+                        self.ParseLAKESParallel()
+                
+                    elif self.StreamConversion:
+                        self.ParseLAKESStreamed()
+                
+                    elif self.InputCompression is not None:
+                        with CompressedFiles.Open(self.InFileGMTtxt, 'rb', Background=self.DecompressInBackground) as InFile, self.OpenOutputFile('wb') as OutFile:
+                            self.FileStats = self.ParseLakeStream(InFile, OutFile)
+                
+                    elif self.NativeShapefile:
+                        try:
+                            with ShapefileReader.ShapefileReader(self.InputFile) as Reader, self.OpenOutputFile('wb') as OutFile:
+                                self.FileStats = self.ParseLakeShapefile(Reader, OutFile)
+                        except ShapefileReader.ShapefileError as err:
+                            exc_type, exc_value, exc_traceback = sys.exc_info()
+                            raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR reading shapefile {}".format(err))
+
+                    elif self.MemoryMap:
+                        with GMTScanner.MemoryMappedFile(self.InFileGMTtxt) as Data, self.OpenOutputFile('wb') as OutFile:
+                            self.FileStats = self.ParseLakeBytes(Data, 0, len(Data), OutFile)
+                
+                    else:
+                        # Move down the input file line by Line
+                        with open(self.InFileGMTtxt, 'r') as InFile, self.OpenOutputFile('w') as OutFile:
+                            self.FileStats = self.ParseLakeLines(InFile, OutFile)
+            
+                self.FinishFieldStats()
+        
+            if self.Instruments is not None:
+                self.FinishInstrumentation()
+        finally:
+            if self.Reporter is not None:
+                self.Reporter.Stop()
+    
+    def ParseLakeLines(self, InFile, OutFile):
+        """
+        The main loop. Reads lines from InFile, copies the lakes that match to OutFile
+        and returns a FileStats dictionary. InFile may be an open file or any iterable 
+        of lines, such as one chunk of the input in ParseLAKESParallel.
+        """
+        CountLines = 0
+        CountLakes = 0
+        CountTotalIslands = 0
+        CountIslandsThisLake = 0
+        MostIslandsInLake = 0
+        CountLakesCopied = 0
+        CountTotalIslandsCopied = 0
+        
+        if self.ReportFullStats:
+            FullStats = self.StartFullStats()
+        if self.CollectFieldStats:
+            FieldStats = self.StartFieldStats()
+        if self.Reporter is not None:
+            self.Reporter.WatchFile(InFile)
+        if self.Instruments is not None:
+            InFile = self.Instruments.CountingReader(InFile)
+        
+        HeaderFound = False
+        LakeHeaderFound = False
         IslandHeaderFound = False
         SkipThisLake = False
         SkipUntilHeader = False
@@ -799,6 +1900,7 @@ class LakesParser:
         SkipIslandsInThisLake = self.SkipIslands
         
         SavedCommentLine = ''
+        LakePredicate = self.LakePredicate
         
         for line in InFile:
             CountLines += 1
@@ -831,29 +1933,12 @@ class LakesParser:
                     CountIslandsThisLake = 0
                     
                     if self.ReportFullStats:
-                        if self.LakeAtributesList[7] < SmallestAreaLake:
-                            SmallestAreaLake = self.LakeAtributesList[7]
-                        if self.LakeAtributesList[7] > LargestAreaLake:
-                            LargestAreaLake = self.LakeAtributesList[7]
+                        self.UpdateFullStats(FullStats, False)
                     
                     
                     # Run the tests Must match All
-                    SkipThisLake = False
-                    
-                    if self.TestBounds:
-                        if not self.LakeMatchesBounds():
-                            SkipThisLake = True
-                
-                    # and not SkipThisLake because if it is already set, no need for further tests
-                    if self.RunNumericTesters and not SkipThisLake:
-                        if not self.LakeMatchesAllNumbers():
-                            SkipThisLake = True
-
-                    if self.RunStringTesters and not SkipThisLake:
-                        if not self.LakeMatchesAllText():
-                            SkipThisLake = True
-                    
-                    
+                    SkipThisLake = not LakePredicate(self.LakeAtributesList)
+
                     if not SkipThisLake:
                         SkipUntilHeader = False
                         OutFile.write(">\n")
@@ -861,18 +1946,9 @@ class LakesParser:
                         CountLakesCopied += 1
                         
                         if self.ReportFullStats:
-                            if self.LakeAtributesList[7] < SmallestAreaLakeCopied:
-                                SmallestAreaLakeCopied = self.LakeAtributesList[7]
-                            if self.LakeAtributesList[7] > LargestAreaLakeCopied:
-                                LargestAreaLakeCopied = self.LakeAtributesList[7]
-                            if self.LakeAtributesList[13] > DeepestLakeCopied:
-                                DeepestLakeCopied = self.LakeAtributesList[13]
-                            if self.LakeAtributesList[16] > HighestLakeCopied:
-                                HighestLakeCopied = self.LakeAtributesList[16]
-                            if self.LakeAtributesList[17] > LargestWatershedToLakeCopied:
-                                LargestWatershedToLakeCopied = self.LakeAtributesList[17]
-                            if self.LakeAtributesList[10] > LargestVolumeLakeCopied:
-                                LargestVolumeLakeCopied = self.LakeAtributesList[10]
+                            self.UpdateFullStats(FullStats, True)
+                        if self.CollectFieldStats:
+                            self.UpdateFieldStats(FieldStats)
                             
                     else:
                         SkipUntilHeader = True
@@ -1002,35 +2078,1301 @@ class LakesParser:
 
             
             
-        # Close input and output files at EOF
-        InFile.close()
-        OutFile.close()
+        # Islands of the last lake
+        if CountIslandsThisLake > MostIslandsInLake:
+            MostIslandsInLake = CountIslandsThisLake
+        
+        FileStats = {'CountLakes':CountLakes,
+                    'CountTotalIslands':CountTotalIslands,
+                    'MostIslandsInLake':MostIslandsInLake,
+                    'CountLines':CountLines,
+                    'CountLakesCopied':CountLakesCopied,
+                    'CountTotalIslandsCopied':CountTotalIslandsCopied}
+        if self.ReportFullStats:
+            FileStats.update(FullStats)
+        if self.CollectFieldStats:
+            FileStats['FieldStats'] = FieldStats
+        return FileStats
+    
+    def ParseLakeBytes(self, Data, Start, End, OutFile):
+        """
+        The bytes version of ParseLakeLines for MemoryMap. Scans bytes Start to End of Data 
+        (an mmap or bytes) with GMTScanner.SegmentScanner and writes matching lakes to OutFile,
+        opened 'wb'. Only the # @D and # @H lines are decoded. Segments are copied as one 
+        slice so lines are copied verbatim rather than checked one by one. Returns FileStats.
+        """
+        Scanner = GMTScanner.SegmentScanner(Data, Start, End)
+        DataView = memoryview(Data)
+        if self.Reporter is not None:
+            self.Reporter.WatchScanner(Scanner)
+        if self.Instruments is not None:
+            self.Instruments.Count('BytesRead', End - Start)
+        
+        CountLakes = 0
+        CountTotalIslands = 0
+        CountIslandsThisLake = 0
+        MostIslandsInLake = 0
+        CountLakesCopied = 0
+        CountTotalIslandsCopied = 0
+        
+        if self.ReportFullStats:
+            FullStats = self.StartFullStats()
+        if self.CollectFieldStats:
+            FieldStats = self.StartFieldStats()
+        
+        CopyThisLake = False
+        LakePredicate = self.LakePredicate
+        
+        # Coordinates are rewritten when simplifying or clipping
+        RewriteGeometry = (self.SimplifyTolerance is not None) or self.ClipToBounds
+        # Vertices before and after simplifying, rings clipped away
+        GeometryCounts = [0, 0, 0]
+        
+        # File header
+        OutFile.write(DataView[Start:Scanner.FileHeaderEnd()])
+        
+        for SegmentStart, CommentStart, CommentEnd, SegmentEnd in Scanner.Segments():
+            if Data[CommentStart:CommentStart + 4] == b'# @D':
+                # Its a new Lake
+                CountLakes += 1
+                self.ExtractLakeHeader(Data[CommentStart:CommentEnd].decode())
+                
+                if CountIslandsThisLake > MostIslandsInLake:
+                    MostIslandsInLake = CountIslandsThisLake
+                CountIslandsThisLake = 0
+                
+                if self.ReportFullStats:
+                    self.UpdateFullStats(FullStats, False)
+                
+                CopyThisLake = LakePredicate(self.LakeAtributesList)
+                if CopyThisLake and self.BoundsOutline:
+                    CopyThisLake = self.BoxMatchesBounds(GMTGeometry.CoordinateBounds(
+                                        GMTGeometry.ParseCoordinates(Data[CommentEnd:SegmentEnd])))
+                if CopyThisLake:
+                    if RewriteGeometry:
+                        # A lake clipped away is not copied, nor are its islands
+                        CopyThisLake, IslandsWritten = self.WriteGeometryText(OutFile, b">\n" + Data[CommentStart:SegmentEnd], GeometryCounts)
+                    else:
+                        OutFile.write(b">\n")
+                        OutFile.write(DataView[CommentStart:SegmentEnd])
+                if CopyThisLake:
+                    CountLakesCopied += 1
+                    if self.ReportFullStats:
+                        self.UpdateFullStats(FullStats, True)
+                    if self.CollectFieldStats:
+                        self.UpdateFieldStats(FieldStats)
+            
+            elif Data[CommentStart:CommentStart + 4] == b'# @H':
+                # Its an island
+                CountTotalIslands += 1
+                CountIslandsThisLake += 1
+                if CopyThisLake and not self.SkipIslands:
+                    if RewriteGeometry:
+                        LakeWritten, IslandsWritten = self.WriteGeometryText(OutFile, b">\n" + Data[CommentStart:SegmentEnd], GeometryCounts)
+                        CountTotalIslandsCopied += IslandsWritten
+                    else:
+                        OutFile.write(b">\n")
+                        OutFile.write(DataView[CommentStart:SegmentEnd])
+                        CountTotalIslandsCopied += 1
+            
+            else:
+                print("Warning odd header after > {}. Continuing.".format(Data[CommentStart:CommentEnd]))
+        
+        # Islands of the last lake
+        if CountIslandsThisLake > MostIslandsInLake:
+            MostIslandsInLake = CountIslandsThisLake
+        
+        DataView.release()
+        
+        FileStats = {'CountLakes':CountLakes,
+                    'CountTotalIslands':CountTotalIslands,
+                    'MostIslandsInLake':MostIslandsInLake,
+                    'CountLines':Scanner.CountLines(),
+                    'CountLakesCopied':CountLakesCopied,
+                    'CountTotalIslandsCopied':CountTotalIslandsCopied}
+        FileStats.update(self.GeometryFileStats(GeometryCounts))
+        if self.ReportFullStats:
+            FileStats.update(FullStats)
+        if self.CollectFieldStats:
+            FileStats['FieldStats'] = FieldStats
+        return FileStats
+    
+    def ParseLakeShapefile(self, Reader, OutFile):
+        """
+        The NativeShapefile version of ParseLakeBytes. Reader is an open 
+        ShapefileReader.ShapefileReader of InputFile. Each lake is tested on its .dbf 
+        attributes, and with BoundsOutline on the box of its shape, and only copied lakes 
+        have their rings read. Writes GMT text to OutFile, opened 'wb', with the header 
+        ogr2ogr would write. Returns FileStats.
+        
+        Rings are outer rings or holes by their winding, as in the shapefile spec, not by 
+        their order. As the rings of skipped lakes are not read, CountTotalIslands and 
+        MostIslandsInLake count the rings after the first of each shape. The copied counts 
+        are of the rings written.
+        """
+        DBF = Reader.DBF
+        SHP = Reader.SHP
+        try:
+            FieldNumbers = [DBF.FieldNumber(Name) for Name in self.HEADER_ORDER]
+        except KeyError as err:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR {} has no {} field. Fields are {}".format(self.InputFile, err, DBF.FieldNames))
+        FieldNumbersOfInterest = [FieldNumbers[i] for i in self.HeaderElementsOfInterest]
+        
+        # Values typed as ExtractLakeHeader types them, blank numbers read as 0
+        Converters = []
+        for HeaderType in self.HeaderTypeListSubset:
+            if 'int' in HeaderType:
+                Converters.append(lambda Value: 0 if Value is None else int(Value))
+            elif 'doub' in HeaderType:
+                Converters.append(lambda Value: 0.0 if Value is None else float(Value))
+            else:
+                Converters.append(lambda Value: '' if Value is None else str(Value))
+        # Header line values formatted as ogr2ogr formats them
+        Formatters = []
+        for HeaderType in self.HEADER_TYPES:
+            if 'str' in HeaderType:
+                Formatters.append(lambda Value: '"{}"'.format('' if Value is None else str(Value).replace('"', '\\"')))
+            elif 'doub' in HeaderType:
+                Formatters.append(lambda Value: '' if Value is None else '%.15g' % Value)
+            else:
+                Formatters.append(lambda Value: '' if Value is None else str(int(Value)))
+        
+        CountLakes = 0
+        CountTotalIslands = 0
+        MostIslandsInLake = 0
+        CountLakesCopied = 0
+        CountTotalIslandsCopied = 0
+        
+        if self.ReportFullStats:
+            FullStats = self.StartFullStats()
+        if self.CollectFieldStats:
+            FieldStats = self.StartFieldStats()
+        
+        LakePredicate = self.LakePredicate
+        RewriteGeometry = (self.SimplifyTolerance is not None) or self.ClipToBounds
+        GeometryCounts = [0, 0, 0]
+        
+        # File header
+        FileBox = '/'.join(['%.15g' % Value for Value in SHP.Box])
+        OutFile.write("# @VGMT1.0 @GPOLYGON\n# @R{}\n# @N{}\n# @T{}\n# FEATURE_DATA\n".format(
+                        FileBox, '|'.join(self.HEADER_ORDER), '|'.join(self.HEADER_TYPES)).encode())
+        
+        for i in range(Reader.RecordCount):
+            if DBF.IsDeleted(i) or SHP.IsNull(i):
+                continue
+            CountLakes += 1
+            self.LakeAtributesList = [Convert(Value) for Convert, Value in zip(Converters, DBF.Values(i, FieldNumbersOfInterest))]
+            
+            CountIslandsThisLake = SHP.PartCount(i) - 1
+            CountTotalIslands += CountIslandsThisLake
+            if CountIslandsThisLake > MostIslandsInLake:
+                MostIslandsInLake = CountIslandsThisLake
+            
+            if self.ReportFullStats:
+                self.UpdateFullStats(FullStats, False)
+            
+            CopyThisLake = LakePredicate(self.LakeAtributesList)
+            if CopyThisLake and self.BoundsOutline:
+                CopyThisLake = self.BoxMatchesBounds(SHP.RecordBox(i))
+            if not CopyThisLake:
+                continue
+            
+            # Rings are classified by winding, outer rings are clockwise and holes counter
+            # clockwise. The first outer ring written carries the header, other outer rings
+            # are # @P segments of their own. A hole belongs to the outer ring before it and
+            # is dropped if that ring was not written.
+            HeaderLine = '|'.join([Format(Value) for Format, Value in zip(Formatters, DBF.Values(i, FieldNumbers))])
+            LakeSegments = []
+            IslandsCopied = 0
+            OuterRingWritten = False
+            for Coordinates in SHP.Parts(i):
+                IsHole = not GMTGeometry.RingIsClockwise(Coordinates)
+                if IsHole and (self.SkipIslands or not OuterRingWritten):
+                    continue
+                if RewriteGeometry:
+                    Coordinates = self.RewriteCoordinates(Coordinates, GeometryCounts)
+                    # A ring clipped away is dropped with its segment lines, as in WriteGeometryText
+                    if not len(Coordinates):
+                        if not IsHole:
+                            OuterRingWritten = False
+                        continue
+                if IsHole:
+                    LakeSegments.append(b">\n# @H\n")
+                    IslandsCopied += 1
+                elif LakeSegments:
+                    LakeSegments.append(b">\n# @P\n")
+                else:
+                    LakeSegments.append(">\n# @D{}\n# @P\n".format(HeaderLine).encode())
+                if not IsHole:
+                    OuterRingWritten = True
+                LakeSegments.append(GMTGeometry.FormatCoordinates(Coordinates))
+            
+            # Every outer ring clipped away, nothing of the lake is written
+            if not LakeSegments:
+                continue
+            OutFile.write(b''.join(LakeSegments))
+            CountLakesCopied += 1
+            CountTotalIslandsCopied += IslandsCopied
+            if self.ReportFullStats:
+                self.UpdateFullStats(FullStats, True)
+            if self.CollectFieldStats:
+                self.UpdateFieldStats(FieldStats)
         
+        FileStats = {'CountLakes':CountLakes,
+                    'CountTotalIslands':CountTotalIslands,
+                    'MostIslandsInLake':MostIslandsInLake,
+                    'CountLakesCopied':CountLakesCopied,
+                    'CountTotalIslandsCopied':CountTotalIslandsCopied}
+        FileStats.update(self.GeometryFileStats(GeometryCounts))
         if self.ReportFullStats:
-            self.FileStats = {'CountLakes':CountLakes,
-                            'CountTotalIslands':CountTotalIslands,
-                            'MostIslandsInLake':MostIslandsInLake,
-                            'CountLines':CountLines,
-                            'SmallestAreaLake':SmallestAreaLake,
-                            'LargestAreaLake':LargestAreaLake,
-                            'CountLakesCopied':CountLakesCopied,
-                            'CountTotalIslandsCopied':CountTotalIslandsCopied,
-                            'SmallestAreaLakeCopied':SmallestAreaLakeCopied,
-                            'LargestAreaLakeCopied':LargestAreaLakeCopied,
-                            'DeepestLakeCopied':DeepestLakeCopied,
-                            'HighestLakeCopied':HighestLakeCopied,
-                            'LargestWatershedToLakeCopied':LargestWatershedToLakeCopied,
-                            'LargestVolumeLakeCopied':LargestVolumeLakeCopied}
+            FileStats.update(FullStats)
+        if self.CollectFieldStats:
+            FileStats['FieldStats'] = FieldStats
+        return FileStats
+    
+    def ParseLAKESBatch(self):
+        """
+        Like ParseLAKES for every job of the JobFile at once. The input is scanned once with 
+        ParseLakeBytesJobs and each lake is written to the output of every job it matches. 
+        Sets FileStats of each job, this parser being the first.
+        """
+        if self.RunLoud:
+            print("Parsing {} jobs in one scan".format(len(self.Jobs)))
+        with GMTScanner.MemoryMappedFile(self.InFileGMTtxt) as Data, contextlib.ExitStack() as OpenFiles:
+            OutFiles = [OpenFiles.enter_context(Job.OpenOutputFile('wb')) for Job in self.Jobs]
+            StatsList = self.ParseLakeBytesJobs(Data, 0, len(Data), self.Jobs, OutFiles)
+        
+        for Job, FileStats in zip(self.Jobs, StatsList):
+            Job.FileStats = FileStats
+            Job.FinishFieldStats()
+    
+    def ParseLakeBytesJobs(self, Data, Start, End, Jobs, OutFiles):
+        """
+        ParseLakeBytes for several jobs in one scan. Jobs are LakesParsers with the header 
+        elements of interest of this one (see SetHeaderElementsOfInterest) and OutFiles their 
+        outputs, opened 'wb'. Each lake header is decoded once here then tested with the 
+        predicate of every job. Returns a list of FileStats, one per job.
+        """
+        Scanner = GMTScanner.SegmentScanner(Data, Start, End)
+        DataView = memoryview(Data)
+        if self.Reporter is not None:
+            self.Reporter.WatchScanner(Scanner)
+        if self.Instruments is not None:
+            self.Instruments.Count('BytesRead', End - Start)
+        
+        CountLakes = 0
+        CountTotalIslands = 0
+        CountIslandsThisLake = 0
+        MostIslandsInLake = 0
+        
+        JobNumbers = range(len(Jobs))
+        CountLakesCopied = [0 for j in JobNumbers]
+        CountTotalIslandsCopied = [0 for j in JobNumbers]
+        FullStats = [Job.StartFullStats() if Job.ReportFullStats else None for Job in Jobs]
+        FieldStats = [Job.StartFieldStats() if Job.CollectFieldStats else None for Job in Jobs]
+        # Coordinates are rewritten when simplifying or clipping
+        RewriteGeometry = [(Job.SimplifyTolerance is not None) or Job.ClipToBounds for Job in Jobs]
+        # Vertices before and after simplifying, rings clipped away
+        GeometryCounts = [[0, 0, 0] for j in JobNumbers]
+        AnyFullStats = any(Job.ReportFullStats for Job in Jobs)
+        
+        # Jobs copying the current lake and so its islands
+        CopyingJobs = []
+        Predicates = [Job.LakePredicate for Job in Jobs]
+        
+        # File header
+        for OutFile in OutFiles:
+            OutFile.write(DataView[Start:Scanner.FileHeaderEnd()])
+        
+        for SegmentStart, CommentStart, CommentEnd, SegmentEnd in Scanner.Segments():
+            if Data[CommentStart:CommentStart + 4] == b'# @D':
+                # Its a new Lake
+                CountLakes += 1
+                self.ExtractLakeHeader(Data[CommentStart:CommentEnd].decode())
+                LakeAtributesList = self.LakeAtributesList
+                
+                if CountIslandsThisLake > MostIslandsInLake:
+                    MostIslandsInLake = CountIslandsThisLake
+                CountIslandsThisLake = 0
+                
+                if AnyFullStats:
+                    for j in JobNumbers:
+                        if Jobs[j].ReportFullStats:
+                            Jobs[j].LakeAtributesList = LakeAtributesList
+                            Jobs[j].UpdateFullStats(FullStats[j], False)
+                
+                # The perimeter box is found once for all the jobs that need it
+                Box = None
+                CopyingJobs = []
+                for j in JobNumbers:
+                    if not Predicates[j](LakeAtributesList):
+                        continue
+                    Job = Jobs[j]
+                    if Job.BoundsOutline:
+                        if Box is None:
+                            Box = GMTGeometry.CoordinateBounds(GMTGeometry.ParseCoordinates(Data[CommentEnd:SegmentEnd]))
+                        if not Job.BoxMatchesBounds(Box):
+                            continue
+                    if RewriteGeometry[j]:
+                        LakeWritten, IslandsWritten = Job.WriteGeometryText(OutFiles[j], b">\n" + Data[CommentStart:SegmentEnd], GeometryCounts[j])
+                        # A lake clipped away is not copied, nor are its islands
+                        if not LakeWritten:
+                            continue
+                    else:
+                        OutFiles[j].write(b">\n")
+                        OutFiles[j].write(DataView[CommentStart:SegmentEnd])
+                    CopyingJobs.append(j)
+                    CountLakesCopied[j] += 1
+                    if Job.ReportFullStats or Job.CollectFieldStats:
+                        Job.LakeAtributesList = LakeAtributesList
+                    if Job.ReportFullStats:
+                        Job.UpdateFullStats(FullStats[j], True)
+                    if Job.CollectFieldStats:
+                        Job.UpdateFieldStats(FieldStats[j])
+            
+            elif Data[CommentStart:CommentStart + 4] == b'# @H':
+                # Its an island
+                CountTotalIslands += 1
+                CountIslandsThisLake += 1
+                for j in CopyingJobs:
+                    if Jobs[j].SkipIslands:
+                        continue
+                    if RewriteGeometry[j]:
+                        LakeWritten, IslandsWritten = Jobs[j].WriteGeometryText(OutFiles[j], b">\n" + Data[CommentStart:SegmentEnd], GeometryCounts[j])
+                        CountTotalIslandsCopied[j] += IslandsWritten
+                    else:
+                        OutFiles[j].write(b">\n")
+                        OutFiles[j].write(DataView[CommentStart:SegmentEnd])
+                        CountTotalIslandsCopied[j] += 1
+            
+            else:
+                print("Warning odd header after > {}. Continuing.".format(Data[CommentStart:CommentEnd]))
+        
+        # Islands of the last lake
+        if CountIslandsThisLake > MostIslandsInLake:
+            MostIslandsInLake = CountIslandsThisLake
+        
+        DataView.release()
+        
+        CountLines = Scanner.CountLines()
+        StatsList = []
+        for j in JobNumbers:
+            FileStats = {'CountLakes':CountLakes,
+                        'CountTotalIslands':CountTotalIslands,
+                        'MostIslandsInLake':MostIslandsInLake,
+                        'CountLines':CountLines,
+                        'CountLakesCopied':CountLakesCopied[j],
+                        'CountTotalIslandsCopied':CountTotalIslandsCopied[j]}
+            FileStats.update(Jobs[j].GeometryFileStats(GeometryCounts[j]))
+            if Jobs[j].ReportFullStats:
+                FileStats.update(FullStats[j])
+            if Jobs[j].CollectFieldStats:
+                FileStats['FieldStats'] = FieldStats[j]
+            StatsList.append(FileStats)
+        return StatsList
+    
+    def WriteGeometryText(self, OutFile, Text, GeometryCounts):
+        """
+        Writes Text, the GMT text of whole lake and island segments, to OutFile opened 'wb' 
+        with each coordinate block clipped to SimpleBounds if ClipToBounds is set and then
+        simplified to self.SimplifyTolerance if it is set. Segment and comment lines are 
+        copied, except that a ring clipped away is dropped with its > and comment lines, 
+        as are the islands after it. If the # @D perimeter is clipped away nothing is written.
+        GeometryCounts, [VerticesBefore, VerticesAfter, RingsClippedAway], is added to.
+        Returns LakeWritten, False if the perimeter was clipped away, and the number of 
+        islands written.
+        """
+        Parts = []
+        SegmentLines = []
+        Block = []
+        # Islands of Text without a perimeter belong to a lake already written
+        PerimeterWritten = True
+        IslandsWritten = 0
+        Lines = bytes(Text).split(b'\n')
+        # The last element is the empty string after the final newline, which writes the 
+        # last block. Without a final newline the last line is coordinates.
+        if Lines[-1]:
+            Lines.append(b'')
+        for line in Lines:
+            if line[:1] in (b'>', b'#', b''):
+                if Block:
+                    IsIsland = any(SegmentLine.startswith(b'# @H') for SegmentLine in SegmentLines)
+                    if not (IsIsland and not PerimeterWritten):
+                        Coordinates = self.RewriteCoordinates(GMTGeometry.ParseCoordinates(b'\n'.join(Block)), GeometryCounts)
+                        if len(Coordinates):
+                            Parts.append(b'\n'.join(SegmentLines) + b'\n')
+                            Parts.append(GMTGeometry.FormatCoordinates(Coordinates))
+                            if IsIsland:
+                                IslandsWritten += 1
+                        elif any(SegmentLine.startswith(b'# @D') for SegmentLine in SegmentLines):
+                            # The lake is gone with its islands
+                            return False, 0
+                        if not IsIsland:
+                            PerimeterWritten = bool(len(Coordinates))
+                    SegmentLines = []
+                    Block = []
+                if line:
+                    SegmentLines.append(line)
+            else:
+                Block.append(line)
+        
+        # Segment lines without coordinates
+        if SegmentLines:
+            Parts.append(b'\n'.join(SegmentLines) + b'\n')
+        OutFile.write(b''.join(Parts))
+        return True, IslandsWritten
+    
+    def RewriteCoordinates(self, Coordinates, GeometryCounts):
+        """
+        Clips and simplifies one ring as described in WriteGeometryText. Returns the new 
+        coordinates, empty if the ring was clipped away.
+        """
+        if self.ClipToBounds:
+            ClipBox = GMTGeometry.ClipBoxForRing(GMTGeometry.CoordinateBounds(Coordinates), self.SimpleBounds)
+            Coordinates = GMTGeometry.ClipToBox(Coordinates, ClipBox)
+            if not len(Coordinates):
+                GeometryCounts[2] += 1
+                return Coordinates
+        if self.SimplifyTolerance is not None:
+            GeometryCounts[0] += len(Coordinates) // 2
+            Coordinates = GMTGeometry.SimplifyCoordinates(Coordinates, self.SimplifyTolerance)
+            GeometryCounts[1] += len(Coordinates) // 2
+        return Coordinates
+    
+    def GeometryFileStats(self, GeometryCounts):
+        """
+        Returns the FileStats entries for GeometryCounts, see WriteGeometryText. 
+        Empty unless simplifying or clipping.
+        """
+        GeometryStats = {}
+        if self.SimplifyTolerance is not None:
+            GeometryStats['CountVerticesBeforeSimplify'] = GeometryCounts[0]
+            GeometryStats['CountVerticesAfterSimplify'] = GeometryCounts[1]
+        if self.ClipToBounds:
+            GeometryStats['CountRingsClippedAway'] = GeometryCounts[2]
+        return GeometryStats
+    
+    def BoxMatchesBounds(self, Box):
+        """
+        Returns True if Box, the W E S N bounding box of a lake perimeter, overlaps 
+        SimpleBounds or any of the boxes of BoundsFile. Used instead of the pour point 
+        with BoundsOutline.
+        """
+        if Box is None:
+            return False
+        if self.SimpleBounds:
+            return GMTGeometry.BoxesOverlap(Box, self.SimpleBounds)
+        return self.BoundsMatcher.BoxMatches(Box)
+    
+    def IterLakes(self, SkipIslands=None):
+        """
+        Generator of LakeRecords.Lake records for the lakes that pass the tests, in file 
+        order. Nothing is written. The header fields are all typed, the perimeter and 
+        island coordinates are LakeRecords.Ring objects parsed only when used. Islands 
+        is empty with SkipIslands, which is self.SkipIslands unless given. The input is 
+        scanned as with MemoryMap, one lake at a time, so memory use does not grow with 
+        the file. FileStats has the counts once the generator is exhausted.
+        """
+        if SkipIslands is None:
+            SkipIslands = self.SkipIslands
+        if self.InputCompression is not None:
+            raise InitInputError('InputFile', self.InputFile, 'ERROR - IterLakes can not read {} compressed input {}. Decompress it first'.format(self.InputCompression, self.InputFile))
+        if self.NativeShapefile or self.StreamConversion:
+            raise InitInputError('InputFile', self.InputFile, 'ERROR - IterLakes reads a GMT file. Use it without NativeShapefile or StreamConversion.')
+        self.CheckAndConvertInFile()
+        
+        # All the header fields are typed for the records, not just those of interest
+        Converters = []
+        for HeaderType in self.HEADER_TYPES:
+            if 'int' in HeaderType:
+                Converters.append(int)
+            elif 'doub' in HeaderType:
+                Converters.append(float)
+            else:
+                Converters.append(lambda Value: Value.strip('"\' \n'))
+        
+        CountLakes = 0
+        CountTotalIslands = 0
+        CountIslandsThisLake = 0
+        MostIslandsInLake = 0
+        CountLakesCopied = 0
+        CountTotalIslandsCopied = 0
+        
+        ThisLake = None
+        LakePredicate = self.LakePredicate
+        
+        with GMTScanner.MemoryMappedFile(self.InFileGMTtxt) as Data:
+            Scanner = GMTScanner.SegmentScanner(Data)
+            for SegmentStart, CommentStart, CommentEnd, SegmentEnd in Scanner.Segments():
+                if Data[CommentStart:CommentStart + 4] == b'# @D':
+                    # Its a new Lake, the last one is complete
+                    if ThisLake is not None:
+                        yield ThisLake
+                        ThisLake = None
+                    
+                    CountLakes += 1
+                    # Actually count of islands in the last lake
+                    if CountIslandsThisLake > MostIslandsInLake:
+                        MostIslandsInLake = CountIslandsThisLake
+                    CountIslandsThisLake = 0
+                    HeaderLine = Data[CommentStart:CommentEnd].decode()
+                    self.ExtractLakeHeader(HeaderLine)
+                    CopyThisLake = LakePredicate(self.LakeAtributesList)
+                    if CopyThisLake and self.BoundsOutline:
+                        CopyThisLake = self.BoxMatchesBounds(GMTGeometry.CoordinateBounds(
+                                            GMTGeometry.ParseCoordinates(Data[CommentEnd:SegmentEnd])))
+                    if CopyThisLake:
+                        Values = [Convert(Value) for Convert, Value in zip(Converters, HeaderLine[4:].split(sep='|'))]
+                        # The perimeter starts with the # @P line which Ring ignores
+                        ThisLake = LakeRecords.Lake(Values, LakeRecords.Ring(Data[CommentEnd:SegmentEnd]), [])
+                        CountLakesCopied += 1
+                
+                elif Data[CommentStart:CommentStart + 4] == b'# @H':
+                    # Its an island
+                    CountTotalIslands += 1
+                    CountIslandsThisLake += 1
+                    if (ThisLake is not None) and not SkipIslands:
+                        ThisLake.Islands.append(LakeRecords.Ring(Data[CommentEnd:SegmentEnd]))
+                        CountTotalIslandsCopied += 1
+                
+                else:
+                    print("Warning odd header after > {}. Continuing.".format(Data[CommentStart:CommentEnd]))
+            
+            if ThisLake is not None:
+                yield ThisLake
+            
+            # Islands of the last lake
+            if CountIslandsThisLake > MostIslandsInLake:
+                MostIslandsInLake = CountIslandsThisLake
+            CountLines = Scanner.CountLines()
+        
+        self.FileStats = {'CountLakes':CountLakes,
+                        'CountTotalIslands':CountTotalIslands,
+                        'MostIslandsInLake':MostIslandsInLake,
+                        'CountLines':CountLines,
+                        'CountLakesCopied':CountLakesCopied,
+                        'CountTotalIslandsCopied':CountTotalIslandsCopied}
+    
+    def LocatePoints(self):
+        """
+        Point lookup for PointsFile, see the class doc string. Finds the lake each point is
+        in and writes lon lat Hylak_id lines to OutputFile in the order of PointsFile.
+        """
+        LonLat = GMTGeometry.AsNumPy(self.ReadPointsFile(self.PointsFile))
+        Grid = GMTGeometry.PointGrid(LonLat)
+        if self.RunLoud:
+            print("Read {} points from {}".format(len(LonLat), self.PointsFile))
+        
+        PointLakeIds = np.zeros(len(LonLat), dtype=np.int64)
+        CountLakesWithPoints = 0
+        
+        for HylakId, Candidates, Rings in self.LakesWithPoints(Grid):
+            # Lakes do not overlap, points already placed are not tested again
+            Candidates = Candidates[PointLakeIds[Candidates] == 0]
+            if len(Candidates) == 0:
+                continue
+            Perimeter, Islands = Rings()
+            
+            Inside = GMTGeometry.PointsInRing(LonLat[Candidates], Perimeter.AsNumPy())
+            for Island in Islands:
+                if not Inside.any():
+                    break
+                # Islands are holes
+                Inside[Inside] &= ~GMTGeometry.PointsInRing(LonLat[Candidates[Inside]], Island.AsNumPy())
+            
+            if Inside.any():
+                PointLakeIds[Candidates[Inside]] = HylakId
+                CountLakesWithPoints += 1
+        
+        with CompressedFiles.Open(self.OutputFile, 'w') as OutFile:
+            for Start in range(0, len(LonLat), 100000):
+                OutFile.write(''.join(['{!r} {!r} {}\n'.format(Lon, Lat, HylakId) for (Lon, Lat), HylakId 
+                                        in zip(LonLat[Start:Start + 100000].tolist(), PointLakeIds[Start:Start + 100000].tolist())]))
+        
+        self.FileStats = {'CountPoints':len(LonLat),
+                        'CountPointsInLakes':int(np.count_nonzero(PointLakeIds)),
+                        'CountLakesWithPoints':CountLakesWithPoints}
+    
+    def LakesWithPoints(self, Grid):
+        """
+        Generator for LocatePoints of (Hylak_id, Candidates, Rings) for each lake passing the 
+        tests that has points of Grid in its bounding box. Candidates are those points. 
+        Rings() returns the perimeter and list of islands as LakeRecords.Ring, so lakes 
+        skipped by LocatePoints are not read. The islands are read with SkipIslands too.
+        With UseIndex the boxes and byte ranges come from the index, otherwise from IterLakes.
+        """
+        if not self.UseIndex:
+            for Lake in self.IterLakes(SkipIslands=False):
+                Candidates = Grid.PointsInBox(GMTGeometry.CoordinateBounds(Lake.Perimeter.Coordinates))
+                if len(Candidates):
+                    yield Lake.Hylak_id, Candidates, functools.partial(tuple, (Lake.Perimeter, Lake.Islands))
+            return
+        
+        TheIndex = self.LoadLakeIndex()
+        if self.Vectorized:
+            SelectedLakes, FullStats = self.SelectLakesVectorized(TheIndex)
         else:
-            self.FileStats = {'CountLakes':CountLakes,
-                            'CountTotalIslands':CountTotalIslands,
-                            'MostIslandsInLake':MostIslandsInLake,
-                            'CountLines':CountLines,
-                            'CountLakesCopied':CountLakesCopied,
-                            'CountTotalIslandsCopied':CountTotalIslandsCopied}
+            SelectedLakes, FullStats = self.SelectLakesIndexed(TheIndex)
+        
+        with open(self.InFileGMTtxt, 'rb') as InFile:
+            for i in SelectedLakes:
+                Candidates = Grid.PointsInBox((TheIndex.BoxWest[i], TheIndex.BoxEast[i], TheIndex.BoxSouth[i], TheIndex.BoxNorth[i]))
+                if len(Candidates):
+                    yield TheIndex.Columns['Hylak_id'][i], Candidates, functools.partial(self.ReadIndexedRings, InFile, TheIndex, i)
+    
+    def ReadIndexedRings(self, InFile, TheIndex, i):
+        """
+        Reads lake i of TheIndex from InFile, the input opened 'rb'. Returns the perimeter and
+        the list of islands as LakeRecords.Ring.
+        """
+        InFile.seek(TheIndex.LakeOffset[i])
+        LakeText = InFile.read(TheIndex.LakeLength[i] + TheIndex.IslandsLength[i])
+        Rings = [LakeRecords.Ring(LakeText[CommentEnd:SegmentEnd]) 
+                    for SegmentStart, CommentStart, CommentEnd, SegmentEnd in GMTScanner.SegmentScanner(LakeText).Segments()]
+        return Rings[0], Rings[1:]
+    
+    def FindLakeChunks(self, FileName, ChunkBytes):
+        """
+        Splits FileName into byte ranges of about ChunkBytes that each start at a lake,
+        a > line followed by a # @D line. The first chunk starts at 0 and so includes
+        the file header. Returns a list of (Start, End) tuples.
+        """
+        FileSize = os.path.getsize(FileName)
+        ChunkStarts = [0]
+        
+        with open(FileName, 'rb') as InFile:
+            Target = ChunkBytes
+            while Target < FileSize:
+                InFile.seek(Target)
+                # Partial line
+                Position = Target + len(InFile.readline())
+                
+                LakeStart = None
+                SegmentHeaderPosition = None
+                for line in InFile:
+                    if SegmentHeaderPosition is not None and line.startswith(b'# @D'):
+                        LakeStart = SegmentHeaderPosition
+                        break
+                    if line[:1] == b'>':
+                        SegmentHeaderPosition = Position
+                    else:
+                        SegmentHeaderPosition = None
+                    Position += len(line)
+                
+                # No more lakes, the last chunk runs to EOF
+                if LakeStart is None:
+                    break
+                ChunkStarts.append(LakeStart)
+                Target = LakeStart + ChunkBytes
+        
+        ChunkEnds = ChunkStarts[1:] + [FileSize]
+        return list(zip(ChunkStarts, ChunkEnds))
+    
+    def ParseLakeChunk(self, Start, End, PartFileName):
+        """
+        Runs ParseLakeLines on bytes Start to End of the input and writes the lakes to PartFileName.
+        Called in the worker processes of ParseLAKESParallel. Returns the FileStats of the chunk.
+        With Instrument the FileStats have the Instrumentation.Instruments of the chunk.
+        """
+        if self.Instrument:
+            self.InstrumentParsing()
+        
+        with self.TimedPhase('Parsing'):
+            if self.MemoryMap:
+                with GMTScanner.MemoryMappedFile(self.InFileGMTtxt) as Data, self.OpenPartFile(PartFileName, 'wb') as OutFile:
+                    FileStats = self.ParseLakeBytes(Data, Start, End, OutFile)
+            else:
+                with open(self.InFileGMTtxt, 'rb') as InFile:
+                    InFile.seek(Start)
+                    ChunkBytes = InFile.read(End - Start)
+                # Decoded the same way as a file opened with open(<file>, 'r')
+                InChunk = io.TextIOWrapper(io.BytesIO(ChunkBytes))
+                with self.OpenPartFile(PartFileName, 'w') as OutFile:
+                    FileStats = self.ParseLakeLines(InChunk, OutFile)
+        
+        if self.Instruments is not None:
+            FileStats['Instrumentation'] = self.Instruments
+        return FileStats
+    
+    def OpenPartFile(self, PartFileName, Mode):
+        """
+        Opens the chunk output PartFileName with Mode, counted as output with Instrument.
+        """
+        PartFile = open(PartFileName, Mode)
+        if self.Instruments is not None:
+            return self.Instruments.CountingWriter(PartFile)
+        return PartFile
+    
+    def ParseLAKESParallel(self):
+        """
+        Like ParseLAKES but the input is split into chunks at lake boundaries and the chunks 
+        are parsed in self.Processes worker processes. The chunk outputs are joined in order 
+        so the output is the same as a serial run. The FileStats of the chunks are merged.
+        """
+        Chunks = self.FindLakeChunks(self.InFileGMTtxt, self.CHUNK_BYTES)
+        if self.RunLoud:
+            print("Parsing {} chunks with {} processes".format(len(Chunks), self.Processes))
+        
+        # Chunk outputs go in a private directory next to OutputFile so runs do not clobber each other
+        PartDirectory = tempfile.mkdtemp(prefix='ParseSHEDSLake_', dir=os.path.dirname(os.path.abspath(self.OutputFile)))
+        PartFileNames = [os.path.join(PartDirectory, 'Chunk{:06d}.gmt'.format(i)) for i in range(len(Chunks))]
+        
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.Processes) as Pool:
+                Futures = [Pool.submit(self.ParseLakeChunk, Start, End, PartFileName) 
+                            for (Start, End), PartFileName in zip(Chunks, PartFileNames)]
+                if self.Reporter is not None:
+                    self.FollowChunks(Chunks, Futures)
+                StatsList = [Future.result() for Future in Futures]
+            
+            with self.TimedPhase('Parsing'), self.OpenOutputFile('wb') as OutFile:
+                for PartFileName in PartFileNames:
+                    with open(PartFileName, 'rb') as PartFile:
+                        shutil.copyfileobj(PartFile, OutFile)
+        except (OSError, concurrent.futures.process.BrokenProcessPool) as err:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR parsing in parallel: {}".format(err))
+        finally:
+            shutil.rmtree(PartDirectory, ignore_errors=True)
+        
+        self.FileStats = self.MergeFileStats(StatsList)
+        if 'Instrumentation' in self.FileStats:
+            self.Instruments.Merge(self.FileStats.pop('Instrumentation'))
+    
+    def FollowChunks(self, Chunks, Futures):
+        """
+        Adds the bytes and lakes of each chunk of ParseLAKESParallel to self.Reporter as 
+        its worker finishes it.
+        """
+        self.Reporter.Expect(sum(End - Start for Start, End in Chunks))
+        
+        def ChunkDone(Future, Bytes):
+            if (not Future.cancelled()) and (Future.exception() is None):
+                self.Reporter.Advance(Bytes, Future.result()['CountLakes'])
+        
+        for (Start, End), Future in zip(Chunks, Futures):
+            Future.add_done_callback(functools.partial(ChunkDone, Bytes=End - Start))
+    
+    @classmethod
+    def MergeFileStats(cls, StatsList):
+        """
+        Merges the FileStats dictionaries from parts of one input. Counts are added. 
+        Keys in FILE_STATS_MIN_KEYS and FILE_STATS_MAX_KEYS take the min or max.
+        Values of FILE_STATS_MERGE_KEYS are merged with their Merge().
+        """
+        FileStats = dict(StatsList[0])
+        for Stats in StatsList[1:]:
+            for Key, Value in Stats.items():
+                if Key in cls.FILE_STATS_MERGE_KEYS:
+                    FileStats[Key].Merge(Value)
+                elif Key in cls.FILE_STATS_MIN_KEYS:
+                    FileStats[Key] = min(FileStats[Key], Value)
+                elif Key in cls.FILE_STATS_MAX_KEYS:
+                    FileStats[Key] = max(FileStats[Key], Value)
+                else:
+                    FileStats[Key] += Value
+        return FileStats
 
+    def StartFullStats(self):
+        """
+        Returns the starting dictionary for the ReportFullStats min and max values.
+        Updated by UpdateFullStats and added to FileStats.
+        """
+        FullStats = {}
+        for Key, HeaderIndex, MinOrMax, Copied in self.FULL_STATS_FIELDS:
+            if MinOrMax == 'min':
+                FullStats[Key] = 24709000
+            else:
+                FullStats[Key] = 0
+        return FullStats
 
-                            
+    def UpdateFullStats(self, FullStats, Copied):
+        """
+        Updates FullStats with the lake in self.LakeAtributesList.
+        Copied is False for every lake in the file and True for lakes copied to the output.
+        With ReportFullStats all header elements are in self.LakeAtributesList so HEADER_ORDER indices work.
+        """
+        for Key, HeaderIndex, MinOrMax, ForCopied in self.FULL_STATS_FIELDS:
+            if ForCopied is Copied:
+                if MinOrMax == 'min':
+                    if self.LakeAtributesList[HeaderIndex] < FullStats[Key]:
+                        FullStats[Key] = self.LakeAtributesList[HeaderIndex]
+                else:
+                    if self.LakeAtributesList[HeaderIndex] > FullStats[Key]:
+                        FullStats[Key] = self.LakeAtributesList[HeaderIndex]
+
+    def StartFieldStats(self):
+        """
+        Returns an empty StreamingStats.StreamingStats of FIELD_STATS_FIELDS. 
+        Updated by UpdateFieldStats and added to FileStats as FieldStats.
+        """
+        return StreamingStats.StreamingStats(self.FIELD_STATS_FIELDS)
+    
+    def UpdateFieldStats(self, FieldStats):
+        """
+        Adds the copied lake in self.LakeAtributesList to FieldStats.
+        With CollectFieldStats all header elements are in self.LakeAtributesList so HEADER_ORDER indices work.
+        """
+        LakeAtributesList = self.LakeAtributesList
+        FieldStats.AddRow([LakeAtributesList[i] for i in self.FIELD_STATS_INDICES])
+    
+    def CopiedFullStats(self, FullStats, TheIndex, CopiedLakes):
+        """
+        Redoes the copied lake values of FullStats for the lakes CopiedLakes of TheIndex,
+        for when selected lakes were clipped away.
+        """
+        StartStats = self.StartFullStats()
+        for Key, HeaderIndex, MinOrMax, Copied in self.FULL_STATS_FIELDS:
+            if Copied:
+                FullStats[Key] = StartStats[Key]
+        Columns = [TheIndex.Columns[Name] for Name in self.HeaderListSubset]
+        for i in CopiedLakes:
+            self.LakeAtributesList = [Column[i] for Column in Columns]
+            self.UpdateFullStats(FullStats, True)
+    
+    def IndexFieldStats(self, TheIndex, SelectedLakes):
+        """
+        Returns the FieldStats of the lakes SelectedLakes of TheIndex, read from the index 
+        columns. Whole columns are added at once with NumPy.
+        """
+        FieldStats = self.StartFieldStats()
+        if np is not None:
+            Selected = np.asarray(SelectedLakes, dtype=np.int64)
+            for Name in self.FIELD_STATS_FIELDS:
+                Column = TheIndex.Columns[Name]
+                FieldStats.AddValues(Name, np.frombuffer(Column, dtype=Column.typecode)[Selected])
+        else:
+            for Name in self.FIELD_STATS_FIELDS:
+                Column = TheIndex.Columns[Name]
+                FieldStats.AddValues(Name, [Column[i] for i in SelectedLakes])
+        return FieldStats
+    
+    def FinishFieldStats(self):
+        """
+        Replaces the StreamingStats in self.FileStats['FieldStats'] with its summary and,
+        with OutputForHistogram, writes it with the histograms to <OutputFile>.stats.json.
+        """
+        FieldStats = self.FileStats.pop('FieldStats', None)
+        if FieldStats is None:
+            return
+        if self.OutputForHistogram:
+            StatsFileName = self.OutputFile + '.stats.json'
+            try:
+                FieldStats.WriteJSON(StatsFileName)
+            except OSError as err:
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR writing {}: {}".format(StatsFileName, err))
+            if self.RunLoud:
+                print("Wrote field statistics and histograms to {}".format(StatsFileName))
+        if self.ReportFullStats:
+            self.FileStats['FieldStats'] = FieldStats.Summary()
+    
+    def IndexBoundsCandidates(self, TheIndex):
+        """
+        Returns the sorted lake numbers in TheIndex near SimpleBounds or any box of BoundsList.
+        """
+        if self.SimpleBounds:
+            return TheIndex.LakesInBounds(self.SimpleBounds)
+        
+        # Union of the boxes in the bounds file
+        Candidates = set()
+        for Bounds in self.BoundsList:
+            Candidates.update(TheIndex.LakesInBounds(Bounds))
+        return sorted(Candidates)
+    
+    def IndexOutlineCandidates(self, TheIndex):
+        """
+        Returns the sorted lake numbers in TheIndex whose perimeter bounding box overlaps 
+        SimpleBounds or any box of BoundsList. Only the lakes of the box grid cells near the 
+        bounds are tested, see LakeIndex.LakesWithBoxInBounds. The grid is read for the 
+        merged bands of BoundsMatcher rather than for each box of BoundsList.
+        """
+        if self.SimpleBounds:
+            Candidates = TheIndex.LakesWithBoxInBounds(self.SimpleBounds)
+        else:
+            Candidates = set()
+            for Bounds in self.BoundsMatcher.MergedBounds():
+                Candidates.update(TheIndex.LakesWithBoxInBounds(Bounds))
+            Candidates = sorted(Candidates)
+        return [i for i in Candidates 
+                if self.BoxMatchesBounds((TheIndex.BoxWest[i], TheIndex.BoxEast[i], TheIndex.BoxSouth[i], TheIndex.BoxNorth[i]))]
+    
+    def LoadLakeIndex(self):
+        """
+        Returns the LakeIndex of the input. It is built if it is missing, stale or BuildIndex is set.
+        """
+        TheIndex = LakeIndex.LakeIndex(self.InFileGMTtxt, self.HEADER_ORDER, self.HEADER_TYPES, 
+                                        RunLoud=self.RunLoud, RunSilent=self.RunSilent)
+        try:
+            if self.BuildIndex or not TheIndex.Load():
+                TheIndex.Build()
+        except LakeIndex.LakeIndexError as err:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            raise ProcessingError(exc_traceback.tb_lineno, err, err.message)
+        return TheIndex
+    
+    def ParseLAKESIndexed(self):
+        """
+        Like ParseLAKES but the lakes are selected from the sidecar index (see LakeIndex.py).
+        With Vectorized the selection is made with NumPy masks, otherwise the testers are
+        run on each candidate lake. The header of the input and the byte ranges of matching 
+        lakes are copied to the output.
+        """
+        TheIndex = self.LoadLakeIndex()
+        
+        if self.Vectorized:
+            SelectedLakes, FullStats = self.SelectLakesVectorized(TheIndex)
+        else:
+            SelectedLakes, FullStats = self.SelectLakesIndexed(TheIndex)
+        
+        if self.RunLoud:
+            print("{} of {} lakes selected from the index".format(len(SelectedLakes), TheIndex.LakeCount))
+        
+        # Coordinates are rewritten when simplifying or clipping
+        RewriteGeometry = (self.SimplifyTolerance is not None) or self.ClipToBounds
+        # Vertices before and after simplifying, rings clipped away
+        GeometryCounts = [0, 0, 0]
+        
+        CountTotalIslandsCopied = 0
+        # Selected lakes less any clipped away
+        CopiedLakes = []
+        CountBytesRead = TheIndex.HeaderLength
+        Reporter = self.Reporter
+        if Reporter is not None:
+            # Only the selected lakes are read
+            if self.SkipIslands:
+                Reporter.Expect(sum(TheIndex.LakeLength[i] for i in SelectedLakes))
+            else:
+                Reporter.Expect(sum(TheIndex.LakeLength[i] + TheIndex.IslandsLength[i] for i in SelectedLakes))
+        with open(self.InFileGMTtxt, 'rb') as InFile, self.OpenOutputFile('wb') as OutFile:
+            OutFile.write(InFile.read(TheIndex.HeaderLength))
+            for i in SelectedLakes:
+                InFile.seek(TheIndex.LakeOffset[i])
+                if self.SkipIslands:
+                    LakeText = InFile.read(TheIndex.LakeLength[i])
+                else:
+                    LakeText = InFile.read(TheIndex.LakeLength[i] + TheIndex.IslandsLength[i])
+                CountBytesRead += len(LakeText)
+                if Reporter is not None:
+                    Reporter.Advance(len(LakeText), 1)
+                if RewriteGeometry:
+                    LakeWritten, IslandsWritten = self.WriteGeometryText(OutFile, LakeText, GeometryCounts)
+                    if not LakeWritten:
+                        continue
+                    CountTotalIslandsCopied += IslandsWritten
+                else:
+                    OutFile.write(LakeText)
+                    if not self.SkipIslands:
+                        CountTotalIslandsCopied += TheIndex.IslandCount[i]
+                CopiedLakes.append(i)
+        if self.Instruments is not None:
+            # Only the selected lakes are read
+            self.Instruments.Count('BytesRead', CountBytesRead)
+        
+        self.FileStats = {'CountLakes':TheIndex.LakeCount,
+                        'CountTotalIslands':sum(TheIndex.IslandCount),
+                        'MostIslandsInLake':max(TheIndex.IslandCount, default=0),
+                        'CountLines':TheIndex.CountLines,
+                        'CountLakesCopied':len(CopiedLakes),
+                        'CountTotalIslandsCopied':CountTotalIslandsCopied}
+        self.FileStats.update(self.GeometryFileStats(GeometryCounts))
+        if self.ReportFullStats:
+            if len(CopiedLakes) < len(SelectedLakes):
+                self.CopiedFullStats(FullStats, TheIndex, CopiedLakes)
+            self.FileStats.update(FullStats)
+        if self.CollectFieldStats:
+            self.FileStats['FieldStats'] = self.IndexFieldStats(TheIndex, CopiedLakes)
+    
+    def SelectLakesIndexed(self, TheIndex):
+        """
+        Runs the testers on the lakes of TheIndex. Returns the list of matching lake numbers
+        in file order and the ReportFullStats dictionary (None without ReportFullStats).
+        """
+        # Columns in the order of self.HeaderListSubset so the testers find their _SearchIndex
+        Columns = [TheIndex.Columns[Name] for Name in self.HeaderListSubset]
+        
+        FullStats = None
+        if self.ReportFullStats:
+            FullStats = self.StartFullStats()
+        
+        # The pour point grid, or the box grid with BoundsOutline, narrows a bounds, mask or 
+        # region query to the lakes near it.
+        # Full stats need every lake so they read them all.
+        if self.BoundsOutline and not self.ReportFullStats:
+            CandidateLakes = self.IndexOutlineCandidates(TheIndex)
+        elif self.TestBounds and not self.ReportFullStats:
+            CandidateLakes = self.IndexBoundsCandidates(TheIndex)
+        elif (self.MaskGridFile is not None) and not self.ReportFullStats:
+            CandidateLakes = TheIndex.LakesInBounds(self.MaskGrid.Bounds())
+        elif (self.RegionPolygonFile is not None) and not self.ReportFullStats:
+            CandidateLakes = TheIndex.LakesInBounds(self.RegionPolygon.Bounds())
+        else:
+            CandidateLakes = range(TheIndex.LakeCount)
+        if self.RunLoud:
+            print("{} candidate lakes of {} in the index".format(len(CandidateLakes), TheIndex.LakeCount))
+        
+        SelectedLakes = []
+        LakePredicate = self.LakePredicate
+        for i in CandidateLakes:
+            self.LakeAtributesList = [Column[i] for Column in Columns]
+            if self.ReportFullStats:
+                self.UpdateFullStats(FullStats, False)
+            if LakePredicate(self.LakeAtributesList):
+                if self.BoundsOutline and self.ReportFullStats and not self.BoxMatchesBounds(
+                        (TheIndex.BoxWest[i], TheIndex.BoxEast[i], TheIndex.BoxSouth[i], TheIndex.BoxNorth[i])):
+                    continue
+                SelectedLakes.append(i)
+                if self.ReportFullStats:
+                    self.UpdateFullStats(FullStats, True)
+        
+        return SelectedLakes, FullStats
+    
+    def BuildLakeTable(self, TheIndex):
+        """
+        Returns a NumPy structured array with one row per lake in TheIndex and a field for each 
+        header element of interest (self.HeaderListSubset). Field dtypes follow HEADER_TYPES:
+        integer is int64, double is float64 and string is unicode as wide as the longest value.
+        Numeric fields are made straight from the index columns without a Python loop.
+        """
+        Fields = []
+        for Name, Type in zip(self.HeaderListSubset, self.HeaderTypeListSubset):
+            if 'int' in Type:
+                Fields.append((Name, np.int64))
+            elif 'doub' in Type:
+                Fields.append((Name, np.float64))
+            else:
+                Width = max((len(Value) for Value in TheIndex.Columns[Name]), default=1)
+                Fields.append((Name, 'U{}'.format(max(Width, 1))))
+        
+        LakeTable = np.empty(TheIndex.LakeCount, dtype=Fields)
+        for Name, Type in zip(self.HeaderListSubset, self.HeaderTypeListSubset):
+            if 'str' in Type:
+                LakeTable[Name] = TheIndex.Columns[Name]
+            else:
+                LakeTable[Name] = np.frombuffer(TheIndex.Columns[Name], dtype=LakeTable.dtype[Name])
+        return LakeTable
+    
+    def BoundsMask(self, Lon, Lat, Bounds):
+        """
+        Boolean mask of the points Lon, Lat (arrays) within Bounds [W E S N BoundsIncDateline].
+        The same test as LakeMatchesBoundsSimple.
+        """
+        Mask = (Lat >= Bounds[2]) & (Lat <= Bounds[3])
+        if not Bounds[4]:
+            Mask &= (Lon >= Bounds[0]) & (Lon <= Bounds[1])
+        else:
+            # split across International Dateline
+            Mask &= ((Lon >= Bounds[0]) & (Lon <= 180.0)) | ((Lon >= -180.0) & (Lon <= Bounds[1]))
+        return Mask
+    
+    def OutlineMask(self, TheIndex):
+        """
+        Boolean mask of the lakes in TheIndex whose perimeter bounding box overlaps 
+        SimpleBounds or any box of BoundsList. The same test as BoxMatchesBounds.
+        """
+        West = np.frombuffer(TheIndex.BoxWest, dtype=np.float64)
+        East = np.frombuffer(TheIndex.BoxEast, dtype=np.float64)
+        South = np.frombuffer(TheIndex.BoxSouth, dtype=np.float64)
+        North = np.frombuffer(TheIndex.BoxNorth, dtype=np.float64)
+        
+        if not self.SimpleBounds:
+            return self.BoundsMatcher.BoxesMatch(West, East, South, North)
+        Bounds = self.SimpleBounds
+        Mask = (South <= Bounds[3]) & (North >= Bounds[2])
+        if not Bounds[4]:
+            Mask &= (West <= Bounds[1]) & (East >= Bounds[0])
+        else:
+            # split across International Dateline
+            Mask &= (East >= Bounds[0]) | (West <= Bounds[1])
+        return Mask
+    
+    def LakeMask(self, LakeTable, TheIndex):
+        """
+        Evaluates every active test over LakeTable, the lakes of TheIndex, at once. Returns 
+        a boolean mask of the lakes that match all of them. Text tests are case insensitive substring matches 
+        as in LakeMatchesName etc.
+        """
+        Mask = np.ones(len(LakeTable), dtype=bool)
+        
+        if self.BoundsOutline:
+            Mask &= self.OutlineMask(TheIndex)
+        elif self.TestBounds:
+            Lon = LakeTable['Pour_long']
+            Lat = LakeTable['Pour_lat']
+            if self.SimpleBounds:
+                Mask &= self.BoundsMask(Lon, Lat, self.SimpleBounds)
+            else:
+                Mask &= self.BoundsMatcher.PointsMatch(Lon, Lat)
+        
+        if self.MaskGridFile is not None:
+            Mask &= self.MaskGrid.PointsMatch(LakeTable['Pour_long'], LakeTable['Pour_lat'])
+        
+        if self.RegionPolygonFile is not None:
+            Mask &= self.RegionPolygon.PointsMatch(LakeTable['Pour_long'], LakeTable['Pour_lat'])
+        
+        if self.AreaMin is not None:
+            Mask &= LakeTable['Lake_area'] >= self.AreaMin
+        if self.AreaMax is not None:
+            Mask &= LakeTable['Lake_area'] <= self.AreaMax
+        
+        for Input, Field in (('LakeName', 'Lake_name'), ('CountryName', 'Country'), ('ContinentName', 'Continent')):
+            SearchString = getattr(self, Input)
+            if SearchString is not None:
+                Mask &= np.char.find(np.char.lower(LakeTable[Field]), SearchString) != -1
+        
+        # Name lists are matched once per distinct value then mapped back to the lakes
+        for Input, Field, MatcherName in (('LakeNameFile', 'Lake_name', 'LakeNameMatcher'), ('CountryNameFile', 'Country', 'CountryNameMatcher')):
+            if getattr(self, Input) is not None:
+                Matcher = getattr(self, MatcherName)
+                UniqueValues, Inverse = np.unique(LakeTable[Field], return_inverse=True)
+                UniqueMatches = np.array([Matcher.Matches(Value) for Value in UniqueValues.tolist()], dtype=bool)
+                Mask &= UniqueMatches[Inverse]
+        
+        return Mask
+    
+    def SelectLakesVectorized(self, TheIndex):
+        """
+        The Vectorized version of SelectLakesIndexed. Loads the header elements of interest 
+        into a structured array and selects lakes with one boolean mask.
+        Returns the matching lake numbers in file order and the ReportFullStats dictionary.
+        """
+        LakeTable = self.BuildLakeTable(TheIndex)
+        Mask = self.LakeMask(LakeTable, TheIndex)
+        SelectedLakes = np.flatnonzero(Mask).tolist()
+        
+        FullStats = None
+        if self.ReportFullStats:
+            FullStats = self.StartFullStats()
+            for Key, HeaderIndex, MinOrMax, Copied in self.FULL_STATS_FIELDS:
+                Values = LakeTable[self.HEADER_ORDER[HeaderIndex]]
+                if Copied:
+                    Values = Values[Mask]
+                if len(Values) == 0:
+                    continue
+                if MinOrMax == 'min':
+                    FullStats[Key] = min(FullStats[Key], Values.min().item())
+                else:
+                    FullStats[Key] = max(FullStats[Key], Values.max().item())
+        
+        return SelectedLakes, FullStats
+    
+    @staticmethod
+    def ReadNameFile(InputName, NameFile):
+        """
+        Reads a file with one name per line. Surrounding spaces and quotes are removed, 
+        as in ExtractLakeHeader, and blank lines are skipped. Returns a list of names.
+        InputName is the init input, used in the InitInputError if there is an error.
+        """
+        if not os.path.exists(NameFile):
+            raise InitInputError(InputName, NameFile, 'ERROR - No name file found - {}'.format(NameFile))
+        
+        with open(NameFile, 'r') as InFile:
+            Names = [line.strip('"\' \n\t\r') for line in InFile]
+        Names = [Name for Name in Names if Name]
+        
+        if not Names:
+            raise InitInputError(InputName, NameFile, 'ERROR - no names found in {}'.format(NameFile))
+        return Names
+    
+    def ReadJobFile(self, JobFile):
+        """
+        Reads JobFile, a JSON list of dictionaries of LakesParser options, and returns a 
+        LakesParser for each. See the class __doc__. Raises InitInputError for a bad job, 
+        with the job number in the message.
+        """
+        try:
+            with open(JobFile, 'r') as TheFile:
+                JobList = json.load(TheFile)
+        except (OSError, ValueError) as err:
+            raise InitInputError('JobFile', JobFile, 'ERROR - Could not read job file {}: {}'.format(JobFile, err))
+        if not isinstance(JobList, list):
+            raise InitInputError('JobFile', JobFile, 'ERROR - Job file {} should be a JSON list of jobs'.format(JobFile))
+        
+        Jobs = []
+        OutputFiles = set()
+        if self.OutputFile is not None:
+            OutputFiles.add(os.path.abspath(self.OutputFile))
+        for JobNumber, JobOptions in enumerate(JobList, start=1):
+            if not isinstance(JobOptions, dict):
+                raise InitInputError('JobFile', JobOptions, 'ERROR - Job {} in {} is not a dictionary of options'.format(JobNumber, JobFile))
+            for Input in JobOptions:
+                if (Input not in self.ALLOWED_INPUTS) or (Input in self.JOB_EXCLUDED_INPUTS):
+                    raise InitInputError('JobFile', Input, 'ERROR - Job {} in {} can not set {}'.format(JobNumber, JobFile, Input))
+            if JobOptions.get('OutputFile') is None:
+                raise InitInputError('JobFile', JobOptions, 'ERROR - Job {} in {} has no OutputFile'.format(JobNumber, JobFile))
+            if os.path.abspath(JobOptions['OutputFile']) in OutputFiles:
+                raise InitInputError('JobFile', JobOptions['OutputFile'], 'ERROR - Job {} in {} repeats OutputFile {}'.format(JobNumber, JobFile, JobOptions['OutputFile']))
+            OutputFiles.add(os.path.abspath(JobOptions['OutputFile']))
+            
+            Options = {Input:getattr(self, Input) for Input in self.JOB_INHERITED_INPUTS}
+            Options.update(JobOptions)
+            # JSON has no separate float type, 5 is as good as 5.0
+            for Input, Value in Options.items():
+                if (self.ALLOWED_INPUTS[Input][0] is float) and isinstance(Value, int) and not isinstance(Value, bool):
+                    Options[Input] = float(Value)
+            
+            try:
+                Jobs.append(type(self)(self.InputFile, RunLoud=False, RunSilent=True, **Options))
+            except InitInputError as err:
+                raise InitInputError(err.var, err.InputRec, 'Job {} in {}: {}'.format(JobNumber, JobFile, err.message))
+        return Jobs
+    
+    @staticmethod
+    def ReadPointsFile(PointsFile):
+        """
+        Reads PointsFile, one lon lat point per line separated by spaces, tabs or a comma.
+        Lines starting with # are comments. Returns an array('d') of lon, lat, lon, lat, ...
+        Raises InitInputError if any point line does not have exactly two values.
+        """
+        with open(PointsFile, 'rb') as InFile:
+            Text = InFile.read().replace(b',', b' ')
+        try:
+            Coordinates = GMTGeometry.ParseCoordinates(Text)
+        except ValueError as err:
+            raise InitInputError('PointsFile', PointsFile, 'ERROR - PointsFile should have two values, lon lat, per line: {}'.format(err))
+        
+        # An even number of values may still not be two per line, lon lat z for example
+        PointLines = (line for line in Text.split(b'\n') if line.strip() and not line.startswith(b'#'))
+        for PointNumber, line in enumerate(PointLines, start=1):
+            if len(line.split()) != 2:
+                raise InitInputError('PointsFile', PointsFile, 'ERROR - PointsFile should have two values, lon lat, per line. Point {} has {}: {}'.format(
+                                        PointNumber, len(line.split()), line.decode(errors='replace').strip()))
+        return Coordinates
+    
+    @classmethod
+    def ReadBoundsFile(cls, BoundsFile, Verbose=False):
+        """
+        Reads a bounds file with one set of bounds per line in order W E S N. Values may be
+        separated by spaces, tabs or commas. Blank lines and lines starting with # are skipped.
+        Each set is checked with BoundsDatelineCheck. Returns a list of [W E S N BoundsIncDateline].
+        Raises InitInputError or BoundsInconsistentError naming the line if there is an error.
+        """
+        BoundsList = []
+        with open(BoundsFile, 'r') as InFile:
+            for LineNumber, line in enumerate(InFile, start=1):
+                line = line.strip()
+                if (not line) or line.startswith('#'):
+                    continue
+                
+                try:
+                    Bounds = [float(Element) for Element in line.replace(',', ' ').split()]
+                except ValueError:
+                    raise InitInputError('BoundsFile', line, 'ERROR - bounds file {} line {} is not numbers: {}'.format(BoundsFile, LineNumber, line))
+                if len(Bounds) != 4:
+                    raise InitInputError('BoundsFile', line, 'ERROR - bounds file {} line {} should have 4 values W E S N: {}'.format(BoundsFile, LineNumber, line))
+                
+                try:
+                    DatelineCrossed = cls.BoundsDatelineCheck(Bounds, Verbose=Verbose)
+                except BoundsInconsistentError as err:
+                    raise BoundsInconsistentError(err.Directions, err.InputRec, 'Bounds file {} line {}: {}'.format(BoundsFile, LineNumber, err.message))
+                
+                Bounds.append(DatelineCrossed)
+                BoundsList.append(Bounds)
+        
+        if not BoundsList:
+            raise InitInputError('BoundsFile', BoundsFile, 'ERROR - no bounds found in bounds file {}'.format(BoundsFile))
+        return BoundsList
     
     @classmethod
     def BoundsDatelineCheck(self, Bounds, Verbose=False):
@@ -1136,12 +3478,57 @@ if __name__ == "__main__":
                         
     parser.add_argument("-stat", "-STAT", "--ReportFullStats", action="store_true",
                         help="Out a full set of statistics. May take a bit longer.")
+    parser.add_argument("-HIST", "-hist", "--OutputForHistogram", action="store_true",
+                        help="Write statistics, quantiles and log binned histograms of each numeric lake attribute of the output lakes to OutputFile.stats.json")
+    
+    parser.add_argument("-CD", "-cd", "--CacheDirectory", action="store", nargs=1,
+                        help="Keep shapefile conversions in CacheDirectory. Default $PARSESHEDS_CACHE_DIR or ~/.cache/ParseSHEDS.")
+    parser.add_argument("-CS", "-cs", "--CacheSizeMB", action="store", nargs=1, type=float, metavar='MB',
+                        help="Delete the least recently used shapefile conversions when the cache is over MB. Default {} MB.".format(
+                            ConversionCache.ConversionCache.DEFAULT_MAX_BYTES // 1024 ** 2))
+    parser.add_argument("-NS", "-ns", "--NativeShapefile", action="store_true",
+                        help="Read a .shp InputFile directly rather than converting it with ogr2ogr. Only the geometry of output lakes is read.")
+    parser.add_argument("-SC", "-sc", "--StreamConversion", action="store_true",
+                        help="Parse ogr2ogr output from a pipe as the .shp InputFile is converted, rather than converting to a file first.")
+    parser.add_argument("-DB", "-db", "--DecompressInBackground", action="store_true",
+                        help="Decompress a compressed InputFile (.gz, .bz2, .xz, .zst) in a separate thread while parsing.")
+    parser.add_argument("-BIN", "-bin", "--BinaryOutput", action="store", nargs=1, choices=['float32', 'float64'],
+                        help="Write OutputFile as a GMT native binary table for gmt plot -bi2f or -bi2d. Lake headers go to OutputFile.hdr.")
+    parser.add_argument("-INST", "-inst", "--Instrument", action="store_true",
+                        help="Time the conversion, scanning, header decoding, filtering and writing phases and count bytes read and written and the lakes each test rejected.")
+    parser.add_argument("-IF", "-if", "--InstrumentationFile", action="store", nargs=1,
+                        help="Write the -INST report to InstrumentationFile as JSON, or as a Prometheus textfile if it ends in .prom. Implies -INST.")
+    parser.add_argument("-PR", "-pr", "--Progress", action="store_true",
+                        help="Print the percentage of the input read, MB/s, lakes per second and time left to stderr while parsing.")
+    
+    parser.add_argument("-UI", "-ui", "--UseIndex", action="store_true",
+                        help="Select lakes with the sidecar index InputFile.lakeidx. It is built on the first run and rebuilt when InputFile changes. Bounds queries only read lakes near the bounds.")
+    parser.add_argument("-BI", "-bi", "--BuildIndex", action="store_true",
+                        help="Rebuild the sidecar index InputFile.lakeidx then use it as with -UI.")
+    parser.add_argument("-P", "-p", "--Processes", action="store", nargs=1, type=int, metavar='N',
+                        help="Parse the input in N worker processes. Output is the same as with one process.")
+    parser.add_argument("-MM", "-mm", "--MemoryMap", action="store_true",
+                        help="Scan the input as a memory mapped file. Faster, especially when most lakes are skipped.")
+    parser.add_argument("-VEC", "-vec", "--Vectorized", action="store_true",
+                        help="Select lakes from the sidecar index with NumPy arrays. Implies -UI. Needs NumPy.")
                         
     BoundsGroup = parser.add_mutually_exclusive_group(required=False)
     BoundsGroup.add_argument("-B", "-b", "--Bounds", action="store", nargs=4, type=float, metavar=('W', 'E', 'S', 'N'),
                         help="Set limits on which lakes to output based on latitude and longitude.\nOnly the pour point will be checked. Lake parts may leave the boundry. \nUse decimal notation and - for south and west.")
     BoundsGroup.add_argument("-BF", "-bf", "--BoundsFile", action="store", nargs=1,
                             help="Only output lakes within one of the bounds in BoundsFile. The file should have one set of bounds per line in order: W E S N. Use decimal degrees and - for south and west.")
+    parser.add_argument("-MG", "-mg", "--MaskGridFile", action="store", nargs=1,
+                        help="Only output lakes whose pour point is on a non zero cell of the mask grid in MaskGridFile, an ESRI ASCII grid (.asc), NumPy .npz of Mask and Extent, or lon lat value xyz text.")
+    parser.add_argument("-RP", "-rp", "--RegionPolygonFile", action="store", nargs=1,
+                        help="Only output lakes whose pour point is inside the GMT polygon in RegionPolygonFile, such as a province outline.")
+    parser.add_argument("-BO", "-bo", "--BoundsOutline", action="store_true",
+                        help="With -B or -BF, test the bounding box of the lake outline rather than the pour point. Lakes partly inside the bounds are output.")
+    parser.add_argument("-PF", "-pf", "--PointsFile", action="store", nargs=1,
+                        help="Look up the lake of each lon lat point in PointsFile. OutputFile gets lon lat Hylak_id per point, 0 if in no lake or on an island, with or without SkipIslands. Needs NumPy.")
+    parser.add_argument("-JF", "-jf", "--JobFile", action="store", nargs=1,
+                        help="Also run each job in the JSON JobFile in the same scan of InputFile. Each job is a dictionary of options with its own OutputFile.")
+    parser.add_argument("-CLIP", "-clip", "--ClipToBounds", action="store_true",
+                        help="With -B, clip lake and island outlines to the bounds. Implies -BO.")
     
     parser.add_argument("-AL", "-al", "--AreaMin", action="store", nargs=1, type=float, metavar='km^2',
                         help="Minimum lake area in square kilometers. Only lakes >= AreaMin will be included.")
@@ -1159,9 +3546,17 @@ if __name__ == "__main__":
                             help="Only output lakes in country CountryName. Use -CN ! for only lakes with empty country field.")
     CountryGroup.add_argument("-CNF", "-cnf", "--CountryNameFile", action="store", nargs=1,
                             help="Only output for countries listed in CountryNameFile. The file should have one country name per line")
+    parser.add_argument("-NFS", "-nfs", "--NameFileSubstring", action="store_true",
+                            help="With -LNF or -CNF, output lakes whose name or country contains any name in the file rather than exactly matching one.")
     
     parser.add_argument("-CTN", "-ctn", "--ContinentName", action="store", nargs=1,
                             help="Only output lakes in Continent ContinentName.")
+    
+    SimplifyGroup = parser.add_mutually_exclusive_group(required=False)
+    SimplifyGroup.add_argument("-SIMP", "-simp", "--Simplify", action="store", nargs=1, type=float, metavar='Degrees',
+                            help="Simplify lake and island outlines with Douglas-Peucker, dropping detail smaller than Degrees.")
+    SimplifyGroup.add_argument("-SDPI", "-sdpi", "--SimplifyScaleDPI", action="store", nargs=2, type=float, metavar=('Scale', 'DPI'),
+                            help="Simplify as -SIMP with the tolerance set to one pixel of a 1:Scale map printed at DPI.")
     args = parser.parse_args()
     
     #print(args.LakeName)
@@ -1224,13 +3619,41 @@ if __name__ == "__main__":
     #SkipIslands = SkipIslands above
     InputsList.pop('ReportFullStats')
     #ReportFullStats = ReportFullStats above
+    InputsList.pop('UseIndex')
+    UseIndex = args.UseIndex
+    InputsList.pop('BuildIndex')
+    BuildIndex = args.BuildIndex
+    InputsList.pop('MemoryMap')
+    MemoryMap = args.MemoryMap
+    InputsList.pop('Vectorized')
+    Vectorized = args.Vectorized
+    InputsList.pop('NameFileSubstring')
+    NameFileSubstring = args.NameFileSubstring
+    InputsList.pop('BoundsOutline')
+    BoundsOutline = args.BoundsOutline
+    InputsList.pop('ClipToBounds')
+    ClipToBounds = args.ClipToBounds
     
-    # TODO implement OutputForHistogram
     InputsList.pop('OutputForHistogram')
+    OutputForHistogram = args.OutputForHistogram
+    InputsList.pop('NativeShapefile')
+    NativeShapefile = args.NativeShapefile
+    InputsList.pop('StreamConversion')
+    StreamConversion = args.StreamConversion
+    InputsList.pop('DecompressInBackground')
+    DecompressInBackground = args.DecompressInBackground
+    InputsList.pop('Instrument')
+    Instrument = args.Instrument
+    InputsList.pop('Progress')
+    Progress = args.Progress
+    # Library callers only
+    InputsList.pop('ProgressCallback')
     
     # Bounds is a list so [0] would cause issues
     InputsList.pop('SimpleBounds')
     SimpleBounds = args.Bounds
+    InputsList.pop('SimplifyScaleDPI')
+    SimplifyScaleDPI = args.SimplifyScaleDPI
     
     for Input in InputsList:
         # eval cannot handle setting a value to a var - use exec
@@ -1260,18 +3683,38 @@ if __name__ == "__main__":
                                 SkipIslands=SkipIslands,
                                 RunLoud=RunLoud, 
                                 RunSilent=RunSilent, 
-                                OutputForHistogram=False,
+                                OutputForHistogram=OutputForHistogram,
                                 ReportFullStats=ReportFullStats,
-                                Overwrite=Overwrite)
+                                Overwrite=Overwrite,
+                                UseIndex=UseIndex,
+                                BuildIndex=BuildIndex,
+                                Processes=Processes,
+                                MemoryMap=MemoryMap,
+                                Vectorized=Vectorized,
+                                NameFileSubstring=NameFileSubstring,
+                                Simplify=Simplify,
+                                SimplifyScaleDPI=SimplifyScaleDPI,
+                                BoundsOutline=BoundsOutline,
+                                ClipToBounds=ClipToBounds,
+                                PointsFile=PointsFile,
+                                JobFile=JobFile,
+                                CacheDirectory=CacheDirectory,
+                                CacheSizeMB=CacheSizeMB,
+                                NativeShapefile=NativeShapefile,
+                                StreamConversion=StreamConversion,
+                                DecompressInBackground=DecompressInBackground,
+                                BinaryOutput=BinaryOutput,
+                                Instrument=Instrument,
+                                InstrumentationFile=InstrumentationFile,
+                                Progress=Progress,
+                                MaskGridFile=MaskGridFile,
+                                RegionPolygonFile=RegionPolygonFile)
     except InitInputError as err:
         print("ERROR - FAIL")
         print(err.message)
         print('Exiting with code 15')
         sys.exit(15)
     
-    # Temp
-    import time
-    start_time = time.time()
     try:
         ParserObj.ParseLAKES()
     except InitInputError as err:
@@ -1287,18 +3730,30 @@ if __name__ == "__main__":
         print('Exiting with code 16')
         sys.exit(16)
     
-    # Temp
-    print("--- %s seconds ---" % (time.time() - start_time))
-        
+    # The run time is in the Instrumentation report with -INST
     if not RUN_SILENT:
-        for key, value in ParserObj.FileStats.items():
-            print('{} {}'.format(key, value))
+        # With a JobFile the stats of each job follow its OutputFile
+        for Job in getattr(ParserObj, 'Jobs', [ParserObj]):
+            if ParserObj.JobFile is not None:
+                print('\n{}'.format(Job.OutputFile))
+            for key, value in Job.FileStats.items():
+                if key == 'FieldStats':
+                    for Field, Stats in value.items():
+                        print('{} Count {} Min {} Max {} Mean {} Median {}'.format(Field, Stats['Count'], Stats['Min'], 
+                                Stats['Max'], Stats['Mean'], Stats['Quantiles']['0.5']))
+                elif key == 'Instrumentation':
+                    print(Instrumentation.FormatReport(value))
+                else:
+                    print('{} {}'.format(key, value))
     
     sys.exit(0)
 
 #python3 ParseSHEDSLake.py /Volumes/ExtWorking/Cartography/HydroSHEDS/HydroLAKES_polys_v10_shp/HydroLAKES_polys_v10_TempConv.gmt /Volumes/ExtWorking/Cartography/testo.gmt -AL 5  -v -o -B 46 48 44 46
 
 # # Time Records
+#   Early timings on the full HydroLAKES file. For repeatable timings on synthetic data, with a
+#   history to compare against, use BenchmarkSHEDS.py.
+#
 #   Time (s)    Action
 #   27.89       Simple Bounds - 385 lakes
 #   27.26       Simple Bounds + area min - 7 lakes (getattr)
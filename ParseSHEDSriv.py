@@ -85,7 +85,26 @@ PEN_HELP_TEXT = "Pen Help goes here"
 # import argparse if called as __main__ only
 import os
 import traceback
+import contextlib
+import functools
 import sys
+import shlex
+import subprocess
+import io
+import tempfile
+
+import GMTScanner
+import GMTGeometry
+import ConversionCache
+import ShapefileReader
+import CompressedFiles
+import GMTBinary
+import Instrumentation
+import ProgressReporter
+import MaskGrid
+import RegionPolygon
+# BoundsFile is read and matched as for lakes
+import ParseSHEDSLake
 
 
     
@@ -116,6 +135,20 @@ class InitInputError(Exception):
         self.message = message
         self.InputRec = InputRec
 
+class ProcessingError(Exception):
+    """
+    Exception raised for errors while processing the input file.
+    Attributes:
+        Line - line num
+        message - explanation of the error
+        CauseException = original exception, if any. may be None
+    """
+    def __init__(self, Line, CauseException, message):
+        self.Line = Line
+        self.message = message
+        self.CauseException = CauseException
+        super(ProcessingError, self).__init__(message)
+
 class SHEDSrivParser:
     """
     Class wrapper for parsing HydroSHEDS river network (riv) data for GMT. 
@@ -138,10 +171,78 @@ class SHEDSrivParser:
                         RunLoud=False, 
                         RunSilent=False, 
                         OutputForHistogram=False, 
-                        Overwrite=False
+                        Overwrite=False,
+                        MemoryMap=False,
+                        CacheDirectory=None,
+                        CacheSizeMB=None,
+                        NativeShapefile=False,
+                        StreamConversion=False,
+                        DecompressInBackground=False,
+                        BinaryOutput=None,
+                        Instrument=False,
+                        InstrumentationFile=None,
+                        Progress=False,
+                        ProgressCallback=None,
+                        MaskGridFile=None,
+                        RegionPolygonFile=None
                         
     Run <SHEDSrivParser object name>.ParseRIV() after instantiating.
     
+    MemoryMap scans the input as bytes with GMTScanner.py rather than line by line.
+    Only segment comment lines are decoded and skipped segments are passed over without 
+    reading their lines. Lines of copied segments are copied verbatim.
+    
+    Shapefile inputs are converted with ogr2ogr once and kept in a cache, see 
+    ConversionCache.py. CacheDirectory defaults to $PARSESHEDS_CACHE_DIR or 
+    ~/.cache/ParseSHEDS. The least recently used conversions are deleted when the cache 
+    is over CacheSizeMB.
+    
+    NativeShapefile reads a shapefile input directly with ShapefileReader.py instead of 
+    converting it. Segments are tested on the ARCID and UP_CELLS of the .dbf and, with 
+    bounds, on their first point, and only segments copied have their points read. 
+    Coordinates are written at full precision. Not used with OutputForHistogram.
+    
+    StreamConversion runs ogr2ogr on a shapefile input writing to a pipe (/vsistdout/) 
+    rather than to a file and parses the lines as they arrive, so converting and parsing 
+    overlap and nothing is written to disk but OutputFile. Skips the conversion cache. 
+    Not used with OutputForHistogram or NativeShapefile.
+    
+    GMT inputs compressed with gzip, bzip2, xz or zstd, found by their magic bytes or 
+    extension (.gz, .bz2, .xz, .zst), are decompressed as they are read line by line, 
+    without MemoryMap. DecompressInBackground decompresses in a separate thread so it 
+    overlaps with parsing. OutputFile is compressed when it has one of those extensions. 
+    See CompressedFiles.py.
+    
+    BinaryOutput, float32 or float64, writes OutputFile as a GMT native binary table of 
+    lon lat columns for gmt plot -bi2f or -bi2d, with a NaN record at each segment break. 
+    The segment headers, with any pens, and comment lines go to the sidecar 
+    <OutputFile>.hdr. See GMTBinary.py.
+    
+    Instrument times the phases of ParseRIV(), conversion, scanning, header decoding, 
+    filtering and writing, and counts the bytes read and written and the segments each 
+    test rejected. The report is FileStats['Instrumentation']. InstrumentationFile implies 
+    Instrument and writes the report to a JSON file, or a Prometheus textfile if its name 
+    ends in .prom. See Instrumentation.py.
+    
+    Progress prints the percentage of the input read, MB/s, segments per second and the 
+    time left to stderr a few times a second, or every few seconds when stderr is not a 
+    terminal. ProgressCallback implies Progress and is called with a dictionary of those 
+    instead, from a background thread. See ProgressReporter.py.
+    
+    BoundsFile has one set of bounds per line, W E S N, read as for LakesParser. Segments 
+    are copied if their first point is within any of them, found with 
+    ParseSHEDSLake.BoundsListMatcher. With SimpleBounds a segment must pass both.
+    
+    MaskGridFile is a raster mask, an ESRI ASCII grid (.asc), a NumPy archive (.npz) of 
+    Mask and Extent or xyz text. Segments are copied if their first point falls on a non 
+    zero cell, as with the bounds. With SimpleBounds a segment must pass both. See 
+    MaskGrid.py.
+    
+    RegionPolygonFile is a GMT polygon, such as a province outline, and segments are 
+    copied if their first point is inside it. The edges are bucketed into a grid once so 
+    each test looks at a few edges however many vertices the outline has. A segment must 
+    also pass SimpleBounds and MaskGridFile if set. See RegionPolygon.py.
+    
     """
 
     def __init__(self, InputFile,
@@ -155,13 +256,26 @@ class SHEDSrivParser:
                     RunLoud=False, 
                     RunSilent=False, 
                     OutputForHistogram=False, 
-                    Overwrite=False):
+                    Overwrite=False,
+                    MemoryMap=False,
+                    CacheDirectory=None,
+                    CacheSizeMB=None,
+                    NativeShapefile=False,
+                    StreamConversion=False,
+                    DecompressInBackground=False,
+                    BinaryOutput=None,
+                    Instrument=False,
+                    InstrumentationFile=None,
+                    Progress=False,
+                    ProgressCallback=None,
+                    MaskGridFile=None,
+                    RegionPolygonFile=None):
                     
         global SUPPORTED_INPUT_EXTENSIONS
         #print("SUPPORTED_INPUT_EXTENSIONS")
         #print(SUPPORTED_INPUT_EXTENSIONS)
 
-        BoolInputs = {"RunLoud":RunLoud, "RunSilent":RunSilent, "OutputForHistogram":OutputForHistogram, "Overwrite":Overwrite }
+        BoolInputs = {"RunLoud":RunLoud, "RunSilent":RunSilent, "OutputForHistogram":OutputForHistogram, "Overwrite":Overwrite, "MemoryMap":MemoryMap, "NativeShapefile":NativeShapefile, "StreamConversion":StreamConversion, "DecompressInBackground":DecompressInBackground, "Instrument":Instrument, "Progress":Progress }
         for key, value in BoolInputs.items():
             if isinstance(value, bool):
                 pass
@@ -178,7 +292,8 @@ class SHEDSrivParser:
         else:
             raise InitInputError("InputFile", InputFile, 'ERROR SHEDSrivParser class init - no path to InputFile:  {} '.format(InputFile))
         
-        InputExtension = InputFile[-3:]
+        # riv.gmt.gz is a gmt file
+        InputExtension = CompressedFiles.StripCompressionExtension(InputFile)[-3:]
 
         if InputExtension in SUPPORTED_INPUT_EXTENSIONS:
             pass
@@ -188,12 +303,78 @@ class SHEDSrivParser:
         if os.path.exists(OutputFile) and (Overwrite is False):
             raise InitInputError("OutputFile", OutputFile, 'ERROR SHEDSrivParser class init - OutputFile exists and overwrite is False:  {} '.format(OutputFile))
             
+        if (CacheSizeMB is not None) and not (isinstance(CacheSizeMB, (int, float)) and (CacheSizeMB >= 0)):
+            raise InitInputError("CacheSizeMB", CacheSizeMB, 'ERROR SHEDSrivParser class init - CacheSizeMB should be a number 0 or more, received {}'.format(CacheSizeMB))
+        
+        if (BinaryOutput is not None) and (BinaryOutput not in GMTBinary.PRECISIONS):
+            raise InitInputError("BinaryOutput", BinaryOutput, 'ERROR SHEDSrivParser class init - BinaryOutput should be one of {}, received {}'.format(list(GMTBinary.PRECISIONS), BinaryOutput))
+        
+        self.InputCompression = CompressedFiles.DetectCompression(InputFile)
+        if (self.InputCompression is not None) and (InputExtension in ("shp", "SHP")):
+            raise InitInputError("InputFile", InputFile, 'ERROR SHEDSrivParser class init - compressed shapefiles are not supported, decompress {} first'.format(InputFile))
+        
+        if NativeShapefile:
+            if InputExtension not in ("shp", "SHP"):
+                raise InitInputError("NativeShapefile", InputFile, 'ERROR SHEDSrivParser class init - NativeShapefile needs a .shp InputFile, received {}'.format(InputFile))
+            if OutputForHistogram:
+                raise InitInputError("NativeShapefile", NativeShapefile, 'ERROR SHEDSrivParser class init - NativeShapefile can not be used with OutputForHistogram')
+        
+        if StreamConversion:
+            if InputExtension not in ("shp", "SHP"):
+                raise InitInputError("StreamConversion", InputFile, 'ERROR SHEDSrivParser class init - StreamConversion needs a .shp InputFile, received {}'.format(InputFile))
+            if OutputForHistogram or NativeShapefile:
+                raise InitInputError("StreamConversion", StreamConversion, 'ERROR SHEDSrivParser class init - StreamConversion can not be used with OutputForHistogram or NativeShapefile')
+        
+        if InstrumentationFile is not None:
+            Instrument = True
+        # Made by InstrumentParsing when ParseRIV runs
+        self.Instruments = None
+        
+        if ProgressCallback is not None:
+            if not callable(ProgressCallback):
+                raise InitInputError("ProgressCallback", ProgressCallback, 'ERROR SHEDSrivParser class init - ProgressCallback should be callable, received {} of type {}'.format(ProgressCallback, type(ProgressCallback)))
+            Progress = True
+        # Made by StartProgress when ParseRIV runs
+        self.Reporter = None
+        
         if BoundsFile is not None:
             if os.path.exists(BoundsFile):
                 if RunLoud:
                     print(BoundsFile,'  - exists')
             else:
                 raise InitInputError("BoundsFile", BoundsFile, 'ERROR SHEDSrivParser class init - no path to BoundsFile:  {} '.format(BoundsFile))
+            try:
+                self.BoundsList = ParseSHEDSLake.LakesParser.ReadBoundsFile(BoundsFile, Verbose=RunLoud)
+            except (ParseSHEDSLake.InitInputError, ParseSHEDSLake.BoundsInconsistentError) as err:
+                raise InitInputError("BoundsFile", BoundsFile, 'ERROR SHEDSrivParser class init - {}'.format(err.message))
+            self.BoundsMatcher = ParseSHEDSLake.BoundsListMatcher(self.BoundsList)
+            if RunLoud:
+                print("Read {} bounds from {}".format(len(self.BoundsList), BoundsFile))
+        
+        if MaskGridFile is not None:
+            if not os.path.exists(MaskGridFile):
+                raise InitInputError("MaskGridFile", MaskGridFile, 'ERROR SHEDSrivParser class init - no path to MaskGridFile:  {} '.format(MaskGridFile))
+            try:
+                self.MaskGrid = MaskGrid.MaskGrid(MaskGridFile)
+            except MaskGrid.MaskGridError as err:
+                raise InitInputError("MaskGridFile", MaskGridFile, 'ERROR SHEDSrivParser class init - {}'.format(err))
+            if RunLoud:
+                print("Read a {} x {} mask grid with {} cells on from {}".format(self.MaskGrid.Rows, self.MaskGrid.Columns, self.MaskGrid.CountOn, MaskGridFile))
+        else:
+            self.MaskGrid = None
+        
+        if RegionPolygonFile is not None:
+            if not os.path.exists(RegionPolygonFile):
+                raise InitInputError("RegionPolygonFile", RegionPolygonFile, 'ERROR SHEDSrivParser class init - no path to RegionPolygonFile:  {} '.format(RegionPolygonFile))
+            try:
+                self.RegionPolygon = RegionPolygon.RegionPolygon(RegionPolygonFile)
+            except RegionPolygon.RegionPolygonError as err:
+                raise InitInputError("RegionPolygonFile", RegionPolygonFile, 'ERROR SHEDSrivParser class init - {}'.format(err))
+            if RunLoud:
+                print("Read a region polygon of {} rings and {} vertices on a {} x {} grid from {}".format(self.RegionPolygon.RingCount, 
+                        self.RegionPolygon.VertexCount, self.RegionPolygon.Rows, self.RegionPolygon.Columns, RegionPolygonFile))
+        else:
+            self.RegionPolygon = None
        
         if isinstance(ThresholdHigh, int) and (ThresholdHigh is not None):
             pass
@@ -211,11 +392,11 @@ class SHEDSrivParser:
                     if self.ValidateSimpleBounds(SimpleBounds):
                 
                         if SimpleBounds[0] <  SimpleBounds[1]:
-                            if RUN_LOUD:
+                            if RunLoud:
                                 print('Does not cross dateline')
                             BoundsIncDateline = False
                         else:
-                            if RUN_LOUD:
+                            if RunLoud:
                                 print('Bounds include the dateline. Now things are complicated')
                             BoundsIncDateline = True
                         
@@ -240,16 +421,29 @@ class SHEDSrivParser:
         #self.RunSilent = RunSilent     # Already done
         self.OutputForHistogram = OutputForHistogram
         self.Overwrite = Overwrite
+        self.MemoryMap = MemoryMap
+        self.CacheDirectory = CacheDirectory
+        self.CacheSizeMB = CacheSizeMB
+        self.NativeShapefile = NativeShapefile
+        self.StreamConversion = StreamConversion
+        self.DecompressInBackground = DecompressInBackground
+        self.BinaryOutput = BinaryOutput
+        self.Instrument = Instrument
+        self.InstrumentationFile = InstrumentationFile
+        self.Progress = Progress
+        self.ProgressCallback = ProgressCallback
         self.ThresholdHigh = ThresholdHigh
         self.ThresholdLow = ThresholdLow
         self.PenColour = PenColour
         self.PenWidth = PenWidth
         #self.SimpleBounds = ExpandedSimpleBounds
         self.BoundsFile = BoundsFile
+        self.MaskGridFile = MaskGridFile
+        self.RegionPolygonFile = RegionPolygonFile
         self.InputFile = InputFile
         self.OutputFile = OutputFile
         
-        if (self.SimpleBounds is not None) or (self.BoundsFile is not None):
+        if (self.SimpleBounds is not None) or (self.BoundsFile is not None) or (self.MaskGrid is not None) or (self.RegionPolygon is not None):
             self.CopyWithinBounds = True
         else:
             self.CopyWithinBounds = False
@@ -354,6 +548,108 @@ class SHEDSrivParser:
             print("HydroSHEDS distributes .shp, .dbf, .prj, and .shx files in the same zip file. \nThey should be kept in the same directory.\nExiting")
             exit(8)
 
+    def RunOgr2ogr(self, IntermediateFileName):
+        """
+        Converts the shapefile InputFile to the GMT file IntermediateFileName with ogr2ogr 
+        from GDAL. Exits if ogr2ogr cannot be run or fails.
+        """
+        if self.RunLoud:
+            print("Will create intermediate file\n  {}".format(IntermediateFileName))
+        
+        # Call ogr2ogr GDAL
+        if self.RunLoud:
+            CommandString = 'ogr2ogr -f "GMT" ' + shlex.quote(IntermediateFileName) + ' ' + shlex.quote(self.InputFile) + ' --debug ON'
+        elif not self.RunSilent:
+            CommandString = 'ogr2ogr -f "GMT" ' + shlex.quote(IntermediateFileName) + ' ' + shlex.quote(self.InputFile) 
+        else:
+            CommandString = 'ogr2ogr -f "GMT" ' + shlex.quote(IntermediateFileName) + ' ' + shlex.quote(self.InputFile) + ' --debug OFF >/dev/null 2>&1'
+
+        try:
+            if self.RunLoud:
+                print("Running: ", CommandString, "\n")
+            ExitStatus = os.system(CommandString)
+        except OSError as err:
+            print(" Error unable to run ",CommandString)
+            print("OSError")
+            print(err)
+            if self.RunLoud:
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                traceback.print_tb(exc_traceback)
+            exit(11)
+        except:
+            print(" Error unable to run ",CommandString)
+            print("We have no idea why it failed. Exiting")
+            if self.RunLoud:
+                exc_type, exc_value, exc_traceback = sys.exc_info()
+                traceback.print_tb(exc_traceback)
+            exit(12)
+    
+        if self.RunLoud:
+            print("ogr2ogr exit status: ",ExitStatus)
+            print("\n")
+        if ExitStatus != 0:
+            print("ogr2ogr appears to have failed.\nIt may be that you need to open GMT to access GDAL ogr2ogr. \nExiting")
+            exit(13)
+
+    def OpenOutputFile(self, Mode):
+        """
+        Opens OutputFile with Mode for the GMT text of the segments. A GMTBinary.BinaryWriter 
+        with BinaryOutput, otherwise compressed as its extension says, see CompressedFiles.py.
+        Raises InitInputError if the BinaryOutput header sidecar exists, unless Overwrite. 
+        OutputFile itself is checked in __init__.
+        """
+        if self.BinaryOutput is not None:
+            SidecarFileName = GMTBinary.SidecarFileName(self.OutputFile)
+            if os.path.exists(SidecarFileName) and not self.Overwrite:
+                raise InitInputError('BinaryOutput', SidecarFileName, 'ERROR SHEDSrivParser - BinaryOutput header file exists and overwrite is False:  {} '.format(SidecarFileName))
+            OutFile = GMTBinary.BinaryWriter(self.OutputFile, self.BinaryOutput)
+        else:
+            OutFile = CompressedFiles.Open(self.OutputFile, Mode)
+        if self.Instruments is not None:
+            return self.Instruments.CountingWriter(OutFile)
+        return OutFile
+
+    def TimedPhase(self, Phase):
+        """
+        Context manager timing Phase with Instrument. Does nothing without Instrument.
+        """
+        if self.Instruments is None:
+            return contextlib.nullcontext()
+        return self.Instruments.Phase(Phase)
+
+    def InstrumentParsing(self):
+        """
+        Starts self.Instruments, see Instrumentation.py, and replaces ParseUpstreamCells, 
+        UpstreamCellsWithinLimits and CheckBounds of this object with timed wrappers. The 
+        class is untouched so other parsers are not slowed.
+        """
+        self.Instruments = Instrumentation.Instruments('rivers')
+        self.ParseUpstreamCells = self.Instruments.Timed('HeaderDecoding', functools.partial(SHEDSrivParser.ParseUpstreamCells, self), 
+                                                        Counter='HeadersDecoded')
+        self.UpstreamCellsWithinLimits = self.Instruments.TimedTest(functools.partial(SHEDSrivParser.UpstreamCellsWithinLimits, self), 'Threshold')
+        self.CheckBounds = self.Instruments.TimedTest(functools.partial(SHEDSrivParser.CheckBounds, self), 'Bounds')
+
+    def StartProgress(self):
+        """
+        Starts self.Reporter, see ProgressReporter.py, counting segments as 
+        ParseUpstreamCells decodes them. The count goes around any Instrument wrapper.
+        """
+        self.Reporter = ProgressReporter.ProgressReporter('segments', Callback=self.ProgressCallback)
+        if self.Instruments is None:
+            self.ParseUpstreamCells = self.Reporter.Counted(functools.partial(SHEDSrivParser.ParseUpstreamCells, self))
+        else:
+            self.ParseUpstreamCells = self.Reporter.Counted(self.ParseUpstreamCells)
+        self.Reporter.Start()
+
+    def FinishInstrumentation(self):
+        """
+        Adds the Instrument report to FileStats and writes InstrumentationFile.
+        """
+        self.Instruments.Stop()
+        self.FileStats['Instrumentation'] = self.Instruments.Report()
+        if self.InstrumentationFile is not None:
+            self.Instruments.WriteFile(self.InstrumentationFile, self.InputFile)
+
     def ParseUpstreamCells(self, line):
         """
         Parse Upstream Cells 
@@ -459,10 +755,26 @@ class SHEDSrivParser:
             if self.CopyWithinBounds is True:
                 # Simple boundaries
                 if self.SimpleBounds is not None:
-                    return self.PointWithinBoundry(Lat,Lon,self.SimpleBounds)
+                    if not self.PointWithinBoundry(Lat,Lon,self.SimpleBounds):
+                        return False
                 
-                # TODO Add bounds file support
-                # It will not be and else. We support both simple and file bounds in same command - to return True must be in both bounds
+                # Bounds file, in any of its bounds
+                if self.BoundsFile is not None:
+                    if not self.BoundsMatcher.PointMatches(Lon,Lat):
+                        return False
+                
+                # Mask grid, one cell lookup
+                if self.MaskGrid is not None:
+                    if not self.MaskGrid.PointMatches(Lon,Lat):
+                        return False
+                
+                # Region polygon, the edges of one cell
+                if self.RegionPolygon is not None:
+                    if not self.RegionPolygon.PointMatches(Lon,Lat):
+                        return False
+                
+                # Simple and file bounds may both be set, a point must be in both
+                return True
         else:
             #print("Just returning true (Error if bounds set)")
             return True
@@ -510,7 +822,7 @@ class SHEDSrivParser:
         """
     
         if self.OutputForHistogram:
-            HistFileName = FileName[:-4] + '_UpCounts.txt'
+            HistFileName = CompressedFiles.StripCompressionExtension(FileName)[:-4] + '_UpCounts.txt'
             if (os.path.exists(HistFileName)) and (not self.Overwrite):
                 print("File exists. Use -o to overwrite. Exiting")
                 exit(9)
@@ -525,7 +837,7 @@ class SHEDSrivParser:
     
         SegmentHeaderFound = False
     
-        with open(FileName, 'r') as InFile:
+        with CompressedFiles.Open(FileName, 'r', Background=self.DecompressInBackground) as InFile:
             for line in InFile:
                 CountLines += 1
             
@@ -575,80 +887,187 @@ class SHEDSrivParser:
     def ParseRIV(self):
 
         # If .shp input, convert using ogr2ogr from GDAL. Exit with error if ogr2ogr is not accessable.
-        InputExtension = self.InputFile[-3:]
+        InputExtension = CompressedFiles.StripCompressionExtension(self.InputFile)[-3:]
         if self.RunLoud:
             print("InputFile extension is", InputExtension)
 
-        if (InputExtension == "shp") or (InputExtension == "SHP"):
-            if self.RunLoud:
-                print("Converting to gmt type file with GDAL ogr2ogr")
+        if self.Instrument:
+            self.InstrumentParsing()
+
+        if self.Progress:
+            self.StartProgress()
+
+        try:
+            if (InputExtension == "shp") or (InputExtension == "SHP"):
+                if self.RunLoud:
+                    print("Converting to gmt type file with GDAL ogr2ogr")
         
-            #ogr2ogr expects an shx file
-            # It also needs dbf and prj files but will silently produce undesired output if not provided
-            self.CheckExtension('shx')
-            self.CheckExtension('dbf')
-            self.CheckExtension('prj')
+                #ogr2ogr expects an shx file
+                # It also needs dbf and prj files but will silently produce undesired output if not provided
+                self.CheckExtension('shx')
+                self.CheckExtension('dbf')
     
-            IntermediateFileName = self.InputFile[:-4] + '_TempConv.gmt'
-            self.InFileGMTtxt = IntermediateFileName
-            if self.RunLoud:
-                print("Will create temporary intermediate file\n  {}".format(IntermediateFileName))
+                if self.NativeShapefile:
+                    self.ParseRIVNative()
+                    return
     
+                self.CheckExtension('prj')
     
-            # Call ogr2ogr GDAL
-            if self.RunLoud:
-                CommandString = 'ogr2ogr -f "GMT" ' + IntermediateFileName + ' ' + self.InputFile + ' --debug ON'
-            elif not self.RunSilent:
-                CommandString = 'ogr2ogr -f "GMT" ' + IntermediateFileName + ' ' + self.InputFile 
-            else:
-                CommandString = 'ogr2ogr -f "GMT" ' + IntermediateFileName + ' ' + self.InputFile + ' --debug OFF >/dev/null 2>&1'
+                if self.StreamConversion:
+                    self.ParseRIVStreamed()
+                    return
     
-            try:
+                # Converted once into the cache, later runs reuse the conversion
+                if self.CacheSizeMB is not None:
+                    CacheMaxBytes = int(self.CacheSizeMB * 1024 ** 2)
+                else:
+                    CacheMaxBytes = None
+                Cache = ConversionCache.ConversionCache(self.CacheDirectory, CacheMaxBytes, RunLoud=self.RunLoud)
+                try:
+                    with self.TimedPhase('Conversion'):
+                        self.InFileGMTtxt = Cache.Convert(self.InputFile, self.RunOgr2ogr)
+                except OSError as err:
+                    print(" Error using conversion cache ", Cache.CacheDirectory)
+                    print(err)
+                    exit(14)
+    
+        
+            elif (InputExtension == "gmt") or (InputExtension == "GMT"):
                 if self.RunLoud:
-                    print("Running: ", CommandString, "\n")
-                ExitStatus = os.system(CommandString)
+                    print("File type is gmt")
+    
+                self.InFileGMTtxt = self.InputFile
+    
+            else:
+                print("\nError input file type not supported. \nSupported extensions are: ",SUPPORTED_INPUT_EXTENSIONS)
+                exit(7)
+
+            # If specified parse the file for the largest and smallest upstream count
+            if self.OutputForHistogram:
+                FileSummary = self.SummarizeGMTFile(self.InFileGMTtxt)
+
+            if self.InputCompression is not None:
+                # Decompressed line by line, it can not be memory mapped
+                with CompressedFiles.Open(self.InFileGMTtxt, 'r', Background=self.DecompressInBackground) as InFile, self.OpenOutputFile('w') as OutFile, self.TimedPhase('Parsing'):
+                    self.FileStats = self.ParseRIVLines(InFile, OutFile)
+            elif self.MemoryMap:
+                with GMTScanner.MemoryMappedFile(self.InFileGMTtxt) as Data, self.OpenOutputFile('wb') as OutFile, self.TimedPhase('Parsing'):
+                    self.FileStats = self.ParseRIVBytes(Data, OutFile)
+            else:
+                # Move down the input file line by Line
+                with open(self.InFileGMTtxt, 'r') as InFile, self.OpenOutputFile('w') as OutFile, self.TimedPhase('Parsing'):
+                    self.FileStats = self.ParseRIVLines(InFile, OutFile)
+
+            self.ReportFileStats()
+        finally:
+            if self.Reporter is not None:
+                self.Reporter.Stop()
+
+    def ParseRIVNative(self):
+        """
+        ParseRIV for NativeShapefile. Reads InputFile with ShapefileReader.py and writes 
+        OutputFile with ParseRIVShapefile.
+        """
+        if self.RunLoud:
+            print("Reading the shapefile directly")
+        try:
+            with ShapefileReader.ShapefileReader(self.InputFile) as Reader, self.OpenOutputFile('wb') as OutFile, self.TimedPhase('Parsing'):
+                self.FileStats = self.ParseRIVShapefile(Reader, OutFile)
+        except ShapefileReader.ShapefileError as err:
+            print(" Error unable to read shapefile ", self.InputFile)
+            print(err)
+            exit(10)
+        
+        self.ReportFileStats()
+
+    def ParseRIVStreamed(self):
+        """
+        ParseRIV for StreamConversion. Runs ogr2ogr writing GMT text to its stdout and 
+        parses the pipe line by line with ParseRIVLines while ogr2ogr is still converting.
+        Raises ProcessingError if ogr2ogr cannot be run or fails. Run as __main__ these 
+        exit with the codes of RunOgr2ogr.
+        """
+        CommandString = 'ogr2ogr -f "GMT" /vsistdout/ ' + shlex.quote(self.InputFile)
+        if self.RunLoud:
+            CommandString += ' --debug ON'
+            print("Running: ", CommandString, "\n")
+
+        # stderr goes to a file so ogr2ogr can not stall on a full stderr pipe
+        with tempfile.TemporaryFile() as ErrFile:
+            try:
+                Process = subprocess.Popen(CommandString, shell=True, stdout=subprocess.PIPE, stderr=ErrFile)
             except OSError as err:
                 print(" Error unable to run ",CommandString)
                 print("OSError")
                 print(err)
+                exc_type, exc_value, exc_traceback = sys.exc_info()
                 if self.RunLoud:
-                    exc_type, exc_value, exc_traceback = sys.exc_info()
-                    traceback.print_tb(exc_traceback)
-                exit(11)
-            except:
-                print(" Error unable to run ",CommandString)
-                print("We have no idea why it failed. Exiting")
-                if self.RunLoud:
-                    exc_type, exc_value, exc_traceback = sys.exc_info()
                     traceback.print_tb(exc_traceback)
-                exit(12)
-        
-            if self.RunLoud:
-                print("ogr2ogr exit status: ",ExitStatus)
-                print("\n")
-            if ExitStatus != 0:
-                print("ogr2ogr appears to have failed.\nIt may be that you need to open GMT to access GDAL ogr2ogr. \nExiting")
-                exit(13)
-    
-        
-        elif (InputExtension == "gmt") or (InputExtension == "GMT"):
-            if self.RunLoud:
-                print("File type is gmt")
-    
-            self.InFileGMTtxt = self.InputFile
-    
-        else:
-            print("\nError input file type not supported. \nSupported extensions are: ",SUPPORTED_INPUT_EXTENSIONS)
-            exit(7)
+                raise ProcessingError(exc_traceback.tb_lineno, err, "ERROR running {} received {}".format(CommandString, type(err).__name__))
 
-        # If specified parse the file for the largest and smallest upstream count
-        if self.OutputForHistogram:
-            FileSummary = self.SummarizeGMTFile(self.InFileGMTtxt)
+            try:
+                # Decoded the same way as a file opened with open(<file>, 'r')
+                with io.TextIOWrapper(Process.stdout) as InFile, self.OpenOutputFile('w') as OutFile, self.TimedPhase('Parsing'):
+                    self.FileStats = self.ParseRIVLines(InFile, OutFile)
+            except BaseException:
+                # ogr2ogr would block on the pipe no one is reading
+                Process.kill()
+                Process.wait()
+                raise
+            ExitStatus = Process.wait()
+
+            ErrFile.seek(0)
+            StdErr = ErrFile.read().decode(errors='replace')
+
+        if self.RunLoud:
+            print("ogr2ogr stderr")
+            print(StdErr)
+            print("ogr2ogr exit status: ",ExitStatus)
+            print("\n")
+        if ExitStatus != 0:
+            if not self.RunSilent:
+                print(StdErr)
+            # Special case - cannot find ogr2ogr. The shell exits 127.
+            if (ExitStatus == 127) or ("ogr2ogr: command not found" in StdErr):
+                print("\n*\n*\n*\n ogr2ogr was not found\n  It may not be installed. \n  If you use GMT to access it,\n  start GMT and run ParseSHEDSriv from the same shell.\n*\n\n\n")
+                raise ProcessingError(None, StdErr, "ERROR ogr2ogr: command not found - try running it alone from the command line to see if you can reach it.")
+            print("ogr2ogr appears to have failed.\nIt may be that you need to open GMT to access GDAL ogr2ogr. \nExiting")
+            raise ProcessingError(None, StdErr, "ERROR non zero exit {} running {}".format(ExitStatus, CommandString))
+
+        self.ReportFileStats()
+
+    def ReportFileStats(self):
+        """
+        Prints FileStats with RunLoud and the closing message. With Instrument first adds 
+        the report to FileStats and with Progress reports the end of the run.
+        """
+        if self.Instruments is not None:
+            self.FinishInstrumentation()
+
+        if self.Reporter is not None:
+            self.Reporter.Stop()
 
-        # Move down the input file line by Line
-        InFile = open(self.InFileGMTtxt, 'r')
-        OutFile = open(self.OutputFile, 'w')
+        if self.RunLoud:
+            print("\n\n")
+            # Not counted when reading the shapefile directly
+            if 'InFileLineCount' in self.FileStats:
+                print('There were {} lines in the file.'.format(self.FileStats['InFileLineCount']))
+            print('There were {} segments in the file.'.format(self.FileStats['InFileSegmentCount']))
+            print('There were {} segments copied to the output file.'.format(self.FileStats['OutputSegmentCount']))
+            print('The upstream cells count ranged from {} to {}.'.format(self.FileStats['InFileMinUpstreamCells'],self.FileStats['InFileMaxUpstreamCells']))
+        # Report count of segments in input and segments in output
+        # Report range of upstream cells in input and output
 
+        if not self.RunSilent:
+            print("complebitur")
+        if self.RunLoud:
+            print("\n\n")
+
+    def ParseRIVLines(self, InFile, OutFile):
+        """
+        The main loop. Reads lines from InFile, copies the segments that pass to OutFile
+        and returns a FileStats dictionary.
+        """
         CountLines = 0
         CountSegments = 0
         CountSegmentsCopied = 0
@@ -661,6 +1080,11 @@ class SHEDSrivParser:
 
         SavedCommentLine = ''
 
+        if self.Reporter is not None:
+            self.Reporter.WatchFile(InFile)
+        if self.Instruments is not None:
+            InFile = self.Instruments.CountingReader(InFile)
+
         for line in InFile:
             CountLines += 1
     
@@ -766,29 +1190,151 @@ class SHEDSrivParser:
                     print(line)
 
 
-        # Close input and output files at EOF
-        InFile.close()
-        OutFile.close()
-        
-        self.FileStats = {'InFileLineCount':CountLines,
-                            'InFileSegmentCount':CountSegments,
-                            'OutputSegmentCount':CountSegmentsCopied,
-                            'InFileMinUpstreamCells':SmallestUpstreamCells,
-                            'InFileMaxUpstreamCells':LargestUpstreamCells}
+        return {'InFileLineCount':CountLines,
+                'InFileSegmentCount':CountSegments,
+                'OutputSegmentCount':CountSegmentsCopied,
+                'InFileMinUpstreamCells':SmallestUpstreamCells,
+                'InFileMaxUpstreamCells':LargestUpstreamCells}
 
-        if self.RunLoud:
-            print("\n\n")
-            print('There were {} lines in the file.'.format(CountLines))
-            print('There were {} segments in the file.'.format(CountSegments))
-            print('There were {} segments copied to the output file.'.format(CountSegmentsCopied))
-            print('The upstream cells count ranged from {} to {}.'.format(SmallestUpstreamCells,LargestUpstreamCells))
-        # Report count of segments in input and segments in output
-        # Report range of upstream cells in input and output
+    def ParseRIVBytes(self, Data, OutFile):
+        """
+        The bytes version of ParseRIVLines for MemoryMap. Scans Data (an mmap or bytes) 
+        with GMTScanner.SegmentScanner and writes the segments that pass to OutFile, opened 'wb'.
+        Only the comment line after each > and, with bounds, the first point are decoded.
+        Segments are copied as one slice so lines are copied verbatim. Returns FileStats.
+        """
+        Scanner = GMTScanner.SegmentScanner(Data)
+        DataView = memoryview(Data)
+        if self.Reporter is not None:
+            self.Reporter.WatchScanner(Scanner)
+        if self.Instruments is not None:
+            self.Instruments.Count('BytesRead', len(Data))
 
-        if not self.RunSilent:
-            print("complebitur")
-        if self.RunLoud:
-            print("\n\n")
+        CountSegments = 0
+        CountSegmentsCopied = 0
+        SmallestUpstreamCells = 10000000000
+        LargestUpstreamCells = 0
+
+        # File header
+        OutFile.write(DataView[:Scanner.FileHeaderEnd()])
+
+        for SegmentStart, CommentStart, CommentEnd, SegmentEnd in Scanner.Segments():
+            CountSegments += 1
+            line = Data[CommentStart:CommentEnd].decode()
+
+            try:
+                UpstreamCells = self.ParseUpstreamCells(line)
+            except UpstreamCountError as err:
+                if not self.RunSilent:
+                    print("Error unable to parse comment on segment {}. Continuing.".format(CountSegments))
+                    print(err)
+                UpstreamCells = 0
+            else:
+                #Keep track of largest and smallest upstream - if no exception
+                if UpstreamCells > LargestUpstreamCells:
+                    LargestUpstreamCells = UpstreamCells
+                if UpstreamCells < SmallestUpstreamCells:
+                    SmallestUpstreamCells = UpstreamCells
+
+            if not self.UpstreamCellsWithinLimits(UpstreamCells):
+                continue
+
+            # check for in bounds on first line if enabled
+            if self.CopyWithinBounds is not False:
+                # Order in gmt files is Lon Lat 142.245833333334 -10.133333333333
+                Lon,Lat = Data[CommentEnd:Scanner.LineEnd(CommentEnd)].split()
+                if not self.CheckBounds(float(Lat),float(Lon)):
+                    continue
+
+            CountSegmentsCopied += 1
+            if self.SegmentHeaderIsSimple:
+                OutFile.write(b">\n")
+            else:
+                OutFile.write(self.CreateSegmentHeader(UpstreamCells).encode())
+            OutFile.write(DataView[CommentStart:SegmentEnd])
+
+        DataView.release()
+
+        return {'InFileLineCount':Scanner.CountLines(),
+                'InFileSegmentCount':CountSegments,
+                'OutputSegmentCount':CountSegmentsCopied,
+                'InFileMinUpstreamCells':SmallestUpstreamCells,
+                'InFileMaxUpstreamCells':LargestUpstreamCells}
+
+    def ParseRIVShapefile(self, Reader, OutFile):
+        """
+        The NativeShapefile version of ParseRIVBytes. Reader is an open 
+        ShapefileReader.ShapefileReader of InputFile. Segments are tested on UP_CELLS 
+        from the .dbf and, with bounds, on their first point. Only the points of copied 
+        segments are read. Writes GMT text to OutFile, opened 'wb', with the header ogr2ogr 
+        would write. Each part of a shape is written as a segment of its own. Returns FileStats.
+        """
+        DBF = Reader.DBF
+        SHP = Reader.SHP
+        try:
+            ArcIDField = DBF.FieldNumber('ARCID')
+            UpCellsField = DBF.FieldNumber('UP_CELLS')
+        except KeyError as err:
+            print(" Error shapefile has no {} field. Fields are {}".format(err, DBF.FieldNames))
+            exit(10)
+
+        CountSegments = 0
+        CountSegmentsCopied = 0
+        SmallestUpstreamCells = 10000000000
+        LargestUpstreamCells = 0
+
+        # File header
+        FileBox = '/'.join(['%.15g' % Value for Value in SHP.Box])
+        OutFile.write("# @VGMT1.0 @GLINESTRING\n# @R{}\n# @NARCID|UP_CELLS\n# @Tinteger|integer\n# FEATURE_DATA\n".format(FileBox).encode())
+
+        for i in range(Reader.RecordCount):
+            if DBF.IsDeleted(i) or SHP.IsNull(i):
+                continue
+            CountSegments += 1
+            ArcID, UpstreamCells = DBF.Values(i, [ArcIDField, UpCellsField])
+
+            if UpstreamCells is None:
+                if not self.RunSilent:
+                    print("Error no upstream cells count on segment {}. Continuing.".format(CountSegments))
+                UpstreamCells = 0
+            else:
+                #Keep track of largest and smallest upstream
+                if UpstreamCells > LargestUpstreamCells:
+                    LargestUpstreamCells = UpstreamCells
+                if UpstreamCells < SmallestUpstreamCells:
+                    SmallestUpstreamCells = UpstreamCells
+
+            if not self.UpstreamCellsWithinLimits(UpstreamCells):
+                continue
+
+            # check for in bounds on first point if enabled
+            if self.CopyWithinBounds is not False:
+                Lon, Lat = SHP.FirstPoint(i)
+                if not self.CheckBounds(Lat, Lon):
+                    continue
+
+            if self.SegmentHeaderIsSimple:
+                SegmentHeader = b">\n"
+            else:
+                SegmentHeader = self.CreateSegmentHeader(UpstreamCells).encode()
+            Comment = "# @D{}|{}\n".format('' if ArcID is None else ArcID, UpstreamCells).encode()
+            # Lines are not polygons so parts have no winding, each part with points is written
+            PartsWritten = 0
+            for Coordinates in SHP.Parts(i):
+                if not len(Coordinates):
+                    continue
+                OutFile.write(SegmentHeader)
+                OutFile.write(Comment)
+                OutFile.write(GMTGeometry.FormatCoordinates(Coordinates))
+                PartsWritten += 1
+            # Only segments actually written are counted
+            if PartsWritten:
+                CountSegmentsCopied += 1
+
+        return {'InFileSegmentCount':CountSegments,
+                'OutputSegmentCount':CountSegmentsCopied,
+                'InFileMinUpstreamCells':SmallestUpstreamCells,
+                'InFileMaxUpstreamCells':LargestUpstreamCells}
 
 
 if __name__ == "__main__":
@@ -814,6 +1360,30 @@ if __name__ == "__main__":
                         help="Overwrite exisiting output. Default is to exit if OutputFile exists.")
     parser.add_argument("-hist", "--OutputForHistogram", action="store_true",
                         help="Output the upstream counts is a separate file for creating histograms")
+    parser.add_argument("-MM", "-mm", "--MemoryMap", action="store_true",
+                        help="Scan the input as a memory mapped file. Faster, especially when most segments are skipped.")
+    parser.add_argument("-CD", "-cd", "--CacheDirectory", action="store",
+                        help="Keep shapefile conversions in CacheDirectory. Default $PARSESHEDS_CACHE_DIR or ~/.cache/ParseSHEDS.")
+    parser.add_argument("-CS", "-cs", "--CacheSizeMB", action="store", type=float, metavar='MB',
+                        help="Delete the least recently used shapefile conversions when the cache is over MB.")
+    parser.add_argument("-NS", "-ns", "--NativeShapefile", action="store_true",
+                        help="Read a .shp InputFile directly rather than converting it with ogr2ogr. Only the points of output segments are read.")
+    parser.add_argument("-SC", "-sc", "--StreamConversion", action="store_true",
+                        help="Parse ogr2ogr output from a pipe as the .shp InputFile is converted, rather than converting to a file first.")
+    parser.add_argument("-DB", "-db", "--DecompressInBackground", action="store_true",
+                        help="Decompress a compressed InputFile (.gz, .bz2, .xz, .zst) in a separate thread while parsing.")
+    parser.add_argument("-BIN", "-bin", "--BinaryOutput", action="store", choices=['float32', 'float64'],
+                        help="Write OutputFile as a GMT native binary table for gmt plot -bi2f or -bi2d. Segment headers go to OutputFile.hdr.")
+    parser.add_argument("-INST", "-inst", "--Instrument", action="store_true",
+                        help="Time each phase of the run and count bytes and rejected segments. Printed unless silent.")
+    parser.add_argument("-IF", "-if", "--InstrumentationFile", action="store",
+                        help="Write the Instrument report to InstrumentationFile, JSON or a Prometheus textfile if it ends in .prom.")
+    parser.add_argument("-PR", "-pr", "--Progress", action="store_true",
+                        help="Print the percentage of the input read, MB/s, segments per second and time left to stderr while parsing.")
+    parser.add_argument("-MG", "-mg", "--MaskGridFile", action="store",
+                        help="Only output segments whose first point is on a non zero cell of the mask grid in MaskGridFile, an ESRI ASCII grid (.asc), NumPy .npz of Mask and Extent, or lon lat value xyz text.")
+    parser.add_argument("-RP", "-rp", "--RegionPolygonFile", action="store",
+                        help="Only output segments whose first point is inside the GMT polygon in RegionPolygonFile, such as a province outline.")
 
     parser.add_argument("-TH", "-th", "--ThresholdHigh", action="store", type=int,
                         help="The high threshold for upstream count. Values above this are omitted.")
@@ -1007,16 +1577,43 @@ if __name__ == "__main__":
                                     RunLoud=RUN_LOUD, 
                                     RunSilent=RUN_SILENT, 
                                     OutputForHistogram=OUTPUT_UPSTREAM_COUNTS, 
-                                    Overwrite=OVERWRITE_FILES)
+                                    Overwrite=OVERWRITE_FILES,
+                                    MemoryMap=args.MemoryMap,
+                                    CacheDirectory=args.CacheDirectory,
+                                    CacheSizeMB=args.CacheSizeMB,
+                                    NativeShapefile=args.NativeShapefile,
+                                    StreamConversion=args.StreamConversion,
+                                    DecompressInBackground=args.DecompressInBackground,
+                                    BinaryOutput=args.BinaryOutput,
+                                    Instrument=args.Instrument,
+                                    InstrumentationFile=args.InstrumentationFile,
+                                    Progress=args.Progress,
+                                    MaskGridFile=args.MaskGridFile,
+                                    RegionPolygonFile=args.RegionPolygonFile)
     except InitInputError as err:
         print("ERROR - FAIL")
         print(err.message)
         exit(15)
     
-    #try:
-    RIVParser.ParseRIV()
+    try:
+        RIVParser.ParseRIV()
+    except InitInputError as err:
+        # An output file found when it is opened
+        print("ERROR - FAIL")
+        print(err.message)
+        exit(15)
+    except ProcessingError as err:
+        # Only StreamConversion raises, the exit codes are those of RunOgr2ogr
+        print("ERROR - FAIL")
+        print(err.message)
+        if err.Line is not None:
+            exit(11)
+        exit(13)
     #except:
     #    print("ERROR - Fail")
     #    exit(16)
+    
+    if ('Instrumentation' in RIVParser.FileStats) and not RUN_SILENT:
+        print(Instrumentation.FormatReport(RIVParser.FileStats['Instrumentation']))
         
     exit(0)
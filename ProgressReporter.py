@@ -0,0 +1,282 @@
+"""
+Progress Reporter shows how far a long run of a parser has got.
+
+A global run can print nothing for a minute. With Progress set ParseSHEDSLake.LakesParser
+and ParseSHEDSriv.SHEDSrivParser start a ProgressReporter. A background thread samples
+the position in the input a few times a second and prints the percentage done, MB/s,
+lakes or segments per second and the time left, or passes them to a callback.
+
+Nothing is added to the parsing loops. The position is read from outside them:
+
+    Files read line by line or in blocks, compressed or not, are followed through the
+    offset of their file descriptor, a copy of it so it can be read from the thread.
+    For compressed files this is the offset in the compressed file.
+    Memory mapped inputs are followed through GMTScanner.SegmentScanner.Position.
+    Parallel and indexed runs add the bytes of each chunk or lake as it is done.
+
+Lakes or segments are counted as their headers are decoded, by a wrapper the parser
+puts on its own header decoding method. Pipes, such as ogr2ogr with StreamConversion,
+have no size or offset so only the count and its rate are shown. Shapefiles read with
+NativeShapefile are not followed.
+
+The callback is called from the background thread with a dictionary, see Snapshot, and
+once more from the parser when the run ends with Finished True. For example
+
+import ParseSHEDSLake
+
+def ShowProgress(Snapshot):
+    print(Snapshot['Fraction'], Snapshot['ETASeconds'])
+
+TheParser = ParseSHEDSLake.LakesParser(InFile, OutFile, AreaMin=10.0, ProgressCallback=ShowProgress)
+TheParser.ParseLAKES()
+
+Author: Joseph Wellhouse
+"""
+
+import os
+import stat
+import sys
+import threading
+import time
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+# Seconds between updates on a terminal or to a callback
+PROGRESS_INTERVAL = 0.5
+# Seconds between lines when printing to a file or pipe, such as the log of a batch job
+LOG_INTERVAL = 10.0
+
+
+class ProgressReporter:
+    """
+    Follows the progress of one run of a parser.
+
+    Required inputs: Unit
+        lakes or segments, what is counted
+    Optional inputs:    Callback=None,
+                            called with each Snapshot instead of printing
+                        Interval=None,
+                            seconds between updates, PROGRESS_INTERVAL or LOG_INTERVAL
+                        Stream=None
+                            printed to, sys.stderr
+
+    The parser points it at its input with WatchFile, WatchScanner or Expect and Advance.
+    The first of WatchFile and WatchScanner wins, so an input read in blocks is not
+    followed through the scanners of the blocks. Run Start() and, when done, Stop().
+    """
+
+    def __init__(self, Unit, Callback=None, Interval=None, Stream=None):
+        self.Unit = Unit
+        self.Callback = Callback
+        if Stream is None:
+            Stream = sys.stderr
+        self.Stream = Stream
+        self.OnTerminal = (Callback is None) and Stream.isatty()
+        if Interval is None:
+            Interval = PROGRESS_INTERVAL if (Callback is not None) or self.OnTerminal else LOG_INTERVAL
+        self.Interval = Interval
+
+        self.Count = 0
+        self.BytesDone = 0
+        self.TotalBytes = None
+        # Returns the bytes done, for inputs followed by their position
+        self.PositionSource = None
+        self.FollowsBytes = False
+        self.Watched = False
+        self.FileNumber = None
+        self.StartTime = None
+        self.LastLength = 0
+
+        self.Stopping = threading.Event()
+        self.Thread = None
+
+    def Start(self):
+        self.Thread = threading.Thread(target=self.Run, daemon=True)
+        self.Thread.start()
+
+    def Run(self):
+        while not self.Stopping.wait(self.Interval):
+            self.Report()
+
+    def Stop(self):
+        """
+        Stops the thread, reports the end of the run and lets go of any watched file.
+        """
+        if self.Stopping.is_set():
+            return
+        self.Stopping.set()
+        if self.Thread is not None:
+            self.Thread.join()
+        self.Report(Finished=True)
+        self.PositionSource = None
+        if self.FileNumber is not None:
+            os.close(self.FileNumber)
+            self.FileNumber = None
+
+    def Counted(self, Function):
+        """
+        Returns Function wrapped to count each call as one lake or segment.
+        """
+        def CountedFunction(*args):
+            self.Count += 1
+            return Function(*args)
+        CountedFunction.__wrapped__ = Function
+        return CountedFunction
+
+    def WatchFile(self, InFile):
+        """
+        Follows InFile, an open file being read from the start, through the offset of its
+        file descriptor. The total is the size of the file. Files without a descriptor
+        or offset, such as pipes, are not followed by bytes.
+        """
+        if self.Watched or self.Stopping.is_set():
+            return
+        self.Watched = True
+        self.Begin()
+        try:
+            FileNumber = InFile.fileno()
+            Status = os.fstat(FileNumber)
+            if not stat.S_ISREG(Status.st_mode):
+                return
+            # A copy of the descriptor shares the offset and can not be closed and reused
+            # under the thread
+            self.FileNumber = os.dup(FileNumber)
+        except (AttributeError, OSError, ValueError):
+            return
+        FileNumberCopy = self.FileNumber
+        self.TotalBytes = Status.st_size
+        self.PositionSource = lambda: os.lseek(FileNumberCopy, 0, os.SEEK_CUR)
+        self.FollowsBytes = True
+
+    def WatchScanner(self, Scanner):
+        """
+        Follows Scanner, a GMTScanner.SegmentScanner, through its Position.
+        """
+        if self.Watched or self.Stopping.is_set():
+            return
+        self.Watched = True
+        self.Begin()
+        self.TotalBytes = Scanner.End - Scanner.Start
+        self.PositionSource = lambda: Scanner.Position - Scanner.Start
+        self.FollowsBytes = True
+
+    def Expect(self, TotalBytes):
+        """
+        Follows an input whose bytes are added with Advance, TotalBytes in all.
+        """
+        self.Watched = True
+        self.Begin()
+        self.TotalBytes = TotalBytes
+        self.FollowsBytes = True
+
+    def Advance(self, Bytes, Count=0):
+        self.BytesDone += Bytes
+        self.Count += Count
+
+    def Begin(self):
+        if self.StartTime is None:
+            self.StartTime = time.perf_counter()
+
+    def Position(self):
+        if self.PositionSource is None:
+            return self.BytesDone
+        try:
+            return self.PositionSource()
+        except OSError:
+            return self.BytesDone
+
+    def Snapshot(self, Finished=False):
+        """
+        Returns a dictionary of
+            Unit            lakes or segments
+            Count           lakes or segments so far
+            BytesDone       bytes of the input so far, None if not followed by bytes
+            TotalBytes      bytes of the input, None if not known
+            Fraction        of the input done, 0 to 1, None if not known
+            Seconds         since the input was first read
+            MBPerSecond     input MB (1024 ** 2 bytes) per second, None if not known
+            CountPerSecond  lakes or segments per second
+            ETASeconds      seconds left at the rate so far, None if not known
+            Finished        True for the last Snapshot of a run
+        """
+        if self.StartTime is None:
+            Seconds = 0.0
+        else:
+            Seconds = time.perf_counter() - self.StartTime
+        Count = self.Count
+
+        BytesDone = None
+        Fraction = None
+        MBPerSecond = None
+        ETASeconds = None
+        if self.FollowsBytes:
+            BytesDone = self.Position()
+            if self.TotalBytes:
+                # Read ahead may pass the end of what is parsed, never the end of the file
+                BytesDone = min(BytesDone, self.TotalBytes)
+                Fraction = BytesDone / self.TotalBytes
+            if Seconds > 0:
+                MBPerSecond = BytesDone / Seconds / 1024 ** 2
+                if (Fraction is not None) and (BytesDone > 0):
+                    ETASeconds = (self.TotalBytes - BytesDone) * Seconds / BytesDone
+
+        return {'Unit':self.Unit,
+                'Count':Count,
+                'BytesDone':BytesDone,
+                'TotalBytes':self.TotalBytes,
+                'Fraction':Fraction,
+                'Seconds':Seconds,
+                'MBPerSecond':MBPerSecond,
+                'CountPerSecond':Count / Seconds if Seconds > 0 else None,
+                'ETASeconds':ETASeconds,
+                'Finished':Finished}
+
+    def Report(self, Finished=False):
+        """
+        Passes a Snapshot to Callback or prints it. Nothing is reported before the input
+        is being read.
+        """
+        if not (self.Watched or self.Count or Finished):
+            return
+        self.Begin()
+        Snapshot = self.Snapshot(Finished)
+        if self.Callback is not None:
+            self.Callback(Snapshot)
+            return
+
+        Line = FormatProgress(Snapshot)
+        if self.OnTerminal:
+            # Overwrite the last line, padded over anything longer
+            self.Stream.write('\r' + Line.ljust(self.LastLength) + ('\n' if Finished else ''))
+            self.LastLength = len(Line)
+        else:
+            self.Stream.write(Line + '\n')
+        self.Stream.flush()
+
+
+def FormatDuration(Seconds):
+    Seconds = int(round(Seconds))
+    return '{}:{:02d}:{:02d}'.format(Seconds // 3600, Seconds // 60 % 60, Seconds % 60)
+
+
+def FormatProgress(Snapshot):
+    """
+    Returns Snapshot as one line of text.
+    """
+    Parts = []
+    if Snapshot['Fraction'] is not None:
+        Parts.append('{:5.1f}%'.format(100.0 * Snapshot['Fraction']))
+    if Snapshot['BytesDone'] is not None:
+        Parts.append('{:.1f} MB'.format(Snapshot['BytesDone'] / 1024 ** 2))
+    if Snapshot['MBPerSecond'] is not None:
+        Parts.append('{:.1f} MB/s'.format(Snapshot['MBPerSecond']))
+    Parts.append('{} {}'.format(Snapshot['Count'], Snapshot['Unit']))
+    if Snapshot['CountPerSecond'] is not None:
+        Parts.append('{:.0f} {}/s'.format(Snapshot['CountPerSecond'], Snapshot['Unit']))
+    if Snapshot['Finished']:
+        Parts.append('done in {}'.format(FormatDuration(Snapshot['Seconds'])))
+    elif Snapshot['ETASeconds'] is not None:
+        Parts.append('ETA {}'.format(FormatDuration(Snapshot['ETASeconds'])))
+    return '  '.join(Parts)
@@ -0,0 +1,331 @@
+"""
+Region Polygon selects points that fall inside a GMT polygon, such as a province outline.
+
+Testing a point against a polygon by casting a ray across every edge costs the number
+of vertices, too slow for an outline of 100000 vertices tested against every lake. The
+edges are bucketed once into a grid of cells, latitude bands split into columns, about
+one cell per edge. A ray cast east from a point is split in two at the eastern side of
+its cell:
+
+    Within the cell the ray is tested against the few edges in the cell.
+    East of the cell the crossings only depend on where the outline crosses that
+    meridian. Those latitudes are found once for each column, so the parity of the
+    crossings is a bisect. Points within CROSSING_TOLERANCE of one of those latitudes,
+    where rounding could put the crossing on either side, cast the ray across every edge.
+
+So a test costs a bisect and the edges of one cell whatever the number of vertices, and
+building the grid costs about the number of edges.
+
+The polygon file is GMT text, lon lat one vertex per line, with rings separated by
+segment headers (lines starting with >) as written by gmt or ogr2ogr. Lines starting
+with # are skipped. Rings need not repeat their first vertex. Every ring is used with
+the even odd rule, so a ring inside another is a hole and separate rings are separate
+parts of the region. Points west of the polygon are tried 360 degrees east, so an
+outline crossing the dateline may be drawn from 170 to 190.
+
+PointMatches tests one point. PointsMatch tests NumPy arrays of points at once and needs
+NumPy. Both give the same result as casting the ray across every edge, as
+GMTGeometry.PointsInRing does. For example
+
+import RegionPolygon
+
+Region = RegionPolygon.RegionPolygon('province.gmt')
+Region.PointMatches(-123.1, 49.3)
+
+Author: Joseph Wellhouse
+"""
+
+import bisect
+
+import GMTGeometry
+
+# NumPy is optional, see above
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+# Rings with fewer distinct vertices have no area and are skipped
+MIN_RING_POINTS = 3
+# Limits the grid of a very large outline to tens of MB
+MAX_CELLS = 1 << 20
+# Fraction of a band added above and below it when finding the columns an edge crosses,
+# so rounding never leaves an edge out of a cell it touches
+BAND_MARGIN = 1e-6
+# Degrees of latitude, about a centimetre, see PointMatches
+CROSSING_TOLERANCE = 1e-7
+
+
+class RegionPolygonError(Exception):
+    """
+    Raised when a region polygon file can not be read.
+    """
+    pass
+
+
+class RegionPolygon:
+    """
+    Polygon region with its edges bucketed into a grid of cells.
+
+    Required inputs: PolygonFile
+
+    West, East, South and North bound every ring. The grid has Rows latitude bands of
+    CellHeight and Columns columns split at the longitudes ColumnEdges. CellEdges maps
+    a cell, Row * Columns + Column, to the edges crossing it as (Lat1, Lat2, Lon1,
+    Slope), Slope being the change of longitude per degree of latitude. Edges that are
+    horizontal never cross a ray so are only used for ColumnCrossings, the sorted
+    latitudes at which the outline crosses the eastern side of each column.
+    RingCount, VertexCount and EdgeCount describe what was read.
+    Raises RegionPolygonError if PolygonFile can not be read or has no rings.
+    """
+
+    def __init__(self, PolygonFile):
+        self.PolygonFile = PolygonFile
+        try:
+            Rings = self.ReadRings(PolygonFile)
+        except OSError as err:
+            raise RegionPolygonError('Unable to read region polygon {}: {}'.format(PolygonFile, err))
+        except ValueError as err:
+            raise RegionPolygonError('Region polygon {} is not valid: {}'.format(PolygonFile, err))
+        if not Rings:
+            raise RegionPolygonError('No rings of {} or more vertices found in region polygon {}'.format(MIN_RING_POINTS, PolygonFile))
+
+        self.RingCount = len(Rings)
+        self.VertexCount = sum(GMTGeometry.VertexCount(Ring) for Ring in Rings)
+        Boxes = [GMTGeometry.CoordinateBounds(Ring) for Ring in Rings]
+        self.West = min(Box[0] for Box in Boxes)
+        self.East = max(Box[1] for Box in Boxes)
+        self.South = min(Box[2] for Box in Boxes)
+        self.North = max(Box[3] for Box in Boxes)
+        if not ((self.West < self.East) and (self.South < self.North)):
+            raise RegionPolygonError('Region polygon {} has no area, W E S N {} {} {} {}'.format(PolygonFile, self.West, self.East, self.South, self.North))
+
+        Segments = self.RingSegments(Rings)
+        # Every edge not horizontal, for the ray cast across all of them
+        self.Edges = [(Lat1, Lat2, Lon1, (Lon2 - Lon1) / (Lat2 - Lat1)) for Lon1, Lat1, Lon2, Lat2 in Segments if Lat1 != Lat2]
+        self.EdgeCount = len(Segments)
+        self.BuildGrid(Segments)
+
+        self.CellStart = None
+        if np is not None:
+            self.BuildGridArrays()
+
+    @staticmethod
+    def ReadRings(PolygonFile):
+        """
+        Returns the rings of PolygonFile as array('d') of lon, lat, ... see GMTGeometry.
+        """
+        with open(PolygonFile, 'rb') as InFile:
+            Data = InFile.read()
+
+        Rings = []
+        Block = []
+        for line in Data.split(b'\n') + [b'>']:
+            if not line.startswith(b'>'):
+                Block.append(line)
+                continue
+            Ring = GMTGeometry.ParseCoordinates(b'\n'.join(Block))
+            Block = []
+            Values = iter(Ring)
+            if len(set(zip(Values, Values))) >= MIN_RING_POINTS:
+                Rings.append(Ring)
+        return Rings
+
+    @staticmethod
+    def RingSegments(Rings):
+        """
+        Returns the edges of Rings, closing each, as (Lon1, Lat1, Lon2, Lat2). Edges of no
+        length are left out.
+        """
+        Segments = []
+        for Ring in Rings:
+            Lons = Ring[0::2]
+            Lats = Ring[1::2]
+            for i in range(len(Lons)):
+                # The last vertex joins the first
+                if (Lons[i - 1] != Lons[i]) or (Lats[i - 1] != Lats[i]):
+                    Segments.append((Lons[i - 1], Lats[i - 1], Lons[i], Lats[i]))
+        return Segments
+
+    def BuildGrid(self, Segments):
+        """
+        Sizes the grid to about one cell per edge, square in degrees, and fills CellEdges
+        and ColumnCrossings from Segments.
+        """
+        Width = self.East - self.West
+        Height = self.North - self.South
+        Cells = max(1, min(len(Segments), MAX_CELLS))
+        self.Rows = max(1, int(round((Cells * Height / Width) ** 0.5)))
+        self.Columns = max(1, int(round(Cells / self.Rows)))
+        self.CellHeight = Height / self.Rows
+        CellWidth = Width / self.Columns
+        self.ColumnEdges = [self.West + Column * CellWidth for Column in range(self.Columns)] + [self.East]
+
+        # The outline crosses the eastern side of a column where an edge has one end
+        # east of it, at or beyond, and the other west
+        self.ColumnCrossings = [[] for Column in range(self.Columns)]
+        for Lon1, Lat1, Lon2, Lat2 in Segments:
+            if Lon1 == Lon2:
+                continue
+            First = max(bisect.bisect_right(self.ColumnEdges, min(Lon1, Lon2)), 1)
+            Last = min(bisect.bisect_right(self.ColumnEdges, max(Lon1, Lon2)), self.Columns)
+            for Side in range(First, Last):
+                self.ColumnCrossings[Side - 1].append(Lat1 + (self.ColumnEdges[Side] - Lon1) * (Lat2 - Lat1) / (Lon2 - Lon1))
+        for Crossings in self.ColumnCrossings:
+            Crossings.sort()
+
+        self.CellEdges = {}
+        Margin = self.CellHeight * BAND_MARGIN
+        for Edge in self.Edges:
+            Lat1, Lat2, Lon1, Slope = Edge
+            # The far end as the tests find it, so the cells cover every longitude they see
+            Lon2 = Lon1 + (Lat2 - Lat1) * Slope
+            RowLow = self.Row(min(Lat1, Lat2))
+            RowHigh = self.Row(max(Lat1, Lat2))
+            if RowLow == RowHigh:
+                # Most edges of a detailed outline are within one band
+                for Column in range(self.Column(min(Lon1, Lon2)), self.Column(max(Lon1, Lon2)) + 1):
+                    self.CellEdges.setdefault(RowLow * self.Columns + Column, []).append(Edge)
+                continue
+            LatLow = min(Lat1, Lat2)
+            LatHigh = max(Lat1, Lat2)
+            for Row in range(RowLow, RowHigh + 1):
+                # The longitudes of the edge within the band
+                BandSouth = max(LatLow, self.South + Row * self.CellHeight - Margin)
+                BandNorth = min(LatHigh, self.South + (Row + 1) * self.CellHeight + Margin)
+                LonSouth = Lon1 + (BandSouth - Lat1) * Slope
+                LonNorth = Lon1 + (BandNorth - Lat1) * Slope
+                for Column in range(self.Column(min(LonSouth, LonNorth)), self.Column(max(LonSouth, LonNorth)) + 1):
+                    self.CellEdges.setdefault(Row * self.Columns + Column, []).append(Edge)
+
+    def BuildGridArrays(self):
+        """
+        Copies the grid into NumPy arrays for PointsMatch. The edges of cell c are
+        CellStart[c]:CellStart[c+1] of CellEdgeArrays, Lat1, Lat2, Lon1 and Slope.
+        """
+        Counts = np.zeros(self.Rows * self.Columns, dtype=np.int64)
+        for Cell, Edges in self.CellEdges.items():
+            Counts[Cell] = len(Edges)
+        self.CellStart = np.zeros(self.Rows * self.Columns + 1, dtype=np.int64)
+        np.cumsum(Counts, out=self.CellStart[1:])
+        AllEdges = np.array([Edge for Cell in sorted(self.CellEdges) for Edge in self.CellEdges[Cell]], dtype=np.float64).reshape(-1, 4)
+        self.CellEdgeArrays = [np.ascontiguousarray(AllEdges[:, i]) for i in range(4)]
+        self.ColumnEdgeArray = np.array(self.ColumnEdges, dtype=np.float64)
+        self.ColumnCrossingArrays = [np.array(Crossings, dtype=np.float64) for Crossings in self.ColumnCrossings]
+
+    def Row(self, Lat):
+        """
+        Returns the band of a latitude, clamped to the edge bands.
+        """
+        return min(max(int((Lat - self.South) / self.CellHeight), 0), self.Rows - 1)
+
+    def Column(self, Lon):
+        """
+        Returns the column of a longitude, clamped to the edge columns.
+        """
+        return min(max(bisect.bisect_right(self.ColumnEdges, Lon) - 1, 0), self.Columns - 1)
+
+    def Bounds(self):
+        """
+        Returns the extent as [W E S N BoundsIncDateline] with longitudes from -180 to 180,
+        as LakesParser.SimpleBounds, for narrowing a search to the polygon.
+        """
+        if self.East - self.West >= 360.0:
+            return [-180.0, 180.0, self.South, self.North, False]
+        West = (self.West + 180.0) % 360.0 - 180.0
+        East = West + (self.East - self.West)
+        if East > 180.0:
+            return [West, East - 360.0, self.South, self.North, True]
+        return [West, East, self.South, self.North, False]
+
+    def PointMatches(self, Lon, Lat):
+        """
+        Returns True if Lon, Lat is inside the polygon.
+        """
+        if Lon < self.West:
+            Lon += 360.0
+        if not ((self.West <= Lon <= self.East) and (self.South <= Lat <= self.North)):
+            return False
+        Column = self.Column(Lon)
+
+        # Crossings east of the cell. On the latitude of one of them, or so close that
+        # rounding decides, which side it is counted on depends on the edge. Leave it to
+        # the full ray cast.
+        Crossings = self.ColumnCrossings[Column]
+        Count = bisect.bisect_right(Crossings, Lat)
+        if ((Count > 0) and (Crossings[Count - 1] >= Lat - CROSSING_TOLERANCE)) or \
+                ((Count < len(Crossings)) and (Crossings[Count] <= Lat + CROSSING_TOLERANCE)):
+            return self.RayCastMatches(Lon, Lat)
+
+        # The last column has no eastern side, its cells hold every edge east of them
+        if Column < self.Columns - 1:
+            CellEast = self.ColumnEdges[Column + 1]
+        else:
+            CellEast = float('inf')
+        for Lat1, Lat2, Lon1, Slope in self.CellEdges.get(self.Row(Lat) * self.Columns + Column, ()):
+            if (Lat1 > Lat) != (Lat2 > Lat):
+                if Lon < Lon1 + (Lat - Lat1) * Slope < CellEast:
+                    Count += 1
+        return (Count % 2) == 1
+
+    def RayCastMatches(self, Lon, Lat):
+        """
+        PointMatches casting the ray across every edge.
+        """
+        Count = 0
+        for Lat1, Lat2, Lon1, Slope in self.Edges:
+            if ((Lat1 > Lat) != (Lat2 > Lat)) and (Lon < Lon1 + (Lat - Lat1) * Slope):
+                Count += 1
+        return (Count % 2) == 1
+
+    def PointsMatch(self, Lon, Lat):
+        """
+        Boolean NumPy mask of the points Lon, Lat (arrays) inside the polygon. The same
+        test as PointMatches with each point paired with the edges of its cell as one
+        array operation. Needs NumPy.
+        """
+        Lon = np.asarray(Lon, dtype=np.float64)
+        Lat = np.asarray(Lat, dtype=np.float64)
+        Lon = np.where(Lon < self.West, Lon + 360.0, Lon)
+        Matches = np.zeros(len(Lon), dtype=bool)
+        Inside = np.flatnonzero((Lon >= self.West) & (Lon <= self.East) & (Lat >= self.South) & (Lat <= self.North))
+        if len(Inside) == 0:
+            return Matches
+        PointLon = Lon[Inside]
+        PointLat = Lat[Inside]
+
+        Rows = np.clip(((PointLat - self.South) / self.CellHeight).astype(np.int64), 0, self.Rows - 1)
+        Columns = np.clip(np.searchsorted(self.ColumnEdgeArray, PointLon, side='right') - 1, 0, self.Columns - 1)
+        Count = np.zeros(len(Inside), dtype=np.int64)
+        OnCrossing = np.zeros(len(Inside), dtype=bool)
+        for Column in np.unique(Columns):
+            InColumn = np.flatnonzero(Columns == Column)
+            Crossings = self.ColumnCrossingArrays[Column]
+            Count[InColumn] = np.searchsorted(Crossings, PointLat[InColumn], side='right')
+            OnCrossing[InColumn] = (np.searchsorted(Crossings, PointLat[InColumn] - CROSSING_TOLERANCE, side='left') != 
+                                    np.searchsorted(Crossings, PointLat[InColumn] + CROSSING_TOLERANCE, side='right'))
+        CellEast = np.where(Columns < self.Columns - 1, self.ColumnEdgeArray[np.minimum(Columns + 1, self.Columns)], np.inf)
+
+        # Each point paired with each edge of its cell
+        Cells = Rows * self.Columns + Columns
+        EdgeCounts = self.CellStart[Cells + 1] - self.CellStart[Cells]
+        Pairs = int(EdgeCounts.sum())
+        if Pairs:
+            PairPoint = np.repeat(np.arange(len(Inside)), EdgeCounts)
+            PairFirst = np.cumsum(EdgeCounts) - EdgeCounts
+            PairEdge = np.repeat(self.CellStart[Cells] - PairFirst, EdgeCounts) + np.arange(Pairs)
+            Lat1s, Lat2s, Lon1s, Slopes = self.CellEdgeArrays
+            Lat1 = Lat1s[PairEdge]
+            Y = PointLat[PairPoint]
+            CrossingLon = Lon1s[PairEdge] + (Y - Lat1) * Slopes[PairEdge]
+            Crosses = ((Lat1 > Y) != (Lat2s[PairEdge] > Y)) & (PointLon[PairPoint] < CrossingLon) & (CrossingLon < CellEast[PairPoint])
+            Count += np.bincount(PairPoint[Crosses], minlength=len(Inside))
+
+        Matches[Inside] = (Count % 2) == 1
+        for i in np.flatnonzero(OnCrossing):
+            Matches[Inside[i]] = self.RayCastMatches(PointLon[i], PointLat[i])
+        return Matches
@@ -0,0 +1,345 @@
+"""
+Shapefile Reader reads ESRI Shapefiles (.shp, .shx and .dbf) directly, without GDAL.
+
+HydroSHEDS distributes its data as shapefiles. Converting them with ogr2ogr to GMT text
+and parsing the text back formats and re-parses every coordinate. This reads the binary
+files instead. All three are memory mapped. The .shx gives the offset of each record in
+the .shp so record i is read without reading the ones before it. The .dbf has fixed width
+records so the attributes of record i are one slice. Geometry is only read for the
+records asked for, so records skipped on their attributes cost no coordinate reading.
+
+Coordinates are returned as array('d') of lon, lat, lon, lat, ... as in GMTGeometry.py.
+Polygon (5) and PolyLine (3) shapes and their Z and M variants are read, Z and M values
+are ignored. See the ESRI Shapefile Technical Description (1998) for the format.
+
+Used by ParseSHEDSLake.LakesParser and ParseSHEDSriv.SHEDSrivParser with NativeShapefile.
+For example
+
+import ShapefileReader
+
+with ShapefileReader.ShapefileReader('HydroLAKES_polys_v10.shp') as Reader:
+    AreaField = Reader.DBF.FieldNumber('Lake_area')
+    for i in range(Reader.RecordCount):
+        if Reader.DBF.Value(i, AreaField) > 100.0:
+            Rings = Reader.SHP.Parts(i)     # list of array('d'), one per ring
+
+Author: Joseph Wellhouse
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+class ShapefileError(Exception):
+    """
+    Exception raised for a shapefile that cannot be read.
+    Attributes:
+        FileName -- the file
+        message -- explanation of the error
+    """
+    def __init__(self, FileName, message):
+        self.FileName = FileName
+        self.message = message
+        super().__init__('{}: {}'.format(FileName, message))
+
+
+def MapFile(FileName):
+    """
+    Returns (open file, read only mmap) of FileName. An empty file maps to b''.
+    """
+    TheFile = open(FileName, 'rb')
+    try:
+        Data = mmap.mmap(TheFile.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # Empty file
+        Data = b''
+    return TheFile, Data
+
+
+def PartFileName(ShapeFile, Extension):
+    """
+    Returns the name of the Extension file of ShapeFile in the case that exists, lower
+    case if neither does.
+    """
+    for Name in (ShapeFile[:-3] + Extension.lower(), ShapeFile[:-3] + Extension.upper()):
+        if os.path.exists(Name):
+            return Name
+    return ShapeFile[:-3] + Extension.lower()
+
+
+class SHPFile:
+    """
+    The geometry of a shapefile, .shp read by record offsets from .shx.
+
+    Required inputs: SHPData, SHXData
+        Bytes or mmaps of the .shp and .shx files
+
+    Box is the (W, E, S, N) of the whole file and ShapeType its shape type.
+    """
+
+    # Shape types with parts, points and a box: PolyLine, Polygon and their Z and M types
+    SHAPE_TYPES_WITH_PARTS = (3, 5, 13, 15, 23, 25)
+    HEADER_BYTES = 100
+
+    def __init__(self, SHPData, SHXData, FileName=''):
+        self.Data = SHPData
+        if len(SHPData) < self.HEADER_BYTES or struct.unpack('>i', SHPData[0:4])[0] != 9994:
+            raise ShapefileError(FileName, 'not a shapefile, file code is not 9994')
+        self.ShapeType = struct.unpack('<i', SHPData[32:36])[0]
+        if self.ShapeType not in self.SHAPE_TYPES_WITH_PARTS:
+            raise ShapefileError(FileName, 'shape type {} is not a polygon or polyline'.format(self.ShapeType))
+        XMin, YMin, XMax, YMax = struct.unpack('<4d', SHPData[36:68])
+        self.Box = (XMin, XMax, YMin, YMax)
+
+        # .shx records are big endian (offset, content length) in 16 bit words
+        RecordIndex = array('i', SHXData[self.HEADER_BYTES:])
+        if sys.byteorder == 'little':
+            RecordIndex.byteswap()
+        self.RecordOffset = RecordIndex[0::2]
+        self.RecordCount = len(self.RecordOffset)
+
+    def ContentStart(self, i):
+        """
+        Offset of the content of record i, just past its 8 byte record header.
+        """
+        return 2 * self.RecordOffset[i] + 8
+
+    def IsNull(self, i):
+        Start = self.ContentStart(i)
+        return struct.unpack('<i', self.Data[Start:Start + 4])[0] == 0
+
+    def RecordBox(self, i):
+        """
+        Returns the (W, E, S, N) box of record i without reading its points, None for a
+        null shape.
+        """
+        if self.IsNull(i):
+            return None
+        Start = self.ContentStart(i)
+        XMin, YMin, XMax, YMax = struct.unpack('<4d', self.Data[Start + 4:Start + 36])
+        return (XMin, XMax, YMin, YMax)
+
+    def PartCount(self, i):
+        """
+        Returns the number of parts of record i without reading them, 0 for a null shape.
+        """
+        if self.IsNull(i):
+            return 0
+        Start = self.ContentStart(i)
+        return struct.unpack('<i', self.Data[Start + 36:Start + 40])[0]
+
+    def Parts(self, i):
+        """
+        Returns a list of the parts of record i, each an array('d') of lon, lat, ...
+        For a polygon the parts are its rings, for a polyline its lines. Empty for a null
+        shape.
+        """
+        if self.IsNull(i):
+            return []
+        Start = self.ContentStart(i)
+        NumParts, NumPoints = struct.unpack('<2i', self.Data[Start + 36:Start + 44])
+        PartsStart = Start + 44
+        PointsStart = PartsStart + 4 * NumParts
+
+        PartStarts = list(struct.unpack('<{}i'.format(NumParts), self.Data[PartsStart:PointsStart]))
+        PartStarts.append(NumPoints)
+
+        Points = array('d', self.Data[PointsStart:PointsStart + 16 * NumPoints])
+        if sys.byteorder == 'big':
+            Points.byteswap()
+        return [Points[2 * PartStart:2 * PartEnd] for PartStart, PartEnd in zip(PartStarts[:-1], PartStarts[1:])]
+
+    def FirstPoint(self, i):
+        """
+        Returns (lon, lat) of the first point of record i without reading the others.
+        None for a null shape.
+        """
+        if self.IsNull(i):
+            return None
+        Start = self.ContentStart(i)
+        NumParts = struct.unpack('<i', self.Data[Start + 36:Start + 40])[0]
+        PointsStart = Start + 44 + 4 * NumParts
+        return struct.unpack('<2d', self.Data[PointsStart:PointsStart + 16])
+
+
+class DBFFile:
+    """
+    The attributes of a shapefile, a dBASE III .dbf file.
+
+    Required inputs: Data
+        Bytes or mmap of the .dbf file
+
+    Optional inputs:    Encoding='utf-8'
+
+    FieldNames, FieldTypes, FieldLengths and FieldDecimals describe the fields, in file order.
+    Values are typed by field type: N and F fields are int when they have no decimals and
+    float otherwise, L fields are bool, others are str with the padding stripped.
+    Blank numbers are None.
+    """
+
+    def __init__(self, Data, Encoding='utf-8', FileName=''):
+        self.Data = Data
+        self.Encoding = Encoding
+        if len(Data) < 32:
+            raise ShapefileError(FileName, 'dbf file too short')
+        self.RecordCount, self.HeaderLength, self.RecordLength = struct.unpack('<IHH', Data[4:12])
+
+        self.FieldNames = []
+        self.FieldTypes = []
+        self.FieldLengths = []
+        self.FieldDecimals = []
+        # Offsets within a record, after the deleted flag byte
+        self.FieldOffsets = []
+        Offset = 1
+        for DescriptorStart in range(32, self.HeaderLength - 1, 32):
+            Descriptor = Data[DescriptorStart:DescriptorStart + 32]
+            if Descriptor[0:1] == b'\r':
+                break
+            self.FieldNames.append(Descriptor[0:11].split(b'\x00')[0].decode('ascii', errors='replace').strip())
+            self.FieldTypes.append(Descriptor[11:12].decode('ascii', errors='replace'))
+            self.FieldLengths.append(Descriptor[16])
+            self.FieldDecimals.append(Descriptor[17])
+            self.FieldOffsets.append(Offset)
+            Offset += Descriptor[16]
+
+        # One function per field turns its bytes into a value
+        self.Converters = []
+        for FieldType, Decimals in zip(self.FieldTypes, self.FieldDecimals):
+            if FieldType in 'NF':
+                self.Converters.append(self.ToInt if (Decimals == 0 and FieldType == 'N') else self.ToFloat)
+            elif FieldType == 'L':
+                self.Converters.append(self.ToBool)
+            else:
+                self.Converters.append(self.ToStr)
+
+    @staticmethod
+    def ToInt(Raw):
+        Raw = Raw.strip()
+        if not Raw:
+            return None
+        try:
+            return int(Raw)
+        except ValueError:
+            return int(float(Raw))
+
+    @staticmethod
+    def ToFloat(Raw):
+        Raw = Raw.strip()
+        if not Raw:
+            return None
+        return float(Raw)
+
+    @staticmethod
+    def ToBool(Raw):
+        return Raw.strip() in (b'T', b't', b'Y', b'y')
+
+    def ToStr(self, Raw):
+        return Raw.decode(self.Encoding, errors='replace').strip(' \x00')
+
+    def FieldNumber(self, Name):
+        """
+        Returns the number of the field Name, ignoring case. Raises KeyError if there is none.
+        """
+        for i, FieldName in enumerate(self.FieldNames):
+            if FieldName.lower() == Name.lower():
+                return i
+        raise KeyError(Name)
+
+    def RecordStart(self, i):
+        return self.HeaderLength + i * self.RecordLength
+
+    def IsDeleted(self, i):
+        Start = self.RecordStart(i)
+        return self.Data[Start:Start + 1] == b'*'
+
+    def Value(self, i, FieldNumber):
+        Start = self.RecordStart(i) + self.FieldOffsets[FieldNumber]
+        return self.Converters[FieldNumber](self.Data[Start:Start + self.FieldLengths[FieldNumber]])
+
+    def Values(self, i, FieldNumbers):
+        """
+        Returns the values of the fields FieldNumbers of record i, read from one slice.
+        """
+        Start = self.RecordStart(i)
+        Record = self.Data[Start:Start + self.RecordLength]
+        Offsets = self.FieldOffsets
+        Lengths = self.FieldLengths
+        Converters = self.Converters
+        return [Converters[f](Record[Offsets[f]:Offsets[f] + Lengths[f]]) for f in FieldNumbers]
+
+
+class ShapefileReader:
+    """
+    Context manager opening the .shp, .shx and .dbf files of a shapefile.
+
+    Required inputs: ShapeFile
+        The .shp file. The .shx and .dbf are next to it. A .cpg file, if any, gives the
+        encoding of the .dbf text, otherwise it is taken as UTF-8.
+
+    SHP is a SHPFile, DBF a DBFFile and RecordCount the number of records.
+    Raises ShapefileError if the files do not agree or cannot be read.
+    """
+
+    def __init__(self, ShapeFile):
+        self.ShapeFile = ShapeFile
+        self.OpenFiles = []
+        self.SHP = None
+        self.DBF = None
+        self.RecordCount = 0
+
+    def __enter__(self):
+        try:
+            SHPData = self.Map(self.ShapeFile)
+            SHXData = self.Map(PartFileName(self.ShapeFile, 'shx'))
+            DBFFileName = PartFileName(self.ShapeFile, 'dbf')
+            DBFData = self.Map(DBFFileName)
+            self.SHP = SHPFile(SHPData, SHXData, self.ShapeFile)
+            self.DBF = DBFFile(DBFData, self.ReadEncoding(), DBFFileName)
+        except (OSError, struct.error) as err:
+            self.Close()
+            raise ShapefileError(self.ShapeFile, 'unable to read: {}'.format(err))
+        except ShapefileError:
+            self.Close()
+            raise
+        if self.SHP.RecordCount != self.DBF.RecordCount:
+            self.Close()
+            raise ShapefileError(self.ShapeFile, '{} shapes but {} dbf records'.format(self.SHP.RecordCount, self.DBF.RecordCount))
+        self.RecordCount = self.SHP.RecordCount
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.Close()
+        return False
+
+    def Map(self, FileName):
+        TheFile, Data = MapFile(FileName)
+        self.OpenFiles.append((TheFile, Data))
+        return Data
+
+    def Close(self):
+        for TheFile, Data in self.OpenFiles:
+            if isinstance(Data, mmap.mmap):
+                Data.close()
+            TheFile.close()
+        self.OpenFiles = []
+
+    def ReadEncoding(self):
+        """
+        Returns the .dbf encoding named in the .cpg file, UTF-8 if there is none.
+        """
+        CPGFileName = PartFileName(self.ShapeFile, 'cpg')
+        if os.path.exists(CPGFileName):
+            with open(CPGFileName, 'r') as CPGFile:
+                Encoding = CPGFile.read().strip()
+            try:
+                ''.encode(Encoding)
+                return Encoding
+            except LookupError:
+                pass
+        return 'utf-8'
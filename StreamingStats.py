@@ -0,0 +1,404 @@
+"""
+Streaming Stats keeps one pass statistics of numeric fields in bounded memory.
+
+For each field it keeps the count, sum, min, max, mean and variance (Welford's method
+for single values, Chan's formula to merge blocks and parts), approximate quantiles from
+a merging t-digest and a histogram with logarithmic bins. Memory does not grow with the
+number of values: the digest keeps about Compression centroids, the histogram one bin per
+1/BinsPerDecade of a decade actually seen and AddRow holds back at most BLOCK_ROWS rows.
+
+Used by ParseSHEDSLake.LakesParser with ReportFullStats or OutputForHistogram. Parts of
+a file parsed in worker processes are combined with Merge(). For example
+
+import StreamingStats
+
+Stats = StreamingStats.StreamingStats(['Lake_area', 'Depth_avg'])
+for Row in Rows:
+    Stats.AddRow(Row)
+print(Stats.Summary())
+Stats.WriteJSON('Stats.json')
+
+NumPy is optional. With it blocks of values are added as arrays.
+
+Author: Joseph Wellhouse
+"""
+
+import bisect
+import json
+import math
+
+# NumPy is optional, see above
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+class TDigest:
+    """
+    Merging t-digest of a stream of values for approximate quantiles.
+
+    Optional inputs:    Compression=200
+
+    Values are buffered and, when the buffer is full, sorted together with the centroids.
+    Neighbours falling in the same unit of the k1 scale function (see ScaleGroup) are merged,
+    so centroids are small near the tails where accuracy matters and there are never more
+    than about Compression of them.
+    """
+
+    BUFFER_FACTOR = 5
+
+    def __init__(self, Compression=200):
+        self.Compression = Compression
+        self.Means = []
+        self.Weights = []
+        self.Buffer = []
+        self.Count = 0
+
+    def Add(self, Value):
+        self.Buffer.append(Value)
+        self.Count += 1
+        if len(self.Buffer) >= self.BUFFER_FACTOR * self.Compression:
+            self.Compress()
+
+    def AddMany(self, Values):
+        """
+        Adds a list of values, a buffer at a time.
+        """
+        BufferSize = self.BUFFER_FACTOR * self.Compression
+        for Start in range(0, len(Values), BufferSize):
+            Block = Values[Start:Start + BufferSize]
+            self.Buffer.extend(Block)
+            self.Count += len(Block)
+            if len(self.Buffer) >= BufferSize:
+                self.Compress()
+
+    def Merge(self, Other):
+        """
+        Adds the centroids and buffer of Other, another TDigest.
+        """
+        Other.Compress()
+        self.Compress()
+        self.Means.extend(Other.Means)
+        self.Weights.extend(Other.Weights)
+        self.Count += Other.Count
+        self.Compress(Resort=True)
+
+    def Compress(self, Resort=False):
+        """
+        Merges the buffer into the centroids.
+        """
+        if not self.Buffer and not Resort:
+            return
+        if np is not None:
+            self.CompressNumPy()
+        else:
+            self.CompressPython()
+        self.Buffer = []
+
+    def ScaleGroup(self, q):
+        """
+        Group of a centroid centred at quantile q, the floor of the k1 scale function
+        Compression * (asin(2q - 1) / pi + 1/2). Centroids in one group are merged.
+        """
+        return math.floor(self.Compression * (math.asin(2.0 * q - 1.0) / math.pi + 0.5))
+
+    def CompressPython(self):
+        Centroids = sorted(list(zip(self.Means, self.Weights)) + [(Value, 1) for Value in self.Buffer])
+        Total = sum(Weight for Mean, Weight in Centroids)
+        Means = []
+        Weights = []
+        LastGroup = None
+        WeightSoFar = 0
+        for Mean, Weight in Centroids:
+            Group = self.ScaleGroup(min(1.0, (WeightSoFar + Weight / 2.0) / Total))
+            WeightSoFar += Weight
+            if Group == LastGroup:
+                Weights[-1] += Weight
+                Means[-1] += (Mean - Means[-1]) * Weight / Weights[-1]
+            else:
+                Means.append(Mean)
+                Weights.append(Weight)
+                LastGroup = Group
+        self.Means = Means
+        self.Weights = Weights
+
+    def CompressNumPy(self):
+        Means = np.concatenate((np.asarray(self.Means, dtype=np.float64), np.asarray(self.Buffer, dtype=np.float64)))
+        Weights = np.concatenate((np.asarray(self.Weights, dtype=np.float64), np.ones(len(self.Buffer))))
+        Order = np.argsort(Means, kind='stable')
+        Means = Means[Order]
+        Weights = Weights[Order]
+        if len(Means) == 0:
+            return
+
+        Centres = (np.cumsum(Weights) - Weights / 2.0) / Weights.sum()
+        Groups = np.floor(self.Compression * (np.arcsin(2.0 * np.minimum(Centres, 1.0) - 1.0) / np.pi + 0.5))
+        Starts = np.flatnonzero(np.concatenate(([True], Groups[1:] != Groups[:-1])))
+        GroupWeights = np.add.reduceat(Weights, Starts)
+        self.Means = (np.add.reduceat(Means * Weights, Starts) / GroupWeights).tolist()
+        self.Weights = GroupWeights.tolist()
+
+    def Quantile(self, q):
+        """
+        Returns the approximate q quantile, 0 <= q <= 1. None if there are no values.
+        """
+        self.Compress()
+        if not self.Means:
+            return None
+        if len(self.Means) == 1:
+            return self.Means[0]
+
+        # Each centroid is centred on its cumulative weight, interpolate between them
+        Target = q * self.Count
+        Centres = []
+        WeightSoFar = 0.0
+        for Weight in self.Weights:
+            Centres.append(WeightSoFar + Weight / 2.0)
+            WeightSoFar += Weight
+        i = bisect.bisect_left(Centres, Target)
+        if i == 0:
+            return self.Means[0]
+        if i == len(Centres):
+            return self.Means[-1]
+        Fraction = (Target - Centres[i - 1]) / (Centres[i] - Centres[i - 1])
+        return self.Means[i - 1] + Fraction * (self.Means[i] - self.Means[i - 1])
+
+
+class LogHistogram:
+    """
+    Histogram with BinsPerDecade logarithmic bins per power of ten. Negative values get
+    mirrored bins and zeros their own count. Only bins that have values are kept.
+
+    Optional inputs:    BinsPerDecade=5
+    """
+
+    def __init__(self, BinsPerDecade=5):
+        self.BinsPerDecade = BinsPerDecade
+        self.Positive = {}
+        self.Negative = {}
+        self.Zeros = 0
+
+    def Bin(self, Magnitude):
+        return math.floor(math.log10(Magnitude) * self.BinsPerDecade)
+
+    def Add(self, Value):
+        if Value > 0:
+            Bin = self.Bin(Value)
+            self.Positive[Bin] = self.Positive.get(Bin, 0) + 1
+        elif Value < 0:
+            Bin = self.Bin(-Value)
+            self.Negative[Bin] = self.Negative.get(Bin, 0) + 1
+        elif Value == 0:
+            self.Zeros += 1
+
+    def AddArray(self, Values):
+        """
+        Adds a NumPy array of values.
+        """
+        for Counts, Magnitudes in ((self.Positive, Values[Values > 0]), (self.Negative, -Values[Values < 0])):
+            if len(Magnitudes):
+                Bins, BinCounts = np.unique(np.floor(np.log10(Magnitudes) * self.BinsPerDecade).astype(np.int64), return_counts=True)
+                for Bin, Count in zip(Bins.tolist(), BinCounts.tolist()):
+                    Counts[Bin] = Counts.get(Bin, 0) + Count
+        self.Zeros += int(np.count_nonzero(Values == 0))
+
+    def Merge(self, Other):
+        for Counts, OtherCounts in ((self.Positive, Other.Positive), (self.Negative, Other.Negative)):
+            for Bin, Count in OtherCounts.items():
+                Counts[Bin] = Counts.get(Bin, 0) + Count
+        self.Zeros += Other.Zeros
+
+    def Bins(self):
+        """
+        Returns a list of [Lower edge, Upper edge, Count] in increasing order of value.
+        """
+        Bins = []
+        for Bin in sorted(self.Negative, reverse=True):
+            Bins.append([-10.0 ** ((Bin + 1) / self.BinsPerDecade), -10.0 ** (Bin / self.BinsPerDecade), self.Negative[Bin]])
+        if self.Zeros:
+            Bins.append([0.0, 0.0, self.Zeros])
+        for Bin in sorted(self.Positive):
+            Bins.append([10.0 ** (Bin / self.BinsPerDecade), 10.0 ** ((Bin + 1) / self.BinsPerDecade), self.Positive[Bin]])
+        return Bins
+
+
+class FieldStats:
+    """
+    Count, sum, min, max, mean, variance, t-digest and log histogram of one field.
+    NaN values are skipped.
+    """
+
+    def __init__(self, Compression=200, BinsPerDecade=5):
+        self.Count = 0
+        self.Sum = 0.0
+        self.Min = None
+        self.Max = None
+        self.Mean = 0.0
+        self.M2 = 0.0
+        self.Digest = TDigest(Compression)
+        self.Histogram = LogHistogram(BinsPerDecade)
+
+    def Add(self, Value):
+        if Value != Value:
+            return
+        self.Count += 1
+        self.Sum += Value
+        if (self.Min is None) or (Value < self.Min):
+            self.Min = Value
+        if (self.Max is None) or (Value > self.Max):
+            self.Max = Value
+        # Welford
+        Delta = Value - self.Mean
+        self.Mean += Delta / self.Count
+        self.M2 += Delta * (Value - self.Mean)
+        self.Digest.Add(Value)
+        self.Histogram.Add(Value)
+
+    def AddValues(self, Values):
+        """
+        Adds a sequence of values as one block, merged in as a FieldStats of its own.
+        Much faster than Add() for each value. Lists are made NumPy arrays when NumPy is there.
+        """
+        if np is not None:
+            Values = np.asarray(Values)
+            if Values.dtype.kind == 'f':
+                Values = Values[~np.isnan(Values)]
+        else:
+            Values = [Value for Value in Values if Value == Value]
+        if len(Values) == 0:
+            return
+
+        Block = FieldStats(self.Digest.Compression, self.Histogram.BinsPerDecade)
+        Block.Count = len(Values)
+        if np is not None:
+            Block.Sum = Values.sum().item()
+            Block.Min = Values.min().item()
+            Block.Max = Values.max().item()
+            Block.Mean = Values.mean(dtype=np.float64).item()
+            Block.M2 = ((Values - Block.Mean) ** 2).sum().item()
+            Block.Digest.AddMany(Values.tolist())
+            Block.Histogram.AddArray(Values)
+        else:
+            Block.Sum = sum(Values)
+            Block.Min = min(Values)
+            Block.Max = max(Values)
+            Block.Mean = Block.Sum / Block.Count
+            Block.M2 = sum((Value - Block.Mean) ** 2 for Value in Values)
+            Block.Digest.AddMany(Values)
+            for Value in Values:
+                Block.Histogram.Add(Value)
+        self.Merge(Block)
+
+    def Merge(self, Other):
+        """
+        Adds Other, a FieldStats of more values of the same field.
+        """
+        if Other.Count == 0:
+            return
+        Count = self.Count + Other.Count
+        # Chan et al.
+        Delta = Other.Mean - self.Mean
+        self.M2 += Other.M2 + Delta * Delta * self.Count * Other.Count / Count
+        self.Mean += Delta * Other.Count / Count
+        self.Count = Count
+        self.Sum += Other.Sum
+        self.Min = Other.Min if self.Min is None else min(self.Min, Other.Min)
+        self.Max = Other.Max if self.Max is None else max(self.Max, Other.Max)
+        self.Digest.Merge(Other.Digest)
+        self.Histogram.Merge(Other.Histogram)
+
+    def Variance(self):
+        """
+        Sample variance. None with fewer than two values.
+        """
+        if self.Count < 2:
+            return None
+        return self.M2 / (self.Count - 1)
+
+
+class StreamingStats:
+    """
+    FieldStats for each of a list of fields.
+
+    Required inputs: Fields
+        The field names, in the order of the rows given to AddRow
+
+    Optional inputs:    Compression=200,
+                        BinsPerDecade=5
+    """
+
+    QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+    # Rows held back by AddRow before they are added as a block
+    BLOCK_ROWS = 4096
+
+    def __init__(self, Fields, Compression=200, BinsPerDecade=5):
+        self.Fields = list(Fields)
+        self.Stats = {Field:FieldStats(Compression, BinsPerDecade) for Field in self.Fields}
+        self.PendingRows = []
+
+    def AddRow(self, Row):
+        """
+        Adds one value per field, Row in the order of Fields. Rows are held back and added
+        BLOCK_ROWS at a time with FieldStats.AddValues.
+        """
+        self.PendingRows.append(Row)
+        if len(self.PendingRows) >= self.BLOCK_ROWS:
+            self.Flush()
+
+    def Flush(self):
+        """
+        Adds the rows held back by AddRow. Done by every method that reads or merges the stats.
+        """
+        if self.PendingRows:
+            for Field, Values in zip(self.Fields, zip(*self.PendingRows)):
+                self.Stats[Field].AddValues(Values)
+            self.PendingRows = []
+
+    def AddValues(self, Field, Values):
+        self.Stats[Field].AddValues(Values)
+
+    def Merge(self, Other):
+        self.Flush()
+        Other.Flush()
+        for Field in self.Fields:
+            self.Stats[Field].Merge(Other.Stats[Field])
+
+    def Summary(self):
+        """
+        Returns a dictionary of field: dictionary of count, sum, min, max, mean, variance
+        and quantiles (as q: value). Histograms are left out, see AsDict.
+        """
+        self.Flush()
+        Summary = {}
+        for Field in self.Fields:
+            Stats = self.Stats[Field]
+            Summary[Field] = {'Count':Stats.Count,
+                            'Sum':Stats.Sum,
+                            'Min':Stats.Min,
+                            'Max':Stats.Max,
+                            'Mean':Stats.Mean if Stats.Count else None,
+                            'Variance':Stats.Variance(),
+                            'Quantiles':{str(q):Stats.Digest.Quantile(q) for q in self.QUANTILES}}
+        return Summary
+
+    def AsDict(self):
+        """
+        Summary with the histogram of each field added as 'Histogram', a list of
+        [Lower edge, Upper edge, Count].
+        """
+        AsDict = self.Summary()
+        for Field in self.Fields:
+            AsDict[Field]['Histogram'] = self.Stats[Field].Histogram.Bins()
+        return AsDict
+
+    def WriteJSON(self, FileName):
+        """
+        Writes AsDict() to FileName as compact JSON.
+        """
+        with open(FileName, 'w') as OutFile:
+            json.dump(self.AsDict(), OutFile, separators=(',', ':'))
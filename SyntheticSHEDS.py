@@ -0,0 +1,338 @@
+"""
+Synthetic SHEDS writes HydroLAKES and HydroSHEDS river network GMT files of any size.
+
+The files are in the format ogr2ogr writes from the HydroSHEDS shapefiles, which is what
+ParseSHEDSLake.LakesParser and ParseSHEDSriv.SHEDSrivParser read. They are for timing and
+trying the parsers without the 2 GB HydroLAKES download, see BenchmarkSHEDS.py.
+
+The data are made to look like the real thing where it matters to the parsers. Lake areas
+are log normal with most lakes under 1 km^2, most lakes are in the boreal north, outlines
+are closed rings written with up to 15 significant digits, islands are smaller rings
+inside their lake, river segments step along the 15 arc second grid of HydroSHEDS and
+their upstream cell counts have the long tail of a river network. Lake attributes other
+than the location, area, shore length, name, country and continent are plausible but
+not consistent with each other.
+
+The same Seed and sizes always give the same file. For example
+
+import SyntheticSHEDS
+
+SyntheticSHEDS.WriteLakes('lakes.gmt', LakeCount=100000, IslandsPerLake=0.3, VerticesPerRing=40)
+SyntheticSHEDS.WriteRivers('riv.gmt', SegmentCount=200000, MinUpstreamCells=100)
+
+or from the command line
+
+python3 SyntheticSHEDS.py lakes.gmt -L 100000
+python3 SyntheticSHEDS.py riv.gmt -R 200000
+
+Author: Joseph Wellhouse
+"""
+
+import math
+import random
+import sys
+
+from ParseSHEDSLake import LakesParser
+
+__version__ = "0.0.3"
+__author__ = "Joseph Wellhouse"
+
+
+# HydroSHEDS grids are in 15 arc second cells
+GRID_DEGREES = 1.0 / 240.0
+KM_PER_DEGREE = 111.32
+
+# Extent of HydroLAKES, the @R of its conversion
+LAKES_REGION = (-180.0, 180.0, -56.0, 83.0)
+# Australia, as the HydroSHEDS au_riv_15s file
+RIVERS_REGION = (112.0, 154.0, -44.0, -10.0)
+
+# (weight, W, E, S, N, continent, countries) of where lakes are, roughly as HydroLAKES
+LAKE_REGIONS = [(0.35, -140.0, -55.0, 45.0, 70.0, 'North America', ['Canada']),
+                (0.08, -125.0, -70.0, 25.0, 49.0, 'North America', ['United States of America']),
+                (0.04, -165.0, -140.0, 55.0, 71.0, 'North America', ['United States of America']),
+                (0.15, 5.0, 40.0, 55.0, 71.0, 'Europe', ['Finland', 'Sweden', 'Norway', 'Russia']),
+                (0.04, -10.0, 30.0, 40.0, 55.0, 'Europe', ['France', 'Germany', 'Poland', 'Ireland']),
+                (0.18, 40.0, 180.0, 50.0, 75.0, 'Asia', ['Russia', 'Kazakhstan', 'Mongolia']),
+                (0.05, 70.0, 120.0, 20.0, 50.0, 'Asia', ['China', 'India']),
+                (0.04, -20.0, 50.0, -35.0, 35.0, 'Africa', ['Tanzania', 'Uganda', 'Ethiopia', 'Mali']),
+                (0.05, -80.0, -35.0, -56.0, 10.0, 'South America', ['Brazil', 'Argentina', 'Chile', 'Peru']),
+                (0.02, 110.0, 180.0, -48.0, -10.0, 'Oceania', ['Australia', 'New Zealand'])]
+
+LAKE_NAMES = ['Lake Superior', 'Great Bear Lake', 'Lac Mistassini', 'Reindeer Lake', 'Lake Ladoga',
+                'Lake Onega', 'Inarijarvi', 'Vanern', 'Lough Neagh', 'Bodensee', 'Lake Baikal',
+                'Khanka', 'Qinghai Hu', 'Lake Victoria', 'Lake Tana', 'Lago Titicaca',
+                'Lago General Carrera', 'Lake Taupo', 'Lake Eyre', 'Mirror Lake', 'Long Lake',
+                'Mud Lake', 'Round Lake']
+# Most lakes have no name
+NAMED_LAKE_FRACTION = 0.02
+
+POLY_SOURCES = ['CanVec', 'SWBD', 'MODIS', 'NHD', 'ECRINS', 'GLWD', 'GRanD']
+
+MAX_UPSTREAM_CELLS = 5000000
+
+RIVERS_HEADER = '# @VGMT1.0 @GLINESTRING\n# @R{}/{}/{}/{}\n# @NARCID|UP_CELLS\n# @Tinteger|integer\n# FEATURE_DATA\n'
+
+
+def FormatCoordinate(Value):
+    """
+    Formats Value as ogr2ogr does, 15 significant digits.
+    """
+    return '%.15g' % Value
+
+
+def SnapToGrid(Value):
+    return round(Value / GRID_DEGREES) * GRID_DEGREES
+
+
+def PoissonCount(Generator, Mean):
+    """
+    Returns a Poisson distributed count with Mean, for the small means used here.
+    """
+    if Mean <= 0:
+        return 0
+    Limit = math.exp(-Mean)
+    Count = 0
+    Product = Generator.random()
+    while Product > Limit:
+        Count += 1
+        Product *= Generator.random()
+    return Count
+
+
+def RingCoordinates(Generator, CentreLon, CentreLat, RadiusKm, VertexCount, Region, Clockwise=False):
+    """
+    Returns the lines of a closed, irregular ring of VertexCount vertices around the
+    centre, kept in Region. The first vertex is repeated last. Lake perimeters are 
+    Clockwise and islands counterclockwise, as in the HydroLAKES shapefile.
+    """
+    Direction = -1.0 if Clockwise else 1.0
+    W, E, S, N = Region
+    LatRadius = RadiusKm / KM_PER_DEGREE
+    LonRadius = LatRadius / max(math.cos(math.radians(CentreLat)), 0.05)
+    Lines = []
+    for k in range(VertexCount):
+        Angle = Direction * 2.0 * math.pi * k / VertexCount
+        Scale = 0.6 + 0.8 * Generator.random()
+        Lon = min(max(CentreLon + Scale * LonRadius * math.cos(Angle), W), E)
+        Lat = min(max(CentreLat + Scale * LatRadius * math.sin(Angle), S), N)
+        Lines.append('{} {}\n'.format(FormatCoordinate(Lon), FormatCoordinate(Lat)))
+    Lines.append(Lines[0])
+    return Lines
+
+
+def LakesHeader(Region=LAKES_REGION):
+    """
+    Returns the file header of a HydroLAKES conversion.
+    """
+    return ('# @VGMT1.0 @GPOLYGON\n'
+            '# @R{}/{}/{}/{}\n'.format(*(FormatCoordinate(Value) for Value in Region)) +
+            '# @N' + '|'.join(LakesParser.HEADER_ORDER) + '\n' +
+            '# @T' + '|'.join(LakesParser.HEADER_TYPES) + '\n' +
+            '# FEATURE_DATA\n')
+
+
+def WriteLakes(OutputFile, LakeCount=10000, IslandsPerLake=0.2, VerticesPerRing=30, Seed=1):
+    """
+    Writes a HydroLAKES like GMT file of LakeCount lakes to OutputFile.
+
+    Required inputs: OutputFile
+    Optional inputs:    LakeCount=10000,
+                        IslandsPerLake=0.2
+                            Mean number of islands per lake, Poisson distributed
+                        VerticesPerRing=30
+                            Mean number of vertices of a lake outline, more for larger lakes.
+                            Islands have a quarter as many. At least 4.
+                        Seed=1
+
+    Returns a dictionary of CountLakes, CountIslands, CountVertices, CountLines and Bytes.
+    """
+    Generator = random.Random(Seed)
+    Weights = [Region[0] for Region in LAKE_REGIONS]
+    CountIslands = 0
+    CountVertices = 0
+    CountLines = 0
+    Bytes = 0
+
+    with open(OutputFile, 'w') as OutFile:
+        Header = LakesHeader()
+        OutFile.write(Header)
+        CountLines += Header.count('\n')
+        Bytes += len(Header)
+
+        for Hylak_id in range(1, LakeCount + 1):
+            Weight, W, E, S, N, Continent, Countries = Generator.choices(LAKE_REGIONS, Weights)[0]
+            CentreLon = Generator.uniform(W, E)
+            CentreLat = Generator.uniform(S, N)
+
+            # HydroLAKES has no lakes under 0.1 km^2 and a few very large ones
+            Area = max(0.1, Generator.lognormvariate(-1.0, 1.5))
+            RadiusKm = math.sqrt(Area / math.pi)
+            ShoreDev = 1.0 + Generator.expovariate(1.0)
+            ShoreLen = ShoreDev * 2.0 * math.pi * RadiusKm
+            Depth = max(0.1, Generator.lognormvariate(1.5, 0.8))
+            VolTotal = Area * Depth / 1000.0
+            Discharge = Generator.lognormvariate(-1.0, 2.0)
+            ResTime = VolTotal / Discharge * 1e6 / 86400.0 if Discharge > 0 else -1
+            Elevation = Generator.randint(0, 3000)
+            Name = Generator.choice(LAKE_NAMES) if Generator.random() < NAMED_LAKE_FRACTION else ''
+            IsReservoir = Generator.random() < 0.01
+
+            # More vertices for larger lakes, about VerticesPerRing on average
+            VertexCount = max(4, int(Generator.expovariate(1.0) * VerticesPerRing * (1.0 + 0.2 * math.log(Area / 0.4))))
+            Ring = RingCoordinates(Generator, CentreLon, CentreLat, RadiusKm, VertexCount, LAKES_REGION, Clockwise=True)
+            # The pour point is on the shore
+            PourLon, PourLat = Ring[0].split()
+
+            Atributes = [str(Hylak_id),
+                        '"{}"'.format(Name),
+                        '"{}"'.format(Generator.choice(Countries)),
+                        '"{}"'.format(Continent),
+                        '"{}"'.format(Generator.choice(POLY_SOURCES)),
+                        '2' if IsReservoir else '1',
+                        str(Generator.randint(1, 7000)) if IsReservoir else '0',
+                        '%.2f' % Area,
+                        '%.2f' % ShoreLen,
+                        '%.2f' % ShoreDev,
+                        '%.2f' % VolTotal,
+                        '%.2f' % (VolTotal if IsReservoir else 0.0),
+                        str(Generator.randint(1, 3)),
+                        '%.1f' % Depth,
+                        '%.3f' % Discharge,
+                        '%.1f' % ResTime,
+                        str(Elevation),
+                        '%.2f' % Generator.uniform(-1.0, 20.0),
+                        '%.1f' % (Area * Generator.lognormvariate(2.0, 1.0)),
+                        PourLon,
+                        PourLat]
+
+            Lines = ['>\n# @D' + '|'.join(Atributes) + '\n# @P\n']
+            Lines.extend(Ring)
+            CountVertices += len(Ring)
+            Islands = PoissonCount(Generator, IslandsPerLake)
+            for k in range(Islands):
+                IslandLon = CentreLon + Generator.uniform(-0.3, 0.3) * RadiusKm / KM_PER_DEGREE
+                IslandLat = CentreLat + Generator.uniform(-0.3, 0.3) * RadiusKm / KM_PER_DEGREE
+                IslandRing = RingCoordinates(Generator, IslandLon, IslandLat, 0.15 * RadiusKm, max(4, VertexCount // 4), LAKES_REGION)
+                Lines.append('>\n# @H\n')
+                Lines.extend(IslandRing)
+                CountVertices += len(IslandRing)
+            CountIslands += Islands
+
+            Text = ''.join(Lines)
+            OutFile.write(Text)
+            CountLines += Text.count('\n')
+            Bytes += len(Text)
+
+    return {'CountLakes':LakeCount,
+            'CountIslands':CountIslands,
+            'CountVertices':CountVertices,
+            'CountLines':CountLines,
+            'Bytes':Bytes}
+
+
+def WriteRivers(OutputFile, SegmentCount=50000, VerticesPerSegment=8, MinUpstreamCells=100, UpstreamTail=0.8, Seed=1):
+    """
+    Writes a HydroSHEDS river network like GMT file of SegmentCount segments to OutputFile.
+
+    Required inputs: OutputFile
+    Optional inputs:    SegmentCount=50000,
+                        VerticesPerSegment=8
+                            Mean number of vertices of a segment. At least 2.
+                        MinUpstreamCells=100
+                            The smallest UP_CELLS, as the riv files of HydroSHEDS only have
+                            streams of 100 upstream cells or more
+                        UpstreamTail=0.8
+                            Pareto shape of UP_CELLS. Smaller is a longer tail, more large rivers.
+                        Seed=1
+
+    Returns a dictionary of CountSegments, CountVertices, MaxUpstreamCells, CountLines and Bytes.
+    """
+    Generator = random.Random(Seed)
+    W, E, S, N = RIVERS_REGION
+    CountVertices = 0
+    MaxUpstreamCells = 0
+    CountLines = 0
+    Bytes = 0
+
+    with open(OutputFile, 'w') as OutFile:
+        Header = RIVERS_HEADER.format(*(FormatCoordinate(Value) for Value in RIVERS_REGION))
+        OutFile.write(Header)
+        CountLines += Header.count('\n')
+        Bytes += len(Header)
+
+        for ARCID in range(1, SegmentCount + 1):
+            # The largest rivers of HydroSHEDS drain a few million cells
+            UpstreamCells = min(int(MinUpstreamCells * Generator.paretovariate(UpstreamTail)), MAX_UPSTREAM_CELLS)
+            MaxUpstreamCells = max(MaxUpstreamCells, UpstreamCells)
+
+            # Segments follow the grid, one cell at a time in one of 8 directions
+            Lon = SnapToGrid(Generator.uniform(W, E))
+            Lat = SnapToGrid(Generator.uniform(S, N))
+            VertexCount = max(2, int(Generator.expovariate(1.0) * VerticesPerSegment))
+            Lines = ['>\n# @D{}|{}\n'.format(ARCID, UpstreamCells)]
+            Heading = Generator.randrange(8)
+            for k in range(VertexCount):
+                Lines.append('{} {}\n'.format(FormatCoordinate(Lon), FormatCoordinate(Lat)))
+                Heading = (Heading + Generator.choice((-1, 0, 0, 1))) % 8
+                Angle = Heading * math.pi / 4.0
+                Lon = min(max(Lon + round(math.cos(Angle)) * GRID_DEGREES, W), E)
+                Lat = min(max(Lat + round(math.sin(Angle)) * GRID_DEGREES, S), N)
+            CountVertices += VertexCount
+
+            Text = ''.join(Lines)
+            OutFile.write(Text)
+            CountLines += Text.count('\n')
+            Bytes += len(Text)
+
+    return {'CountSegments':SegmentCount,
+            'CountVertices':CountVertices,
+            'MaxUpstreamCells':MaxUpstreamCells,
+            'CountLines':CountLines,
+            'Bytes':Bytes}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Write synthetic HydroLAKES or HydroSHEDS river network GMT files for testing and timing')
+
+    parser.add_argument("OutputFile", action="store", nargs=1,
+                        help="Name of output file. Either relative or full path.")
+    parser.add_argument('--version', action='version',
+                        version="%(prog)s {}".format(__version__))
+    parser.add_argument("-s", "--silent", action="store_true",
+                        help="Do not print the counts of what was written.")
+
+    KindGroup = parser.add_mutually_exclusive_group(required=True)
+    KindGroup.add_argument("-L", "-l", "--LakeCount", action="store", nargs=1, type=int,
+                        help="Write a lakes file of LakeCount lakes.")
+    KindGroup.add_argument("-R", "-r", "--SegmentCount", action="store", nargs=1, type=int,
+                        help="Write a river network file of SegmentCount segments.")
+
+    parser.add_argument("-I", "-i", "--IslandsPerLake", action="store", nargs=1, type=float, default=[0.2],
+                        help="Mean number of islands per lake. Default 0.2.")
+    parser.add_argument("-V", "--VerticesPerRing", action="store", nargs=1, type=int, default=[30],
+                        help="Mean number of vertices per lake outline. Default 30.")
+    parser.add_argument("-VS", "-vs", "--VerticesPerSegment", action="store", nargs=1, type=int, default=[8],
+                        help="Mean number of vertices per river segment. Default 8.")
+    parser.add_argument("-MU", "-mu", "--MinUpstreamCells", action="store", nargs=1, type=int, default=[100],
+                        help="Smallest upstream cell count of a river segment. Default 100.")
+    parser.add_argument("-UT", "-ut", "--UpstreamTail", action="store", nargs=1, type=float, default=[0.8],
+                        help="Pareto shape of the upstream cell counts, smaller for more large rivers. Default 0.8.")
+    parser.add_argument("-S", "--Seed", action="store", nargs=1, type=int, default=[1],
+                        help="Random seed. The same seed and sizes give the same file. Default 1.")
+    args = parser.parse_args()
+
+    if args.LakeCount is not None:
+        Counts = WriteLakes(args.OutputFile[0], LakeCount=args.LakeCount[0], IslandsPerLake=args.IslandsPerLake[0],
+                            VerticesPerRing=args.VerticesPerRing[0], Seed=args.Seed[0])
+    else:
+        Counts = WriteRivers(args.OutputFile[0], SegmentCount=args.SegmentCount[0], VerticesPerSegment=args.VerticesPerSegment[0],
+                            MinUpstreamCells=args.MinUpstreamCells[0], UpstreamTail=args.UpstreamTail[0], Seed=args.Seed[0])
+
+    if not args.silent:
+        for key, value in Counts.items():
+            print('{} {}'.format(key, value))
+
+    sys.exit(0)
@@ -0,0 +1,8 @@
+"""
+The parsers are modules at the top of the repository rather than a package.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
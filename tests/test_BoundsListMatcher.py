@@ -0,0 +1,130 @@
+"""
+BoundsListMatcher finds the same points and boxes as testing each bounds in turn, and the 
+indexed and scanned BoundsOutline selections with a BoundsFile agree.
+"""
+
+import random
+
+import pytest
+
+import GMTGeometry
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+
+def RandomBoundsList(Generator, BoundsCount):
+    """
+    Returns random bounds, some crossing the dateline and some sharing edges on a grid.
+    """
+    BoundsList = []
+    for i in range(BoundsCount):
+        West = float(Generator.randrange(-180, 180))
+        South = float(Generator.randrange(-90, 89))
+        East = West + Generator.choice([1.0, 5.0, 20.0])
+        North = min(South + Generator.choice([1.0, 5.0, 20.0]), 90.0)
+        if East > 180.0:
+            BoundsList.append([West, East - 360.0, South, North, True])
+        else:
+            BoundsList.append([West, East, South, North, False])
+    return BoundsList
+
+
+def PointInBounds(Lon, Lat, Bounds):
+    """
+    The test of LakeMatchesBoundsSimple for one bounds.
+    """
+    if (Lat < Bounds[2]) or (Lat > Bounds[3]):
+        return False
+    if not Bounds[4]:
+        return Bounds[0] <= Lon <= Bounds[1]
+    # split across International Dateline
+    return (Lon >= Bounds[0]) or (Lon <= Bounds[1])
+
+
+def RandomBox(Generator):
+    # Whole degree corners so boxes often touch the edges of the bounds
+    West = float(Generator.randrange(-180, 180))
+    South = float(Generator.randrange(-90, 90))
+    return (West, min(West + Generator.choice([0.0, 0.5, 1.0, 3.0]), 180.0),
+            South, min(South + Generator.choice([0.0, 0.5, 1.0, 3.0]), 90.0))
+
+
+@pytest.mark.parametrize('BoundsCount', [1, 10, 300])
+def test_PointMatchesEveryBounds(BoundsCount):
+    Generator = random.Random(BoundsCount)
+    BoundsList = RandomBoundsList(Generator, BoundsCount)
+    Matcher = ParseSHEDSLake.BoundsListMatcher(BoundsList)
+    for i in range(3000):
+        # Half the points on whole degrees so many are on the edges of the bounds
+        if i % 2:
+            Lon, Lat = float(Generator.randrange(-180, 181)), float(Generator.randrange(-90, 91))
+        else:
+            Lon, Lat = Generator.uniform(-180.0, 180.0), Generator.uniform(-90.0, 90.0)
+        Expected = any(PointInBounds(Lon, Lat, Bounds) for Bounds in BoundsList)
+        assert Matcher.PointMatches(Lon, Lat) == Expected, (Lon, Lat)
+
+
+@pytest.mark.parametrize('BoundsCount', [1, 10, 300])
+def test_BoxMatchesEveryBounds(BoundsCount):
+    Generator = random.Random(BoundsCount)
+    BoundsList = RandomBoundsList(Generator, BoundsCount)
+    Matcher = ParseSHEDSLake.BoundsListMatcher(BoundsList)
+    for i in range(3000):
+        Box = RandomBox(Generator)
+        Expected = any(GMTGeometry.BoxesOverlap(Box, Bounds) for Bounds in BoundsList)
+        assert Matcher.BoxMatches(Box) == Expected, Box
+
+
+def test_IndexedBoundsFileOutlineMatchesScan(tmp_path):
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=2000, VerticesPerRing=10)
+    BoundsFile = str(tmp_path / 'bounds.txt')
+    with open(BoundsFile, 'w') as OutFile:
+        for Bounds in RandomBoundsList(random.Random(5), 200):
+            OutFile.write('{} {} {} {}\n'.format(*Bounds[:4]))
+    
+    Outputs = []
+    for Name, Options in (('scan.gmt', {}), ('indexed.gmt', {'UseIndex':True})):
+        TheParser = ParseSHEDSLake.LakesParser(LakesFile, str(tmp_path / Name), BoundsFile=BoundsFile,
+                                                BoundsOutline=True, RunSilent=True, **Options)
+        TheParser.ParseLAKES()
+        with open(str(tmp_path / Name), 'rb') as InFile:
+            Outputs.append(InFile.read())
+    assert Outputs[0] == Outputs[1]
+    assert Outputs[0].count(b'# @D') > 0
+
+
+@pytest.mark.parametrize('BoundsCount', [1, 10, 300])
+def test_NumPyMatchesLinePath(BoundsCount):
+    np = pytest.importorskip('numpy')
+    Generator = random.Random(BoundsCount)
+    BoundsList = RandomBoundsList(Generator, BoundsCount)
+    Matcher = ParseSHEDSLake.BoundsListMatcher(BoundsList)
+    Boxes = [RandomBox(Generator) for i in range(3000)]
+    West, East, South, North = [np.array(Column) for Column in zip(*Boxes)]
+    
+    assert Matcher.BoxesMatch(West, East, South, North).tolist() == [Matcher.BoxMatches(Box) for Box in Boxes]
+    # Box corners are whole degrees so many points are on the edges of the bounds
+    assert Matcher.PointsMatch(West, South).tolist() == [Matcher.PointMatches(Lon, Lat) for Lon, Lat in zip(West, South)]
+    assert Matcher.PointsMatch(East, North).tolist() == [Matcher.PointMatches(Lon, Lat) for Lon, Lat in zip(East, North)]
+
+
+@pytest.mark.parametrize('Options', [{}, {'BoundsOutline':True}])
+def test_VectorizedBoundsFileMatchesScan(tmp_path, Options):
+    pytest.importorskip('numpy')
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=2000, VerticesPerRing=10)
+    BoundsFile = str(tmp_path / 'bounds.txt')
+    with open(BoundsFile, 'w') as OutFile:
+        for Bounds in RandomBoundsList(random.Random(7), 200):
+            OutFile.write('{} {} {} {}\n'.format(*Bounds[:4]))
+    
+    Outputs = []
+    for Name, Vectorized in (('scan.gmt', False), ('vectorized.gmt', True)):
+        TheParser = ParseSHEDSLake.LakesParser(LakesFile, str(tmp_path / Name), BoundsFile=BoundsFile,
+                                                Vectorized=Vectorized, RunSilent=True, **Options)
+        TheParser.ParseLAKES()
+        with open(str(tmp_path / Name), 'rb') as InFile:
+            Outputs.append(InFile.read())
+    assert Outputs[0] == Outputs[1]
+    assert Outputs[0].count(b'# @D') > 0
@@ -0,0 +1,89 @@
+"""
+ClipToBounds clips lake rings to SimpleBounds, on the right side of the dateline, and drops
+a lake whose perimeter is clipped away along with its islands.
+"""
+
+import json
+
+import pytest
+
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+LAKE_HEADER = '# @D1|"{}"|"Canada"|"North America"|"CanVec"|1|0|4.00|8.00|1.10|0.40|0.00|1|10.0|0.100|10.0|100|1.00|40.0|{}|{}\n'
+
+# An L shaped lake whose box overlaps the bounds 2 3 2 3 but whose perimeter does not,
+# with an island in its corner
+CLIPPED_LAKE = ('>\n' + LAKE_HEADER.format('Corner', 0.5, 0.5) + '# @P\n0 0\n0 4\n1 4\n1 1\n4 1\n4 0\n0 0\n'
+                '>\n# @H\n0.2 0.2\n0.8 0.2\n0.8 0.8\n0.2 0.8\n0.2 0.2\n')
+# A lake within the bounds, with an island
+KEPT_LAKE = ('>\n' + LAKE_HEADER.format('Inside', 2.5, 2.5) + '# @P\n2.1 2.1\n2.1 2.9\n2.9 2.9\n2.9 2.1\n2.1 2.1\n'
+             '>\n# @H\n2.4 2.4\n2.6 2.4\n2.6 2.6\n2.4 2.6\n2.4 2.4\n')
+# A lake west of the dateline whose box midpoint is west of the west edge of the bounds
+DATELINE_LAKE = '>\n' + LAKE_HEADER.format('Dateline', 175.5, 10) + '# @P\n160 6\n160 14\n176 14\n176 6\n160 6\n'
+
+
+def WriteLakes(tmp_path, Text):
+    FileName = str(tmp_path / 'lakes.gmt')
+    with open(FileName, 'w') as OutFile:
+        OutFile.write(SyntheticSHEDS.LakesHeader() + Text)
+    return FileName
+
+
+def Segments(FileName):
+    """
+    Returns the comment line and coordinates of each segment of FileName.
+    """
+    with open(FileName, 'r') as InFile:
+        Text = InFile.read()
+    Result = []
+    for Segment in Text.split('>\n')[1:]:
+        Lines = Segment.splitlines()
+        Comment = Lines[0]
+        Coordinates = [tuple(float(Value) for Value in line.split()) for line in Lines if line[0] != '#']
+        Result.append((Comment[:4], Coordinates))
+    return Result
+
+
+@pytest.mark.parametrize('Options', [{}, {'UseIndex':True}, {'Processes':2}])
+def test_ClippedAwayLakeDropsIslands(tmp_path, Options):
+    LakesFile = WriteLakes(tmp_path, CLIPPED_LAKE + KEPT_LAKE)
+    OutputFile = str(tmp_path / 'out.gmt')
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, SimpleBounds=[2.0, 3.0, 2.0, 3.0],
+                                            ClipToBounds=True, RunSilent=True, **Options)
+    TheParser.ParseLAKES()
+    
+    assert [Comment for Comment, Coordinates in Segments(OutputFile)] == ['# @D', '# @H']
+    assert TheParser.FileStats['CountLakesCopied'] == 1
+    assert TheParser.FileStats['CountTotalIslandsCopied'] == 1
+
+
+def test_ClippedAwayLakeDropsIslandsInJobs(tmp_path):
+    LakesFile = WriteLakes(tmp_path, CLIPPED_LAKE + KEPT_LAKE)
+    OutputFiles = [str(tmp_path / 'out0.gmt'), str(tmp_path / 'out1.gmt')]
+    JobFile = str(tmp_path / 'jobs.json')
+    with open(JobFile, 'w') as OutFile:
+        json.dump([{'OutputFile':OutputFiles[1], 'SimpleBounds':[2.0, 3.0, 2.0, 3.0], 'ClipToBounds':True}], OutFile)
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFiles[0], SimpleBounds=[2.0, 3.0, 2.0, 3.0],
+                                            ClipToBounds=True, JobFile=JobFile, RunSilent=True)
+    TheParser.ParseLAKES()
+    
+    for OutputFile, Job in zip(OutputFiles, TheParser.Jobs):
+        assert [Comment for Comment, Coordinates in Segments(OutputFile)] == ['# @D', '# @H']
+        assert Job.FileStats['CountLakesCopied'] == 1
+        assert Job.FileStats['CountTotalIslandsCopied'] == 1
+
+
+@pytest.mark.parametrize('Options', [{}, {'UseIndex':True}])
+def test_ClipAcrossDateline(tmp_path, Options):
+    LakesFile = WriteLakes(tmp_path, DATELINE_LAKE)
+    OutputFile = str(tmp_path / 'out.gmt')
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, SimpleBounds=[175.0, -170.0, 5.0, 15.0],
+                                            ClipToBounds=True, RunSilent=True, **Options)
+    TheParser.ParseLAKES()
+    
+    [(Comment, Coordinates)] = Segments(OutputFile)
+    assert Comment == '# @D'
+    assert min(Lon for Lon, Lat in Coordinates) == 175.0
+    assert max(Lon for Lon, Lat in Coordinates) == 176.0
+    assert TheParser.FileStats['CountLakesCopied'] == 1
@@ -0,0 +1,45 @@
+"""
+Options that need to seek in or map the input name compression when given a compressed file.
+"""
+
+import gzip
+
+import pytest
+
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+
+@pytest.fixture
+def CompressedLakes(tmp_path):
+    FileName = str(tmp_path / 'lakes.gmt.gz')
+    with gzip.open(FileName, 'wt') as OutFile:
+        OutFile.write(SyntheticSHEDS.LakesHeader())
+    return FileName
+
+
+@pytest.mark.parametrize('Input, Options', [('UseIndex', {'UseIndex':True}), 
+                                            ('Vectorized', {'Vectorized':True}), 
+                                            ('Processes', {'Processes':2}), 
+                                            ('PointsFile', {'PointsFile':'points'}), 
+                                            ('JobFile', {'JobFile':'jobs'})])
+def test_CompressedInputRejected(tmp_path, CompressedLakes, Input, Options):
+    if Input in ('Vectorized', 'PointsFile'):
+        pytest.importorskip('numpy')
+    Options = dict(Options)
+    for Name in ('PointsFile', 'JobFile'):
+        if Name in Options:
+            Options[Name] = str(tmp_path / Options[Name])
+            with open(Options[Name], 'w') as OutFile:
+                OutFile.write('[]' if Name == 'JobFile' else '0 0\n')
+    with pytest.raises(ParseSHEDSLake.InitInputError) as err:
+        ParseSHEDSLake.LakesParser(CompressedLakes, str(tmp_path / 'out.gmt'), RunSilent=True, **Options)
+    assert err.value.var == Input
+    assert 'compressed' in err.value.message
+
+
+def test_IterLakesCompressedInput(CompressedLakes):
+    TheParser = ParseSHEDSLake.LakesParser(CompressedLakes, None, RunSilent=True)
+    with pytest.raises(ParseSHEDSLake.InitInputError) as err:
+        list(TheParser.IterLakes())
+    assert 'gzip compressed' in err.value.message
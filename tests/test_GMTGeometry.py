@@ -0,0 +1,31 @@
+"""
+GMTGeometry coordinate buffers, with and without NumPy.
+"""
+
+from array import array
+
+import pytest
+
+import GMTGeometry
+
+
+def test_NumPyRoundTrip():
+    pytest.importorskip('numpy')
+    Coordinates = GMTGeometry.ParseCoordinates(b'-131.5 61.7\n-131.6 61.8\n')
+    assert GMTGeometry.FromNumPy(GMTGeometry.AsNumPy(Coordinates)) == Coordinates
+
+
+def test_NumPyMissing(monkeypatch):
+    monkeypatch.setattr(GMTGeometry, 'np', None)
+    Coordinates = array('d', [-131.5, 61.7, -131.6, 61.8])
+
+    with pytest.raises(GMTGeometry.InitInputError) as err:
+        GMTGeometry.FromNumPy([[-131.5, 61.7]])
+    assert err.value.var == 'LonLat'
+    assert 'NumPy' in err.value.message
+    with pytest.raises(GMTGeometry.InitInputError) as err:
+        GMTGeometry.AsNumPy(Coordinates)
+    assert err.value.var == 'Coordinates'
+
+    # The other functions fall back to pure Python
+    assert GMTGeometry.CoordinateBounds(Coordinates) == (-131.6, -131.5, 61.7, 61.8)
@@ -0,0 +1,21 @@
+"""
+IterLakes yields the lakes ParseLAKES would write and reports the same FileStats.
+"""
+
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+
+def test_IterLakesFileStatsMatchParse(tmp_path):
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=2000, IslandsPerLake=0.8, VerticesPerRing=8)
+
+    Parsed = ParseSHEDSLake.LakesParser(LakesFile, str(tmp_path / 'out.gmt'), AreaMin=1.0, MemoryMap=True, RunSilent=True)
+    Parsed.ParseLAKES()
+    Iterated = ParseSHEDSLake.LakesParser(LakesFile, None, AreaMin=1.0, RunSilent=True)
+    Lakes = list(Iterated.IterLakes())
+
+    assert len(Lakes) == Parsed.FileStats['CountLakesCopied']
+    for Name in ('CountLakes', 'CountTotalIslands', 'MostIslandsInLake', 'CountLines', 'CountLakesCopied', 'CountTotalIslandsCopied'):
+        assert Iterated.FileStats[Name] == Parsed.FileStats[Name], Name
+    assert Iterated.FileStats['MostIslandsInLake'] > 1
@@ -0,0 +1,114 @@
+"""
+The perimeter box grid of LakeIndex finds the same lakes as testing every box, and an 
+index is rebuilt when its source file changes size or mtime.
+"""
+
+import os
+import random
+from array import array
+
+import pytest
+
+import GMTGeometry
+import LakeIndex
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+LakesParser = ParseSHEDSLake.LakesParser
+
+
+def RandomBoxIndex(BoxCount=5000, Seed=3):
+    """
+    Returns a LakeIndex of random perimeter boxes with its box grid built. Most are small,
+    some are wider or taller than a grid cell and a few are empty.
+    """
+    Generator = random.Random(Seed)
+    TheIndex = LakeIndex.LakeIndex('unused.gmt', LakesParser.HEADER_ORDER, LakesParser.HEADER_TYPES)
+    TheIndex.BoxWest, TheIndex.BoxEast, TheIndex.BoxSouth, TheIndex.BoxNorth = array('d'), array('d'), array('d'), array('d')
+    for i in range(BoxCount):
+        if i % 500 == 0:
+            Box = (float('inf'), float('-inf'), float('inf'), float('-inf'))
+        else:
+            Size = Generator.choice([0.01, 0.3, 1.0, 4.0])
+            West = Generator.uniform(-180.0, 180.0 - Size)
+            South = Generator.uniform(-89.0, 89.0 - Size)
+            Box = (West, West + Size * Generator.random(), South, South + Size * Generator.random())
+        for Column, Value in zip((TheIndex.BoxWest, TheIndex.BoxEast, TheIndex.BoxSouth, TheIndex.BoxNorth), Box):
+            Column.append(Value)
+    TheIndex.LakeCount = BoxCount
+    TheIndex.BuildBoxGrid()
+    return TheIndex
+
+
+@pytest.mark.parametrize('Bounds', [[-10.0, 10.0, -5.0, 5.0, False],
+                                    [100.5, 100.6, 40.2, 40.3, False],
+                                    [-180.0, -170.0, -90.0, -80.0, False],
+                                    [170.0, -170.0, 0.0, 30.0, True],
+                                    [179.5, 179.0, -20.0, 20.0, True]])
+def test_LakesWithBoxInBounds(Bounds):
+    TheIndex = RandomBoxIndex()
+    Boxes = zip(TheIndex.BoxWest, TheIndex.BoxEast, TheIndex.BoxSouth, TheIndex.BoxNorth)
+    Expected = [i for i, Box in enumerate(Boxes) if GMTGeometry.BoxesOverlap(Box, Bounds)]
+
+    Candidates = TheIndex.LakesWithBoxInBounds(Bounds)
+    assert Candidates == sorted(Candidates)
+    assert [i for i in Candidates if GMTGeometry.BoxesOverlap(
+                (TheIndex.BoxWest[i], TheIndex.BoxEast[i], TheIndex.BoxSouth[i], TheIndex.BoxNorth[i]), Bounds)] == Expected
+    # Only the cells near the bounds are read
+    assert len(Candidates) < TheIndex.LakeCount // 2
+
+
+def test_IndexedBoundsOutlineMatchesScan(tmp_path):
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=3000, VerticesPerRing=10)
+    Outputs = []
+    for Name, Options in (('scan.gmt', {}), ('indexed.gmt', {'UseIndex':True})):
+        TheParser = LakesParser(LakesFile, str(tmp_path / Name), SimpleBounds=[5.0, 40.0, 55.0, 71.0],
+                                BoundsOutline=True, RunSilent=True, **Options)
+        TheParser.ParseLAKES()
+        with open(str(tmp_path / Name), 'rb') as InFile:
+            Outputs.append(InFile.read())
+    assert Outputs[0] == Outputs[1]
+    assert Outputs[0].count(b'# @D') > 0
+
+
+def NewIndex(LakesFile):
+    return LakeIndex.LakeIndex(LakesFile, LakesParser.HEADER_ORDER, LakesParser.HEADER_TYPES, RunSilent=True)
+
+
+def test_IndexStaleOnChangedMtimeOrSize(tmp_path):
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=50, VerticesPerRing=5)
+    NewIndex(LakesFile).Build()
+    assert NewIndex(LakesFile).Load()
+    
+    # Same size, later mtime
+    Stat = os.stat(LakesFile)
+    os.utime(LakesFile, ns=(Stat.st_atime_ns, Stat.st_mtime_ns + 1000000000))
+    assert not NewIndex(LakesFile).Load()
+    NewIndex(LakesFile).Build()
+    assert NewIndex(LakesFile).Load()
+    
+    # Same mtime, different size
+    Stat = os.stat(LakesFile)
+    with open(LakesFile, 'a') as OutFile:
+        OutFile.write('\n')
+    os.utime(LakesFile, ns=(Stat.st_atime_ns, Stat.st_mtime_ns))
+    assert not NewIndex(LakesFile).Load()
+
+
+def test_IndexedRunAfterInputChanged(tmp_path):
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    Options = {'SimpleBounds':[-20.0, 60.0, 30.0, 70.0], 'RunSilent':True, 'Overwrite':True}
+    Outputs = []
+    for Seed in (1, 2):
+        # The second file is written over the first so the index of the first is stale
+        SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=500, VerticesPerRing=5, Seed=Seed)
+        for Name, UseIndex in (('scan.gmt', False), ('indexed.gmt', True)):
+            TheParser = LakesParser(LakesFile, str(tmp_path / Name), UseIndex=UseIndex, **Options)
+            TheParser.ParseLAKES()
+            with open(str(tmp_path / Name), 'rb') as InFile:
+                Outputs.append(InFile.read())
+    assert Outputs[0] == Outputs[1]
+    assert Outputs[2] == Outputs[3]
+    assert Outputs[0] != Outputs[2]
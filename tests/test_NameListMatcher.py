@@ -0,0 +1,48 @@
+"""
+NameListMatcher matches the same names as a plain scan of the name list.
+"""
+
+import random
+
+import pytest
+
+import ParseSHEDSLake
+
+ALPHABET = 'abcé '
+
+
+def RandomName(Generator, Shortest, Longest):
+    return ''.join(Generator.choice(ALPHABET) for i in range(Generator.randint(Shortest, Longest)))
+
+
+@pytest.mark.parametrize('Seed', [1, 2, 3])
+def test_SubstringMatchesPlainScan(Seed):
+    Generator = random.Random(Seed)
+    # Short patterns over a small alphabet so they overlap and share prefixes and suffixes
+    Names = [RandomName(Generator, 2, 4) for i in range(30)] + ['', 'ÉC', 'Lac ']
+    Matcher = ParseSHEDSLake.NameListMatcher(Names, Substring=True)
+    Patterns = [Name.casefold() for Name in Names if Name]
+    Counts = [0, 0]
+    for i in range(3000):
+        Name = RandomName(Generator, 0, 8)
+        if i % 3 == 0:
+            Name = Name.upper()
+        Expected = any(Pattern in Name.casefold() for Pattern in Patterns)
+        assert Matcher.Matches(Name) == Expected, Name
+        Counts[Expected] += 1
+    # Both outcomes are tested
+    assert min(Counts) > 300
+
+
+def test_ExactMatchesIgnoreCase():
+    Matcher = ParseSHEDSLake.NameListMatcher(['Great Bear Lake', 'Lac Mistassini', ''])
+    assert Matcher.Matches('great bear lake')
+    assert Matcher.Matches('LAC MISTASSINI')
+    assert not Matcher.Matches('Great Bear')
+    assert not Matcher.Matches('Great Bear Lakes')
+
+
+def test_EmptyNameMatchesNothingAsSubstring():
+    Matcher = ParseSHEDSLake.NameListMatcher(['', 'zz'], Substring=True)
+    assert not Matcher.Matches('Great Bear Lake')
+    assert Matcher.Matches('Lake Pizza')
@@ -0,0 +1,113 @@
+"""
+NativeShapefile reads the rings of a lakes shapefile directly. The shapefiles are written
+here, each lake a polygon record of rings given as lists of (lon, lat).
+"""
+
+import struct
+
+import GMTGeometry
+import ParseSHEDSLake
+
+LakesParser = ParseSHEDSLake.LakesParser
+
+# Clockwise outer rings and counterclockwise holes, as in the shapefile spec
+OUTER_A = [(0.0, 0.0), (0.0, 2.0), (2.0, 2.0), (2.0, 0.0), (0.0, 0.0)]
+HOLE_A = [(0.5, 0.5), (1.5, 0.5), (1.5, 1.5), (0.5, 1.5), (0.5, 0.5)]
+OUTER_B = [(4.0, 0.0), (4.0, 1.0), (5.0, 1.0), (5.0, 0.0), (4.0, 0.0)]
+
+
+def WriteLakesShapefile(FileBase, Lakes):
+    """
+    Writes FileBase.shp, .shx and .dbf. Lakes is a list of (Hylak_id, Rings) or
+    (Hylak_id, Rings, PourPoint). The pour point defaults to the first vertex of the
+    first ring. The area is 10 and the other fields blank.
+    """
+    Lakes = [(Lake[0], Lake[1], Lake[2] if len(Lake) > 2 else Lake[1][0][0]) for Lake in Lakes]
+    SHP = bytearray(100)
+    SHX = bytearray(100)
+    AllPoints = [Point for Hylak_id, Rings, PourPoint in Lakes for Ring in Rings for Point in Ring]
+    for RecordNumber, (Hylak_id, Rings, PourPoint) in enumerate(Lakes, start=1):
+        Points = [Point for Ring in Rings for Point in Ring]
+        Lons = [Point[0] for Point in Points]
+        Lats = [Point[1] for Point in Points]
+        Content = struct.pack('<i4d2i', 5, min(Lons), min(Lats), max(Lons), max(Lats), len(Rings), len(Points))
+        PartStart = 0
+        for Ring in Rings:
+            Content += struct.pack('<i', PartStart)
+            PartStart += len(Ring)
+        for Point in Points:
+            Content += struct.pack('<2d', *Point)
+        SHX += struct.pack('>2i', len(SHP) // 2, len(Content) // 2)
+        SHP += struct.pack('>2i', RecordNumber, len(Content) // 2) + Content
+    for Data in (SHP, SHX):
+        Data[0:28] = struct.pack('>7i', 9994, 0, 0, 0, 0, 0, len(Data) // 2)
+        Data[28:100] = struct.pack('<2i8d', 1000, 5, min(Point[0] for Point in AllPoints), min(Point[1] for Point in AllPoints),
+                                    max(Point[0] for Point in AllPoints), max(Point[1] for Point in AllPoints), 0, 0, 0, 0)
+
+    FieldLength = 20
+    Fields = [(Name, 'C' if 'str' in Type else 'N', 0 if 'int' in Type else 6)
+                for Name, Type in zip(LakesParser.HEADER_ORDER, LakesParser.HEADER_TYPES)]
+    DBF = bytearray(struct.pack('<4BIHH20x', 3, 26, 1, 1, len(Lakes), 32 + 32 * len(Fields) + 1, 1 + FieldLength * len(Fields)))
+    for Name, FieldType, Decimals in Fields:
+        DBF += Name.encode().ljust(11, b'\0') + FieldType.encode() + b'\0' * 4 + bytes([FieldLength, Decimals]) + b'\0' * 14
+    DBF += b'\r'
+    for Hylak_id, Rings, PourPoint in Lakes:
+        Values = {'Hylak_id':str(Hylak_id), 'Lake_area':'10.0', 'Pour_long':repr(PourPoint[0]), 'Pour_lat':repr(PourPoint[1])}
+        DBF += b' '
+        for Name, FieldType, Decimals in Fields:
+            Value = Values.get(Name, '').encode()
+            DBF += Value.ljust(FieldLength) if FieldType == 'C' else Value.rjust(FieldLength)
+    DBF += b'\x1a'
+
+    for Extension, Data in (('shp', SHP), ('shx', SHX), ('dbf', DBF)):
+        with open('{}.{}'.format(FileBase, Extension), 'wb') as OutFile:
+            OutFile.write(Data)
+    return FileBase + '.shp'
+
+
+def ParseLakes(InputFile, OutputFile, **Options):
+    TheParser = LakesParser(InputFile, OutputFile, AreaMin=1.0, NativeShapefile=True, RunSilent=True, **Options)
+    TheParser.ParseLAKES()
+    with open(OutputFile, 'r') as InFile:
+        Lines = InFile.read().split('\n')
+    # Segment comment lines after the file header, # @D shortened to its tag
+    Comments = [line[:4] for line in Lines[5:] if line.startswith('#')]
+    return TheParser, Comments
+
+
+def test_RingIsClockwise():
+    Outer = GMTGeometry.ParseCoordinates(''.join('{} {}\n'.format(*Point) for Point in OUTER_A))
+    Hole = GMTGeometry.ParseCoordinates(''.join('{} {}\n'.format(*Point) for Point in HOLE_A))
+    assert GMTGeometry.RingIsClockwise(Outer)
+    assert not GMTGeometry.RingIsClockwise(Hole)
+    assert GMTGeometry.SignedArea(Outer) == -4.0
+    assert GMTGeometry.SignedArea(Hole) == 1.0
+
+
+def test_RingsClassifiedByWinding(tmp_path):
+    ShapeFile = WriteLakesShapefile(str(tmp_path / 'lakes'), [(1, [OUTER_A, HOLE_A, OUTER_B]), (2, [OUTER_B])])
+    TheParser, Comments = ParseLakes(ShapeFile, str(tmp_path / 'out.gmt'))
+
+    # The second outer ring of lake 1 is a perimeter, not an island
+    assert Comments == ['# @D', '# @P', '# @H', '# @P', '# @D', '# @P']
+    assert TheParser.FileStats['CountLakesCopied'] == 2
+    assert TheParser.FileStats['CountTotalIslandsCopied'] == 1
+
+
+def test_SkipIslandsKeepsOuterRings(tmp_path):
+    ShapeFile = WriteLakesShapefile(str(tmp_path / 'lakes'), [(1, [OUTER_A, HOLE_A, OUTER_B])])
+    TheParser, Comments = ParseLakes(ShapeFile, str(tmp_path / 'out.gmt'), SkipIslands=True)
+
+    assert Comments == ['# @D', '# @P', '# @P']
+    assert TheParser.FileStats['CountTotalIslandsCopied'] == 0
+
+
+def test_ClippedAwayLakeNotCounted(tmp_path):
+    # Lake 1 has its pour point in the bounds but its outline is clipped away
+    Outside = [(3.0, 3.0), (3.0, 3.5), (10.0, 3.5), (10.0, 3.0), (3.0, 3.0)]
+    ShapeFile = WriteLakesShapefile(str(tmp_path / 'lakes'), [(1, [Outside, HOLE_A], (1.0, 1.0)), (2, [OUTER_A, HOLE_A])])
+    TheParser, Comments = ParseLakes(ShapeFile, str(tmp_path / 'out.gmt'), SimpleBounds=[-1.0, 2.5, -1.0, 2.5], ClipToBounds=True)
+
+    assert Comments == ['# @D', '# @P', '# @H']
+    assert TheParser.FileStats['CountLakesCopied'] == 1
+    assert TheParser.FileStats['CountTotalIslandsCopied'] == 1
@@ -0,0 +1,81 @@
+"""
+Files written next to OutputFile are only replaced with Overwrite, as OutputFile is.
+"""
+
+import pytest
+
+import GMTBinary
+import ParseSHEDSLake
+import ParseSHEDSriv
+import SyntheticSHEDS
+
+
+@pytest.fixture
+def LakesFile(tmp_path):
+    FileName = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(FileName, LakeCount=200, VerticesPerRing=8)
+    return FileName
+
+
+def test_StatsFileNeedsOverwrite(tmp_path, LakesFile):
+    OutputFile = str(tmp_path / 'out.gmt')
+    with open(OutputFile + '.stats.json', 'w') as OutFile:
+        OutFile.write('{}')
+
+    with pytest.raises(ParseSHEDSLake.InitInputError) as err:
+        ParseSHEDSLake.LakesParser(LakesFile, OutputFile, AreaMin=1.0, OutputForHistogram=True, RunSilent=True)
+    assert err.value.InputRec == OutputFile + '.stats.json'
+
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, AreaMin=1.0, OutputForHistogram=True, Overwrite=True, RunSilent=True)
+    TheParser.ParseLAKES()
+    with open(OutputFile + '.stats.json', 'r') as InFile:
+        assert 'Lake_area' in InFile.read()
+
+
+@pytest.fixture
+def RiversFile(tmp_path):
+    FileName = str(tmp_path / 'riv.gmt')
+    SyntheticSHEDS.WriteRivers(FileName, SegmentCount=200)
+    return FileName
+
+
+def WriteSidecar(OutputFile):
+    with open(GMTBinary.SidecarFileName(OutputFile), 'w') as OutFile:
+        OutFile.write('> kept\n')
+
+
+def ReadSidecar(OutputFile):
+    with open(GMTBinary.SidecarFileName(OutputFile), 'r') as InFile:
+        return InFile.read()
+
+
+def test_LakesSidecarNeedsOverwrite(tmp_path, LakesFile):
+    OutputFile = str(tmp_path / 'out.bin')
+    WriteSidecar(OutputFile)
+
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, AreaMin=1.0, BinaryOutput='float32', RunSilent=True)
+    with pytest.raises(ParseSHEDSLake.InitInputError) as err:
+        TheParser.ParseLAKES()
+    assert err.value.InputRec == GMTBinary.SidecarFileName(OutputFile)
+    assert ReadSidecar(OutputFile) == '> kept\n'
+
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, AreaMin=1.0, BinaryOutput='float32', Overwrite=True, RunSilent=True)
+    TheParser.ParseLAKES()
+    assert ReadSidecar(OutputFile) != '> kept\n'
+
+
+def test_RiversSidecarNeedsOverwrite(tmp_path, RiversFile):
+    OutputFile = str(tmp_path / 'out.bin')
+    WriteSidecar(OutputFile)
+
+    TheParser = ParseSHEDSriv.SHEDSrivParser(RiversFile, OutputFile, ThresholdHigh=100000000000, ThresholdLow=500,
+                                                BinaryOutput='float32', RunSilent=True)
+    with pytest.raises(ParseSHEDSriv.InitInputError) as err:
+        TheParser.ParseRIV()
+    assert err.value.InputRec == GMTBinary.SidecarFileName(OutputFile)
+    assert ReadSidecar(OutputFile) == '> kept\n'
+
+    TheParser = ParseSHEDSriv.SHEDSrivParser(RiversFile, OutputFile, ThresholdHigh=100000000000, ThresholdLow=500,
+                                                BinaryOutput='float32', Overwrite=True, RunSilent=True)
+    TheParser.ParseRIV()
+    assert ReadSidecar(OutputFile) != '> kept\n'
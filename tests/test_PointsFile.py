@@ -0,0 +1,60 @@
+"""
+PointsFile looks up the lake each point is in. The lakes file has one square lake with a
+square island in its middle.
+"""
+
+import pytest
+
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+# PointsFile needs NumPy
+pytest.importorskip('numpy')
+
+LAKE_HEADER = '# @D1|"Square"|"Canada"|"North America"|"CanVec"|1|0|4.00|8.00|1.10|0.40|0.00|1|10.0|0.100|10.0|100|1.00|40.0|0|0\n'
+LAKE = '>\n' + LAKE_HEADER + '# @P\n0 0\n0 2\n2 2\n2 0\n0 0\n'
+ISLAND = '>\n# @H\n0.5 0.5\n1.5 0.5\n1.5 1.5\n0.5 1.5\n0.5 0.5\n'
+
+# In the lake, on the island, outside the lake
+POINTS = '0.25 0.25\n1 1\n5 5\n'
+
+
+@pytest.fixture
+def LakesFile(tmp_path):
+    FileName = str(tmp_path / 'lakes.gmt')
+    with open(FileName, 'w') as OutFile:
+        OutFile.write(SyntheticSHEDS.LakesHeader() + LAKE + ISLAND)
+    return FileName
+
+
+def WritePoints(tmp_path, Text):
+    FileName = str(tmp_path / 'points.txt')
+    with open(FileName, 'w') as OutFile:
+        OutFile.write(Text)
+    return FileName
+
+
+def LocatePoints(LakesFile, PointsFile, OutputFile, **Options):
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, PointsFile=PointsFile, RunSilent=True, **Options)
+    TheParser.ParseLAKES()
+    with open(OutputFile, 'r') as InFile:
+        return [int(line.split()[2]) for line in InFile]
+
+
+@pytest.mark.parametrize('Options', [{}, {'SkipIslands':True}, {'UseIndex':True}, {'UseIndex':True, 'SkipIslands':True}])
+def test_PointsOnIslandsInNoLake(tmp_path, LakesFile, Options):
+    PointsFile = WritePoints(tmp_path, POINTS)
+    assert LocatePoints(LakesFile, PointsFile, str(tmp_path / 'out.txt'), **Options) == [1, 0, 0]
+
+
+@pytest.mark.parametrize('Text', ['0.25 0.25 10\n1 1 20\n', '0.25 0.25\n1 1 20\n5\n', '0.25,0.25,10\n1,1,20\n'])
+def test_PointsFileColumns(tmp_path, LakesFile, Text):
+    PointsFile = WritePoints(tmp_path, Text)
+    with pytest.raises(ParseSHEDSLake.InitInputError) as err:
+        LocatePoints(LakesFile, PointsFile, str(tmp_path / 'out.txt'))
+    assert 'two values' in err.value.message
+
+
+def test_PointsFileCommentsAndCommas(tmp_path, LakesFile):
+    PointsFile = WritePoints(tmp_path, '# lon lat\n0.25,0.25\n\n1 1\n5\t5\n')
+    assert LocatePoints(LakesFile, PointsFile, str(tmp_path / 'out.txt')) == [1, 0, 0]
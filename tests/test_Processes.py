@@ -0,0 +1,42 @@
+"""
+Parsing in chunks with Processes writes the same output and FileStats as a serial run.
+"""
+
+import pytest
+
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+
+@pytest.fixture(scope='module')
+def LakesFile(tmp_path_factory):
+    FileName = str(tmp_path_factory.mktemp('lakes') / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(FileName, LakeCount=3000, IslandsPerLake=0.5, VerticesPerRing=10)
+    return FileName
+
+
+def ParseLakes(LakesFile, OutputFile, ChunkBytes=None, **Options):
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, RunSilent=True, **Options)
+    if ChunkBytes is not None:
+        # Many small chunks so lakes and islands meet the chunk edges
+        TheParser.CHUNK_BYTES = ChunkBytes
+    TheParser.ParseLAKES()
+    with open(OutputFile, 'rb') as InFile:
+        return InFile.read(), TheParser.FileStats
+
+
+@pytest.mark.parametrize('Options', [{'AreaMin':1.0}, 
+                                     {'ContinentName':'north', 'SkipIslands':True}, 
+                                     {'SimpleBounds':[-20.0, 60.0, 30.0, 70.0], 'ReportFullStats':True}, 
+                                     {'MemoryMap':True, 'AreaMax':50.0}])
+def test_ProcessesMatchSerial(tmp_path, LakesFile, Options):
+    Expected, ExpectedStats = ParseLakes(LakesFile, str(tmp_path / 'serial.gmt'), **Options)
+    Output, FileStats = ParseLakes(LakesFile, str(tmp_path / 'parallel.gmt'), ChunkBytes=20000, Processes=3, **Options)
+    
+    assert Output == Expected
+    assert ExpectedStats['CountLakesCopied'] > 0
+    for Key in ('CountLakes', 'CountTotalIslands', 'MostIslandsInLake', 'CountLines', 'CountLakesCopied', 
+                'CountTotalIslandsCopied'):
+        assert FileStats[Key] == ExpectedStats[Key], Key
+    if 'ReportFullStats' in Options:
+        assert FileStats['FieldStats']['Lake_area']['Count'] == ExpectedStats['FieldStats']['Lake_area']['Count']
@@ -0,0 +1,51 @@
+"""
+The river parser copies segments whose first point is in any box of a BoundsFile.
+"""
+
+import pytest
+
+import ParseSHEDSriv
+import SyntheticSHEDS
+
+# Two boxes in SyntheticSHEDS.RIVERS_REGION
+BOXES = [[115.0, 125.0, -30.0, -20.0], [135.0, 150.0, -25.0, -12.0]]
+
+
+@pytest.fixture
+def RiversFile(tmp_path):
+    FileName = str(tmp_path / 'rivers.gmt')
+    SyntheticSHEDS.WriteRivers(FileName, SegmentCount=2000)
+    return FileName
+
+
+def ParseRivers(RiversFile, OutputFile, **Options):
+    TheParser = ParseSHEDSriv.SHEDSrivParser(RiversFile, OutputFile, ThresholdHigh=100000000000, ThresholdLow=500,
+                                                RunSilent=True, **Options)
+    TheParser.ParseRIV()
+    with open(OutputFile, 'rb') as InFile:
+        return InFile.read(), TheParser.FileStats['OutputSegmentCount']
+
+
+def WriteBoundsFile(tmp_path, Boxes):
+    FileName = str(tmp_path / 'bounds.txt')
+    with open(FileName, 'w') as OutFile:
+        for Box in Boxes:
+            OutFile.write('{} {} {} {}\n'.format(*Box))
+    return FileName
+
+
+def test_BoundsFileOneBoxMatchesSimpleBounds(tmp_path, RiversFile):
+    BoundsFile = WriteBoundsFile(tmp_path, BOXES[:1])
+    Expected, ExpectedCount = ParseRivers(RiversFile, str(tmp_path / 'simple.gmt'), SimpleBounds=list(BOXES[0]))
+    Output, Count = ParseRivers(RiversFile, str(tmp_path / 'file.gmt'), BoundsFile=BoundsFile)
+    assert Output == Expected
+    assert Count == ExpectedCount > 0
+
+
+def test_BoundsFileAnyBox(tmp_path, RiversFile):
+    BoundsFile = WriteBoundsFile(tmp_path, BOXES)
+    Counts = [ParseRivers(RiversFile, str(tmp_path / 'simple{}.gmt'.format(i)), SimpleBounds=list(Box))[1]
+                for i, Box in enumerate(BOXES)]
+    Output, Count = ParseRivers(RiversFile, str(tmp_path / 'file.gmt'), BoundsFile=BoundsFile)
+    assert Count == sum(Counts)
+    assert min(Counts) > 0
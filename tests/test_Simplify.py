@@ -0,0 +1,141 @@
+"""
+Simplify and ClipToBounds rewrite the coordinates of the copied lakes, including the last
+ring of a file without a final newline. Simplified rings keep every dropped vertex within
+the tolerance and clipped rings stay within the bounds.
+"""
+
+import gzip
+import math
+import random
+from array import array
+
+import pytest
+
+import GMTGeometry
+import ParseSHEDSLake
+import SyntheticSHEDS
+
+LAKE_HEADER = '# @D1|"Square"|"Canada"|"North America"|"CanVec"|1|0|4.00|8.00|1.10|0.40|0.00|1|10.0|0.100|10.0|100|1.00|40.0|1|1\n'
+LAKE = '>\n' + LAKE_HEADER + '# @P\n0 0\n0 2\n2 2\n2 0\n0 0\n'
+ISLAND = '>\n# @H\n0.5 0.5\n1.5 0.5\n1.5 1.5\n0.5 1.5\n0.5 0.5\n'
+
+
+def WriteLakes(FileName, Text):
+    Text = SyntheticSHEDS.LakesHeader() + Text
+    if FileName.endswith('.gz'):
+        with gzip.open(FileName, 'wt') as OutFile:
+            OutFile.write(Text)
+    else:
+        with open(FileName, 'w') as OutFile:
+            OutFile.write(Text)
+
+
+def RewriteLakes(tmp_path, Text, Name, Options):
+    LakesFile = str(tmp_path / Name)
+    OutputFile = str(tmp_path / ('out.' + Name))
+    WriteLakes(LakesFile, Text)
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, RunSilent=True, Overwrite=True, **Options)
+    TheParser.ParseLAKES()
+    with gzip.open(OutputFile, 'rb') if OutputFile.endswith('.gz') else open(OutputFile, 'rb') as InFile:
+        return InFile.read(), TheParser.FileStats
+
+
+@pytest.mark.parametrize('Rewrite', [{'Simplify':0.0}, {'SimpleBounds':[-180.0, 180.0, -90.0, 90.0], 'ClipToBounds':True}])
+@pytest.mark.parametrize('Mode', [{}, {'UseIndex':True}, {'Processes':2}, {'Name':'lakes.gmt.gz'}])
+def test_UnterminatedLastRing(tmp_path, Rewrite, Mode):
+    Mode = dict(Mode)
+    Name = Mode.pop('Name', 'lakes.gmt')
+    (tmp_path / 'terminated').mkdir()
+    Expected, ExpectedStats = RewriteLakes(tmp_path / 'terminated', LAKE + ISLAND, Name, dict(Rewrite, **Mode))
+    Output, FileStats = RewriteLakes(tmp_path, LAKE + ISLAND.rstrip('\n'), Name, dict(Rewrite, **Mode))
+    
+    assert Output == Expected
+    # The island keeps its five vertices
+    assert Output.endswith(b'# @H\n0.5 0.5\n1.5 0.5\n1.5 1.5\n0.5 1.5\n0.5 0.5\n')
+    assert FileStats['CountTotalIslandsCopied'] == 1
+
+
+def RandomRing(Generator, VertexCount):
+    """
+    Returns a closed star shaped ring with a jagged outline.
+    """
+    Ring = array('d')
+    for i in range(VertexCount):
+        Angle = 2.0 * math.pi * i / VertexCount
+        Radius = 1.0 + 0.3 * Generator.random()
+        Ring.extend([10.0 + Radius * math.cos(Angle), 50.0 + Radius * math.sin(Angle)])
+    Ring.extend(Ring[:2])
+    return Ring
+
+
+def LineDistance(Point, Start, End):
+    DirectionLon = End[0] - Start[0]
+    DirectionLat = End[1] - Start[1]
+    Length = math.hypot(DirectionLon, DirectionLat)
+    if Length == 0.0:
+        return math.hypot(Point[0] - Start[0], Point[1] - Start[1])
+    return abs(DirectionLon * (Point[1] - Start[1]) - DirectionLat * (Point[0] - Start[0])) / Length
+
+
+@pytest.mark.parametrize('UseNumPy', [True, False])
+@pytest.mark.parametrize('Tolerance', [0.0, 0.01, 0.1, 10.0])
+def test_SimplifyWithinTolerance(monkeypatch, UseNumPy, Tolerance):
+    if UseNumPy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(GMTGeometry, 'np', None)
+    Ring = RandomRing(random.Random(4), 200)
+    Points = list(zip(Ring[0::2], Ring[1::2]))
+    Simplified = GMTGeometry.SimplifyCoordinates(Ring, Tolerance)
+    Kept = list(zip(Simplified[0::2], Simplified[1::2]))
+    
+    # The ring stays closed and a polygon
+    assert Kept[0] == Kept[-1] == Points[0]
+    assert len(Kept) >= GMTGeometry.MIN_RING_VERTICES
+    if Tolerance == 0.0:
+        assert Kept == Points
+    # Kept vertices are in order and each dropped vertex is near the line it was dropped to
+    KeptIndices = []
+    Next = 0
+    for Point in Kept:
+        Next = Points.index(Point, Next + (1 if KeptIndices else 0))
+        KeptIndices.append(Next)
+    for First, End in zip(KeptIndices, KeptIndices[1:]):
+        for i in range(First + 1, End):
+            assert LineDistance(Points[i], Points[First], Points[End]) <= Tolerance
+
+
+def test_SimplifyModesAgree(tmp_path):
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=1000, VerticesPerRing=40)
+    Outputs = []
+    for Name, Options in (('scan.gmt', {}), ('indexed.gmt', {'UseIndex':True}), ('parallel.gmt', {'Processes':2})):
+        TheParser = ParseSHEDSLake.LakesParser(LakesFile, str(tmp_path / Name), Simplify=0.01, RunSilent=True, **Options)
+        TheParser.ParseLAKES()
+        with open(str(tmp_path / Name), 'rb') as InFile:
+            Outputs.append(InFile.read())
+        FileStats = TheParser.FileStats
+        assert 0 < FileStats['CountVerticesAfterSimplify'] < FileStats['CountVerticesBeforeSimplify']
+        assert FileStats['CountLakesCopied'] == FileStats['CountLakes']
+    assert Outputs[0] == Outputs[1] == Outputs[2]
+    with open(LakesFile, 'rb') as InFile:
+        assert len(Outputs[0]) < len(InFile.read())
+
+
+def test_ClippedRingsWithinBounds(tmp_path):
+    LakesFile = str(tmp_path / 'lakes.gmt')
+    OutputFile = str(tmp_path / 'out.gmt')
+    SyntheticSHEDS.WriteLakes(LakesFile, LakeCount=2000, VerticesPerRing=20)
+    Bounds = [-20.0, 60.0, 30.0, 70.0]
+    TheParser = ParseSHEDSLake.LakesParser(LakesFile, OutputFile, SimpleBounds=Bounds, ClipToBounds=True, RunSilent=True)
+    TheParser.ParseLAKES()
+    
+    with open(OutputFile, 'r') as InFile:
+        Lines = [line.split() for line in InFile if line[0] not in '#>']
+    assert Lines
+    for Lon, Lat in Lines:
+        assert Bounds[0] <= float(Lon) <= Bounds[1]
+        assert Bounds[2] <= float(Lat) <= Bounds[3]
+    # Some rings crossed the bounds and were cut at them
+    assert any((float(Lon) in Bounds[:2]) or (float(Lat) in Bounds[2:]) for Lon, Lat in Lines)
+    assert TheParser.FileStats['CountLakesCopied'] > 0
@@ -0,0 +1,126 @@
+"""
+StreamConversion parses ogr2ogr output from a pipe. ogr2ogr is replaced by fakebin/ogr2ogr,
+which writes a synthetic GMT file, so the tests run without GDAL.
+"""
+
+import os
+
+import pytest
+
+import ParseSHEDSLake
+import ParseSHEDSriv
+import SyntheticSHEDS
+
+FAKE_BIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fakebin')
+
+
+@pytest.fixture
+def FakeOgr2ogr(monkeypatch):
+    monkeypatch.setenv('PATH', FAKE_BIN + os.pathsep + os.environ.get('PATH', ''))
+    monkeypatch.delenv('FAKE_OGR2OGR_EXIT', raising=False)
+    return monkeypatch
+
+
+def MakeShapefile(Directory, Name):
+    """
+    Returns the path of an empty Name.shp with the files next to it the parsers check for.
+    The fake ogr2ogr converts it to $FAKE_OGR2OGR_SOURCE.
+    """
+    for Extension in ('shp', 'shx', 'dbf', 'prj'):
+        open(os.path.join(Directory, '{}.{}'.format(Name, Extension)), 'w').close()
+    return os.path.join(Directory, Name + '.shp')
+
+
+@pytest.fixture
+def LakesShapefile(tmp_path, FakeOgr2ogr):
+    GMTFile = str(tmp_path / 'lakes.gmt')
+    SyntheticSHEDS.WriteLakes(GMTFile, LakeCount=300, VerticesPerRing=12)
+    FakeOgr2ogr.setenv('FAKE_OGR2OGR_SOURCE', GMTFile)
+    return GMTFile, MakeShapefile(str(tmp_path), 'lakes')
+
+
+@pytest.fixture
+def RiversShapefile(tmp_path, FakeOgr2ogr):
+    GMTFile = str(tmp_path / 'riv.gmt')
+    SyntheticSHEDS.WriteRivers(GMTFile, SegmentCount=500)
+    FakeOgr2ogr.setenv('FAKE_OGR2OGR_SOURCE', GMTFile)
+    return GMTFile, MakeShapefile(str(tmp_path), 'riv')
+
+
+def ParseLakes(InputFile, OutputFile, **Options):
+    TheParser = ParseSHEDSLake.LakesParser(InputFile, OutputFile, AreaMin=0.5, RunSilent=True, **Options)
+    TheParser.ParseLAKES()
+    return TheParser
+
+
+def ParseRivers(InputFile, OutputFile, **Options):
+    TheParser = ParseSHEDSriv.SHEDSrivParser(InputFile, OutputFile, ThresholdHigh=100000000000, ThresholdLow=500,
+                                                RunSilent=True, **Options)
+    TheParser.ParseRIV()
+    return TheParser
+
+
+def ReadBytes(FileName):
+    with open(FileName, 'rb') as InFile:
+        return InFile.read()
+
+
+def test_LakesStreamedMatchesGMTText(tmp_path, LakesShapefile):
+    GMTFile, ShapeFile = LakesShapefile
+    ParseLakes(GMTFile, str(tmp_path / 'text.gmt'))
+    Streamed = ParseLakes(ShapeFile, str(tmp_path / 'streamed.gmt'), StreamConversion=True)
+
+    assert ReadBytes(str(tmp_path / 'streamed.gmt')) == ReadBytes(str(tmp_path / 'text.gmt'))
+    assert Streamed.FileStats['CountLakesCopied'] > 0
+
+
+def test_LakesStreamedNonZeroExit(tmp_path, LakesShapefile, FakeOgr2ogr):
+    FakeOgr2ogr.setenv('FAKE_OGR2OGR_EXIT', '1')
+    with pytest.raises(ParseSHEDSLake.ProcessingError) as err:
+        ParseLakes(LakesShapefile[1], str(tmp_path / 'streamed.gmt'), StreamConversion=True)
+    assert 'non zero exit 1' in err.value.message
+    assert 'fake ogr2ogr failure' in err.value.CauseException
+
+
+def test_LakesStreamedMissingOgr2ogr(tmp_path, LakesShapefile, FakeOgr2ogr):
+    # The shell runs ogr2ogr and exits 127 when it is not found
+    FakeOgr2ogr.setenv('FAKE_OGR2OGR_EXIT', '127')
+    with pytest.raises(ParseSHEDSLake.ProcessingError) as err:
+        ParseLakes(LakesShapefile[1], str(tmp_path / 'streamed.gmt'), StreamConversion=True)
+    assert 'command not found' in err.value.message
+
+    FakeOgr2ogr.delenv('FAKE_OGR2OGR_EXIT')
+    FakeOgr2ogr.setenv('PATH', str(tmp_path))
+    with pytest.raises(ParseSHEDSLake.ProcessingError) as err:
+        ParseLakes(LakesShapefile[1], str(tmp_path / 'streamed2.gmt'), StreamConversion=True)
+    assert 'command not found' in err.value.message
+
+
+def test_RiversStreamedMatchesGMTText(tmp_path, RiversShapefile):
+    GMTFile, ShapeFile = RiversShapefile
+    ParseRivers(GMTFile, str(tmp_path / 'text.gmt'))
+    Streamed = ParseRivers(ShapeFile, str(tmp_path / 'streamed.gmt'), StreamConversion=True)
+
+    assert ReadBytes(str(tmp_path / 'streamed.gmt')) == ReadBytes(str(tmp_path / 'text.gmt'))
+    assert Streamed.FileStats['OutputSegmentCount'] > 0
+
+
+def test_RiversStreamedNonZeroExit(tmp_path, RiversShapefile, FakeOgr2ogr):
+    FakeOgr2ogr.setenv('FAKE_OGR2OGR_EXIT', '1')
+    with pytest.raises(ParseSHEDSriv.ProcessingError) as err:
+        ParseRivers(RiversShapefile[1], str(tmp_path / 'streamed.gmt'), StreamConversion=True)
+    assert 'non zero exit 1' in err.value.message
+    assert 'fake ogr2ogr failure' in err.value.CauseException
+
+
+def test_RiversStreamedMissingOgr2ogr(tmp_path, RiversShapefile, FakeOgr2ogr):
+    FakeOgr2ogr.setenv('FAKE_OGR2OGR_EXIT', '127')
+    with pytest.raises(ParseSHEDSriv.ProcessingError) as err:
+        ParseRivers(RiversShapefile[1], str(tmp_path / 'streamed.gmt'), StreamConversion=True)
+    assert 'command not found' in err.value.message
+
+    FakeOgr2ogr.delenv('FAKE_OGR2OGR_EXIT')
+    FakeOgr2ogr.setenv('PATH', str(tmp_path))
+    with pytest.raises(ParseSHEDSriv.ProcessingError) as err:
+        ParseRivers(RiversShapefile[1], str(tmp_path / 'streamed2.gmt'), StreamConversion=True)
+    assert 'command not found' in err.value.message